@@ -0,0 +1,57 @@
+import argparse
+import time
+
+from src.rate_limiting.distributed_rate_limiter import DistributedRateLimiter
+from src.rate_limiting.storage_backend import InMemoryStorageBackend, RedisStorageBackend
+
+# Algorithm name -> limits of the limiter
+ALGORITHMS = {
+    'token_bucket': {'capacity': 100, 'fill_rate': 100},
+    'leaky_bucket': {'capacity': 100, 'leak_rate': 100},
+    'fixed_window_counter': {'max_allowed_requests': 100, 'window_size': 1},
+    'sliding_window_counter': {'max_allowed_requests': 100, 'window_size': 1},
+    'sliding_window_log': {'max_allowed_requests': 100, 'window_size': 1},
+}
+
+BATCH_SIZES = (1, 10, 100)
+
+
+def run(limiter: DistributedRateLimiter, num_decisions: int, num_keys: int, batch_size: int) -> tuple[float, float]:
+    """Run decisions one by one or in pipelined batches, return round-trips per decision and decisions per second."""
+    keys = [f"client-{i % num_keys}" for i in range(num_decisions)]
+    round_trips = limiter.backend.round_trips
+    start_time = time.perf_counter()
+    if batch_size == 1:
+        for key in keys:
+            limiter.allow_request(key)
+    else:
+        for i in range(0, num_decisions, batch_size):
+            limiter.allow_batch(keys[i:i + batch_size])
+    elapsed = time.perf_counter() - start_time
+    return (limiter.backend.round_trips - round_trips) / num_decisions, num_decisions / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Round-trips per decision of the distributed rate limiter")
+    parser.add_argument('--redis-url', help="run against a Redis server, e.g. redis://localhost:6379/0, "
+                                            "instead of the in-memory stand-in (needs the redis package)")
+    parser.add_argument('--decisions', type=int, default=10_000, help="decisions per run")
+    parser.add_argument('--keys', type=int, default=1000, help="number of distinct keys")
+    args = parser.parse_args()
+
+    if args.redis_url:
+        import redis
+        backend = RedisStorageBackend(redis.Redis.from_url(args.redis_url))
+    else:
+        backend = InMemoryStorageBackend()
+
+    print(f"{'algorithm':<24}{'batch size':>12}{'round-trips/decision':>22}{'decisions/s':>14}")
+    for algorithm, limits in ALGORITHMS.items():
+        limiter = DistributedRateLimiter(backend, algorithm, key_prefix='benchmark', **limits)
+        for batch_size in BATCH_SIZES:
+            round_trips, throughput = run(limiter, args.decisions, args.keys, batch_size)
+            print(f"{algorithm:<24}{batch_size:>12}{round_trips:>22.3f}{throughput:>14,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+import argparse
+import threading
+import time
+
+from src.rate_limiting.hierarchical_rate_limiter import HierarchicalRateLimiter
+from src.rate_limiting.leaky_bucket import LeakyBucket
+from src.rate_limiting.sliding_window_counter import SlidingWindowCounter
+from src.rate_limiting.token_bucket import TokenBucket
+from src.rate_limiting.traffic_simulator import default_decision
+
+THREAD_COUNTS = (1, 4, 8)
+
+
+def build_levels(num_users: int, num_organizations: int):
+    """Limiters of every user, organization and the global one, a mix of algorithms with limits high enough to
+    admit most requests, so that both approaches go through every level."""
+    users = [TokenBucket(capacity=1000, fill_rate=1_000_000) for _ in range(num_users)]
+    organizations = [SlidingWindowCounter(max_allowed_requests=1_000_000, window_size=1)
+                     for _ in range(num_organizations)]
+    global_limiter = LeakyBucket(capacity=1_000_000, leak_rate=10_000_000)
+    return users, organizations, global_limiter
+
+
+def sequential_decision(chain) -> bool:
+    """Today's approach: one decision per limiter, each under its own lock, stopping at the first denial
+    without refunding the limiters that admitted the request."""
+    for limiter in chain:
+        if not default_decision(limiter):
+            return False
+    return True
+
+
+def run(decide, chains, num_threads: int, decisions_per_thread: int) -> float:
+    """Run decisions on the chains of random users from several threads and return the nanoseconds per decision."""
+    start_barrier = threading.Barrier(num_threads + 1)
+
+    def worker(thread_id: int):
+        selected = [chains[(thread_id * 7919 + i * 104729) % len(chains)] for i in range(decisions_per_thread)]
+        start_barrier.wait()
+        for chain in selected:
+            decide(chain)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(num_threads)]
+    for thread in threads:
+        thread.start()
+    start_barrier.wait()
+    start_time = time.perf_counter_ns()
+    for thread in threads:
+        thread.join()
+    return (time.perf_counter_ns() - start_time) / (num_threads * decisions_per_thread)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hierarchical limits: composite limiter against one call per level")
+    parser.add_argument('--users', type=int, default=1000, help="number of users")
+    parser.add_argument('--organizations', type=int, default=10, help="number of organizations")
+    parser.add_argument('--decisions', type=int, default=50_000, help="decisions per thread")
+    parser.add_argument('--repeat', type=int, default=5, help="runs per configuration, the best one is reported")
+    args = parser.parse_args()
+
+    users, organizations, global_limiter = build_levels(args.users, args.organizations)
+    chains = [(user, organizations[index % args.organizations], global_limiter) for index, user in enumerate(users)]
+    composites = [HierarchicalRateLimiter(chain) for chain in chains]
+    print(f"{'threads':>8}{'sequential ns':>16}{'composite ns':>15}{'ratio':>8}")
+    for num_threads in THREAD_COUNTS:
+        sequential = min(run(sequential_decision, chains, num_threads, args.decisions) for _ in range(args.repeat))
+        composite = min(run(HierarchicalRateLimiter.allow_request, composites, num_threads, args.decisions)
+                        for _ in range(args.repeat))
+        print(f"{num_threads:>8}{sequential:>16.0f}{composite:>15.0f}{composite / sequential:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
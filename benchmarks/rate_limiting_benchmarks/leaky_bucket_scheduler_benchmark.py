@@ -0,0 +1,65 @@
+import argparse
+import threading
+import time
+from collections import deque
+
+from src.rate_limiting.leaky_bucket_scheduler import LeakyBucketScheduler
+
+LEAK_RATES = (1_000, 10_000, 100_000, 200_000)
+
+
+def per_item_sleep(leak_rate: float, num_items: int) -> list[float]:
+    """The naive drain: a worker sleeping 1 / leak_rate after every item, and return the release times."""
+    release_times = []
+    queue = deque(range(num_items))
+
+    def worker():
+        while queue:
+            queue.popleft()
+            release_times.append(time.monotonic())
+            time.sleep(1 / leak_rate)
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+    return release_times
+
+
+def scheduler(leak_rate: float, num_items: int) -> list[float]:
+    """The tick-based drain of LeakyBucketScheduler, fed by a producer thread, and return the release times."""
+    release_times = []
+    record = release_times.append
+    with LeakyBucketScheduler(capacity=num_items, leak_rate=leak_rate) as leaky_bucket:
+        producer = threading.Thread(target=lambda: [leaky_bucket.add(lambda: record(time.monotonic()))
+                                                    for _ in range(num_items)])
+        producer.start()
+        producer.join()
+    return release_times
+
+
+def summarize(release_times: list[float], leak_rate: float) -> tuple[float, float]:
+    """Achieved rate, and the 99th percentile of how late the items left in ms, compared to their due time counted
+    from the first release."""
+    start_time = release_times[0]
+    rate = (len(release_times) - 1) / (release_times[-1] - start_time)
+    lateness = sorted(release_time - (start_time + index / leak_rate)
+                      for index, release_time in enumerate(release_times))
+    return rate, lateness[int(0.99 * (len(lateness) - 1))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Leaky bucket scheduler: pacing accuracy against per-item sleeps")
+    parser.add_argument('--duration', type=float, default=1.0, help="seconds of work queued per leak rate")
+    args = parser.parse_args()
+
+    print(f"{'leak rate':>10}{'sleep rate':>13}{'p99 late ms':>13}{'scheduler rate':>16}{'p99 late ms':>13}")
+    for leak_rate in LEAK_RATES:
+        num_items = int(leak_rate * args.duration)
+        sleep_rate, sleep_lateness = summarize(per_item_sleep(leak_rate, num_items), leak_rate)
+        scheduler_rate, scheduler_lateness = summarize(scheduler(leak_rate, num_items), leak_rate)
+        print(f"{leak_rate:>10}{sleep_rate:>13.0f}{sleep_lateness:>13.2f}{scheduler_rate:>16.0f}"
+              f"{scheduler_lateness:>13.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+import argparse
+import time
+
+from src.rate_limiting.distributed_rate_limiter import DistributedRateLimiter
+from src.rate_limiting.leased_rate_limiter import LeasedRateLimiter
+from src.rate_limiting.storage_backend import InMemoryStorageBackend, RedisStorageBackend
+
+# Algorithm name -> limits of the limiter, high enough that the limit itself is never hit
+ALGORITHMS = {
+    'token_bucket': {'capacity': 1_000_000, 'fill_rate': 1_000_000},
+    'fixed_window_counter': {'max_allowed_requests': 1_000_000, 'window_size': 1},
+}
+
+LEASE_SIZES = (10, 100, 1000)
+
+
+def run(limiter, num_decisions: int, num_keys: int) -> tuple[float, float]:
+    """Run decisions one by one, return round-trips per decision and decisions per second."""
+    keys = [f"client-{i % num_keys}" for i in range(num_decisions)]
+    round_trips = limiter.backend.round_trips
+    start_time = time.perf_counter()
+    for key in keys:
+        limiter.allow_request(key)
+    elapsed = time.perf_counter() - start_time
+    if isinstance(limiter, LeasedRateLimiter):
+        limiter.close()
+    return (limiter.backend.round_trips - round_trips) / num_decisions, num_decisions / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Round-trips per decision with and without local quota leases")
+    parser.add_argument('--redis-url', help="run against a Redis server, e.g. redis://localhost:6379/0, "
+                                            "instead of the in-memory stand-in (needs the redis package)")
+    parser.add_argument('--decisions', type=int, default=100_000, help="decisions per run")
+    parser.add_argument('--keys', type=int, default=10, help="number of distinct keys")
+    args = parser.parse_args()
+
+    if args.redis_url:
+        import redis
+        backend = RedisStorageBackend(redis.Redis.from_url(args.redis_url))
+    else:
+        backend = InMemoryStorageBackend()
+
+    print(f"{'algorithm':<24}{'lease size':>12}{'round-trips/decision':>22}{'decisions/s':>14}")
+    for algorithm, limits in ALGORITHMS.items():
+        limiter = DistributedRateLimiter(backend, algorithm, key_prefix='benchmark-remote', **limits)
+        round_trips, throughput = run(limiter, args.decisions, args.keys)
+        print(f"{algorithm:<24}{'-':>12}{round_trips:>22.4f}{throughput:>14,.0f}")
+        for lease_size in LEASE_SIZES:
+            limiter = LeasedRateLimiter(backend, algorithm, lease_size, key_prefix=f'benchmark-{lease_size}', **limits)
+            round_trips, throughput = run(limiter, args.decisions, args.keys)
+            print(f"{algorithm:<24}{lease_size:>12}{round_trips:>22.4f}{throughput:>14,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+import argparse
+import statistics
+import time
+
+from src.rate_limiting.bucketed_sliding_window_log import BucketedSlidingWindowLog
+from src.rate_limiting.fixed_window_counter import FixedWindowCounter
+from src.rate_limiting.leaky_bucket import LeakyBucket
+from src.rate_limiting.metrics import RateLimiterMetrics, to_openmetrics, to_prometheus
+from src.rate_limiting.sliding_window_counter import SlidingWindowCounter
+from src.rate_limiting.sliding_window_log import SlidingWindowLog
+from src.rate_limiting.token_bucket import TokenBucket
+
+# Algorithm name -> (limiter factory taking the metrics, decision of one request), limits leave room for some denials
+ALGORITHMS = {
+    'token_bucket': (lambda metrics: TokenBucket(capacity=1000, fill_rate=100_000, metrics=metrics),
+                     lambda limiter: limiter.consume(1)),
+    'leaky_bucket': (lambda metrics: LeakyBucket(capacity=1000, leak_rate=100_000, metrics=metrics),
+                     lambda limiter: limiter.add_tokens(1)),
+    'fixed_window_counter': (lambda metrics: FixedWindowCounter(max_allowed_requests=1000, window_size=0.01,
+                                                                metrics=metrics),
+                             lambda limiter: limiter.allow_request()),
+    'sliding_window_counter': (lambda metrics: SlidingWindowCounter(max_allowed_requests=1000, window_size=0.01,
+                                                                    metrics=metrics),
+                               lambda limiter: limiter.allow_request()),
+    'sliding_window_log': (lambda metrics: SlidingWindowLog(max_allowed_requests=1000, window_size=0.01,
+                                                            metrics=metrics),
+                           lambda limiter: limiter.allow_request()),
+    'bucketed_sliding_window_log': (lambda metrics: BucketedSlidingWindowLog(max_allowed_requests=1000,
+                                                                             window_size=0.01, metrics=metrics),
+                                    lambda limiter: limiter.allow_request()),
+}
+
+
+def run(limiter, decide, num_decisions: int) -> float:
+    """Run decisions on a single thread and return the nanoseconds per decision."""
+    start_time = time.perf_counter_ns()
+    for _ in range(num_decisions):
+        decide(limiter)
+    return (time.perf_counter_ns() - start_time) / num_decisions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cost of the metrics on a decision, and of exporting them")
+    parser.add_argument('--decisions', type=int, default=50_000, help="decisions per run")
+    parser.add_argument('--repeat', type=int, default=40,
+                        help="runs per limiter, alternating with and without metrics, the medians are reported")
+    parser.add_argument('--sample-every', type=int, default=64, help="one decision in that many is timed")
+    args = parser.parse_args()
+
+    print(f"{'algorithm':<30}{'plain ns':>10}{'metered ns':>12}{'overhead':>10}{'p25-p75':>16}")
+    all_metrics = []
+    for algorithm, (factory, decide) in ALGORITHMS.items():
+        metrics = RateLimiterMetrics(algorithm, sample_every=args.sample_every)
+        all_metrics.append(metrics)
+        plain_runs, metered_runs, overheads = [], [], []
+        # Alternate the two so that noise from the machine hits both alike, and compare every pair of runs: the
+        # median of the pairwise overheads is steadier than the difference of two minimums
+        for _ in range(args.repeat):
+            plain_runs.append(run(factory(None), decide, args.decisions))
+            metered_runs.append(run(factory(metrics), decide, args.decisions))
+            overheads.append(metered_runs[-1] / plain_runs[-1] - 1)
+        quartiles = statistics.quantiles(overheads, n=4)
+        print(f"{algorithm:<30}{statistics.median(plain_runs):>10.0f}{statistics.median(metered_runs):>12.0f}"
+              f"{statistics.median(overheads):>10.1%}{quartiles[0]:>8.1%}-{quartiles[2]:>7.1%}")
+
+    for name, export in (('prometheus', to_prometheus), ('openmetrics', to_openmetrics)):
+        start_time = time.perf_counter_ns()
+        for _ in range(100):
+            export(all_metrics)
+        print(f"{name} export of {len(all_metrics)} limiters: {(time.perf_counter_ns() - start_time) / 100_000:.0f} us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Callable
+
+from src.rate_limiting.fixed_window_counter import FixedWindowCounter
+from src.rate_limiting.gcra import GCRA
+from src.rate_limiting.keyed_rate_limiter import KeyedRateLimiter
+from src.rate_limiting.leaky_bucket import LeakyBucket
+from src.rate_limiting.sliding_window_counter import SlidingWindowCounter
+from src.rate_limiting.sliding_window_log import SlidingWindowLog
+from src.rate_limiting.token_bucket import TokenBucket
+
+# Algorithm name -> (limiter factory, single decision on a limiter), limits leave room for allowed and denied requests
+ALGORITHMS = {
+    'token_bucket': (lambda: TokenBucket(capacity=100, fill_rate=10_000), lambda limiter: limiter.consume(1)),
+    'leaky_bucket': (lambda: LeakyBucket(capacity=100, leak_rate=10_000), lambda limiter: limiter.add_tokens(1)),
+    'fixed_window_counter': (lambda: FixedWindowCounter(max_allowed_requests=100, window_size=0.01),
+                             lambda limiter: limiter.allow_request()),
+    'sliding_window_counter': (lambda: SlidingWindowCounter(max_allowed_requests=100, window_size=0.01),
+                               lambda limiter: limiter.allow_request()),
+    'sliding_window_log': (lambda: SlidingWindowLog(max_allowed_requests=100, window_size=0.01),
+                           lambda limiter: limiter.allow_request()),
+    'gcra': (lambda: GCRA(capacity=100, fill_rate=10_000), lambda limiter: limiter.consume(1)),
+}
+
+SCENARIOS = ('single_thread', 'multi_thread', 'many_key', 'bursty')
+
+# Metrics compared against a baseline, and whether higher values are better
+COMPARED_METRICS = {'decisions_per_second': True, 'p99_latency_ns': False}
+
+
+def percentile(sorted_values: list[int], fraction: float) -> int:
+    """Nearest-rank percentile of sorted values."""
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: list[int], elapsed: float) -> dict:
+    """Throughput and latency percentiles of decisions timed one by one, elapsed being the wall time of all of them."""
+    latencies.sort()
+    return {
+        'decisions': len(latencies),
+        'decisions_per_second': round(len(latencies) / elapsed),
+        'p50_latency_ns': percentile(latencies, 0.5),
+        'p99_latency_ns': percentile(latencies, 0.99),
+        'p999_latency_ns': percentile(latencies, 0.999),
+    }
+
+
+def timed_decisions(decide: Callable, limiters: list, latencies: list[int]):
+    """Run one decision per limiter, in order, appending the latency of each one."""
+    perf_counter_ns = time.perf_counter_ns
+    for limiter in limiters:
+        start_time = perf_counter_ns()
+        decide(limiter)
+        latencies.append(perf_counter_ns() - start_time)
+
+
+def single_thread(factory: Callable, decide: Callable, num_decisions: int, **_) -> dict:
+    """One limiter, decisions back to back from one thread."""
+    limiters = [factory()] * num_decisions
+    latencies = []
+    start_time = time.perf_counter()
+    timed_decisions(decide, limiters, latencies)
+    return summarize(latencies, time.perf_counter() - start_time)
+
+
+def multi_thread(factory: Callable, decide: Callable, num_decisions: int, num_threads: int, **_) -> dict:
+    """One limiter shared by several threads, decisions back to back, so every decision contends for its lock."""
+    limiter = factory()
+    start_barrier = threading.Barrier(num_threads + 1)
+    latencies_per_thread = [[] for _ in range(num_threads)]
+
+    def worker(latencies: list[int]):
+        limiters = [limiter] * (num_decisions // num_threads)
+        start_barrier.wait()
+        timed_decisions(decide, limiters, latencies)
+
+    threads = [threading.Thread(target=worker, args=(latencies,)) for latencies in latencies_per_thread]
+    for thread in threads:
+        thread.start()
+    start_barrier.wait()
+    start_time = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start_time
+    return summarize([latency for latencies in latencies_per_thread for latency in latencies], elapsed)
+
+
+def many_key(factory: Callable, decide: Callable, num_decisions: int, num_keys: int, **_) -> dict:
+    """Decisions on random keys of a KeyedRateLimiter, plus the memory each tracked key costs."""
+    tracemalloc.start()
+    registry = KeyedRateLimiter(factory, max_keys=num_keys)
+    for key in range(num_keys):
+        registry.get_limiter(key)
+    bytes_per_key = tracemalloc.get_traced_memory()[0] / num_keys
+    tracemalloc.stop()
+
+    rng = random.Random(42)
+    keys = [rng.randrange(num_keys) for _ in range(num_decisions)]
+    perf_counter_ns = time.perf_counter_ns
+    latencies = []
+    start_time = time.perf_counter()
+    for key in keys:
+        decision_start_time = perf_counter_ns()
+        decide(registry.get_limiter(key))
+        latencies.append(perf_counter_ns() - decision_start_time)
+    result = summarize(latencies, time.perf_counter() - start_time)
+    result['bytes_per_key'] = round(bytes_per_key)
+    return result
+
+
+def bursty(factory: Callable, decide: Callable, num_decisions: int, burst_size: int, idle_time: float, **_) -> dict:
+    """One limiter, bursts of back to back decisions separated by idle periods, so most of a burst is denied."""
+    limiter = factory()
+    latencies = []
+    elapsed = 0.0
+    for _ in range(num_decisions // burst_size):
+        start_time = time.perf_counter()
+        timed_decisions(decide, [limiter] * burst_size, latencies)
+        elapsed += time.perf_counter() - start_time  # Idle periods do not count towards the throughput
+        time.sleep(idle_time)
+    return summarize(latencies, elapsed)
+
+
+SCENARIO_RUNNERS = {
+    'single_thread': single_thread,
+    'multi_thread': multi_thread,
+    'many_key': many_key,
+    'bursty': bursty,
+}
+
+
+def find_regressions(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Describe every compared metric that got worse than the baseline by more than the tolerance."""
+    regressions = []
+    for algorithm, scenarios in results['results'].items():
+        for scenario, metrics in scenarios.items():
+            baseline_metrics = baseline.get('results', {}).get(algorithm, {}).get(scenario)
+            if baseline_metrics is None:
+                continue
+            for metric, higher_is_better in COMPARED_METRICS.items():
+                old, new = baseline_metrics[metric], metrics[metric]
+                change = (new - old) / old if old else 0.0
+                if (-change if higher_is_better else change) > tolerance:
+                    regressions.append(f"{algorithm}/{scenario} {metric}: {old:,} -> {new:,} ({change:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput, latency percentiles and memory of every rate limiter")
+    parser.add_argument('--output', default='rate_limiting_benchmark.json', help="JSON file the results go to")
+    parser.add_argument('--baseline', help="JSON file of an earlier run, exit with status 1 on regressions")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="relative change tolerated against the baseline")
+    parser.add_argument('--algorithms', nargs='+', choices=list(ALGORITHMS), default=list(ALGORITHMS))
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--decisions', type=int, default=100_000, help="decisions per scenario")
+    parser.add_argument('--threads', type=int, default=8, help="threads of the multi-thread scenario")
+    parser.add_argument('--keys', type=int, default=10_000, help="distinct keys of the many-key scenario")
+    parser.add_argument('--burst-size', type=int, default=500, help="decisions per burst of the bursty scenario")
+    parser.add_argument('--idle-time', type=float, default=0.005, help="seconds between bursts")
+    args = parser.parse_args()
+
+    results = {
+        'python': sys.version.split()[0],
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'parameters': {'decisions': args.decisions, 'threads': args.threads, 'keys': args.keys,
+                       'burst_size': args.burst_size, 'idle_time': args.idle_time},
+        'results': {},
+    }
+    print(f"{'algorithm':<24}{'scenario':<15}{'decisions/s':>13}{'p50 ns':>9}{'p99 ns':>9}{'p999 ns':>10}"
+          f"{'bytes/key':>11}")
+    for algorithm in args.algorithms:
+        factory, decide = ALGORITHMS[algorithm]
+        for scenario in args.scenarios:
+            metrics = SCENARIO_RUNNERS[scenario](factory, decide, num_decisions=args.decisions,
+                                                 num_threads=args.threads, num_keys=args.keys,
+                                                 burst_size=args.burst_size, idle_time=args.idle_time)
+            results['results'].setdefault(algorithm, {})[scenario] = metrics
+            print(f"{algorithm:<24}{scenario:<15}{metrics['decisions_per_second']:>13,}"
+                  f"{metrics['p50_latency_ns']:>9,}{metrics['p99_latency_ns']:>9,}{metrics['p999_latency_ns']:>10,}"
+                  f"{metrics.get('bytes_per_key', ''):>11}")
+
+    with open(args.output, 'w') as output:
+        json.dump(results, output, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = find_regressions(results, json.load(baseline_file), args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
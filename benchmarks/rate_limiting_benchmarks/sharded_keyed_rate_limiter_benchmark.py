@@ -0,0 +1,96 @@
+import argparse
+import threading
+import time
+
+from src.rate_limiting.fixed_window_counter import FixedWindowCounter
+from src.rate_limiting.keyed_rate_limiter import KeyedRateLimiter
+from src.rate_limiting.leaky_bucket import LeakyBucket
+from src.rate_limiting.sharded_keyed_rate_limiter import ShardedKeyedRateLimiter
+from src.rate_limiting.sliding_window_counter import SlidingWindowCounter
+from src.rate_limiting.sliding_window_log import SlidingWindowLog
+from src.rate_limiting.token_bucket import TokenBucket
+
+# Algorithm name -> (limiter factory, single decision on a limiter)
+ALGORITHMS = {
+    'token_bucket': (lambda: TokenBucket(capacity=100, fill_rate=100), lambda limiter: limiter.consume(1)),
+    'leaky_bucket': (lambda: LeakyBucket(capacity=100, leak_rate=100), lambda limiter: limiter.add_tokens(1)),
+    'fixed_window_counter': (lambda: FixedWindowCounter(max_allowed_requests=100, window_size=1),
+                             lambda limiter: limiter.allow_request()),
+    'sliding_window_counter': (lambda: SlidingWindowCounter(max_allowed_requests=100, window_size=1),
+                               lambda limiter: limiter.allow_request()),
+    'sliding_window_log': (lambda: SlidingWindowLog(max_allowed_requests=100, window_size=1),
+                           lambda limiter: limiter.allow_request()),
+}
+
+# With the GIL, total throughput stays roughly flat as threads are added, and the sharded limiter is slower than
+# a single lock at every thread count: lookups of known keys take no lock, and creating or evicting a key holds
+# the GIL anyway, so the shards only add hashing. Sharding pays off when the work done under the lock releases
+# the GIL, as in the contended creation scenario, or on free-threaded builds
+THREAD_COUNTS = (1, 2, 4, 8, 16, 32)
+
+
+def slow_factory(factory, latency: float):
+    """Wrap a limiter factory so it first waits for a store, e.g. to read the quota of the key, releasing the GIL."""
+    def create():
+        time.sleep(latency)
+        return factory()
+    return create
+
+
+def run(registry, decide, num_threads: int, num_keys: int, decisions_per_thread: int) -> float:
+    """Run decisions on random keys from several threads and return the throughput in decisions per second."""
+    start_barrier = threading.Barrier(num_threads + 1)
+
+    def worker(thread_id: int):
+        keys = [(thread_id * 7919 + i * 104729) % num_keys for i in range(decisions_per_thread)]
+        start_barrier.wait()
+        for key in keys:
+            decide(registry.get_limiter(key))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(num_threads)]
+    for thread in threads:
+        thread.start()
+    start_barrier.wait()
+    start_time = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start_time
+    return num_threads * decisions_per_thread / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Contention benchmark of keyed rate limiters")
+    parser.add_argument('--keys', type=int, default=100_000, help="number of distinct keys")
+    parser.add_argument('--max-keys', type=int, default=50_000, help="maximum number of tracked keys")
+    parser.add_argument('--shards', type=int, default=64, help="number of shards of the sharded limiter")
+    parser.add_argument('--decisions', type=int, default=20_000, help="decisions per thread")
+    parser.add_argument('--factory-latency', type=float, default=0.0002,
+                        help="seconds a new limiter waits for its quota in the contended creation scenario")
+    parser.add_argument('--creation-decisions', type=int, default=500,
+                        help="decisions per thread in the contended creation scenario")
+    args = parser.parse_args()
+
+    print(f"{'algorithm':<24}{'threads':>8}{'single lock (ops/s)':>22}{'sharded (ops/s)':>18}")
+    for name, (factory, decide) in ALGORITHMS.items():
+        for num_threads in THREAD_COUNTS:
+            single = KeyedRateLimiter(factory, max_keys=args.max_keys)
+            sharded = ShardedKeyedRateLimiter(factory, num_shards=args.shards, max_keys=args.max_keys)
+            single_throughput = run(single, decide, num_threads, args.keys, args.decisions)
+            sharded_throughput = run(sharded, decide, num_threads, args.keys, args.decisions)
+            print(f"{name:<24}{num_threads:>8}{single_throughput:>22,.0f}{sharded_throughput:>18,.0f}")
+
+    # Keys created and evicted all the time, by a factory waiting for a store under the lock of the registry
+    print(f"\nContended creation, {args.factory_latency * 1e6:.0f}us per new limiter")
+    print(f"{'algorithm':<24}{'threads':>8}{'single lock (ops/s)':>22}{'sharded (ops/s)':>18}")
+    factory, decide = ALGORITHMS['token_bucket']
+    factory = slow_factory(factory, args.factory_latency)
+    for num_threads in THREAD_COUNTS:
+        single = KeyedRateLimiter(factory, max_keys=args.max_keys)
+        sharded = ShardedKeyedRateLimiter(factory, num_shards=args.shards, max_keys=args.max_keys)
+        single_throughput = run(single, decide, num_threads, args.keys, args.creation_decisions)
+        sharded_throughput = run(sharded, decide, num_threads, args.keys, args.creation_decisions)
+        print(f"{'token_bucket':<24}{num_threads:>8}{single_throughput:>22,.0f}{sharded_throughput:>18,.0f}")
+
+
+if __name__ == '__main__':
+    main()
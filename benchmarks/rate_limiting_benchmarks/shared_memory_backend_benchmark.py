@@ -0,0 +1,85 @@
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+from src.rate_limiting.distributed_rate_limiter import DistributedRateLimiter
+from src.rate_limiting.fixed_window_counter import FixedWindowCounter
+from src.rate_limiting.shared_memory_backend import SharedMemoryStorageBackend
+from src.rate_limiting.token_bucket import TokenBucket
+
+# Algorithm name -> (limits, per-process limiter factory, decision on a per-process limiter), a host-wide limit of
+# 1000 requests per second
+ALGORITHMS = {
+    'token_bucket': ({'capacity': 1000, 'fill_rate': 1000}, lambda: TokenBucket(capacity=1000, fill_rate=1000),
+                     lambda limiter: limiter.consume(1)),
+    'fixed_window_counter': ({'max_allowed_requests': 1000, 'window_size': 1},
+                             lambda: FixedWindowCounter(max_allowed_requests=1000, window_size=1),
+                             lambda limiter: limiter.allow_request()),
+}
+
+PROCESS_COUNTS = (1, 4, 16)
+
+
+def worker(algorithm: str, path, num_keys: int, duration: float, start_event, results) -> None:
+    """Decide requests on num_keys keys for duration seconds, per process or through the shared table, and report
+    the number of decisions and of allowed requests."""
+    limits, factory, decide = ALGORITHMS[algorithm]
+    if path is None:
+        limiters = [factory() for _ in range(num_keys)]
+        allow = lambda index: decide(limiters[index])  # noqa: E731
+    else:
+        limiter = DistributedRateLimiter(SharedMemoryStorageBackend(path), algorithm, **limits)
+        keys = [f"client-{index}" for index in range(num_keys)]
+        allow = lambda index: limiter.allow_request(keys[index])  # noqa: E731
+
+    start_event.wait()
+    decisions = allowed = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        for index in range(num_keys):
+            allowed += allow(index)
+        decisions += num_keys
+    results.put((decisions, allowed))
+
+
+def run(algorithm: str, path, num_processes: int, num_keys: int, duration: float) -> tuple[float, float]:
+    """Run the workers and return the decisions per second of the host, and the requests allowed per second and
+    key, against a limit of 1000."""
+    context = multiprocessing.get_context('fork')
+    start_event, results = context.Event(), context.Queue()
+    processes = [context.Process(target=worker, args=(algorithm, path, num_keys, duration, start_event, results))
+                 for _ in range(num_processes)]
+    for process in processes:
+        process.start()
+    start_event.set()
+    totals = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    decisions, allowed = sum(total[0] for total in totals), sum(total[1] for total in totals)
+    return decisions / duration, allowed / duration / num_keys
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Host-wide limits of worker processes: per-process limiters "
+                                                 "against a shared memory table")
+    parser.add_argument('--duration', type=float, default=2.0, help="seconds every run lasts")
+    parser.add_argument('--keys', type=int, default=10, help="number of distinct keys")
+    args = parser.parse_args()
+
+    print(f"{'algorithm':<22}{'processes':>10}{'per-process ops/s':>19}{'allowed/s':>11}"
+          f"{'shared ops/s':>14}{'allowed/s':>11}")
+    for algorithm in ALGORITHMS:
+        for num_processes in PROCESS_COUNTS:
+            local_throughput, local_allowed = run(algorithm, None, num_processes, args.keys, args.duration)
+            with tempfile.TemporaryDirectory(dir='/dev/shm' if os.path.isdir('/dev/shm') else None) as directory:
+                path = os.path.join(directory, 'rate_limits')
+                SharedMemoryStorageBackend(path).close()
+                shared_throughput, shared_allowed = run(algorithm, path, num_processes, args.keys, args.duration)
+            print(f"{algorithm:<22}{num_processes:>10}{local_throughput:>19,.0f}{local_allowed:>11,.0f}"
+                  f"{shared_throughput:>14,.0f}{shared_allowed:>11,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from src.rate_limiting.snapshot import load_snapshot, save_snapshot
+from src.rate_limiting.token_bucket_store import TokenBucketStore
+
+CHUNK_SLOTS = (4_096, 65_536, 1 << 30)  # The last one copies the whole store in one hold of the lock
+
+
+def decision_stalls(store: TokenBucketStore, num_keys: int, stop: threading.Event, stalls: list) -> None:
+    """Make decisions until stopped and record the longest one, in ms."""
+    longest = 0.0
+    key = 0
+    while not stop.is_set():
+        start_time = time.perf_counter()
+        store.consume(key, 1)
+        longest = max(longest, time.perf_counter() - start_time)
+        key = (key + 7919) % num_keys
+    stalls.append(longest * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Snapshot and restore of a token bucket store")
+    parser.add_argument('--keys', type=int, nargs='+', default=[100_000, 1_000_000, 3_000_000],
+                        help="numbers of keys in the store")
+    args = parser.parse_args()
+
+    print(f"{'keys':>10}{'chunk slots':>13}{'save s':>9}{'longest decision ms':>21}{'restore s':>11}{'MB':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'buckets.snapshot')
+        for num_keys in args.keys:
+            store = TokenBucketStore(capacity=10, fill_rate=1, initial_slots=2 * num_keys)
+            for key in range(num_keys):
+                store.consume(key, 1)
+            for chunk_slots in CHUNK_SLOTS:
+                stop, stalls = threading.Event(), []
+                thread = threading.Thread(target=decision_stalls, args=(store, num_keys, stop, stalls))
+                thread.start()
+                start_time = time.perf_counter()
+                save_snapshot(store, path, chunk_slots=chunk_slots)
+                save_time = time.perf_counter() - start_time
+                stop.set()
+                thread.join()
+
+                start_time = time.perf_counter()
+                restored = load_snapshot(path)
+                restore_time = time.perf_counter() - start_time
+                assert len(restored) == len(store)
+                print(f"{num_keys:>10}{min(chunk_slots, store.num_slots):>13}{save_time:>9.2f}{stalls[0]:>21.2f}"
+                      f"{restore_time:>11.2f}{os.path.getsize(path) / 1e6:>8.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+import argparse
+import time
+
+from src.rate_limiting.keyed_rate_limiter import KeyedRateLimiter
+from src.rate_limiting.token_bucket import TokenBucket
+from src.rate_limiting.traffic_simulator import VirtualClock
+
+IDLE_TTL = 60.0
+
+
+def run(num_keys: int, new_keys_per_second: int, seconds: int, wheel_tick) -> tuple[float, float, int]:
+    """Fill a registry with keys used over the last IDLE_TTL seconds, then let new keys arrive while evict_idle runs
+    every second. Return the mean and worst evict_idle time in ms, and the number of keys left, the wheel may keep
+    keys up to a tick longer."""
+    clock = VirtualClock()
+    registry = KeyedRateLimiter(lambda: TokenBucket(capacity=10, fill_rate=1, clock=clock), max_keys=10 * num_keys,
+                                idle_ttl=IDLE_TTL, clock=clock, wheel_tick=wheel_tick)
+    for i in range(num_keys):
+        clock.advance(IDLE_TTL / num_keys)
+        registry.get_limiter(('old', i))
+
+    sweep_times = []
+    for second in range(seconds):
+        for i in range(new_keys_per_second):
+            clock.advance(1 / new_keys_per_second)
+            registry.get_limiter(('new', second, i))
+        start_time = time.perf_counter()
+        registry.evict_idle()
+        sweep_times.append(time.perf_counter() - start_time)
+    return sum(sweep_times) / len(sweep_times) * 1000, max(sweep_times) * 1000, len(registry)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Expiring idle keys: scanning every key against a timing wheel")
+    parser.add_argument('--keys', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                        help="numbers of keys tracked when the sweeps start")
+    parser.add_argument('--new-keys', type=int, default=1_000, help="keys created per second")
+    parser.add_argument('--seconds', type=int, default=10, help="seconds simulated, one sweep per second")
+    args = parser.parse_args()
+
+    print(f"{'keys':>10}{'scan mean ms':>15}{'scan max ms':>14}{'wheel mean ms':>16}{'wheel max ms':>15}"
+          f"{'scan left':>12}{'wheel left':>12}")
+    for num_keys in args.keys:
+        scan_mean, scan_max, scan_left = run(num_keys, args.new_keys, args.seconds, None)
+        wheel_mean, wheel_max, wheel_left = run(num_keys, args.new_keys, args.seconds, 0.1)
+        print(f"{num_keys:>10}{scan_mean:>15.2f}{scan_max:>14.2f}{wheel_mean:>16.2f}{wheel_max:>15.2f}"
+              f"{scan_left:>12}{wheel_left:>12}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,333 @@
+import argparse
+import csv
+import gzip
+import itertools
+import json
+from array import array
+from datetime import datetime
+from typing import Any, Hashable, Iterable, Iterator, Optional
+
+from src.rate_limiting.count_min_sketch import CountMinSketch
+from src.rate_limiting.fixed_window_counter import FixedWindowCounter
+from src.rate_limiting.gcra import GCRA
+from src.rate_limiting.keyed_rate_limiter import KeyedRateLimiter
+from src.rate_limiting.leaky_bucket import LeakyBucket
+from src.rate_limiting.sliding_window_counter import SlidingWindowCounter
+from src.rate_limiting.sliding_window_log import SlidingWindowLog
+from src.rate_limiting.token_bucket import TokenBucket
+from src.rate_limiting.traffic_simulator import VirtualClock, default_decision
+
+# Algorithm name -> (limiter class, burst parameter, rate or window parameter)
+ALGORITHMS = {
+    'token_bucket': (TokenBucket, 'capacity', 'fill_rate'),
+    'leaky_bucket': (LeakyBucket, 'capacity', 'leak_rate'),
+    'fixed_window_counter': (FixedWindowCounter, 'max_allowed_requests', 'window_size'),
+    'sliding_window_counter': (SlidingWindowCounter, 'max_allowed_requests', 'window_size'),
+    'sliding_window_log': (SlidingWindowLog, 'max_allowed_requests', 'window_size'),
+    'gcra': (GCRA, 'capacity', 'fill_rate'),
+}
+
+# Error bounds of the sketch estimating the requests of every key, about 1.5 MB of counters: estimates exceed the
+# true counts by at most 0.01% of the requests of the log, with a probability of 99.9%
+KEY_SKETCH_EPSILON = 0.0001
+KEY_SKETCH_DELTA = 0.001
+
+
+class _HeavyKeys:
+    """
+    Counts of the keys of a replay in fixed memory: the requests of every key are estimated by a CountMinSketch, and
+    only the top_keys keys with the highest estimates have counts of their own, a key whose estimate overtakes the
+    lowest of them takes its place
+    """
+
+    def __init__(self, top_keys: int, num_candidates: int):
+        self.top_keys: int = top_keys
+        self.sketch: CountMinSketch = CountMinSketch.from_error_bounds(KEY_SKETCH_EPSILON, KEY_SKETCH_DELTA)
+        # Key -> [estimated requests, requests counted since the key is tracked, denied requests of every candidate]
+        self.counts: dict[Hashable, array] = {}
+        self.floor: int = 0  # Lowest estimate of the tracked keys once top_keys are tracked
+        self.empty_counts: array = array('q', [0]) * (num_candidates + 2)
+        # Keys the sketch had never seen, a key colliding with others on every row is missed
+        self.keys: int = 0
+
+    def count(self, key: Hashable) -> Optional[array]:
+        """
+        Count a request of a key
+
+        :return: counts of the key, to add its denied requests to, None if it is not among the heaviest keys
+        """
+        estimate = self.sketch.add(key)
+        if estimate == 1:
+            self.keys += 1
+        counts = self.counts.get(key)
+        if counts is None:
+            if len(self.counts) >= self.top_keys:
+                if estimate <= self.floor:
+                    return None
+                # The floor may be stale, the estimates of the tracked keys grow as they are seen again
+                lowest_key = min(self.counts, key=lambda tracked_key: self.counts[tracked_key][0])
+                if self.counts[lowest_key][0] < estimate:
+                    del self.counts[lowest_key]
+                    counts = self.counts[key] = array('q', self.empty_counts)
+                self.floor = min(tracked_counts[0] for tracked_counts in self.counts.values())
+                if counts is None:
+                    return None
+            else:
+                counts = self.counts[key] = array('q', self.empty_counts)
+                if len(self.counts) == self.top_keys:
+                    self.floor = min(tracked_counts[0] for tracked_counts in self.counts.values())
+        counts[0] = estimate
+        counts[1] += 1
+        return counts
+
+
+def read_access_log(path: str, key_field: str = 'key', timestamp_field: str = 'timestamp',
+                    log_format: Optional[str] = None, skip_invalid: bool = False) -> Iterator[tuple[float, str]]:
+    """
+    Stream the requests of an access log, one line at a time, so logs of any size are read in constant memory
+
+    :param path: JSONL or CSV file, gzip compressed if its name ends with .gz
+    :param key_field: field holding the key of the request (API key, client IP, ...)
+    :param timestamp_field: field holding the time of the request, in epoch seconds or ISO 8601
+    :param log_format: 'jsonl' or 'csv', guessed from the file name if omitted
+    :param skip_invalid: skip lines that cannot be parsed instead of raising ValueError
+    :return: (timestamp, key) of every request, in the order of the log
+    """
+    if log_format is None:
+        name = path[:-3] if path.endswith('.gz') else path
+        log_format = 'csv' if name.endswith('.csv') else 'jsonl'
+    if log_format not in ('jsonl', 'csv'):
+        raise ValueError("Log format must be 'jsonl' or 'csv'")
+
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8', newline='') as file:
+        # Line numbers of a CSV log start after its header
+        records = csv.DictReader(file) if log_format == 'csv' else file
+        for line_number, record in enumerate(records, start=2 if log_format == 'csv' else 1):
+            try:
+                if log_format == 'jsonl':
+                    if not record.strip():
+                        continue
+                    record = json.loads(record)
+                request = _parse_timestamp(record[timestamp_field]), str(record[key_field])
+            except (ValueError, KeyError, TypeError) as error:
+                if skip_invalid:
+                    continue
+                raise ValueError(f"Invalid record at line {line_number} of {path}: {error!r}") from error
+            yield request
+
+
+def limit_grid(**values: Iterable[float]) -> list[dict[str, float]]:
+    """
+    Every combination of the given limit values, e.g. limit_grid(capacity=[5, 10], fill_rate=[1, 2])
+
+    :return: list of limits, keyword arguments of the limiter
+    """
+    names = list(values)
+    return [dict(zip(names, combination)) for combination in itertools.product(*values.values())]
+
+
+def replay_access_log(requests: Iterable[tuple[float, Hashable]], algorithm: str, candidates: list[dict],
+                      target_deny_rate: float = 0.01, max_keys: int = 1_000_000, top_keys: int = 1000) -> dict:
+    """
+    Run every request of a log through one limiter per key, for every candidate limits, in virtual time
+
+    The log is read in a single pass: each candidate has its own KeyedRateLimiter on a shared VirtualClock that
+    follows the timestamps of the log. A key idle long enough for its limiter to be back to its initial state is
+    evicted, tracked by the timing wheel of the registry so evictions cost O(1) each instead of periodic scans of
+    every key, and the limiters only take memory for the recently active keys. The requests of every key are
+    estimated in a Count-Min Sketch of fixed size, and only the top_keys heaviest keys get counts of their own,
+    so memory does not grow with the number of distinct keys. Requests older than the clock, from a log that is
+    slightly out of order, are decided at the current time.
+
+    :param requests: (timestamp, key) of every request, e.g. read_access_log(path)
+    :param algorithm: name of the algorithm, one of ALGORITHMS
+    :param candidates: limits to evaluate, keyword arguments of the limiter, e.g. limit_grid(...)
+    :param target_deny_rate: highest acceptable fraction of denied requests
+    :param max_keys: maximum number of keys with a limiter per candidate, least recently used ones are evicted
+    :param top_keys: number of heaviest keys reported per key
+    :return: dictionary with the number of requests and keys, the duration of the log, the result of every
+        candidate from the smallest to the largest limits, the recommended limits, i.e. the smallest ones keeping
+        the overall deny rate under the target, and for the heaviest keys, most requests first, the estimated
+        number of requests, the deny rate of every candidate and the smallest limits keeping its deny rate under
+        the target. Deny rates of a key are over the requests since it became one of the heaviest, all of them
+        for a key that was from its first request. The number of keys is counted by the sketch, which may miss a
+        few on logs with hundreds of thousands of keys, and keys over the target are counted among the heaviest
+    """
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Unknown algorithm {algorithm!r}, expected one of {', '.join(ALGORITHMS)}")
+    if not candidates:
+        raise ValueError("At least one candidate is needed")
+    if not 0 <= target_deny_rate < 1:
+        raise ValueError("Target deny rate must be between 0 and 1")
+    if top_keys <= 0:
+        raise ValueError("top_keys must be positive")
+
+    limiter_class = ALGORITHMS[algorithm][0]
+    candidates = sorted(candidates, key=lambda limits: _limit_size(algorithm, limits))
+    clock = VirtualClock()
+    registries = []
+    for limits in candidates:
+        limiter_class(**limits, clock=clock)  # Rejects invalid limits before reading the log
+        idle_ttl = _idle_horizon(algorithm, limits)
+        # Keys expire up to a quarter of their idle time late, which only holds their memory a little longer
+        registries.append(KeyedRateLimiter(lambda limits=limits: limiter_class(**limits, clock=clock),
+                                           max_keys=max_keys, idle_ttl=idle_ttl, clock=clock,
+                                           wheel_tick=idle_ttl / 4))
+
+    heavy_keys = _HeavyKeys(top_keys, len(candidates))
+    total_requests = 0
+    total_denied = [0] * len(candidates)
+    first_timestamp = None
+    for timestamp, key in requests:
+        clock.advance_to(timestamp)
+        if first_timestamp is None:
+            first_timestamp = timestamp
+
+        total_requests += 1
+        counts = heavy_keys.count(key)
+        for index, registry in enumerate(registries):
+            if not default_decision(registry.get_limiter(key)):
+                total_denied[index] += 1
+                if counts is not None:
+                    counts[index + 2] += 1
+
+    return _report(candidates, heavy_keys, total_requests, total_denied, target_deny_rate,
+                   0.0 if first_timestamp is None else clock.current_time - first_timestamp)
+
+
+def _report(candidates: list[dict], heavy_keys: _HeavyKeys, total_requests: int, total_denied: list[int],
+            target_deny_rate: float, duration: float) -> dict:
+    """
+    Summarize the counts of a replay
+    """
+    keys_over_target = [0] * len(candidates)
+    per_key = {}
+    for key, counts in sorted(heavy_keys.counts.items(), key=lambda item: item[1][0], reverse=True):
+        deny_rates = [denied / counts[1] for denied in counts[2:]]
+        smallest_limits = None
+        for index, deny_rate in enumerate(deny_rates):
+            if deny_rate > target_deny_rate:
+                keys_over_target[index] += 1
+            elif smallest_limits is None:
+                smallest_limits = candidates[index]
+        per_key[key] = {'requests': counts[0], 'deny_rates': deny_rates, 'smallest_limits': smallest_limits}
+
+    results = []
+    recommended = None
+    for index, limits in enumerate(candidates):
+        deny_rate = total_denied[index] / total_requests if total_requests else 0.0
+        results.append({
+            'limits': limits,
+            'allowed': total_requests - total_denied[index],
+            'denied': total_denied[index],
+            'deny_rate': deny_rate,
+            'keys_over_target': keys_over_target[index],
+        })
+        if recommended is None and deny_rate <= target_deny_rate:
+            recommended = limits
+
+    return {
+        'requests': total_requests,
+        'keys': heavy_keys.keys,
+        'duration': duration,
+        'candidates': results,
+        'recommended': recommended,
+        'per_key': per_key,
+    }
+
+
+def _limit_size(algorithm: str, limits: dict) -> tuple[float, float]:
+    """
+    Sustained rate and burst of limits, smaller limits sort first
+    """
+    _, burst_parameter, rate_parameter = ALGORITHMS[algorithm]
+    burst = limits[burst_parameter]
+    if rate_parameter == 'window_size':
+        return burst / limits['window_size'], burst
+    return limits[rate_parameter], burst
+
+
+def _idle_horizon(algorithm: str, limits: dict) -> float:
+    """
+    Idle time after which the limiter of a key is back to its initial state and can be evicted without changing
+    any later decision
+    """
+    _, burst_parameter, rate_parameter = ALGORITHMS[algorithm]
+    if rate_parameter == 'window_size':
+        # The sliding window counter still weighs the previous window, the other ones only the current one
+        windows = 2 if algorithm == 'sliding_window_counter' else 1
+        return windows * limits['window_size']
+    # Time to refill or drain the whole bucket, plus one token for the rounding of the last one
+    return (limits[burst_parameter] + 1) / limits[rate_parameter]
+
+
+def _parse_timestamp(value: Any) -> float:
+    """
+    Convert a timestamp in epoch seconds or ISO 8601 to epoch seconds
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+
+
+def _parse_limit(argument: str) -> tuple[str, list[float]]:
+    """
+    Parse a --limit argument, e.g. capacity=5,10,20
+    """
+    name, separator, values = argument.partition('=')
+    if not separator or not values:
+        raise argparse.ArgumentTypeError(f"Expected NAME=VALUE[,VALUE...], got {argument!r}")
+    try:
+        return name, [float(value) if '.' in value else int(value) for value in values.split(',')]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Limit values must be numbers, got {argument!r}") from None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay an access log through a rate limiter to size its limits")
+    parser.add_argument('path', help="JSONL or CSV access log, gzip compressed if its name ends with .gz")
+    parser.add_argument('--algorithm', choices=list(ALGORITHMS), default='token_bucket')
+    parser.add_argument('--limit', type=_parse_limit, action='append', required=True,
+                        help="candidate values of a limit, e.g. --limit capacity=5,10,20 --limit fill_rate=1,2,5")
+    parser.add_argument('--target', type=float, default=0.01, help="highest acceptable deny rate")
+    parser.add_argument('--key-field', default='key', help="field holding the key of a request")
+    parser.add_argument('--timestamp-field', default='timestamp', help="field holding the time of a request")
+    parser.add_argument('--format', choices=('jsonl', 'csv'), help="format of the log, guessed from its name")
+    parser.add_argument('--skip-invalid', action='store_true', help="skip lines that cannot be parsed")
+    parser.add_argument('--max-keys', type=int, default=1_000_000, help="maximum number of keys with a limiter")
+    parser.add_argument('--top-keys', type=int, default=1000, help="number of heaviest keys reported per key")
+    parser.add_argument('--top', type=int, default=10, help="number of most denied keys to print")
+    parser.add_argument('--output', help="JSON file the full report, with the heaviest keys, goes to")
+    args = parser.parse_args()
+
+    requests = read_access_log(args.path, args.key_field, args.timestamp_field, args.format, args.skip_invalid)
+    report = replay_access_log(requests, args.algorithm, limit_grid(**dict(args.limit)), args.target, args.max_keys,
+                               args.top_keys)
+
+    print(f"{report['requests']:,} requests from {report['keys']:,} keys over {report['duration']:,.0f}s")
+    print(f"{'limits':<48} {'deny rate':>10} {'keys over target':>17}")
+    for result in report['candidates']:
+        limits = ', '.join(f"{name}={value}" for name, value in result['limits'].items())
+        print(f"{limits:<48} {result['deny_rate']:>10.4%} {result['keys_over_target']:>17,}")
+
+    recommended = report['recommended']
+    if recommended is None:
+        print(f"\nNo candidate keeps the deny rate under {args.target:.2%}, try larger limits")
+    else:
+        index = [result['limits'] for result in report['candidates']].index(recommended)
+        print(f"\nSmallest limits under {args.target:.2%} denied: {recommended}")
+        most_denied = sorted(report['per_key'].items(), key=lambda item: item[1]['deny_rates'][index], reverse=True)
+        for key, stats in most_denied[:args.top]:
+            print(f"  {key}: {stats['requests']:,} requests, {stats['deny_rates'][index]:.2%} denied")
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+import math
+import time
+from collections import deque
+from threading import Lock
+from typing import Any, Callable, Iterable, Optional
+
+from src.rate_limiting.traffic_simulator import VirtualClock, default_decision
+
+# Rate attributes the limiters read on every decision, in the order they are looked up
+RATE_ATTRIBUTES = ('fill_rate', 'leak_rate', 'max_allowed_requests')
+# Rate attributes holding a whole number of requests
+INTEGER_RATE_ATTRIBUTES = ('max_allowed_requests',)
+
+
+class AIMDController:
+    def __init__(self, limiter: Any, latency_target: float, min_rate: float, max_rate: float,
+                 increase: float = 1.0, decrease_factor: float = 0.5, tolerance: float = 0.05,
+                 interval: float = 1.0, attribute: Optional[str] = None, clock: Optional[Callable[[], float]] = None):
+        """
+        Initialize a controller retuning the rate of a limiter from the latency and the errors of the downstream
+        service it protects, additive increase, multiplicative decrease, as TCP congestion control does
+
+        Outcomes of the downstream calls are recorded with record. Every interval seconds, the rate of the limiter
+        is cut by decrease_factor if more than tolerance of the calls recorded in the interval failed or took
+        longer than latency_target, and raised by increase otherwise, so the admitted rate probes for the capacity
+        of the backend and backs off as soon as it queues up, instead of sitting at a conservative static limit.
+        An interval without calls leaves the rate as it is, an idle backend tells nothing about its capacity.
+
+        Recording a call adds it to plain int counters and the rate is set by assigning the attribute of the
+        limiter: neither takes the lock of the limiter, whose decisions read the new rate from the next one on.
+        The thread recording the first call of a new interval makes the adjustment under a lock only ever tried
+        without blocking, the others never wait for it. Two threads incrementing a counter at once may rarely lose
+        a call, which moves the congested fraction of an interval by a call at most.
+
+        :param limiter: limiter to retune, e.g. TokenBucket, LeakyBucket, FixedWindowCounter or SlidingWindowCounter
+        :param latency_target: latency in seconds the downstream calls should stay under
+        :param min_rate: lowest rate the limiter is set to
+        :param max_rate: highest rate the limiter is set to
+        :param increase: amount added to the rate after an interval without congestion
+        :param decrease_factor: factor the rate is multiplied by after an interval with congestion, between 0 and 1
+        :param tolerance: fraction of the calls of an interval that may be slow or fail before the rate is cut
+        :param interval: seconds between two adjustments
+        :param attribute: rate attribute of the limiter, the first of fill_rate, leak_rate and max_allowed_requests
+            it has if omitted. max_allowed_requests is set to whole values
+        :param clock: zero-argument callable returning the current time in seconds, time.monotonic if omitted,
+            e.g. a VirtualClock to run the controller in simulated time
+        """
+        if latency_target <= 0 or interval <= 0 or increase <= 0:
+            raise ValueError("Latency target, interval and increase must be positive")
+        if not 0 < min_rate <= max_rate:
+            raise ValueError("min_rate must be positive and at most max_rate")
+        if not 0 < decrease_factor < 1 or not 0 <= tolerance < 1:
+            raise ValueError("decrease_factor must be between 0 and 1 and tolerance in [0, 1)")
+        if attribute is None:
+            attribute = next((name for name in RATE_ATTRIBUTES if hasattr(limiter, name)), None)
+        if attribute is None or not hasattr(limiter, attribute):
+            raise ValueError(f"{type(limiter).__name__} has no rate attribute to retune")
+
+        self.clock: Callable[[], float] = time.monotonic if clock is None else clock
+        self.limiter: Any = limiter
+        self.attribute: str = attribute
+        self.integer_rate: bool = attribute in INTEGER_RATE_ATTRIBUTES
+        self.latency_target: float = latency_target
+        self.min_rate: float = min_rate
+        self.max_rate: float = max_rate
+        self.increase: float = increase
+        self.decrease_factor: float = decrease_factor
+        self.tolerance: float = tolerance
+        self.interval: float = interval
+
+        # Rate the controller works on, unrounded, so small increases of an integer attribute add up
+        self.rate: float = min(max(float(getattr(limiter, attribute)), min_rate), max_rate)
+        self.__apply_rate()
+
+        self.calls: int = 0  # Calls recorded so far
+        self.congested_calls: int = 0  # Calls recorded so far that failed or missed the latency target
+        self.counted_calls: int = 0  # Counter values at the last adjustment
+        self.counted_congested_calls: int = 0
+        self.next_adjustment_time: float = self.clock() + interval
+
+        # Lock making sure a single thread adjusts the rate, only ever tried without blocking
+        self.lock: Lock = Lock()
+
+    def record(self, latency: float, error: bool = False) -> None:
+        """
+        Record the outcome of a downstream call admitted by the limiter
+
+        :param latency: seconds the call took
+        :param error: True if the call failed, e.g. a timeout or a 503
+        """
+        self.calls += 1
+        if error or latency > self.latency_target:
+            self.congested_calls += 1
+        if self.clock() >= self.next_adjustment_time and self.lock.acquire(False):
+            try:
+                self.__adjust()
+            finally:
+                self.lock.release()
+
+    def __adjust(self) -> None:
+        """
+        Raise or cut the rate from the calls recorded since the last adjustment
+        This method is not thread-safe and should be called within a lock
+        """
+        current_time = self.clock()
+        if current_time < self.next_adjustment_time:
+            return  # Adjusted by another thread meanwhile
+        # Intervals without a call in between are skipped, the next interval starts now
+        self.next_adjustment_time = current_time + self.interval
+
+        calls, congested_calls = self.calls, self.congested_calls
+        interval_calls = calls - self.counted_calls
+        interval_congested_calls = congested_calls - self.counted_congested_calls
+        self.counted_calls, self.counted_congested_calls = calls, congested_calls
+        if not interval_calls:
+            return
+
+        if interval_congested_calls > interval_calls * self.tolerance:
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+        else:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+        self.__apply_rate()
+
+    def __apply_rate(self) -> None:
+        """
+        Set the rate attribute of the limiter, a single assignment seen whole by its next decision
+        """
+        setattr(self.limiter, self.attribute, max(1, round(self.rate)) if self.integer_rate else self.rate)
+
+
+class _SimulatedBackend:
+    """
+    Backend serving admitted requests one after the other in virtual time, the outcomes of a simulate_goodput run
+    """
+
+    def __init__(self, clock: VirtualClock, capacity_at: Callable[[float], float], timeout: float,
+                 controller: Optional[AIMDController], interval: Optional[float]):
+        self.clock: VirtualClock = clock
+        self.capacity_at: Callable[[float], float] = capacity_at
+        self.timeout: float = timeout
+        self.controller: Optional[AIMDController] = controller
+        self.interval: Optional[float] = interval
+
+        self.pending: deque = deque()  # (completion time, latency) of the admitted requests, in completion order
+        self.busy_until: float = 0.0  # Time at which the backend is done with the admitted requests
+        self.served: int = 0
+        self.failed: int = 0
+        self.total_latency: float = 0.0
+        self.timeline: dict = {}  # Interval start -> [served requests, rate of the limiter]
+
+    def admit(self, timestamp: float) -> None:
+        """
+        Queue a request admitted at timestamp behind the ones before it
+        """
+        self.busy_until = max(self.busy_until, timestamp) + 1 / self.capacity_at(timestamp)
+        self.pending.append((self.busy_until, self.busy_until - timestamp))
+
+    def complete_until(self, timestamp: float) -> None:
+        """
+        Complete the requests done by timestamp, advancing the clock to each completion and recording its outcome
+        on the controller
+        """
+        pending, timeout = self.pending, self.timeout
+        while pending and pending[0][0] <= timestamp:
+            completion_time, latency = pending.popleft()
+            self.clock.advance_to(completion_time)
+            if latency > timeout:
+                self.failed += 1
+            else:
+                self.served += 1
+                self.total_latency += latency
+                if self.interval is not None:
+                    self.__interval_entry(completion_time)[0] += 1
+            if self.controller is not None:
+                self.controller.record(min(latency, timeout), error=latency > timeout)
+
+    def record_rate(self, timestamp: float, rate: float) -> None:
+        """
+        Record the rate of the limiter at an arrival, the last one of its interval is reported
+        """
+        if self.interval is not None:
+            self.__interval_entry(timestamp)[1] = rate
+
+    def report_timeline(self) -> list[tuple[float, float, float]]:
+        """
+        Get (interval start, goodput, rate of the limiter at the last arrival) of every interval, in time order
+        """
+        report = []
+        last_rate = None
+        for interval_start, (served_count, rate) in sorted(self.timeline.items()):
+            last_rate = last_rate if rate is None else rate  # No arrival in the interval, the rate did not change
+            report.append((interval_start, served_count / self.interval, last_rate))
+        return report
+
+    def __interval_entry(self, timestamp: float) -> list:
+        return self.timeline.setdefault(math.floor(timestamp / self.interval) * self.interval, [0, None])
+
+
+def simulate_goodput(limiter_factory: Callable[[VirtualClock], Any], arrivals: Iterable[float],
+                     capacity_at: Callable[[float], float], timeout: float,
+                     controller_factory: Optional[Callable[[Any, VirtualClock], AIMDController]] = None,
+                     decide: Callable[[Any], bool] = default_decision, interval: Optional[float] = None) -> dict:
+    """
+    Feed a trace of arrivals through a limiter in front of a simulated backend, in virtual time, to compare the
+    goodput of static and adaptive limits while the capacity of the backend changes
+
+    The backend serves the admitted requests one after the other, at capacity_at(t) requests per second: a request
+    admitted faster than that waits for the ones before it. A request that is not served within timeout seconds
+    fails, it counts as an error, not as goodput, and still takes its turn in the backend, as the work of a client
+    that gave up is not cancelled. The outcome of a request is recorded on the controller once it completes.
+
+    :param limiter_factory: callable creating the limiter from the virtual clock,
+        e.g. lambda clock: TokenBucket(capacity=10, fill_rate=100, clock=clock)
+    :param arrivals: arrival times in increasing order, e.g. poisson_arrivals(rate=100, duration=60)
+    :param capacity_at: requests per second the backend serves at a time, e.g. lambda t: 200 if t < 30 else 50
+    :param timeout: seconds after which a request fails
+    :param controller_factory: callable creating the controller from the limiter and the virtual clock,
+        None for a static limit
+    :param decide: decision of one request on the limiter, default_decision if omitted
+    :param interval: if given, also report the goodput and the rate of the limiter per interval of that many seconds
+    :return: dictionary with the number of requests, admitted ones, served ones within the timeout, the goodput,
+        failed ones, the mean latency of the served requests, the duration of the trace and, with an interval,
+        the list of (interval start, goodput, rate of the limiter at the last arrival) of every interval
+    """
+    if timeout <= 0:
+        raise ValueError("Timeout must be positive")
+    if interval is not None and interval <= 0:
+        raise ValueError("Interval must be positive")
+
+    clock = VirtualClock()
+    limiter = limiter_factory(clock)
+    controller = None if controller_factory is None else controller_factory(limiter, clock)
+    attribute = next((name for name in RATE_ATTRIBUTES if hasattr(limiter, name)), None)
+    backend = _SimulatedBackend(clock, capacity_at, timeout, controller, interval)
+    requests = admitted = 0
+
+    for timestamp in arrivals:
+        backend.complete_until(timestamp)
+        clock.advance_to(timestamp)
+        requests += 1
+        if attribute is not None:
+            backend.record_rate(timestamp, getattr(limiter, attribute))
+        if decide(limiter):
+            admitted += 1
+            backend.admit(timestamp)
+    backend.complete_until(math.inf)
+
+    duration = clock.current_time
+    result = {
+        'requests': requests,
+        'admitted': admitted,
+        'served': backend.served,
+        'failed': backend.failed,
+        'goodput': backend.served / duration if duration else 0.0,
+        'mean_latency': backend.total_latency / backend.served if backend.served else 0.0,
+        'duration': duration,
+    }
+    if interval is not None:
+        result['timeline'] = backend.report_timeline()
+    return result
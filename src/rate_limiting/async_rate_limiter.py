@@ -0,0 +1,178 @@
+import abc
+import asyncio
+from collections import deque
+from typing import Optional
+
+from src.rate_limiting.fixed_window_counter import FixedWindowCounter
+from src.rate_limiting.leaky_bucket import LeakyBucket
+from src.rate_limiting.metrics import RateLimiterMetrics
+from src.rate_limiting.sliding_window_counter import SlidingWindowCounter
+from src.rate_limiting.sliding_window_log import SlidingWindowLog
+from src.rate_limiting.token_bucket import TokenBucket
+
+
+class AsyncRateLimiter(abc.ABC):
+    def __init__(self):
+        """
+        Initialize the queue of coroutines waiting for capacity
+
+        Waiters are served in FIFO order: only the coroutine at the head of the queue sleeps, for exactly the time
+        the limiter needs to free up capacity, the others wait on a future resolved when their turn comes.
+        """
+        self.waiters: deque = deque()
+
+    async def acquire(self, amount: int = 1) -> None:
+        """
+        Wait until the limiter admits the request, in arrival order
+
+        :param amount: cost of the request
+        """
+        self._validate(amount)
+        if not self.waiters and self._try_acquire(amount):
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            if self.waiters[0] is not waiter:
+                await waiter  # Resolved once every waiter ahead of us is served
+            while not self._try_acquire(amount):
+                await asyncio.sleep(self._time_until_available(amount))
+        finally:
+            if self.waiters[0] is waiter:
+                self.waiters.popleft()
+            else:
+                self.waiters.remove(waiter)  # Cancelled while waiting for its turn
+            # Hand over to the next waiter
+            if self.waiters and not self.waiters[0].done():
+                self.waiters[0].set_result(None)
+
+    async def __aenter__(self) -> 'AsyncRateLimiter':
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        return None
+
+    @abc.abstractmethod
+    def _validate(self, amount: int) -> None:
+        """
+        Reject requests that the limiter could never admit, instead of waiting for them forever
+        """
+
+    @abc.abstractmethod
+    def _try_acquire(self, amount: int) -> bool:
+        """
+        Admit the request now if the limiter has capacity for it
+        """
+
+    @abc.abstractmethod
+    def _time_until_available(self, amount: int) -> float:
+        """
+        Time until the limiter has capacity for the request
+        """
+
+
+class AsyncTokenBucket(AsyncRateLimiter, TokenBucket):
+    def __init__(self, capacity: int, fill_rate: float, metrics: Optional[RateLimiterMetrics] = None):
+        """
+        Initialize the token bucket, with awaitable acquisition of tokens
+        :param capacity: maximum number of tokens a bucket can hold
+        :param fill_rate: number of tokens added per unit of time
+        :param metrics: metrics the decisions are counted and timed in, None to skip instrumentation
+        """
+        TokenBucket.__init__(self, capacity, fill_rate, metrics=metrics)
+        AsyncRateLimiter.__init__(self)
+
+    def _validate(self, amount: int) -> None:
+        if amount < 0:
+            raise ValueError("Cannot consume negative tokens")
+        if amount > self.capacity:
+            raise ValueError("Cannot consume more tokens than the capacity")
+
+    def _try_acquire(self, amount: int) -> bool:
+        return self.consume(amount)
+
+    def _time_until_available(self, amount: int) -> float:
+        return self.time_until_available(amount)
+
+
+class AsyncLeakyBucket(AsyncRateLimiter, LeakyBucket):
+    def __init__(self, capacity: int, leak_rate: float, metrics: Optional[RateLimiterMetrics] = None):
+        """
+        Initialize the leaky bucket, with awaitable addition of tokens.
+
+        :param capacity: Maximum number of requests that can be processed.
+        :param leak_rate: Number of tokens that leak per unit of time.
+        :param metrics: metrics the decisions are counted and timed in, None to skip instrumentation
+        """
+        LeakyBucket.__init__(self, capacity, leak_rate, metrics=metrics)
+        AsyncRateLimiter.__init__(self)
+
+    def _validate(self, amount: int) -> None:
+        if amount < 0:
+            raise ValueError("Cannot add negative tokens")
+        if amount > self.capacity:
+            raise ValueError("Cannot add more tokens than the capacity")
+
+    def _try_acquire(self, amount: int) -> bool:
+        return self.add_tokens(amount)
+
+    def _time_until_available(self, amount: int) -> float:
+        return self.time_until_available(amount)
+
+
+class _AsyncWindowRateLimiter(AsyncRateLimiter):
+    """
+    Awaitable acquisition for the window based limiters, the amount is the cost of the request
+    """
+
+    def _validate(self, amount: int) -> None:
+        if amount < 0:
+            raise ValueError("Cannot admit a negative cost")
+        if amount > self.max_allowed_requests:
+            raise ValueError("Cannot admit a cost above the maximum allowed requests")
+
+    def _try_acquire(self, amount: int) -> bool:
+        return self.allow_request(amount)
+
+    def _time_until_available(self, amount: int) -> float:
+        return self.time_until_available(amount)
+
+
+class AsyncFixedWindowCounter(_AsyncWindowRateLimiter, FixedWindowCounter):
+    def __init__(self, max_allowed_requests: int, window_size: float, metrics: Optional[RateLimiterMetrics] = None):
+        """
+        Initialize fixed window rate limiter, with awaitable admission of requests
+
+        :param max_allowed_requests: maximum number of allowed requests per window
+        :param window_size: size of the time window in seconds
+        :param metrics: metrics the decisions are counted and timed in, None to skip instrumentation
+        """
+        FixedWindowCounter.__init__(self, max_allowed_requests, window_size, metrics=metrics)
+        AsyncRateLimiter.__init__(self)
+
+
+class AsyncSlidingWindowCounter(_AsyncWindowRateLimiter, SlidingWindowCounter):
+    def __init__(self, max_allowed_requests: int, window_size: float, metrics: Optional[RateLimiterMetrics] = None):
+        """
+        Initializes Sliding Window Counter, with awaitable admission of requests
+
+        :param max_allowed_requests: number of allowed requests in a window
+        :param window_size: size of the window
+        :param metrics: metrics the decisions are counted and timed in, None to skip instrumentation
+        """
+        SlidingWindowCounter.__init__(self, max_allowed_requests, window_size, metrics=metrics)
+        AsyncRateLimiter.__init__(self)
+
+
+class AsyncSlidingWindowLog(_AsyncWindowRateLimiter, SlidingWindowLog):
+    def __init__(self, max_allowed_requests: int, window_size: float, metrics: Optional[RateLimiterMetrics] = None):
+        """
+        Initialize Sliding Window Log, with awaitable admission of requests
+        :param max_allowed_requests: maximum allowed request for a window
+        :param window_size: size of the time window
+        :param metrics: metrics the decisions are counted and timed in, None to skip instrumentation
+        """
+        SlidingWindowLog.__init__(self, max_allowed_requests, window_size, metrics=metrics)
+        AsyncRateLimiter.__init__(self)
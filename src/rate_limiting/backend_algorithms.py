@@ -0,0 +1,163 @@
+import math
+from collections import deque
+from typing import Any, Callable, Optional
+
+# Decisions of the storage backends, the Python equivalents of their Lua scripts, shared by InMemoryStorageBackend
+# and SharedMemoryStorageBackend so both make the same decisions as the server.
+#
+# Every algorithm is a function (state, now, first_limit, second_limit, cost) -> (reply, state, time_to_live):
+# it takes the state of the key, None for a new key or one whose state expired, the wall clock time in seconds,
+# the two limits of the algorithm and the cost of the request, or the amount requested by a lease. It returns the
+# reply of the script, the new state and the seconds until the state is back to its initial value, after which
+# the backend may discard it. States are tuples of numbers, which the shared memory backend stores in a
+# fixed-size record, except the state of sliding_window_log, whose log is a deque updated in place.
+
+
+def token_bucket(state: Optional[tuple], now: float, capacity: float, fill_rate: float,
+                 cost: int) -> tuple[int, tuple, float]:
+    """
+    State: tokens, last fill time
+    """
+    tokens, last_fill_time = (capacity, now) if state is None else state
+    tokens = min(capacity, tokens + max(0.0, now - last_fill_time) * fill_rate)
+
+    allowed = 0
+    if cost <= tokens:
+        tokens -= cost
+        allowed = 1
+    return allowed, (tokens, now), (capacity - tokens) / fill_rate
+
+
+def leaky_bucket(state: Optional[tuple], now: float, capacity: float, leak_rate: float,
+                 cost: int) -> tuple[int, tuple, float]:
+    """
+    State: tokens, last leak time
+    """
+    tokens, last_leak_time = (0.0, now) if state is None else state
+    tokens = max(0.0, tokens - max(0.0, now - last_leak_time) * leak_rate)
+
+    allowed = 0
+    if tokens + cost <= capacity:
+        tokens += cost
+        allowed = 1
+    return allowed, (tokens, now), tokens / leak_rate
+
+
+def fixed_window_counter(state: Optional[tuple], now: float, max_allowed_requests: float, window_size: float,
+                         cost: int) -> tuple[int, tuple, float]:
+    """
+    State: requests in the window, window start time
+    """
+    count, window_start_time = (0, now) if state is None else state
+    if now - window_start_time >= window_size:
+        window_start_time = now
+        count = 0
+
+    allowed = 0
+    if count + cost <= max_allowed_requests:
+        count += cost
+        allowed = 1
+    return allowed, (count, window_start_time), window_start_time + window_size - now
+
+
+def sliding_window_counter(state: Optional[tuple], now: float, max_allowed_requests: float, window_size: float,
+                           cost: int) -> tuple[int, tuple, float]:
+    """
+    State: current window number, requests in the current window, requests in the previous window
+    """
+    current_window = math.floor(now / window_size)
+    window, current_count, previous_count = (current_window, 0, 0) if state is None else state
+    if window == current_window - 1:
+        previous_count, current_count = current_count, 0
+    elif window < current_window - 1:
+        previous_count, current_count = 0, 0
+
+    time_elapsed_in_current_window = (now - current_window * window_size) / window_size
+    weighted_count = previous_count * (1 - time_elapsed_in_current_window) + current_count
+
+    allowed = 0
+    # The rule of SlidingWindowCounter: a request of cost n is admitted as n single requests in a row would be
+    if weighted_count + cost - 1 < max_allowed_requests:
+        current_count += cost
+        allowed = 1
+    return allowed, (current_window, current_count, previous_count), 2 * window_size
+
+
+def sliding_window_log(state: Optional[tuple], now: float, max_allowed_requests: float, window_size: float,
+                       cost: int) -> tuple[int, tuple, float]:
+    """
+    State: total cost of the requests in the window, and their (timestamp, cost), oldest first, updated in place
+    """
+    count, request_log = (0, deque()) if state is None else state
+    window_start_time = now - window_size
+    while request_log and request_log[0][0] <= window_start_time:
+        count -= request_log.popleft()[1]
+
+    allowed = 0
+    if count + cost <= max_allowed_requests:
+        if cost > 0:
+            request_log.append((now, cost))  # One entry per request, whatever its cost
+            count += cost
+        allowed = 1
+    return allowed, (count, request_log), window_size
+
+
+def gcra(state: Optional[tuple], now: float, capacity: float, fill_rate: float,
+         cost: int) -> tuple[int, tuple, float]:
+    """
+    State: theoretical arrival time in microseconds, the time at which the bucket would be full again
+    """
+    now = round(now * 1_000_000)  # Microseconds, as the server time of the script
+    # Whole microseconds per token, as in the script, so a full bucket always admits capacity tokens
+    emission_interval = max(1, math.floor(1_000_000 / fill_rate + 0.5))
+    theoretical_arrival_time = now if state is None else max(int(state[0]), now)
+    new_arrival_time = theoretical_arrival_time + cost * emission_interval
+
+    allowed = 0
+    if new_arrival_time - now <= capacity * emission_interval:
+        theoretical_arrival_time = new_arrival_time
+        allowed = 1
+    # A TAT in the past is the same state as no TAT at all
+    return allowed, (theoretical_arrival_time,), (theoretical_arrival_time - now) / 1_000_000
+
+
+def token_bucket_lease(state: Optional[tuple], now: float, capacity: float, fill_rate: float,
+                       requested: int) -> tuple[list, tuple, float]:
+    """
+    Same state as token_bucket, replies the granted tokens and -1: the lease never has to be dropped
+    """
+    tokens, last_fill_time = (capacity, now) if state is None else state
+    tokens = min(capacity, tokens + max(0.0, now - last_fill_time) * fill_rate)
+
+    granted = min(requested, math.floor(tokens))
+    tokens -= granted
+    return [granted, -1], (tokens, now), (capacity - tokens) / fill_rate
+
+
+def fixed_window_counter_lease(state: Optional[tuple], now: float, max_allowed_requests: float, window_size: float,
+                               requested: int) -> tuple[list, tuple, float]:
+    """
+    Same state as fixed_window_counter, replies the granted requests and the milliseconds left in the window
+    """
+    count, window_start_time = (0, now) if state is None else state
+    if now - window_start_time >= window_size:
+        window_start_time = now
+        count = 0
+
+    granted = max(0, min(requested, int(max_allowed_requests) - int(count)))
+    count += granted
+    time_left_in_window = window_start_time + window_size - now
+    return [granted, math.floor(time_left_in_window * 1000)], (count, window_start_time), time_left_in_window
+
+
+# Algorithm name -> decision, the names of the scripts
+ALGORITHMS: dict[str, Callable[[Any, float, float, float, int], tuple[Any, Any, float]]] = {
+    'token_bucket': token_bucket,
+    'leaky_bucket': leaky_bucket,
+    'fixed_window_counter': fixed_window_counter,
+    'sliding_window_counter': sliding_window_counter,
+    'sliding_window_log': sliding_window_log,
+    'gcra': gcra,
+    'token_bucket_lease': token_bucket_lease,
+    'fixed_window_counter_lease': fixed_window_counter_lease,
+}
@@ -0,0 +1,473 @@
+import abc
+import time
+from threading import Lock
+from typing import Callable, Hashable, Optional, Sequence
+
+import numpy as np
+
+
+def _group_ranks(inverse: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Order the requests of a batch by key, keeping the arrival order of the requests of the same key
+
+    :param inverse: index of the key of every request
+    :return: permutation sorting the requests by key, start offset of the group of every sorted request,
+        rank of every sorted request within its group
+    """
+    order = np.argsort(inverse, kind='stable')
+    sorted_groups = inverse[order]
+    is_group_start = np.empty(len(order), dtype=bool)
+    is_group_start[:1] = True
+    np.not_equal(sorted_groups[1:], sorted_groups[:-1], out=is_group_start[1:])
+    group_starts = np.flatnonzero(is_group_start)
+    group_sizes = np.diff(np.append(group_starts, len(order)))
+    starts = np.repeat(group_starts, group_sizes)
+    return order, starts, np.arange(len(order)) - starts
+
+
+class _BatchRateLimiter(abc.ABC):
+    def __init__(self, initial_slots: int, clock: Optional[Callable[[], float]] = None):
+        """
+        Initialize the key -> slot map shared by all batch limiters
+
+        :param initial_slots: number of keys the state arrays are sized for before they need to grow
+        :param clock: zero-argument callable returning the current time in seconds, time.monotonic if omitted,
+            e.g. a VirtualClock to run the limiter in simulated time
+        """
+        if initial_slots <= 0:
+            raise ValueError("initial_slots must be positive")
+
+        self.clock: Callable[[], float] = time.monotonic if clock is None else clock
+        self.slots: dict = {}  # Key -> index of its state in the arrays
+        self.num_slots: int = initial_slots
+
+        self.lock: Lock = Lock()  # One lock per batch, instead of one per request
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.slots
+
+    def _resolve(self, keys: Sequence[Hashable], current_time: float) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Map the keys of a batch to their slots, creating the state of unknown keys.
+        This method is not thread-safe and should be called within a lock
+
+        :return: slot of every distinct key of the batch, index into it for every request
+        """
+        slots = self.slots
+
+        def slot_of(key: Hashable) -> int:
+            slot = slots.get(key)
+            if slot is None:
+                slot = len(slots)
+                if slot == self.num_slots:
+                    self.num_slots *= 2
+                    self._grow(self.num_slots)
+                self._initialize(slot, current_time)
+                slots[key] = slot
+            return slot
+
+        request_slots = np.fromiter(map(slot_of, keys), dtype=np.int64, count=len(keys))
+        return np.unique(request_slots, return_inverse=True)
+
+    @abc.abstractmethod
+    def _grow(self, num_slots: int) -> None:
+        """
+        Resize the state arrays to the given number of slots
+        """
+
+    @abc.abstractmethod
+    def _initialize(self, slot: int, current_time: float) -> None:
+        """
+        Set the state of a new key, as a freshly constructed single-key limiter would
+        """
+
+    @staticmethod
+    def _resize(values: np.ndarray, num_slots: int) -> np.ndarray:
+        resized = np.zeros(num_slots, dtype=values.dtype)
+        resized[:len(values)] = values
+        return resized
+
+
+class _BatchBucket(_BatchRateLimiter):
+    """
+    Shared admission of weighted requests against a per-key budget, used by both buckets
+    """
+
+    @staticmethod
+    def _admit_in_order(inverse: np.ndarray, costs: np.ndarray, budgets: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Admit the requests of every key in arrival order, as long as their cost fits in what is left of the budget
+
+        :param inverse: index of the key of every request
+        :param costs: cost of every request
+        :param budgets: budget of every distinct key
+        :return: admission mask, total admitted cost of every distinct key
+        """
+        order, starts, _ = _group_ranks(inverse)
+        sorted_costs = costs[order]
+        sorted_groups = inverse[order]
+        cumulative = np.cumsum(sorted_costs)
+        spent = cumulative - (cumulative[starts] - sorted_costs[starts])  # Cost of the group prefix, inclusive
+        sorted_admitted = spent <= budgets[sorted_groups]
+
+        # Requests are admitted in order until the first one that does not fit, a later and cheaper one
+        # may still fit in what is left, which needs the sequential pass over those few candidates
+        denied = np.flatnonzero(~sorted_admitted)
+        if len(denied):
+            first_denied = np.full(len(budgets), len(order))
+            np.minimum.at(first_denied, sorted_groups[denied], denied)
+            candidates = denied[(denied > first_denied[sorted_groups[denied]]) &
+                                (sorted_costs[denied] <= budgets[sorted_groups[denied]])]
+            if len(candidates):
+                left = budgets.copy()
+                admitted_before = np.bincount(sorted_groups[sorted_admitted], sorted_costs[sorted_admitted],
+                                              minlength=len(budgets))
+                left -= admitted_before.astype(left.dtype)
+                for index in candidates.tolist():
+                    group = sorted_groups[index]
+                    if sorted_costs[index] <= left[group]:
+                        left[group] -= sorted_costs[index]
+                        sorted_admitted[index] = True
+
+        admitted = np.empty(len(order), dtype=bool)
+        admitted[order] = sorted_admitted
+        admitted_costs = np.bincount(inverse[admitted], costs[admitted], minlength=len(budgets))
+        return admitted, admitted_costs.astype(np.int64)
+
+
+class BatchTokenBucket(_BatchBucket):
+    def __init__(self, capacity: int, fill_rate: float, initial_slots: int = 1024,
+                 clock: Optional[Callable[[], float]] = None):
+        """
+        Initialize token buckets, one per key, deciding whole batches of requests at once
+
+        :param capacity: maximum number of tokens a bucket can hold
+        :param fill_rate: number of tokens added per unit of time
+        :param initial_slots: number of keys the state arrays are sized for before they need to grow
+        :param clock: zero-argument callable returning the current time in seconds, time.monotonic if omitted,
+            e.g. a VirtualClock to run the limiter in simulated time
+        """
+        if capacity <= 0 or fill_rate <= 0:
+            raise ValueError("Capacity and fill rate must be a positive number")
+        super().__init__(initial_slots, clock)
+
+        self.capacity: int = capacity
+        self.fill_rate: float = fill_rate
+
+        self.tokens: np.ndarray = np.zeros(initial_slots, dtype=np.int64)
+        self.last_fill_time: np.ndarray = np.zeros(initial_slots, dtype=np.float64)
+
+    def consume_batch(self, keys: Sequence[Hashable], tokens: Sequence[int]) -> np.ndarray:
+        """
+        Consume tokens for a batch of requests, same decisions as calling TokenBucket.consume
+        for every request in order
+
+        :param keys: key of every request
+        :param tokens: required tokens of every request
+        :return: boolean mask, True where the tokens were consumed
+        """
+        costs = np.asarray(tokens, dtype=np.int64)
+        if len(costs) != len(keys):
+            raise ValueError("keys and tokens must have the same length")
+        if np.any(costs < 0):
+            raise ValueError("Cannot consume negative tokens")
+        if len(costs) == 0:
+            return np.zeros(0, dtype=bool)
+
+        with self.lock:
+            current_time = self.clock()
+            unique_slots, inverse = self._resolve(keys, current_time)
+
+            # Refill every bucket once, later requests of the same key see no elapsed time
+            # Whole tokens only, the fraction of the next one is kept unless the bucket is full
+            new_tokens = np.floor((current_time - self.last_fill_time[unique_slots]) * self.fill_rate)
+            refilled_slots = unique_slots[new_tokens > 0]
+            new_tokens = new_tokens[new_tokens > 0]
+            full = self.tokens[refilled_slots] + new_tokens >= self.capacity
+            self.tokens[refilled_slots] = np.minimum(self.capacity, self.tokens[refilled_slots] + new_tokens)
+            self.last_fill_time[refilled_slots] = np.where(
+                full, current_time, self.last_fill_time[refilled_slots] + new_tokens / self.fill_rate
+            )
+
+            admitted, admitted_costs = self._admit_in_order(inverse, costs, self.tokens[unique_slots])
+            self.tokens[unique_slots] -= admitted_costs
+            return admitted
+
+    def _grow(self, num_slots: int) -> None:
+        self.tokens = self._resize(self.tokens, num_slots)
+        self.last_fill_time = self._resize(self.last_fill_time, num_slots)
+
+    def _initialize(self, slot: int, current_time: float) -> None:
+        self.tokens[slot] = self.capacity
+        self.last_fill_time[slot] = current_time
+
+
+class BatchLeakyBucket(_BatchBucket):
+    def __init__(self, capacity: int, leak_rate: float, initial_slots: int = 1024,
+                 clock: Optional[Callable[[], float]] = None):
+        """
+        Initialize leaky buckets, one per key, deciding whole batches of requests at once
+
+        :param capacity: maximum number of requests that can be processed
+        :param leak_rate: number of tokens that leak per unit of time
+        :param initial_slots: number of keys the state arrays are sized for before they need to grow
+        :param clock: zero-argument callable returning the current time in seconds, time.monotonic if omitted,
+            e.g. a VirtualClock to run the limiter in simulated time
+        """
+        if capacity <= 0 or leak_rate <= 0:
+            raise ValueError("Capacity or leak rate should be positive")
+        super().__init__(initial_slots, clock)
+
+        self.capacity: int = capacity
+        self.leak_rate: float = leak_rate
+
+        self.tokens: np.ndarray = np.zeros(initial_slots, dtype=np.int64)
+        self.last_leak_time: np.ndarray = np.zeros(initial_slots, dtype=np.float64)
+
+    def add_tokens_batch(self, keys: Sequence[Hashable], amounts: Sequence[int]) -> np.ndarray:
+        """
+        Add tokens for a batch of requests, same decisions as calling LeakyBucket.add_tokens
+        for every request in order
+
+        :param keys: key of every request
+        :param amounts: amount of tokens of every request
+        :return: boolean mask, True where the tokens were added
+        """
+        costs = np.asarray(amounts, dtype=np.int64)
+        if len(costs) != len(keys):
+            raise ValueError("keys and amounts must have the same length")
+        if np.any(costs < 0):
+            raise ValueError("Cannot add negative tokens")
+        if len(costs) == 0:
+            return np.zeros(0, dtype=bool)
+
+        with self.lock:
+            current_time = self.clock()
+            unique_slots, inverse = self._resolve(keys, current_time)
+
+            # Leak every bucket once, later requests of the same key see no elapsed time
+            # Whole tokens only, the fraction of the next one is kept unless the bucket runs empty
+            leaked_tokens = np.floor((current_time - self.last_leak_time[unique_slots]) * self.leak_rate)
+            empty = leaked_tokens >= self.tokens[unique_slots]
+            self.last_leak_time[unique_slots] = np.where(
+                empty, current_time, self.last_leak_time[unique_slots] + leaked_tokens / self.leak_rate
+            )
+            self.tokens[unique_slots] = np.maximum(0, self.tokens[unique_slots] - leaked_tokens)
+
+            admitted, admitted_costs = self._admit_in_order(inverse, costs,
+                                                            self.capacity - self.tokens[unique_slots])
+            self.tokens[unique_slots] += admitted_costs
+            return admitted
+
+    def _grow(self, num_slots: int) -> None:
+        self.tokens = self._resize(self.tokens, num_slots)
+        self.last_leak_time = self._resize(self.last_leak_time, num_slots)
+
+    def _initialize(self, slot: int, current_time: float) -> None:
+        self.tokens[slot] = 0
+        self.last_leak_time[slot] = current_time
+
+
+class BatchFixedWindowCounter(_BatchRateLimiter):
+    def __init__(self, max_allowed_requests: int, window_size: float, initial_slots: int = 1024,
+                 clock: Optional[Callable[[], float]] = None):
+        """
+        Initialize fixed window counters, one per key, deciding whole batches of requests at once
+
+        :param max_allowed_requests: maximum number of allowed requests per window
+        :param window_size: size of the time window in seconds
+        :param initial_slots: number of keys the state arrays are sized for before they need to grow
+        :param clock: zero-argument callable returning the current time in seconds, time.monotonic if omitted,
+            e.g. a VirtualClock to run the limiter in simulated time
+        """
+        if max_allowed_requests <= 0 or window_size <= 0:
+            raise ValueError("max_allowed_requests and window_size must be positive")
+        super().__init__(initial_slots, clock)
+
+        self.max_allowed_requests: int = max_allowed_requests
+        self.window_size: float = window_size
+
+        self.current_request_count: np.ndarray = np.zeros(initial_slots, dtype=np.int64)
+        self.window_start_time: np.ndarray = np.zeros(initial_slots, dtype=np.float64)
+
+    def allow_request_batch(self, keys: Sequence[Hashable]) -> np.ndarray:
+        """
+        Decide a batch of requests, same decisions as calling FixedWindowCounter.allow_request
+        for every request in order
+
+        :param keys: key of every request
+        :return: boolean mask, True where the request is allowed
+        """
+        if len(keys) == 0:
+            return np.zeros(0, dtype=bool)
+
+        with self.lock:
+            current_time = self.clock()
+            unique_slots, inverse = self._resolve(keys, current_time)
+
+            # Keys whose window is over start a new one at the current time
+            expired = current_time - self.window_start_time[unique_slots] >= self.window_size
+            expired_slots = unique_slots[expired]
+            self.window_start_time[expired_slots] = current_time
+            self.current_request_count[expired_slots] = 0
+
+            order, _, ranks = _group_ranks(inverse)
+            sorted_groups = inverse[order]
+            counts = self.current_request_count[unique_slots]
+            admitted = np.empty(len(order), dtype=bool)
+            admitted[order] = counts[sorted_groups] + ranks < self.max_allowed_requests
+
+            self.current_request_count[unique_slots] += np.bincount(inverse[admitted], minlength=len(unique_slots))
+            return admitted
+
+    def _grow(self, num_slots: int) -> None:
+        self.current_request_count = self._resize(self.current_request_count, num_slots)
+        self.window_start_time = self._resize(self.window_start_time, num_slots)
+
+    def _initialize(self, slot: int, current_time: float) -> None:
+        self.current_request_count[slot] = 0
+        self.window_start_time[slot] = current_time
+
+
+class BatchSlidingWindowCounter(_BatchRateLimiter):
+    def __init__(self, max_allowed_requests: int, window_size: float, initial_slots: int = 1024,
+                 clock: Optional[Callable[[], float]] = None):
+        """
+        Initialize sliding window counters, one per key, deciding whole batches of requests at once
+
+        :param max_allowed_requests: number of allowed requests in a window
+        :param window_size: size of the window
+        :param initial_slots: number of keys the state arrays are sized for before they need to grow
+        :param clock: zero-argument callable returning the current time in seconds, time.monotonic if omitted,
+            e.g. a VirtualClock to run the limiter in simulated time
+        """
+        if max_allowed_requests <= 0 or window_size <= 0:
+            raise ValueError("Max allowed requests and window size should be positive")
+        super().__init__(initial_slots, clock)
+
+        self.max_allowed_requests: int = max_allowed_requests
+        self.window_size: float = window_size
+
+        self.current_window: np.ndarray = np.zeros(initial_slots, dtype=np.int64)
+        self.current_request_count: np.ndarray = np.zeros(initial_slots, dtype=np.int64)
+        self.previous_request_count: np.ndarray = np.zeros(initial_slots, dtype=np.int64)
+
+    def allow_request_batch(self, keys: Sequence[Hashable]) -> np.ndarray:
+        """
+        Decide a batch of requests, same decisions as calling SlidingWindowCounter.allow_request
+        for every request in order
+
+        :param keys: key of every request
+        :return: boolean mask, True where the request is allowed
+        """
+        if len(keys) == 0:
+            return np.zeros(0, dtype=bool)
+
+        with self.lock:
+            current_time = self.clock()
+            unique_slots, inverse = self._resolve(keys, current_time)
+            current_window = int(current_time // self.window_size)
+
+            # Move every counter to the current window, windows older than the previous one are dropped
+            window_shift = current_window - self.current_window[unique_slots]
+            current_counts = np.where(window_shift == 0, self.current_request_count[unique_slots], 0)
+            previous_counts = np.where(window_shift == 0, self.previous_request_count[unique_slots],
+                                       np.where(window_shift == 1, self.current_request_count[unique_slots], 0))
+
+            # The k-th request of a key in the batch sees k more requests in the current window
+            time_elapsed_in_current_window = (current_time % self.window_size) / self.window_size
+            weighted_previous_counts = previous_counts * (1 - time_elapsed_in_current_window)
+            order, _, ranks = _group_ranks(inverse)
+            admitted = np.empty(len(order), dtype=bool)
+            admitted[order] = (weighted_previous_counts[inverse[order]] + (current_counts[inverse[order]] + ranks)
+                               < self.max_allowed_requests)
+
+            self.current_window[unique_slots] = current_window
+            self.previous_request_count[unique_slots] = previous_counts
+            self.current_request_count[unique_slots] = (
+                current_counts + np.bincount(inverse[admitted], minlength=len(unique_slots))
+            )
+            return admitted
+
+    def _grow(self, num_slots: int) -> None:
+        self.current_window = self._resize(self.current_window, num_slots)
+        self.current_request_count = self._resize(self.current_request_count, num_slots)
+        self.previous_request_count = self._resize(self.previous_request_count, num_slots)
+
+    def _initialize(self, slot: int, current_time: float) -> None:
+        self.current_window[slot] = int(current_time // self.window_size)
+        self.current_request_count[slot] = 0
+        self.previous_request_count[slot] = 0
+
+
+class BatchSlidingWindowLog(_BatchRateLimiter):
+    def __init__(self, max_allowed_requests: int, window_size: float, initial_slots: int = 1024,
+                 clock: Optional[Callable[[], float]] = None):
+        """
+        Initialize sliding window logs, one per key, deciding whole batches of requests at once
+
+        The log of every key is a ring of max_allowed_requests timestamps, a log never holds more requests
+        than that. Memory is O(keys * max_allowed_requests), suited to moderate limits.
+
+        :param max_allowed_requests: maximum allowed request for a window
+        :param window_size: size of the time window
+        :param initial_slots: number of keys the state arrays are sized for before they need to grow
+        :param clock: zero-argument callable returning the current time in seconds, time.monotonic if omitted,
+            e.g. a VirtualClock to run the limiter in simulated time
+        """
+        if max_allowed_requests <= 0 or window_size <= 0:
+            raise ValueError("Max allowed requests and window size should be positive")
+        super().__init__(initial_slots, clock)
+
+        self.max_allowed_requests: int = max_allowed_requests
+        self.window_size: float = window_size
+
+        # Ring of the last admitted timestamps of every key, the oldest one is at the head
+        self.request_timestamps: np.ndarray = np.full((initial_slots, max_allowed_requests), -np.inf)
+        self.head: np.ndarray = np.zeros(initial_slots, dtype=np.int64)
+
+    def allow_request_batch(self, keys: Sequence[Hashable]) -> np.ndarray:
+        """
+        Decide a batch of requests, same decisions as calling SlidingWindowLog.allow_request
+        for every request in order
+
+        :param keys: key of every request
+        :return: boolean mask, True where the request is allowed
+        """
+        if len(keys) == 0:
+            return np.zeros(0, dtype=bool)
+
+        with self.lock:
+            current_time = self.clock()
+            unique_slots, inverse = self._resolve(keys, current_time)
+
+            window_start_time = current_time - self.window_size
+            counts = np.count_nonzero(self.request_timestamps[unique_slots] > window_start_time, axis=1)
+
+            order, _, ranks = _group_ranks(inverse)
+            sorted_groups = inverse[order]
+            sorted_admitted = counts[sorted_groups] + ranks < self.max_allowed_requests
+
+            # Expired timestamps sit at the head of the ring, admitted requests overwrite them in order
+            admitted_slots = unique_slots[sorted_groups[sorted_admitted]]
+            positions = (self.head[admitted_slots] + ranks[sorted_admitted]) % self.max_allowed_requests
+            self.request_timestamps[admitted_slots, positions] = current_time
+            admitted_counts = np.bincount(sorted_groups[sorted_admitted], minlength=len(unique_slots))
+            self.head[unique_slots] = (self.head[unique_slots] + admitted_counts) % self.max_allowed_requests
+
+            admitted = np.empty(len(order), dtype=bool)
+            admitted[order] = sorted_admitted
+            return admitted
+
+    def _grow(self, num_slots: int) -> None:
+        resized = np.full((num_slots, self.max_allowed_requests), -np.inf)
+        resized[:len(self.request_timestamps)] = self.request_timestamps
+        self.request_timestamps = resized
+        self.head = self._resize(self.head, num_slots)
+
+    def _initialize(self, slot: int, current_time: float) -> None:
+        self.request_timestamps[slot] = -np.inf
+        self.head[slot] = 0
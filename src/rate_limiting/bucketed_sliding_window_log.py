@@ -0,0 +1,239 @@
+import math
+import time
+from array import array
+from threading import Condition, Lock
+from typing import Callable, Optional
+
+from src.rate_limiting.metrics import RateLimiterMetrics, count_decision
+
+
+class BucketedSlidingWindowLog:
+    def __init__(self, max_allowed_requests: int, window_size: float, slices: int = 60,
+                 clock: Optional[Callable[[], float]] = None,
+                 metrics: Optional[RateLimiterMetrics] = None):
+        """
+        Initialize Bucketed Sliding Window Log
+
+        Instead of one timestamp per request, the log keeps the number of requests received in each slice of
+        window_size / slices seconds, in a ring of slices + 1 counts. A slice leaves the window once all of it
+        is older than window_size, so every request is kept for between window_size and
+        window_size + window_size / slices seconds:
+        - the limiter never admits more than max_allowed_requests within any window_size seconds, as the exact log
+        - it may deny a request up to window_size / slices seconds longer than the exact log would
+
+        Memory is O(slices) whatever the limit, and evicting old requests costs O(1) per request, amortized.
+
+        :param max_allowed_requests: maximum allowed request for a window
+        :param window_size: size of the time window
+        :param slices: number of slices of the window, more slices mean a smaller error and more memory
+        :param clock: zero-argument callable returning the current time in seconds, time.monotonic if omitted,
+            e.g. a VirtualClock to run the limiter in simulated time
+        :param metrics: metrics the decisions are counted and timed in, None to skip instrumentation
+        """
+        if max_allowed_requests <= 0 or window_size <= 0:
+            raise ValueError("Max allowed requests and window size should be positive")
+        if slices <= 0:
+            raise ValueError("Number of slices should be positive")
+
+        self.clock: Callable[[], float] = time.monotonic if clock is None else clock
+        self.metrics: Optional[RateLimiterMetrics] = metrics
+        self.max_allowed_requests: int = max_allowed_requests
+        self.window_size: float = window_size
+        self.slices: int = slices
+        self.slice_size: float = window_size / slices
+
+        self.slice_counts: array = array('q', bytes(8 * (slices + 1)))  # Ring of request counts per slice
+        self.current_slice: int = self.__slice_of(self.clock())  # Index of the newest slice in the ring
+        self.current_request_count: int = 0  # Current count of requests in the window
+        self.last_request_time: float = self.clock()  # Timestamp of the last received request
+
+        self.lock: Lock = Lock()
+        self.condition: Condition = Condition(self.lock)  # Threads waiting for old slices to expire park on it
+
+    def allow_request(self, cost: int = 1) -> bool:
+        """
+        Determines if a new request is allowed
+
+        :param cost: weight of the request, the number of requests it counts as in the window
+        :return: True, if the request is allowed, False otherwise
+        """
+        if cost < 0:
+            raise ValueError("Cannot admit a negative cost")
+
+        metrics = self.metrics
+        if metrics is None:
+            with self.lock:
+                return self.__allow_request(self.clock(), cost)
+        if metrics.sample_countdown <= 0:
+            return metrics.timed_decision(self.lock, self.__allow_request_now, cost)
+        # Untimed decision counted inline, see RateLimiterMetrics
+        metrics.sample_countdown -= 1
+        lock = self.lock
+        if not lock.acquire(False):
+            metrics.wait_for_lock(lock)
+        try:
+            allowed = self.__allow_request(self.clock(), cost)
+            if allowed:
+                metrics.allowed += 1
+            else:
+                metrics.denied += 1
+        finally:
+            lock.release()
+        return allowed
+
+    def acquire(self, cost: int = 1, timeout: Optional[float] = None) -> bool:
+        """
+        Admit a new request, waiting for the oldest slices to leave the window if needed
+
+        :param cost: weight of the request, the number of requests it counts as in the window
+        :param timeout: maximum number of seconds to wait, None to wait as long as needed
+        :return: True, if the request is allowed, False if it cannot be allowed before the timeout
+        """
+        if cost < 0:
+            raise ValueError("Cannot admit a negative cost")
+        if cost > self.max_allowed_requests:
+            raise ValueError("Cannot admit a cost above the maximum allowed requests")
+
+        deadline = None if timeout is None else self.clock() + timeout
+        with self.condition:
+            while True:
+                current_time = self.clock()
+                if self.__allow_request(current_time, cost):
+                    return count_decision(self.metrics, True)
+
+                wait_time = self.__time_until_available(current_time, cost)
+                if deadline is not None and deadline - current_time < wait_time:
+                    return count_decision(self.metrics, False)  # No point in waiting, no slice will expire in time
+                self.condition.wait(wait_time)
+
+    def time_until_available(self, cost: int = 1) -> float:
+        """
+        Get the time until a request would be allowed
+
+        :param cost: weight of the request, the number of requests it counts as in the window
+        :return: seconds to wait, 0 if a request is allowed now, infinity if the cost exceeds the maximum allowed
+            requests
+        """
+        if cost < 0:
+            raise ValueError("Cannot admit a negative cost")
+
+        with self.lock:
+            current_time = self.clock()
+            self.__remove_old_slices(current_time)
+            return self.__time_until_available(current_time, cost)
+
+    def __allow_request(self, current_time: float, cost: int) -> bool:
+        """
+        Determines if a new request is allowed
+        This method is not thread-safe and should be called within a lock
+
+        :param current_time: the current timestamp
+        :param cost: weight of the request
+        """
+        self.__remove_old_slices(current_time)
+
+        if self.current_request_count + cost <= self.max_allowed_requests:
+            self.slice_counts[self.current_slice % len(self.slice_counts)] += cost
+            self.current_request_count += cost
+            self.last_request_time = current_time
+            return True
+        return False
+
+    def __allow_request_now(self, cost: int) -> bool:
+        """
+        Determines if a new request is allowed at the current time
+        This method is not thread-safe and should be called within a lock
+        """
+        return self.__allow_request(self.clock(), cost)
+
+    def _check(self, amount: int) -> bool:
+        """
+        Check if requests can be admitted now, without admitting them, the first phase of a HierarchicalRateLimiter
+        decision
+        This method is not thread-safe and should be called within a lock
+        """
+        self.__remove_old_slices(self.clock())
+        return self.current_request_count + amount <= self.max_allowed_requests
+
+    def _commit(self, amount: int) -> None:
+        """
+        Admit requests that _check accepted, the second phase of a HierarchicalRateLimiter decision
+        This method is not thread-safe and should be called within a lock
+        """
+        current_time = self.clock()
+        self.__remove_old_slices(current_time)  # The clock may have moved to the next slice since _check
+        self.slice_counts[self.current_slice % len(self.slice_counts)] += amount
+        self.current_request_count += amount
+        self.last_request_time = current_time
+
+    def __time_until_available(self, current_time: float, cost: int) -> float:
+        """
+        Compute the time until a request would be allowed, from the oldest non-empty slices in the window
+        This method is not thread-safe and should be called within a lock
+
+        :param current_time: the current timestamp
+        :param cost: weight of the request
+        """
+        if cost > self.max_allowed_requests:
+            return math.inf
+        excess_count = self.current_request_count + cost - self.max_allowed_requests
+        if excess_count <= 0:
+            return 0.0
+        # Slices leave the window from the oldest one, until enough requests have left
+        ring_size = len(self.slice_counts)
+        oldest_slice = self.current_slice - self.slices
+        excess_count -= self.slice_counts[oldest_slice % ring_size]
+        while excess_count > 0:
+            oldest_slice += 1
+            excess_count -= self.slice_counts[oldest_slice % ring_size]
+        # A slice leaves the window once its end is window_size old
+        return max(0.0, (oldest_slice + ring_size) * self.slice_size - current_time)
+
+    def get_stats(self) -> dict:
+        """
+        Get current statistics about the sliding window
+
+        :return: A dictionary containing current stats
+        """
+        with self.lock:
+            current_time = self.clock()
+            self.__remove_old_slices(current_time)
+
+            return {
+                'current_request_count': self.current_request_count,
+                'allowed_requests': self.max_allowed_requests,
+                'window_size': self.window_size,
+                'slices': self.slices,
+                'last_request_time': current_time - self.last_request_time
+            }
+
+    def reset(self) -> None:
+        """
+        Reset the rate limiter to its initial stats
+        """
+        with self.lock:
+            for i in range(len(self.slice_counts)):
+                self.slice_counts[i] = 0
+            self.current_request_count = 0
+            self.current_slice = self.__slice_of(self.clock())
+            self.last_request_time = self.clock()
+            self.condition.notify_all()  # Waiting threads can go ahead
+
+    def __slice_of(self, timestamp: float) -> int:
+        return int(timestamp // self.slice_size)
+
+    def __remove_old_slices(self, current_time):
+        """
+        Advances the ring to the slice of the current time, clearing the slices that left the rolling window.
+        Each slice is cleared once per turn of the ring, so the cost is O(1) per request, amortized.
+
+        :param current_time: the current timestamp
+        """
+        new_slice = self.__slice_of(current_time)
+        ring_size = len(self.slice_counts)
+        # Past a full turn of the ring every slice has left the window
+        for slice_index in range(max(self.current_slice, new_slice - ring_size) + 1, new_slice + 1):
+            position = slice_index % ring_size
+            self.current_request_count -= self.slice_counts[position]
+            self.slice_counts[position] = 0
+        self.current_slice = max(self.current_slice, new_slice)
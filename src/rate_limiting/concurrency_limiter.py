@@ -0,0 +1,398 @@
+import asyncio
+import math
+import time
+from collections import deque
+from threading import Condition, Lock
+from typing import Callable, Optional
+
+from src.rate_limiting.metrics import RateLimiterMetrics, count_decision
+
+# Seconds after which a KeyedRateLimiter checks again a limiter that still had permits out
+IN_FLIGHT_RECHECK_INTERVAL = 1.0
+
+
+class VegasLimit:
+    def __init__(self, min_limit: int = 1, max_limit: int = 1000, alpha: float = 3, beta: float = 6):
+        """
+        Initialize the TCP Vegas rule adapting the limit of a ConcurrencyLimiter to the queueing delay of the backend
+
+        By Little's law, limit calls in flight taking latency seconds each complete limit / latency calls per
+        second. Without queueing, calls would take min_latency, the shortest latency seen, and the same throughput
+        would only need limit * min_latency / latency calls in flight: the other limit * (1 - min_latency / latency)
+        wait in a queue downstream. Once per round trip, every limit calls, latency is averaged over its calls and
+        the limit grows by one while fewer than alpha calls queue, and shrinks by one once more than beta do, so it
+        settles where the backend is kept busy with a short queue instead of where its latency explodes. The limit
+        only grows if at least half of it was in use during the round trip, a limit that is never reached tells
+        nothing about the backend.
+        min_latency is never measured again: a backend that got lastingly slower is seen as queueing, its limit
+        stays conservative.
+        This class is not thread-safe, ConcurrencyLimiter uses it within its lock
+
+        :param min_limit: lowest limit
+        :param max_limit: highest limit
+        :param alpha: queued calls under which the limit grows
+        :param beta: queued calls over which the limit shrinks, at least alpha
+        """
+        if not 0 < min_limit <= max_limit:
+            raise ValueError("min_limit must be positive and at most max_limit")
+        if not 0 <= alpha <= beta:
+            raise ValueError("alpha must be between 0 and beta")
+
+        self.min_limit: int = min_limit
+        self.max_limit: int = max_limit
+        self.alpha: float = alpha
+        self.beta: float = beta
+
+        self.min_latency: float = math.inf  # Shortest latency seen
+        self.samples: int = 0  # Calls completed since the last adjustment
+        self.total_latency: float = 0.0  # Sum of their latencies
+        self.peak_in_flight: int = 0  # Most calls in flight since the last adjustment
+
+    def update(self, limit: int, latency: float, in_flight: int) -> int:
+        """
+        Get the new limit after a call completed
+
+        :param limit: current limit
+        :param latency: seconds the call took
+        :param in_flight: calls in flight when it completed, itself included
+        :return: new limit, between min_limit and max_limit
+        """
+        self.min_latency = min(self.min_latency, latency)
+        self.peak_in_flight = max(self.peak_in_flight, in_flight)
+        self.samples += 1
+        self.total_latency += latency
+        if self.samples < limit:
+            return limit
+        mean_latency = self.total_latency / self.samples
+        peak_in_flight = self.peak_in_flight
+        self.samples = self.peak_in_flight = 0
+        self.total_latency = 0.0
+        if mean_latency <= 0:
+            return limit
+
+        queued = limit * (1 - self.min_latency / mean_latency)
+        if queued > self.beta:
+            limit -= 1
+        elif queued < self.alpha and peak_in_flight * 2 >= limit:
+            limit += 1
+        return min(max(limit, self.min_limit), self.max_limit)
+
+
+class Permit:
+    """
+    Permits of a ConcurrencyLimiter, held for the duration of a with block, or of an async with block on an
+    AsyncConcurrencyLimiter, see ConcurrencyLimiter.permit
+    """
+    __slots__ = ('limiter', 'cost', 'timeout', 'start_time')
+
+    def __init__(self, limiter: 'ConcurrencyLimiter', cost: int, timeout: Optional[float]):
+        self.limiter: ConcurrencyLimiter = limiter
+        self.cost: int = cost
+        self.timeout: Optional[float] = timeout
+        self.start_time: float = 0.0
+
+    def __enter__(self) -> 'Permit':
+        if not self.limiter.acquire(self.cost, self.timeout):
+            raise TimeoutError(f"No permit available within {self.timeout} seconds")
+        self.start_time = self.limiter.clock()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.__release(exc_type)
+
+    async def __aenter__(self) -> 'Permit':
+        if not await self.limiter.acquire_async(self.cost, self.timeout):
+            raise TimeoutError(f"No permit available within {self.timeout} seconds")
+        self.start_time = self.limiter.clock()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        self.__release(exc_type)
+
+    def __release(self, exc_type) -> None:
+        # A failed call may have failed fast or timed out, its latency says nothing reliable about the backend
+        latency = None if exc_type is not None else self.limiter.clock() - self.start_time
+        self.limiter.release(self.cost, latency)
+
+
+class ConcurrencyLimiter:
+    def __init__(self, max_concurrency: int, limit_algorithm: Optional[VegasLimit] = None,
+                 clock: Optional[Callable[[], float]] = None, metrics: Optional[RateLimiterMetrics] = None):
+        """
+        Initialize a limiter of the requests in flight at the same time
+
+        Rate limiters cap how often requests start, this one caps how many run at once: a request takes a permit
+        when it starts and gives it back when it ends, so when the backend slows down, requests hold their permits
+        longer and fewer new ones are admitted, where a rate limit would keep admitting them into a growing queue.
+        Permits are taken with allow_request, without waiting, or acquire, waiting for a release, and given back
+        with release; permit wraps both in a context manager that also measures the latency of the call.
+
+        With a limit_algorithm, e.g. VegasLimit, the limit is adapted from the latency of every call released with
+        one, starting from max_concurrency.
+
+        One limiter per tenant caps the concurrency of every tenant through a KeyedRateLimiter, e.g.
+        KeyedRateLimiter(lambda: ConcurrencyLimiter(10), wheel_tick=1.0): its timing wheel only drops limiters
+        without permits out, see expiry_time. A limiter evicted once max_keys is reached while it has permits out
+        is replaced by an empty one, size max_keys for the tenants active at the same time.
+
+        :param max_concurrency: permits in flight at most, the initial limit with a limit_algorithm
+        :param limit_algorithm: rule adapting the limit from the latency of the calls, None for a fixed limit
+        :param clock: zero-argument callable returning the current time in seconds, time.monotonic if omitted,
+            e.g. a VirtualClock to run the limiter in simulated time
+        :param metrics: metrics the decisions are counted and timed in, None to skip instrumentation
+        """
+        if max_concurrency <= 0:
+            raise ValueError("Max concurrency must be positive")
+
+        self.clock: Callable[[], float] = time.monotonic if clock is None else clock
+        self.metrics: Optional[RateLimiterMetrics] = metrics
+        self.limit_algorithm: Optional[VegasLimit] = limit_algorithm
+        self.limit: int = max_concurrency
+        if limit_algorithm is not None:
+            self.limit = min(max(max_concurrency, limit_algorithm.min_limit), limit_algorithm.max_limit)
+
+        # Permits taken and not released yet
+        self.in_flight: int = 0
+        # Last time a permit was released, the limiter holds no state a new one would not since then when idle
+        self.last_release_time: float = self.clock()
+
+        self.lock: Lock = Lock()
+        # Condition on the same lock, threads waiting for a permit park on it
+        self.condition: Condition = Condition(self.lock)
+
+    def get_available_permits(self) -> int:
+        """
+        Get the number of permits that can be taken now
+
+        :return: permits
+        """
+        with self.lock:
+            return max(0, self.limit - self.in_flight)
+
+    def allow_request(self, cost: int = 1) -> bool:
+        """
+        Take permits for a request if they are available now, they must be given back with release
+
+        :param cost: permits the request takes, e.g. more of them for a heavier request
+        :return: True, if the permits were taken, False otherwise
+        """
+        if cost < 0:
+            raise ValueError("Cannot take a negative number of permits")
+
+        metrics = self.metrics
+        if metrics is None:
+            with self.lock:
+                return self._try_acquire(cost)
+        if metrics.sample_countdown <= 0:
+            return metrics.timed_decision(self.lock, self._try_acquire, cost)
+        # Untimed decision counted inline, see RateLimiterMetrics
+        metrics.sample_countdown -= 1
+        lock = self.lock
+        if not lock.acquire(False):
+            metrics.wait_for_lock(lock)
+        try:
+            allowed = self._try_acquire(cost)
+            if allowed:
+                metrics.allowed += 1
+            else:
+                metrics.denied += 1
+        finally:
+            lock.release()
+        return allowed
+
+    def acquire(self, cost: int = 1, timeout: Optional[float] = None) -> bool:
+        """
+        Take permits for a request, waiting for other requests to release theirs if needed
+
+        :param cost: permits the request takes
+        :param timeout: maximum number of seconds to wait, 0 not to wait, None to wait as long as needed
+        :return: True, if the permits were taken, False if they were not released before the timeout, or right
+            away once the limit adapted below the cost with no permit out, see _beyond_reach
+        """
+        self._validate(cost)
+
+        deadline = None if timeout is None else self.clock() + timeout
+        with self.condition:
+            while not self._try_acquire(cost):
+                wait_time = None if deadline is None else deadline - self.clock()
+                if (wait_time is not None and wait_time <= 0) or self._beyond_reach(cost):
+                    return count_decision(self.metrics, False)
+                self.condition.wait(wait_time)
+            return count_decision(self.metrics, True)
+
+    def release(self, cost: int = 1, latency: Optional[float] = None) -> None:
+        """
+        Give back the permits of a request that ended
+
+        :param cost: permits the request took
+        :param latency: seconds the request took, fed to the limit algorithm, None not to sample it
+        """
+        if cost < 0:
+            raise ValueError("Cannot release a negative number of permits")
+
+        with self.lock:
+            if cost > self.in_flight:
+                raise ValueError("Cannot release more permits than are in flight")
+            if latency is not None and self.limit_algorithm is not None:
+                self.limit = self.limit_algorithm.update(self.limit, latency, self.in_flight)
+            self.in_flight -= cost
+            self.last_release_time = self.clock()
+            self._on_release()
+
+    def permit(self, cost: int = 1, timeout: Optional[float] = None) -> Permit:
+        """
+        Get a context manager holding permits for the duration of its block, e.g.
+        with limiter.permit(timeout=0.1): call_backend()
+        The block runs once the permits are taken, and they are released when it ends, with the latency of the
+        block if it did not raise
+
+        :param cost: permits the request takes
+        :param timeout: maximum number of seconds to wait, 0 not to wait, None to wait as long as needed.
+            TimeoutError is raised if the permits are not taken in time
+        :return: context manager, usable with async with on an AsyncConcurrencyLimiter
+        """
+        self._validate(cost)
+        return Permit(self, cost, timeout)
+
+    def expiry_time(self) -> float:
+        """
+        Get the time from which the limiter holds no state a new one would not, so a KeyedRateLimiter may drop it:
+        the last release if no permit is out, later otherwise. An adapted limit is not kept, a limiter created
+        again starts over from max_concurrency
+
+        :return: time in seconds of the clock
+        """
+        with self.lock:
+            if self.in_flight:
+                return self.clock() + IN_FLIGHT_RECHECK_INTERVAL
+            return self.last_release_time
+
+    def _validate(self, cost: int) -> None:
+        """
+        Reject requests that the limiter could never admit, instead of waiting for them forever
+        """
+        if cost < 0:
+            raise ValueError("Cannot take a negative number of permits")
+        max_limit = self.limit if self.limit_algorithm is None else self.limit_algorithm.max_limit
+        if cost > max_limit:
+            raise ValueError("Cannot take more permits than the limit")
+
+    def _beyond_reach(self, cost: int) -> bool:
+        """
+        Check if a request can no longer be admitted: an adapted limit dropped below its cost, and with no permit
+        out, no release will ever raise the limit again
+        This method is not thread-safe and should be called within a lock
+        """
+        return cost > self.limit and not self.in_flight
+
+    def _try_acquire(self, cost: int) -> bool:
+        """
+        Take permits if the limit leaves room for them
+        This method is not thread-safe and should be called within a lock
+        """
+        if self.in_flight + cost <= self.limit:
+            self.in_flight += cost
+            return True
+        return False
+
+    def _on_release(self) -> None:
+        """
+        Wake up the requests waiting for a permit, requests of different costs may fit
+        This method is not thread-safe and should be called within a lock
+        """
+        self.condition.notify_all()
+
+
+class AsyncConcurrencyLimiter(ConcurrencyLimiter):
+    def __init__(self, max_concurrency: int, limit_algorithm: Optional[VegasLimit] = None,
+                 clock: Optional[Callable[[], float]] = None, metrics: Optional[RateLimiterMetrics] = None):
+        """
+        Initialize the concurrency limiter, with awaitable acquisition of permits
+
+        Coroutines waiting for permits are served in FIFO order: a release hands its permits to the coroutine at
+        the head of the queue, on its event loop, and requests that arrive meanwhile do not take them first.
+        Threads can still take permits with acquire and allow_request, after the queued coroutines.
+        See ConcurrencyLimiter for the parameters.
+        """
+        super().__init__(max_concurrency, limit_algorithm, clock, metrics)
+        self.waiters: deque = deque()  # (future, cost) of the coroutines waiting for permits, in arrival order
+
+    async def acquire_async(self, cost: int = 1, timeout: Optional[float] = None) -> bool:
+        """
+        Take permits for a request, waiting for other requests to release theirs if needed
+
+        :param cost: permits the request takes
+        :param timeout: maximum number of seconds to wait, 0 not to wait, None to wait as long as needed
+        :return: True, if the permits were taken, False if they were not released before the timeout, or right
+            away once the limit adapted below the cost with no permit out, see _beyond_reach
+        """
+        self._validate(cost)
+
+        with self.lock:
+            if self._try_acquire(cost):
+                return count_decision(self.metrics, True)
+            if (timeout is not None and timeout <= 0) or self._beyond_reach(cost):
+                return count_decision(self.metrics, False)
+            waiter = (asyncio.get_running_loop().create_future(), cost)
+            self.waiters.append(waiter)
+
+        try:
+            # The future is cancelled on timeout, permits handed over to it meanwhile are released by __grant.
+            # It is resolved with False if the request is beyond reach
+            allowed = await asyncio.wait_for(waiter[0], timeout)
+        except asyncio.TimeoutError:
+            allowed = False
+        finally:
+            with self.lock:
+                if waiter in self.waiters:
+                    self.waiters.remove(waiter)
+                    self._on_release()  # The waiters behind it may fit now
+        with self.lock:
+            return count_decision(self.metrics, allowed)
+
+    def _try_acquire(self, cost: int) -> bool:
+        """
+        Take permits if the limit leaves room for them and no coroutine waits for permits before
+        This method is not thread-safe and should be called within a lock
+        """
+        return not self.waiters and super()._try_acquire(cost)
+
+    def _on_release(self) -> None:
+        """
+        Hand the released permits over to the coroutines at the head of the queue, then wake up the threads
+        This method is not thread-safe and should be called within a lock
+        """
+        waiters = self.waiters
+        while waiters:
+            future, cost = waiters[0]
+            if future.done():  # Cancelled or timed out
+                waiters.popleft()
+                continue
+            if self._beyond_reach(cost):
+                # Would hold up the queue forever, the waiters behind it may fit
+                waiters.popleft()
+                future.get_loop().call_soon_threadsafe(self.__reject, future)
+                continue
+            if self.in_flight + cost > self.limit:
+                return
+            waiters.popleft()
+            self.in_flight += cost
+            future.get_loop().call_soon_threadsafe(self.__grant, future, cost)
+        super()._on_release()
+
+    def __grant(self, future: asyncio.Future, cost: int) -> None:
+        """
+        Resolve the future of a waiter that was handed permits, on its event loop, or release them if it gave up
+        """
+        if future.done():
+            self.release(cost)
+        else:
+            future.set_result(True)
+
+    @staticmethod
+    def __reject(future: asyncio.Future) -> None:
+        """
+        Resolve the future of a waiter that is beyond reach, on its event loop, unless it gave up already
+        """
+        if not future.done():
+            future.set_result(False)
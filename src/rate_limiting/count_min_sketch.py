@@ -0,0 +1,290 @@
+import hashlib
+import math
+import os
+import time
+from array import array
+from threading import Lock
+from typing import Callable, Hashable, Optional
+
+from src.rate_limiting.token_bucket_store import key_bytes
+
+# Size in bytes of the random salt keying the hash of a sketch
+SALT_SIZE = 16
+
+
+class CountMinSketch:
+    def __init__(self, width: int, depth: int, salt: Optional[bytes] = None):
+        """
+        Initialize a Count-Min Sketch, approximate counters for any number of keys in fixed memory
+
+        The sketch is depth rows of width counters. A key adds to one counter per row and its count is estimated
+        by the smallest of them: keys sharing counters can only inflate an estimate, never deflate it. Counts are
+        added with conservative update, only the counters below the new estimate are raised, which keeps the
+        estimates of colliding keys tighter than plain increments. Keys are hashed with BLAKE2b keyed by a random
+        salt, so a client cannot pick keys colliding with another one's counters to get it limited, and sketches
+        only share counter positions if they share the salt.
+        This class is not thread-safe, CountMinSketchLimiter uses it within its lock
+
+        :param width: counters per row, more of them make collisions rarer
+        :param depth: number of rows, more of them make a bad estimate less likely
+        :param salt: key of the hash, at most 64 bytes, SALT_SIZE random bytes if omitted
+        """
+        if width <= 0 or depth <= 0:
+            raise ValueError("Width and depth must be positive")
+        if salt is not None and len(salt) > hashlib.blake2b.MAX_KEY_SIZE:
+            raise ValueError("The salt cannot be longer than 64 bytes")
+
+        self.width: int = width
+        self.depth: int = depth
+        self.salt: bytes = os.urandom(SALT_SIZE) if salt is None else salt
+        self.counters: array = array('q', [0]) * (width * depth)  # Rows one after the other
+        self.total: int = 0  # Sum of the counts added
+
+    @classmethod
+    def from_error_bounds(cls, epsilon: float, delta: float, salt: Optional[bytes] = None) -> 'CountMinSketch':
+        """
+        Create a sketch whose estimates exceed the true counts by at most epsilon times the total count, with a
+        probability of at least 1 - delta
+
+        :param epsilon: error bound, as a fraction of the total count
+        :param delta: probability of an estimate exceeding the error bound
+        :param salt: key of the hash, SALT_SIZE random bytes if omitted
+        :return: sketch of ceil(e / epsilon) counters per row and ceil(ln(1 / delta)) rows
+        """
+        width, depth = cls.dimensions(epsilon, delta)
+        return cls(width, depth, salt)
+
+    @staticmethod
+    def dimensions(epsilon: float, delta: float) -> tuple[int, int]:
+        """
+        Get the width and depth of a sketch meeting error bounds, see from_error_bounds
+
+        :param epsilon: error bound, as a fraction of the total count
+        :param delta: probability of an estimate exceeding the error bound
+        :return: width and depth
+        """
+        if not 0 < epsilon < 1 or not 0 < delta < 1:
+            raise ValueError("epsilon and delta must be between 0 and 1")
+        return math.ceil(math.e / epsilon), math.ceil(math.log(1 / delta))
+
+    def add(self, key: Hashable, count: int = 1) -> int:
+        """
+        Add to the count of a key
+
+        :param key: key to count
+        :param count: amount added, cannot be negative
+        :return: estimated count of the key, count included
+        """
+        if count < 0:
+            raise ValueError("Cannot add a negative count")
+        return self._add(self._cells(key), count)
+
+    def estimate(self, key: Hashable) -> int:
+        """
+        Estimate the count of a key
+
+        :param key: key to look up
+        :return: estimated count, never below the true count
+        """
+        return self._estimate(self._cells(key))
+
+    def clear(self) -> None:
+        """
+        Reset every counter to 0
+        """
+        self.counters = array('q', [0]) * (self.width * self.depth)
+        self.total = 0
+
+    def nbytes(self) -> int:
+        """
+        Get the memory used by the counters
+
+        :return: size of the counters in bytes
+        """
+        return self.counters.itemsize * len(self.counters)
+
+    def _cells(self, key: Hashable) -> list[int]:
+        """
+        Get the positions of the counters of a key, one per row, derived from the two halves of its keyed digest
+        (Kirsch-Mitzenmacher), shared by every sketch of the same width, depth and salt
+        """
+        width = self.width
+        digest = hashlib.blake2b(key_bytes(key), digest_size=16, key=self.salt).digest()
+        first_hash = int.from_bytes(digest[:8], 'little')
+        second_hash = int.from_bytes(digest[8:], 'little') | 1
+        return [row * width + (first_hash + row * second_hash) % width for row in range(self.depth)]
+
+    def _add(self, cells: list[int], count: int) -> int:
+        """
+        Add to the counters at the given positions with conservative update and return the new estimate
+        """
+        counters = self.counters
+        estimate = min(map(counters.__getitem__, cells)) + count
+        for cell in cells:
+            if counters[cell] < estimate:
+                counters[cell] = estimate
+        self.total += count
+        return estimate
+
+    def _estimate(self, cells: list[int]) -> int:
+        """
+        Get the smallest of the counters at the given positions
+        """
+        return min(map(self.counters.__getitem__, cells))
+
+
+class CountMinSketchLimiter:
+    def __init__(self, max_allowed_requests: int, window_size: float, epsilon: float = 0.0001, delta: float = 0.01,
+                 top_k: int = 10, count_denied: bool = True, clock: Optional[Callable[[], float]] = None):
+        """
+        Initialize a sliding window limiter for an unbounded number of keys, counting requests in Count-Min Sketches
+
+        Where a KeyedRateLimiter of SlidingWindowCounter keeps two exact counters per key, this limiter keeps two
+        sketches, the current and the previous window, shared by every key and weighted the same way: the
+        previous window counts for the part of it still inside the sliding window. Memory is fixed whatever the
+        number of keys, 2 * 8 * ceil(e / epsilon) * ceil(ln(1 / delta)) bytes, about 2 MB with the defaults.
+        Estimates only err upwards, by at most epsilon times the requests counted in the window with a probability
+        of at least 1 - delta, so a key may be limited early, never late. Size epsilon against the traffic of a
+        window: under 10 million requests per window, the defaults may overcount a key by 1000 requests.
+
+        The top_k keys with the highest estimates are tracked as heavy hitters, for blocking decisions upstream.
+
+        :param max_allowed_requests: number of allowed requests per key in a window
+        :param window_size: size of the window in seconds
+        :param epsilon: error bound of the estimates, as a fraction of the requests counted in a window
+        :param delta: probability of an estimate exceeding the error bound
+        :param top_k: number of heavy hitters tracked, 0 to track none
+        :param count_denied: count denied requests too, so a key flooding the limiter stays limited until it slows
+            down and heavy hitters are ranked by the load they offer rather than by the requests they got through.
+            False to count admitted requests only, as SlidingWindowCounter does
+        :param clock: zero-argument callable returning the current time in seconds, time.monotonic if omitted,
+            e.g. a VirtualClock to run the limiter in simulated time
+        """
+        if max_allowed_requests <= 0 or window_size <= 0:
+            raise ValueError("Max allowed requests and window size should be positive")
+        if top_k < 0:
+            raise ValueError("top_k cannot be negative")
+
+        self.clock: Callable[[], float] = time.monotonic if clock is None else clock
+        self.max_allowed_requests: int = max_allowed_requests
+        self.window_size: float = window_size
+        self.top_k: int = top_k
+        self.count_denied: bool = count_denied
+
+        width, depth = CountMinSketch.dimensions(epsilon, delta)
+        self.current_window: int = int(self.clock() // window_size)  # Current window identifier
+        self.current_sketch: CountMinSketch = CountMinSketch(width, depth)  # Requests of the current window
+        # Requests of the previous window, on the same salt so both sketches share the cells of a key
+        self.previous_sketch: CountMinSketch = CountMinSketch(width, depth, self.current_sketch.salt)
+
+        self.heavy_hitters: dict[Hashable, float] = {}  # Key -> estimate when last seen, top_k keys at most
+        self.heavy_hitter_floor: float = 0.0  # Lowest estimate of the heavy hitters once top_k are tracked
+
+        self.lock: Lock = Lock()
+
+    def allow_request(self, key: Hashable, cost: int = 1) -> bool:
+        """
+        Determines if a request of a key is allowed in the current window
+
+        :param key: key identifying the client, e.g. its source IP
+        :param cost: weight of the request, the number of requests it counts as in the window
+        :return: True, if the request is allowed, False otherwise
+        """
+        if cost < 0:
+            raise ValueError("Cannot admit a negative cost")
+
+        cells = self.current_sketch._cells(key)
+        with self.lock:
+            weight = self.__shift_windows(self.clock())
+            previous_count = self.previous_sketch._estimate(cells) * weight
+            current_count = self.current_sketch._estimate(cells)
+
+            # Same rule as SlidingWindowCounter: the count before the last of the requests is under the limit
+            allowed = previous_count + current_count + cost - 1 < self.max_allowed_requests
+            if allowed or self.count_denied:
+                current_count = self.current_sketch._add(cells, cost)
+            if self.top_k:
+                self.__track(key, previous_count + current_count)
+            return allowed
+
+    def estimate(self, key: Hashable) -> float:
+        """
+        Estimate the requests of a key in the sliding window
+
+        :param key: key to look up
+        :return: estimated count, never below the true count
+        """
+        cells = self.current_sketch._cells(key)
+        with self.lock:
+            weight = self.__shift_windows(self.clock())
+            return self.previous_sketch._estimate(cells) * weight + self.current_sketch._estimate(cells)
+
+    def get_heavy_hitters(self) -> list[tuple[Hashable, float]]:
+        """
+        Get the tracked heavy hitters with their current estimates
+
+        :return: (key, estimated count in the sliding window) pairs, highest first
+        """
+        with self.lock:
+            weight = self.__shift_windows(self.clock())
+            estimates = [(key, self.previous_sketch.estimate(key) * weight + self.current_sketch.estimate(key))
+                         for key in self.heavy_hitters]
+        return sorted(estimates, key=lambda item: item[1], reverse=True)
+
+    def nbytes(self) -> int:
+        """
+        Get the memory used by the sketches, fixed whatever the number of keys
+
+        :return: size of the sketches in bytes
+        """
+        return self.current_sketch.nbytes() + self.previous_sketch.nbytes()
+
+    def __shift_windows(self, current_time: float) -> float:
+        """
+        Move the sketches to the window of the current time, a window older than the previous one is dropped, and
+        get the weight of the previous window in the sliding window
+        This method is not thread-safe and should be called within a lock
+        """
+        weight = 1 - (current_time % self.window_size) / self.window_size
+        current_window = int(current_time // self.window_size)
+        if current_window != self.current_window:
+            dropped_sketch = self.previous_sketch
+            dropped_sketch.clear()
+            if current_window == self.current_window + 1:
+                self.previous_sketch, self.current_sketch = self.current_sketch, dropped_sketch
+            else:
+                self.current_sketch.clear()
+            self.current_window = current_window
+            self.__refresh_heavy_hitters(weight)
+        return weight
+
+    def __track(self, key: Hashable, estimate: float) -> None:
+        """
+        Record the estimate of a key among the heavy hitters if it is one of the top_k highest
+        This method is not thread-safe and should be called within a lock
+        """
+        heavy_hitters = self.heavy_hitters
+        if key in heavy_hitters:
+            heavy_hitters[key] = estimate
+        elif len(heavy_hitters) < self.top_k:
+            heavy_hitters[key] = estimate
+            if len(heavy_hitters) == self.top_k:
+                self.heavy_hitter_floor = min(heavy_hitters.values())
+        elif estimate > self.heavy_hitter_floor:
+            # The floor may be stale, the estimates of the heavy hitters grow as they are seen again
+            lowest_key = min(heavy_hitters, key=heavy_hitters.get)
+            if heavy_hitters[lowest_key] < estimate:
+                del heavy_hitters[lowest_key]
+                heavy_hitters[key] = estimate
+            self.heavy_hitter_floor = min(heavy_hitters.values())
+
+    def __refresh_heavy_hitters(self, weight: float) -> None:
+        """
+        Estimate the heavy hitters again in the new window, their recorded estimates belong to the last one
+        This method is not thread-safe and should be called within a lock
+        """
+        heavy_hitters = self.heavy_hitters
+        for key in heavy_hitters:
+            heavy_hitters[key] = self.previous_sketch.estimate(key) * weight + self.current_sketch.estimate(key)
+        if len(heavy_hitters) == self.top_k:
+            self.heavy_hitter_floor = min(heavy_hitters.values())
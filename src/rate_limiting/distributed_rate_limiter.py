@@ -0,0 +1,82 @@
+import uuid
+from typing import Hashable, Optional, Sequence
+
+from src.rate_limiting.storage_backend import StorageBackend
+
+# Algorithm name -> names of its two limits, in the order the scripts expect them
+ALGORITHM_LIMITS = {
+    'token_bucket': ('capacity', 'fill_rate'),
+    'leaky_bucket': ('capacity', 'leak_rate'),
+    'fixed_window_counter': ('max_allowed_requests', 'window_size'),
+    'sliding_window_counter': ('max_allowed_requests', 'window_size'),
+    'sliding_window_log': ('max_allowed_requests', 'window_size'),
+    'gcra': ('capacity', 'fill_rate'),
+}
+
+
+class DistributedRateLimiter:
+    def __init__(self, backend: StorageBackend, algorithm: str, key_prefix: str = 'rate_limit', **limits: float):
+        """
+        Initialize a rate limiter whose state is shared by every node through a storage backend
+
+        Each decision is a single atomic round-trip to the backend, so all the replicas of a service enforce
+        one global limit. Token and leaky buckets refill and leak continuously, without rounding, and the
+        sliding window counter weights the previous window by the part of it still inside the sliding window.
+
+        :param backend: storage backend holding the state, e.g. RedisStorageBackend
+        :param algorithm: one of token_bucket, leaky_bucket, fixed_window_counter, sliding_window_counter,
+            sliding_window_log and gcra
+        :param key_prefix: prefix of the keys holding the state in the backend
+        :param limits: limits of the algorithm, named as in the local classes, e.g. capacity and fill_rate
+        """
+        if algorithm not in ALGORITHM_LIMITS:
+            raise ValueError(f"Unknown algorithm {algorithm}, expected one of {', '.join(ALGORITHM_LIMITS)}")
+        if set(limits) != set(ALGORITHM_LIMITS[algorithm]):
+            raise ValueError(f"{algorithm} takes the limits {', '.join(ALGORITHM_LIMITS[algorithm])}")
+        if any(value <= 0 for value in limits.values()):
+            raise ValueError("Limits must be positive")
+
+        self.backend: StorageBackend = backend
+        self.algorithm: str = algorithm
+        self.key_prefix: str = key_prefix
+        self.limits: tuple = tuple(limits[name] for name in ALGORITHM_LIMITS[algorithm])
+
+    def allow_request(self, key: Hashable, cost: int = 1) -> bool:
+        """
+        Determines if a request of a key is allowed, in one round-trip
+
+        :param key: key identifying the client
+        :param cost: cost of the request, tokens for the buckets and requests for the windows
+        :return: True, if the request is allowed, False otherwise
+        """
+        if cost < 0:
+            raise ValueError("Cost cannot be negative")
+        return self.backend.evaluate(self.algorithm, self.__state_key(key), self.__args(cost)) == 1
+
+    def allow_batch(self, keys: Sequence[Hashable], costs: Optional[Sequence[int]] = None) -> list[bool]:
+        """
+        Determines if a batch of requests is allowed, pipelined into one round-trip.
+        Requests are decided in order, each one atomically.
+
+        :param keys: key of every request
+        :param costs: cost of every request, 1 for every request if omitted
+        :return: True for every allowed request, False for every denied one
+        """
+        costs = [1] * len(keys) if costs is None else costs
+        if len(costs) != len(keys):
+            raise ValueError("keys and costs must have the same length")
+        if any(cost < 0 for cost in costs):
+            raise ValueError("Cost cannot be negative")
+        if not keys:
+            return []
+
+        calls = [(self.__state_key(key), self.__args(cost)) for key, cost in zip(keys, costs)]
+        return [result == 1 for result in self.backend.evaluate_many(self.algorithm, calls)]
+
+    def __state_key(self, key: Hashable) -> str:
+        return f"{self.key_prefix}:{self.algorithm}:{key}"
+
+    def __args(self, cost: int) -> list:
+        # Log entries need unique members, the other algorithms ignore the request id
+        request_id = uuid.uuid4().hex if self.algorithm == 'sliding_window_log' else ''
+        return [*self.limits, cost, request_id]
@@ -0,0 +1,317 @@
+import time
+
+# Bound once, so the hot paths skip the attribute lookup on the time module
+monotonic_ns = time.monotonic_ns
+
+NANOSECONDS_PER_SECOND = 1_000_000_000
+
+
+# The classes below are tuned for a single decision path: __slots__ instead of an instance __dict__, integer
+# nanosecond clocks, no rounding and no containers created per decision. They hold no lock, an uncontended lock
+# costs about as much as the whole decision, so an instance must be confined to one thread or one event loop,
+# e.g. one limiter per worker thread through threading.local. Use the regular classes when threads share a limiter.
+# Most of the speedup over the regular classes comes from dropping the lock: against their decisions with the lock
+# factored out, the tuning alone makes the buckets about 1.7x faster and the window counters and log 1.0-1.3x, see
+# fast_rate_limiter_benchmark.
+
+
+class FastTokenBucket:
+    """
+    Token bucket for a single thread, with the same consume and get_available_tokens as TokenBucket.
+
+    Tokens are added one whole token at a time: last_fill_time only advances by the time the added tokens took,
+    so the fraction of the next token is carried over instead of being rounded away.
+    """
+    __slots__ = ('capacity', 'fill_rate', 'fill_interval', 'tokens', 'last_fill_time')
+
+    def __init__(self, capacity: int, fill_rate: float):
+        """
+        Initialize the token bucket
+
+        :param capacity: maximum number of tokens a bucket can hold
+        :param fill_rate: number of tokens added per second
+        """
+        if capacity <= 0 or fill_rate <= 0:
+            raise ValueError("Capacity and fill rate must be a positive number")
+
+        self.capacity: int = capacity
+        self.fill_rate: float = fill_rate
+        self.fill_interval: int = max(1, round(NANOSECONDS_PER_SECOND / fill_rate))  # Nanoseconds per token
+        self.tokens: int = capacity
+        self.last_fill_time: int = monotonic_ns()
+
+    def get_available_tokens(self) -> int:
+        """
+        Get the current number of tokens in the bucket
+
+        :return: tokens
+        """
+        self.__add_tokens(monotonic_ns())
+        return self.tokens
+
+    def consume(self, tokens: int) -> bool:
+        """
+        Consume token from the bucket
+
+        :param tokens: required tokens to consume
+        :return: True, if tokens were consumed, False otherwise
+        """
+        if tokens < 0:
+            raise ValueError("Cannot consume negative tokens")
+
+        current_time = monotonic_ns()
+        # Most decisions come in before the next whole token is due and skip the refill
+        if current_time - self.last_fill_time >= self.fill_interval:
+            self.__add_tokens(current_time)
+        if tokens <= self.tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    def __add_tokens(self, current_time: int):
+        """
+        Add the whole tokens due since the last fill
+        """
+        new_tokens = (current_time - self.last_fill_time) // self.fill_interval
+        if new_tokens <= 0:
+            return
+        if self.tokens + new_tokens >= self.capacity:
+            self.tokens = self.capacity
+            self.last_fill_time = current_time  # A full bucket does not bank time
+        else:
+            self.tokens += new_tokens
+            self.last_fill_time += new_tokens * self.fill_interval
+
+
+class FastLeakyBucket:
+    """
+    Leaky bucket for a single thread, with the same add_tokens and get_available_tokens as LeakyBucket.
+
+    Tokens leak one whole token at a time, carrying the fraction of the next one over instead of rounding it away.
+    """
+    __slots__ = ('capacity', 'leak_rate', 'leak_interval', 'tokens', 'last_leak_time')
+
+    def __init__(self, capacity: int, leak_rate: float):
+        """
+        Initialize the leaky bucket.
+
+        :param capacity: Maximum number of requests that can be processed.
+        :param leak_rate: Number of tokens that leak per second.
+        """
+        if capacity <= 0 or leak_rate <= 0:
+            raise ValueError("Capacity or leak rate should be positive")
+
+        self.capacity: int = capacity
+        self.leak_rate: float = leak_rate
+        self.leak_interval: int = max(1, round(NANOSECONDS_PER_SECOND / leak_rate))  # Nanoseconds per token
+        self.tokens: int = 0
+        self.last_leak_time: int = monotonic_ns()
+
+    def get_available_tokens(self) -> int:
+        """
+        Get current water level (number of tokens available) in the bucket.
+
+        :return: Currently available tokens.
+        """
+        self.__leak(monotonic_ns())
+        return self.tokens
+
+    def add_tokens(self, amount: int) -> bool:
+        """
+        Add tokens to the bucket.
+
+        :param amount: amount of tokens to be added (number of incoming requests).
+        :return: True, if request was added successfully, False otherwise.
+        """
+        if amount < 0:
+            raise ValueError("Cannot add negative tokens")
+
+        current_time = monotonic_ns()
+        # Most decisions come in before the next whole token has leaked and skip the leak
+        if current_time - self.last_leak_time >= self.leak_interval:
+            self.__leak(current_time)
+        if self.tokens + amount <= self.capacity:
+            self.tokens += amount
+            return True
+        return False
+
+    def __leak(self, current_time: int):
+        """
+        Leak the whole tokens due since the last leak
+        """
+        leaked_tokens = (current_time - self.last_leak_time) // self.leak_interval
+        if leaked_tokens >= self.tokens:
+            self.tokens = 0
+            self.last_leak_time = current_time  # An empty bucket does not bank time
+        elif leaked_tokens > 0:
+            self.tokens -= leaked_tokens
+            self.last_leak_time += leaked_tokens * self.leak_interval
+
+
+class FastFixedWindowCounter:
+    """Fixed window counter for a single thread, with the same allow_request as FixedWindowCounter."""
+    __slots__ = ('max_allowed_requests', 'window_size', 'window_size_ns', 'current_request_count',
+                 'window_start_time')
+
+    def __init__(self, max_allowed_requests: int, window_size: float):
+        """
+        Initialize fixed window rate limiter
+
+        :param max_allowed_requests: maximum number of allowed requests per window
+        :param window_size: size of the time window in seconds
+        """
+        if max_allowed_requests <= 0 or window_size <= 0:
+            raise ValueError("max_allowed_requests and window_size must be positive")
+
+        self.max_allowed_requests: int = max_allowed_requests
+        self.window_size: float = window_size
+        self.window_size_ns: int = max(1, round(window_size * NANOSECONDS_PER_SECOND))
+        self.current_request_count: int = 0
+        self.window_start_time: int = monotonic_ns()
+
+    def allow_request(self, cost: int = 1) -> bool:
+        """
+        Determines if a request is allowed or not
+
+        :param cost: weight of the request, the number of requests it counts as in the window
+        :return: True, if request is allowed, False otherwise
+        """
+        if cost < 0:
+            raise ValueError("Cannot admit a negative cost")
+
+        current_time = monotonic_ns()
+        if current_time - self.window_start_time >= self.window_size_ns:
+            # Reset the counter and start a new window
+            self.window_start_time = current_time
+            self.current_request_count = 0
+        if self.current_request_count + cost <= self.max_allowed_requests:
+            self.current_request_count += cost
+            return True
+        return False
+
+    def get_remaining_requests(self) -> int:
+        """
+        Returns remaining requests in the window
+
+        :return: count of remaining requests
+        """
+        return max(0, self.max_allowed_requests - self.current_request_count)
+
+
+class FastSlidingWindowCounter:
+    """Sliding window counter for a single thread, with the same allow_request as SlidingWindowCounter."""
+    __slots__ = ('max_allowed_requests', 'window_size', 'window_size_ns', 'current_window', 'current_request_count',
+                 'previous_request_count')
+
+    def __init__(self, max_allowed_requests: int, window_size: float):
+        """
+        Initializes Sliding Window Counter
+
+        :param max_allowed_requests: number of allowed requests in a window
+        :param window_size: size of the window in seconds
+        """
+        if max_allowed_requests <= 0 or window_size <= 0:
+            raise ValueError("Max allowed requests and window size should be positive")
+
+        self.max_allowed_requests: int = max_allowed_requests
+        self.window_size: float = window_size
+        self.window_size_ns: int = max(1, round(window_size * NANOSECONDS_PER_SECOND))
+        self.current_window: int = monotonic_ns() // self.window_size_ns
+        self.current_request_count: int = 0
+        self.previous_request_count: int = 0
+
+    def allow_request(self, cost: int = 1) -> bool:
+        """
+        Determines if a request is allowed in the current window
+
+        :param cost: weight of the request, the number of requests it counts as in the window
+        :return: True, if the request is allowed, False otherwise
+        """
+        if cost < 0:
+            raise ValueError("Cannot admit a negative cost")
+
+        current_time = monotonic_ns()
+        current_window = current_time // self.window_size_ns
+        if current_window != self.current_window:
+            # Move the counters to the current window, a window older than the previous one is dropped
+            consecutive = current_window == self.current_window + 1
+            self.previous_request_count = self.current_request_count if consecutive else 0
+            self.current_request_count = 0
+            self.current_window = current_window
+
+        if self.previous_request_count:
+            # Sliding window effect: the part of the previous window still inside the sliding window counts
+            time_elapsed_in_current_window = (current_time % self.window_size_ns) / self.window_size_ns
+            allowed_count = (self.previous_request_count * (1 - time_elapsed_in_current_window) +
+                             self.current_request_count)
+        else:
+            allowed_count = self.current_request_count
+        # A request of cost n is admitted as n single requests in a row would be, as in SlidingWindowCounter
+        if allowed_count + cost - 1 < self.max_allowed_requests:
+            self.current_request_count += cost
+            return True
+        return False
+
+
+class FastSlidingWindowLog:
+    """
+    Sliding window log for a single thread, with the same allow_request as SlidingWindowLog.
+
+    Requests go to a ring of max_allowed_requests slots allocated up front, a timestamp and a cost per slot, so
+    admitting a request overwrites a slot instead of appending to a deque. Every admitted request costs at least 1,
+    so the ring never holds more requests than it has slots; requests of cost 0 are admitted without a slot.
+    """
+    __slots__ = ('max_allowed_requests', 'window_size', 'window_size_ns', 'request_timestamps', 'request_costs',
+                 'oldest_index', 'request_log_length', 'current_request_count')
+
+    def __init__(self, max_allowed_requests: int, window_size: float):
+        """
+        Initialize Sliding Window Log
+
+        :param max_allowed_requests: maximum allowed request for a window
+        :param window_size: size of the time window in seconds
+        """
+        if max_allowed_requests <= 0 or window_size <= 0:
+            raise ValueError("Max allowed requests and window size should be positive")
+
+        self.max_allowed_requests: int = max_allowed_requests
+        self.window_size: float = window_size
+        self.window_size_ns: int = max(1, round(window_size * NANOSECONDS_PER_SECOND))
+        self.request_timestamps: list[int] = [0] * max_allowed_requests  # Ring of timestamps
+        self.request_costs: list[int] = [0] * max_allowed_requests  # Ring of costs, the same slots
+        self.oldest_index: int = 0  # Slot of the oldest request in the window
+        self.request_log_length: int = 0  # Requests in the window, the slots in use
+        self.current_request_count: int = 0  # Total cost of the requests in the window
+
+    def allow_request(self, cost: int = 1) -> bool:
+        """
+        Determines if a new request is allowed
+
+        :param cost: weight of the request, the number of requests it counts as in the window
+        :return: True, if the request is allowed, False otherwise
+        """
+        if cost < 0:
+            raise ValueError("Cannot admit a negative cost")
+
+        current_time = monotonic_ns()
+        timestamps = self.request_timestamps
+        window_start_time = current_time - self.window_size_ns
+        # Remove the requests that left the rolling window
+        while self.request_log_length and timestamps[self.oldest_index] <= window_start_time:
+            self.current_request_count -= self.request_costs[self.oldest_index]
+            self.oldest_index += 1
+            if self.oldest_index == self.max_allowed_requests:
+                self.oldest_index = 0
+            self.request_log_length -= 1
+
+        if self.current_request_count + cost <= self.max_allowed_requests:
+            if cost:
+                newest_index = self.oldest_index + self.request_log_length
+                if newest_index >= self.max_allowed_requests:
+                    newest_index -= self.max_allowed_requests
+                timestamps[newest_index] = current_time
+                self.request_costs[newest_index] = cost
+                self.request_log_length += 1
+                self.current_request_count += cost
+            return True
+        return False
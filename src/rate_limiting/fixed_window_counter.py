@@ -1,47 +1,163 @@
+import math
 import time
-from threading import Lock
+from threading import Condition, Lock
+from typing import Callable, Optional
+
+from src.rate_limiting.metrics import RateLimiterMetrics, count_decision
 
 
 class FixedWindowCounter:
-    def __init__(self, max_allowed_requests: int, window_size: float):
+    def __init__(self, max_allowed_requests: int, window_size: float, clock: Optional[Callable[[], float]] = None,
+                 metrics: Optional[RateLimiterMetrics] = None):
         """
         Initialize fixed window rate limiter
 
         :param max_allowed_requests: maximum number of allowed requests per window
         :param window_size: size of the time window in seconds
+        :param clock: zero-argument callable returning the current time in seconds, time.monotonic if omitted,
+            e.g. a VirtualClock to run the limiter in simulated time
+        :param metrics: metrics the decisions are counted and timed in, None to skip instrumentation
         """
         if max_allowed_requests <= 0 or window_size <= 0:
             raise ValueError("max_allowed_requests and window_size must be positive")
 
+        self.clock: Callable[[], float] = time.monotonic if clock is None else clock
+        self.metrics: Optional[RateLimiterMetrics] = metrics
         self.max_allowed_requests: int = max_allowed_requests
         self.window_size: float = window_size
 
         self.current_request_count = 0  # Current request count within the window
-        self.window_start_time = time.monotonic()  # Start time of the current window
+        self.window_start_time = self.clock()  # Start time of the current window
 
         self.lock: Lock = Lock()  # Lock for thread safety
+        self.condition: Condition = Condition(self.lock)  # Threads waiting for the next window park on it
 
-    def allow_request(self) -> bool:
+    def allow_request(self, cost: int = 1) -> bool:
         """
         Determines if a request is allowed or not
 
+        :param cost: weight of the request, the number of requests it counts as in the window
         :return: True, if request is allowed, False otherwise
         """
-        with self.lock:
-            current_time = time.monotonic()
-            # Check if we are still within the current window
-            if current_time - self.window_start_time < self.window_size:
-                # Check if we have not exhausted our requests for the current window
-                if self.current_request_count < self.max_allowed_requests:
-                    self.current_request_count += 1
-                    return True
-                else:
-                    return False
+        if cost < 0:
+            raise ValueError("Cannot admit a negative cost")
+
+        metrics = self.metrics
+        if metrics is None:
+            with self.lock:
+                return self.__allow_request(cost)
+        if metrics.sample_countdown <= 0:
+            return metrics.timed_decision(self.lock, self.__allow_request, cost)
+        # Untimed decision counted inline, see RateLimiterMetrics
+        metrics.sample_countdown -= 1
+        lock = self.lock
+        if not lock.acquire(False):
+            metrics.wait_for_lock(lock)
+        try:
+            allowed = self.__allow_request(cost)
+            if allowed:
+                metrics.allowed += 1
             else:
-                # Reset the counter and start a new window
-                self.window_start_time = current_time
-                self.current_request_count = 1
-                return True
+                metrics.denied += 1
+        finally:
+            lock.release()
+        return allowed
+
+    def acquire(self, cost: int = 1, timeout: Optional[float] = None) -> bool:
+        """
+        Admit a request, waiting for the next window if needed
+
+        :param cost: weight of the request, the number of requests it counts as in the window
+        :param timeout: maximum number of seconds to wait, None to wait as long as needed
+        :return: True, if request is allowed, False if it cannot be allowed before the timeout
+        """
+        if cost < 0:
+            raise ValueError("Cannot admit a negative cost")
+        if cost > self.max_allowed_requests:
+            raise ValueError("Cannot admit a cost above the maximum allowed requests")
+
+        deadline = None if timeout is None else self.clock() + timeout
+        with self.condition:
+            while not self.__allow_request(cost):
+                wait_time = self.__time_until_available(cost)
+                if deadline is not None and deadline - self.clock() < wait_time:
+                    return count_decision(self.metrics, False)  # No point in waiting, the window will not end in time
+                self.condition.wait(wait_time)
+            return count_decision(self.metrics, True)
+
+    def time_until_available(self, cost: int = 1) -> float:
+        """
+        Get the time until a request would be allowed
+
+        :param cost: weight of the request, the number of requests it counts as in the window
+        :return: seconds to wait, 0 if a request is allowed now, infinity if the cost exceeds the maximum allowed
+            requests
+        """
+        if cost < 0:
+            raise ValueError("Cannot admit a negative cost")
+
+        with self.lock:
+            return self.__time_until_available(cost)
+
+    def expiry_time(self) -> float:
+        """
+        Get the time at which the current window ends, from then on the counter holds no state a new one would not,
+        so a KeyedRateLimiter may drop it
+
+        :return: end of the current window, in seconds of the clock
+        """
+        with self.lock:
+            return self.window_start_time + self.window_size
+
+    def __allow_request(self, cost: int) -> bool:
+        """
+        Determines if a request is allowed or not
+        This method is not thread-safe and should be called within a lock
+        """
+        current_time = self.clock()
+        # Check if we are still within the current window
+        if current_time - self.window_start_time >= self.window_size:
+            # Reset the counter and start a new window
+            self.window_start_time = current_time
+            self.current_request_count = 0
+        # Check if the request does not exhaust our requests for the current window
+        if self.current_request_count + cost <= self.max_allowed_requests:
+            self.current_request_count += cost
+            return True
+        return False
+
+    def _check(self, amount: int) -> bool:
+        """
+        Check if requests can be admitted now, without admitting them, the first phase of a HierarchicalRateLimiter
+        decision
+        This method is not thread-safe and should be called within a lock
+        """
+        current_time = self.clock()
+        if current_time - self.window_start_time >= self.window_size:
+            # Start a new window
+            self.window_start_time = current_time
+            self.current_request_count = 0
+        return self.current_request_count + amount <= self.max_allowed_requests
+
+    def _commit(self, amount: int) -> None:
+        """
+        Admit requests that _check accepted, the second phase of a HierarchicalRateLimiter decision
+        This method is not thread-safe and should be called within a lock
+        """
+        self.current_request_count += amount
+
+    def __time_until_available(self, cost: int) -> float:
+        """
+        Compute the time until a request would be allowed, from the window boundary
+        This method is not thread-safe and should be called within a lock
+        """
+        if cost > self.max_allowed_requests:
+            return math.inf
+        time_in_window = self.clock() - self.window_start_time
+        if time_in_window >= self.window_size or self.current_request_count + cost <= self.max_allowed_requests:
+            return 0.0
+        # The window is exhausted, the counter resets when it ends
+        return self.window_size - time_in_window
 
     def get_window_status(self) -> dict[str, int]:
         """
@@ -50,7 +166,7 @@ class FixedWindowCounter:
         :return: A dictionary with the current request count and time remaining in the window.
         """
         with self.lock:
-            current_time = time.monotonic()
+            current_time = self.clock()
             time_remaining = max(0, int(self.window_size - (current_time - self.window_start_time)))
             return {
                 'requests_made': self.current_request_count,
@@ -62,8 +178,9 @@ class FixedWindowCounter:
         Resets the window to its initial configuration
         """
         with self.lock:
-            self.window_start_time = time.monotonic()
+            self.window_start_time = self.clock()
             self.current_request_count = 0
+            self.condition.notify_all()  # Waiting threads can go ahead
 
     def get_remaining_requests(self) -> int:
         """
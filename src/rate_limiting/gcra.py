@@ -0,0 +1,284 @@
+import math
+import time
+from threading import Condition, Lock
+from typing import Callable, Hashable, Optional
+
+from src.rate_limiting.metrics import RateLimiterMetrics, count_decision
+
+NANOSECONDS_PER_SECOND = 1_000_000_000
+
+
+class GCRA:
+    def __init__(self, capacity: int, fill_rate: float, clock: Optional[Callable[[], float]] = None,
+                 metrics: Optional[RateLimiterMetrics] = None):
+        """
+        Initialize a Generic Cell Rate Algorithm limiter, with the burst and rate of a token bucket
+
+        Instead of a token count and a refill time, the limiter keeps a single integer: the theoretical arrival
+        time (TAT), in nanoseconds, at which the bucket would be full again. Every admitted token pushes it
+        1 / fill_rate seconds further, and a request is admitted if it does not push it more than
+        capacity / fill_rate seconds past the current time. Partial tokens are accounted exactly instead of
+        waiting for a whole token, and the time to wait for a denied request is a subtraction.
+        1 / fill_rate is rounded to whole nanoseconds, so every comparison is between integers and a full bucket
+        always admits capacity tokens at once, whatever the rate; the rate is off by less than half a nanosecond
+        per token, and cannot exceed 10**9 tokens per second.
+
+        :param capacity: maximum number of tokens a bucket can hold, the largest burst
+        :param fill_rate: number of tokens added per unit of time
+        :param clock: zero-argument callable returning the current time in seconds, time.monotonic if omitted,
+            e.g. a VirtualClock to run the limiter in simulated time
+        :param metrics: metrics the decisions are counted and timed in, None to skip instrumentation
+        """
+        if capacity <= 0 or fill_rate <= 0:
+            raise ValueError("Capacity and fill rate must be a positive number")
+
+        self.clock: Callable[[], float] = time.monotonic if clock is None else clock
+        self.metrics: Optional[RateLimiterMetrics] = metrics
+        self.capacity: int = capacity
+        self.fill_rate: float = fill_rate
+        self.emission_interval: int = _emission_interval(fill_rate)  # Nanoseconds per token
+        self.burst_tolerance: int = capacity * self.emission_interval  # How far the TAT can run ahead of now
+
+        # Theoretical arrival time in nanoseconds, a TAT in the past means a full bucket
+        self.theoretical_arrival_time: int = self.__now()
+
+        self.lock: Lock = Lock()
+        # Condition on the same lock, threads waiting for tokens park on it
+        self.condition: Condition = Condition(self.lock)
+
+    def get_available_tokens(self) -> int:
+        """
+        Get the current number of whole tokens in the bucket
+
+        :return: tokens
+        """
+        with self.lock:
+            time_ahead = max(0, self.theoretical_arrival_time - self.__now())
+            return (self.burst_tolerance - time_ahead) // self.emission_interval
+
+    def consume(self, tokens: int) -> bool:
+        """
+        Consume tokens from the bucket
+
+        :param tokens: required tokens to consume
+        :return: True, if tokens were consumed, False otherwise
+        """
+        if tokens < 0:
+            raise ValueError("Cannot consume negative tokens")
+
+        metrics = self.metrics
+        if metrics is None:
+            with self.lock:
+                return self.__consume(tokens)
+        if metrics.sample_countdown <= 0:
+            return metrics.timed_decision(self.lock, self.__consume, tokens)
+        # Untimed decision counted inline, see RateLimiterMetrics
+        metrics.sample_countdown -= 1
+        lock = self.lock
+        if not lock.acquire(False):
+            metrics.wait_for_lock(lock)
+        try:
+            allowed = self.__consume(tokens)
+            if allowed:
+                metrics.allowed += 1
+            else:
+                metrics.denied += 1
+        finally:
+            lock.release()
+        return allowed
+
+    def consume_with_retry_after(self, tokens: int) -> tuple[bool, float]:
+        """
+        Consume tokens from the bucket, returning how long to wait if they are not available,
+        e.g. for the Retry-After header of a denied request
+
+        :param tokens: required tokens to consume
+        :return: (True, 0) if tokens were consumed, otherwise (False, seconds until they are available),
+            infinity if they exceed the capacity
+        """
+        if tokens < 0:
+            raise ValueError("Cannot consume negative tokens")
+
+        with self.lock:
+            if self.__consume(tokens):
+                return True, 0.0
+            return False, self.__time_until_available(tokens)
+
+    def acquire(self, tokens: int = 1, timeout: Optional[float] = None) -> bool:
+        """
+        Consume tokens from the bucket, waiting for them if needed
+
+        :param tokens: required tokens to consume
+        :param timeout: maximum number of seconds to wait, None to wait as long as needed
+        :return: True, if tokens were consumed, False if they cannot be available before the timeout
+        """
+        if tokens < 0:
+            raise ValueError("Cannot consume negative tokens")
+        if tokens > self.capacity:
+            raise ValueError("Cannot consume more tokens than the capacity")
+
+        deadline = None if timeout is None else self.clock() + timeout
+        with self.condition:
+            while not self.__consume(tokens):
+                wait_time = self.__time_until_available(tokens)
+                if deadline is not None and deadline - self.clock() < wait_time:
+                    # No point in waiting, the tokens will not be there in time
+                    return count_decision(self.metrics, False)
+                self.condition.wait(wait_time)
+            return count_decision(self.metrics, True)
+
+    def time_until_available(self, tokens: int) -> float:
+        """
+        Get the time until the bucket holds the required tokens
+
+        :param tokens: required tokens to consume
+        :return: seconds to wait, 0 if the tokens are available now, infinity if they exceed the capacity
+        """
+        if tokens < 0:
+            raise ValueError("Cannot consume negative tokens")
+
+        with self.lock:
+            return self.__time_until_available(tokens)
+
+    def _check(self, tokens: int) -> bool:
+        """
+        Check if tokens can be consumed now, without consuming them, the first phase of a HierarchicalRateLimiter
+        decision
+        This method is not thread-safe and should be called within a lock
+        """
+        current_time = self.__now()
+        new_arrival_time = max(self.theoretical_arrival_time, current_time) + tokens * self.emission_interval
+        return new_arrival_time - current_time <= self.burst_tolerance
+
+    def _commit(self, tokens: int) -> None:
+        """
+        Consume tokens that _check accepted, the second phase of a HierarchicalRateLimiter decision
+        This method is not thread-safe and should be called within a lock
+        """
+        self.theoretical_arrival_time = (max(self.theoretical_arrival_time, self.__now()) +
+                                         tokens * self.emission_interval)
+
+    def __consume(self, tokens: int) -> bool:
+        """
+        Consume tokens if they do not push the TAT past the burst tolerance
+        This method is not thread-safe and should be called within a lock
+        """
+        current_time = self.__now()
+        new_arrival_time = max(self.theoretical_arrival_time, current_time) + tokens * self.emission_interval
+        if new_arrival_time - current_time <= self.burst_tolerance:
+            self.theoretical_arrival_time = new_arrival_time
+            return True
+        return False
+
+    def __time_until_available(self, tokens: int) -> float:
+        """
+        Compute the time until the bucket holds the required tokens, from the TAT
+        This method is not thread-safe and should be called within a lock
+        """
+        if tokens > self.capacity:
+            return math.inf
+        current_time = self.__now()
+        new_arrival_time = max(self.theoretical_arrival_time, current_time) + tokens * self.emission_interval
+        return max(0.0, (new_arrival_time - self.burst_tolerance - current_time) / NANOSECONDS_PER_SECOND)
+
+    def __now(self) -> int:
+        return round(self.clock() * NANOSECONDS_PER_SECOND)
+
+
+class GCRAStore:
+    def __init__(self, capacity: int, fill_rate: float, clock: Optional[Callable[[], float]] = None):
+        """
+        Initialize a store of GCRA limiters, one per key, holding a single integer per key
+
+        A key whose TAT is in the past has a full bucket, the same state as a key that was never seen, so
+        purge_idle can drop it without changing any decision. Decisions are the same as GCRA.consume.
+
+        :param capacity: maximum number of tokens a bucket can hold, the largest burst
+        :param fill_rate: number of tokens added per unit of time
+        :param clock: zero-argument callable returning the current time in seconds, time.monotonic if omitted,
+            e.g. a VirtualClock to run the limiter in simulated time
+        """
+        if capacity <= 0 or fill_rate <= 0:
+            raise ValueError("Capacity and fill rate must be a positive number")
+
+        self.clock: Callable[[], float] = time.monotonic if clock is None else clock
+        self.capacity: int = capacity
+        self.fill_rate: float = fill_rate
+        self.emission_interval: int = _emission_interval(fill_rate)  # Nanoseconds per token
+        self.burst_tolerance: int = capacity * self.emission_interval  # How far a TAT can run ahead of now
+
+        self.theoretical_arrival_times: dict[Hashable, int] = {}  # Key -> TAT in nanoseconds
+
+        self.lock: Lock = Lock()
+
+    def consume(self, key: Hashable, tokens: int) -> bool:
+        """
+        Consume tokens from the bucket of a key
+
+        :param key: key identifying the client
+        :param tokens: required tokens to consume
+        :return: True, if tokens were consumed, False otherwise
+        """
+        return self.consume_with_retry_after(key, tokens)[0]
+
+    def consume_with_retry_after(self, key: Hashable, tokens: int) -> tuple[bool, float]:
+        """
+        Consume tokens from the bucket of a key, returning how long to wait if they are not available
+
+        :param key: key identifying the client
+        :param tokens: required tokens to consume
+        :return: (True, 0) if tokens were consumed, otherwise (False, seconds until they are available),
+            infinity if they exceed the capacity
+        """
+        if tokens < 0:
+            raise ValueError("Cannot consume negative tokens")
+
+        with self.lock:
+            current_time = round(self.clock() * NANOSECONDS_PER_SECOND)
+            theoretical_arrival_time = self.theoretical_arrival_times.get(key, current_time)
+            new_arrival_time = max(theoretical_arrival_time, current_time) + tokens * self.emission_interval
+            if new_arrival_time - current_time <= self.burst_tolerance:
+                self.theoretical_arrival_times[key] = new_arrival_time
+                return True, 0.0
+        if tokens > self.capacity:
+            return False, math.inf
+        return False, (new_arrival_time - self.burst_tolerance - current_time) / NANOSECONDS_PER_SECOND
+
+    def get_available_tokens(self, key: Hashable) -> int:
+        """
+        Get the current number of whole tokens in the bucket of a key
+
+        :param key: key identifying the client
+        :return: tokens, the capacity if the key has no state
+        """
+        with self.lock:
+            current_time = round(self.clock() * NANOSECONDS_PER_SECOND)
+            time_ahead = max(0, self.theoretical_arrival_times.get(key, current_time) - current_time)
+            return (self.burst_tolerance - time_ahead) // self.emission_interval
+
+    def purge_idle(self) -> int:
+        """
+        Drop every key whose bucket is full again, which scans all keys
+
+        :return: number of dropped keys
+        """
+        with self.lock:
+            current_time = round(self.clock() * NANOSECONDS_PER_SECOND)
+            idle_keys = [key for key, theoretical_arrival_time in self.theoretical_arrival_times.items()
+                         if theoretical_arrival_time <= current_time]
+            for key in idle_keys:
+                del self.theoretical_arrival_times[key]
+            return len(idle_keys)
+
+    def __len__(self) -> int:
+        return len(self.theoretical_arrival_times)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.theoretical_arrival_times
+
+
+def _emission_interval(fill_rate: float) -> int:
+    """
+    Nanoseconds between two tokens, rounded to a whole number so the TAT arithmetic stays exact
+    """
+    return max(1, round(NANOSECONDS_PER_SECOND / fill_rate))
@@ -0,0 +1,75 @@
+from typing import Any, Sequence
+
+
+class HierarchicalRateLimiter:
+    def __init__(self, limiters: Sequence[Any]):
+        """
+        Initialize a composite of nested limiters, e.g. [user limiter, organization limiter, global limiter],
+        admitting a request only if every one of them admits it
+
+        A decision takes the locks of all the limiters, checks every limiter without changing its quota and only
+        then charges all of them, so a limiter denying the request leaves the others untouched and nothing has to
+        be refunded. The locks are always taken in the same global order, by the address of the lock, so
+        composites sharing limiters, e.g. every user composite sharing the global limiter, cannot deadlock.
+        Decisions made through the composite are not recorded in the metrics of the limiters.
+
+        :param limiters: limiters to check, in the order they are checked, any of TokenBucket, LeakyBucket,
+            FixedWindowCounter, SlidingWindowCounter, SlidingWindowLog, BucketedSlidingWindowLog and GCRA.
+            Checking the limiter most likely to deny first saves work on denials
+        """
+        if not limiters:
+            raise ValueError("At least one limiter is needed")
+        if not all(hasattr(limiter, '_check') and hasattr(limiter, '_commit') for limiter in limiters):
+            raise ValueError("Limiters must support two-phase decisions")
+        if len({id(limiter.lock) for limiter in limiters}) != len(limiters):
+            raise ValueError("A limiter cannot appear twice in the chain")
+
+        self.limiters: tuple = tuple(limiters)
+        # Locks in the global acquisition order
+        self.locks: tuple = tuple(sorted((limiter.lock for limiter in limiters), key=id))
+
+    def allow_request(self, amount: int = 1) -> bool:
+        """
+        Admit a request in every limiter of the chain, or in none of them
+
+        :param amount: tokens of the request for the buckets, number of requests for the window based limiters
+        :return: True, if every limiter admitted the request, False otherwise
+        """
+        if amount < 0:
+            raise ValueError("Cannot admit a negative amount")
+
+        locks = self.locks
+        for lock in locks:
+            lock.acquire()
+        try:
+            for limiter in self.limiters:
+                if not limiter._check(amount):
+                    return False
+            for limiter in self.limiters:
+                limiter._commit(amount)
+            return True
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    def denying_limiter(self, amount: int = 1) -> Any:
+        """
+        Find the first limiter of the chain that would deny a request now, e.g. to tell a client which quota
+        it ran out of, without admitting the request
+
+        :param amount: tokens of the request for the buckets, number of requests for the window based limiters
+        :return: the limiter, None if every limiter would admit the request
+        """
+        if amount < 0:
+            raise ValueError("Cannot admit a negative amount")
+
+        for lock in self.locks:
+            lock.acquire()
+        try:
+            for limiter in self.limiters:
+                if not limiter._check(amount):
+                    return limiter
+            return None
+        finally:
+            for lock in reversed(self.locks):
+                lock.release()
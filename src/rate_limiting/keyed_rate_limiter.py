@@ -0,0 +1,213 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Hashable, Optional
+
+from src.rate_limiting.timing_wheel import TimingWheel
+
+
+class _KeyEntry:
+    """
+    Per-key bookkeeping: the limiter itself and the timestamps used for eviction
+    """
+    __slots__ = ('limiter', 'last_access_time', 'last_checked_time')
+
+    def __init__(self, limiter: Any, current_time: float):
+        self.limiter = limiter
+        self.last_access_time: float = current_time  # Updated on every lookup, without a lock
+        self.last_checked_time: float = current_time  # Updated when the eviction hand passes over the entry
+
+
+class KeyedRateLimiter:
+    def __init__(self, limiter_factory: Callable[[], Any], max_keys: int = 1_000_000,
+                 idle_ttl: Optional[float] = None, max_eviction_steps: int = 8,
+                 clock: Optional[Callable[[], float]] = None, wheel_tick: Optional[float] = None):
+        """
+        Initialize a registry of rate limiters, one per key (API key, client IP, ...)
+
+        Limiters are created on first use. Lookups of known keys do not take a lock; the lock is only taken
+        to insert a new key or evict old ones. Once max_keys is reached, keys are evicted with the CLOCK
+        (second chance) approximation of LRU: keys used since the eviction hand last passed get another
+        round, idle keys are dropped.
+
+        With wheel_tick set, keys are also dropped once they expire, tracked by a TimingWheel: idle_ttl seconds after
+        their last use if idle_ttl is set, otherwise once their limiter reports, through its expiry_time method, that
+        it holds no state a new limiter would not, e.g. FixedWindowCounter or SlidingWindowCounter after their window
+        ends. Expiring a key then costs O(1) instead of a scan of every key: evict_idle only visits expired keys,
+        and every insertion expires up to max_eviction_steps of them, so memory is released as time passes without
+        a cleanup spike. A key used again is not touched on the lookup path, the wheel checks its expiry again when
+        it comes due.
+
+        :param limiter_factory: zero-argument callable creating the limiter for a new key,
+            e.g. lambda: TokenBucket(capacity=10, fill_rate=1)
+        :param max_keys: maximum number of keys tracked at the same time
+        :param idle_ttl: seconds after which an unused key is evicted, None to evict only when max_keys is reached
+        :param max_eviction_steps: maximum number of second chances given by a single eviction,
+            bounds the work done on the insert path
+        :param clock: zero-argument callable returning the current time in seconds, time.monotonic if omitted,
+            e.g. a VirtualClock to run the limiter in simulated time
+        :param wheel_tick: resolution in seconds of the timing wheel expiring the keys, keys expire up to one tick
+            late, None to expire keys by scanning them in evict_idle. Without idle_ttl, get_limiter raises
+            ValueError on a limiter without an expiry_time method
+        """
+        if max_keys <= 0 or max_eviction_steps <= 0:
+            raise ValueError("max_keys and max_eviction_steps must be positive")
+        if idle_ttl is not None and idle_ttl <= 0:
+            raise ValueError("idle_ttl must be positive")
+
+        self.clock: Callable[[], float] = time.monotonic if clock is None else clock
+        self.limiter_factory: Callable[[], Any] = limiter_factory
+        self.max_keys: int = max_keys
+        self.idle_ttl: Optional[float] = idle_ttl
+        self.max_eviction_steps: int = max_eviction_steps
+        # Expiry times of the keys, None to find idle keys by scanning
+        self.wheel: Optional[TimingWheel] = None if wheel_tick is None else TimingWheel(wheel_tick, clock=self.clock)
+
+        # Keys in eviction order, the head is the next candidate of the eviction hand
+        self.entries: OrderedDict = OrderedDict()
+
+        # Lock guarding insertions and evictions, lookups of existing keys never take it
+        self.lock: Lock = Lock()
+
+    def get_limiter(self, key: Hashable) -> Any:
+        """
+        Get the limiter for a key, creating it if the key is not tracked yet
+
+        :param key: key identifying the client
+        :return: limiter for the key
+        """
+        entry = self.entries.get(key)
+        if entry is not None:
+            entry.last_access_time = self.clock()
+            return entry.limiter
+
+        with self.lock:
+            current_time = self.clock()
+            # Another thread might have created the limiter while we were waiting for the lock
+            entry = self.entries.get(key)
+            if entry is None:
+                limiter = self.limiter_factory()
+                if self.wheel is not None and self.idle_ttl is None and not hasattr(limiter, 'expiry_time'):
+                    raise ValueError("A timing wheel needs idle_ttl, or limiters with an expiry_time method")
+                if self.wheel is None:
+                    self.__evict_idle_head(current_time)
+                else:
+                    self.__expire(current_time, self.max_eviction_steps)
+                if len(self.entries) >= self.max_keys:
+                    self.__evict_one(current_time)
+                entry = _KeyEntry(limiter, current_time)
+                self.entries[key] = entry
+                if self.wheel is not None:
+                    self.wheel.schedule(key, self.__expiry_time(entry))
+            entry.last_access_time = current_time
+            return entry.limiter
+
+    def remove(self, key: Hashable) -> bool:
+        """
+        Stop tracking a key
+
+        :param key: key to remove
+        :return: True, if the key was tracked, False otherwise
+        """
+        with self.lock:
+            if self.wheel is not None:
+                self.wheel.cancel(key)
+            return self.entries.pop(key, None) is not None
+
+    def evict_idle(self) -> int:
+        """
+        Evict every key that has not been used for idle_ttl seconds, or whose limiter expired with a timing wheel.
+        Without a timing wheel this scans all keys, prefer calling it from a background task rather than the
+        request path.
+
+        :return: number of evicted keys
+        """
+        if self.wheel is not None:
+            with self.lock:
+                return self.__expire(self.clock())
+        if self.idle_ttl is None:
+            return 0
+
+        with self.lock:
+            expiry_time = self.clock() - self.idle_ttl
+            idle_keys = [key for key, entry in self.entries.items() if entry.last_access_time <= expiry_time]
+            for key in idle_keys:
+                del self.entries[key]
+            return len(idle_keys)
+
+    def clear(self) -> None:
+        """
+        Stop tracking all keys
+        """
+        with self.lock:
+            self.entries.clear()
+            if self.wheel is not None:
+                self.wheel = TimingWheel(self.wheel.tick, clock=self.clock)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.entries
+
+    def __evict_idle_head(self, current_time: float) -> None:
+        """
+        Evict idle keys waiting at the head of the eviction order, at most max_eviction_steps of them.
+        This method is not thread-safe and should be called within a lock
+        """
+        if self.idle_ttl is None:
+            return
+
+        expiry_time = current_time - self.idle_ttl
+        for _ in range(self.max_eviction_steps):
+            if not self.entries:
+                return
+            key, entry = next(iter(self.entries.items()))
+            if entry.last_access_time > expiry_time:
+                return
+            del self.entries[key]
+
+    def __expire(self, current_time: float, max_expirations: Optional[int] = None) -> int:
+        """
+        Evict the keys the timing wheel reports as expired, at most about max_expirations of them, None for all.
+        Keys used since they were scheduled are scheduled again at their new expiry time.
+        This method is not thread-safe and should be called within a lock
+        """
+        evicted_count = 0
+        for key in self.wheel.advance(max_expirations):
+            entry = self.entries.get(key)
+            if entry is None:
+                continue
+            expiry_time = self.__expiry_time(entry)
+            if expiry_time <= current_time:
+                del self.entries[key]
+                evicted_count += 1
+            else:
+                self.wheel.schedule(key, expiry_time)
+        return evicted_count
+
+    def __expiry_time(self, entry: _KeyEntry) -> float:
+        """
+        Get the time at which a key expires, idle_ttl seconds after its last use, or once its limiter expires
+        """
+        if self.idle_ttl is not None:
+            return entry.last_access_time + self.idle_ttl
+        return entry.limiter.expiry_time()
+
+    def __evict_one(self, current_time: float) -> None:
+        """
+        Evict a single key using the CLOCK approximation of LRU.
+        This method is not thread-safe and should be called within a lock
+        """
+        for _ in range(self.max_eviction_steps):
+            key, entry = next(iter(self.entries.items()))
+            if entry.last_access_time <= entry.last_checked_time:
+                # Not used since the hand last passed over it
+                break
+            # Used recently, give it a second chance
+            entry.last_checked_time = current_time
+            self.entries.move_to_end(key)
+        # Either an unused key was found or we ran out of steps, evict the current head
+        key, _ = self.entries.popitem(last=False)
+        if self.wheel is not None:
+            self.wheel.cancel(key)
@@ -1,26 +1,38 @@
+import math
 import time
-from threading import Lock
+from threading import Condition, Lock
+from typing import Callable, Optional
+
+from src.rate_limiting.metrics import RateLimiterMetrics, count_decision
 
 
 class LeakyBucket:
-    def __init__(self, capacity: int, leak_rate: float):
+    def __init__(self, capacity: int, leak_rate: float, clock: Optional[Callable[[], float]] = None,
+                 metrics: Optional[RateLimiterMetrics] = None):
         """
         Initialize the leaky bucket.
 
         :param capacity: Maximum number of requests that can be processed.
         :param leak_rate: Number of tokens that leak per unit of time.
+        :param clock: zero-argument callable returning the current time in seconds, time.monotonic if omitted,
+            e.g. a VirtualClock to run the limiter in simulated time
+        :param metrics: metrics the decisions are counted and timed in, None to skip instrumentation
         """
         if capacity <= 0 or leak_rate <= 0:
             raise ValueError("Capacity or leak rate should be positive")
 
+        self.clock: Callable[[], float] = time.monotonic if clock is None else clock
+        self.metrics: Optional[RateLimiterMetrics] = metrics
         self.capacity: int = capacity
         self.leak_rate: float = leak_rate
 
         self.tokens: int = 0  # Current number of tokens in the bucket
-        self.last_leak_time: float = time.monotonic()  # Last time we checked the bucket
+        self.last_leak_time: float = self.clock()  # Last time we checked the bucket
 
         # Lock for thread safety
         self.lock: Lock = Lock()
+        # Condition on the same lock, threads waiting for room in the bucket park on it
+        self.condition: Condition = Condition(self.lock)
 
     def get_available_tokens(self) -> int:
         """
@@ -42,23 +54,123 @@ class LeakyBucket:
         if amount < 0:
             raise ValueError("Cannot add negative tokens")
 
+        metrics = self.metrics
+        if metrics is None:
+            with self.lock:
+                return self.__add_tokens(amount)
+        if metrics.sample_countdown <= 0:
+            return metrics.timed_decision(self.lock, self.__add_tokens, amount)
+        # Untimed decision counted inline, see RateLimiterMetrics
+        metrics.sample_countdown -= 1
+        lock = self.lock
+        if not lock.acquire(False):
+            metrics.wait_for_lock(lock)
+        try:
+            allowed = self.__add_tokens(amount)
+            if allowed:
+                metrics.allowed += 1
+            else:
+                metrics.denied += 1
+        finally:
+            lock.release()
+        return allowed
+
+    def acquire(self, amount: int = 1, timeout: Optional[float] = None) -> bool:
+        """
+        Add tokens to the bucket, waiting for them to fit if needed.
+
+        :param amount: amount of tokens to be added (number of incoming requests).
+        :param timeout: maximum number of seconds to wait, None to wait as long as needed.
+        :return: True, if tokens were added, False if they cannot fit before the timeout.
+        """
+        if amount < 0:
+            raise ValueError("Cannot add negative tokens")
+        if amount > self.capacity:
+            raise ValueError("Cannot add more tokens than the capacity")
+
+        deadline = None if timeout is None else self.clock() + timeout
+        with self.condition:
+            while True:
+                self.__leak()  # First, leak tokens based on the time passed
+                if self.tokens + amount <= self.capacity:
+                    self.tokens += amount
+                    return count_decision(self.metrics, True)
+
+                wait_time = self.__time_until_available(amount)
+                if deadline is not None and deadline - self.clock() < wait_time:
+                    return count_decision(self.metrics, False)  # No point in waiting, the tokens will not fit in time
+                self.condition.wait(wait_time)
+
+    def time_until_available(self, amount: int) -> float:
+        """
+        Get the time until enough tokens have leaked for the amount to fit in the bucket
+
+        :param amount: amount of tokens to be added (number of incoming requests).
+        :return: seconds to wait, 0 if the amount fits now, infinity if it exceeds the capacity.
+        """
+        if amount < 0:
+            raise ValueError("Cannot add negative tokens")
+
         with self.lock:
             self.__leak()  # First, leak tokens based on the time passed
+            return self.__time_until_available(amount)
 
-            if self.tokens + amount <= self.capacity:
-                self.tokens += amount
-                return True
+    def __add_tokens(self, amount: int) -> bool:
+        """
+        Add tokens to the bucket if there is room for all of them
+        This method is not thread-safe and should be called within a lock
+        """
+        self.__leak()  # First, leak tokens based on the time passed
+
+        if self.tokens + amount <= self.capacity:
+            self.tokens += amount
+            return True
+
+        return False  # We are not allowing partial addition of tokens
+
+    def _check(self, amount: int) -> bool:
+        """
+        Check if tokens can be added now, without adding them, the first phase of a HierarchicalRateLimiter decision
+        This method is not thread-safe and should be called within a lock
+        """
+        self.__leak()
+        return self.tokens + amount <= self.capacity
+
+    def _commit(self, amount: int) -> None:
+        """
+        Add tokens that _check accepted, the second phase of a HierarchicalRateLimiter decision
+        This method is not thread-safe and should be called within a lock
+        """
+        self.tokens += amount
+
+    def __time_until_available(self, amount: int) -> float:
+        """
+        Compute the time until the amount fits in the bucket, from the leak rate
+        This method is not thread-safe and should be called within a lock
+        """
+        if self.tokens + amount <= self.capacity:
+            return 0.0
+        if amount > self.capacity:
+            return math.inf
 
-            return False  # We are not allowing partial addition of tokens
+        excess_tokens = self.tokens + amount - self.capacity
+        time_since_last_leak = self.clock() - self.last_leak_time
+        return max(0.0, excess_tokens / self.leak_rate - time_since_last_leak)
 
     def __leak(self):
         """
         Simulate the leaking of the bucket based on the elapsed time
         This method is not thread-safe and should be called within a lock
         """
-        current_time = time.monotonic()
+        current_time = self.clock()
         time_elapsed = current_time - self.last_leak_time
-        leaked_tokens = time_elapsed * self.leak_rate  # Number of requests that have been processed
+        leak_rate = self.leak_rate  # Read once, an AIMDController may retune it meanwhile
+        leaked_tokens = int(time_elapsed * leak_rate)  # Number of requests that have been processed
 
-        self.tokens = max(0, round(self.tokens - leaked_tokens))
-        self.last_leak_time = current_time
+        if leaked_tokens >= self.tokens:
+            self.tokens = 0
+            self.last_leak_time = current_time  # An empty bucket does not bank time
+        elif leaked_tokens > 0:
+            # Only whole tokens leak, the fraction of the next one is kept
+            self.tokens -= leaked_tokens
+            self.last_leak_time += leaked_tokens / leak_rate
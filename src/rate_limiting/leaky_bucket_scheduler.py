@@ -0,0 +1,319 @@
+import asyncio
+import time
+import traceback
+from collections import deque
+from concurrent.futures import Executor, Future
+from threading import Condition, Lock, Thread
+from typing import Any, Callable, Optional
+
+
+class LeakyBucketScheduler:
+    def __init__(self, capacity: int, leak_rate: float, tick: float = 0.001, executor: Optional[Executor] = None,
+                 error_handler: Optional[Callable[[BaseException], Any]] = None):
+        """
+        Initialize a leaky bucket that queues work and drains it at leak_rate, on a worker thread
+
+        Where LeakyBucket only meters requests, the scheduler holds the work itself: submitted callables wait in a
+        bounded queue, the bucket, and leave it at leak_rate, smoothing bursts for a downstream service that cannot
+        absorb them. The n-th item of a busy period is due n / leak_rate seconds after the period started, so
+        the rate does not drift however long the queue stays busy, and an idle scheduler does not bank time.
+        Sleeping until every single due time would cap the rate at a few thousand items per second, so the worker
+        wakes up at most once per tick and releases every item due by then: items leave in batches of
+        leak_rate * tick items at most, each no later than its due time plus a tick. A worker held up, e.g. by a
+        slow item, catches up in one batch, so the rate holds on average.
+        A Future costs a few microseconds to create and resolve, about as much as the rest of an item, so add
+        queues work without one and is the way to sustain 100k+ items per second.
+
+        :param capacity: maximum number of queued items, submissions beyond it are rejected
+        :param leak_rate: number of items released per second
+        :param tick: shortest time in seconds the worker sleeps between two batches
+        :param executor: executor the released items run on, None to run them on the worker thread, in which
+            case slow items delay the next ones
+        :param error_handler: callable receiving the exceptions raised by the items queued with add, None to print
+            them to stderr, as an uncaught exception of a thread would be
+        """
+        if capacity <= 0 or leak_rate <= 0:
+            raise ValueError("Capacity or leak rate should be positive")
+        if tick <= 0:
+            raise ValueError("Tick should be positive")
+
+        self.capacity: int = capacity
+        self.leak_rate: float = leak_rate
+        self.tick: float = tick
+        self.executor: Optional[Executor] = executor
+        self.error_handler: Optional[Callable[[BaseException], Any]] = error_handler
+
+        self.queue: deque = deque()  # (future, callable, args, kwargs) of the queued items, in submission order
+        self.period_start_time: float = time.monotonic()  # Start of the current busy period
+        self.released_count: int = 0  # Items released since the start of the busy period
+        self.shutting_down: bool = False
+
+        self.lock: Lock = Lock()
+        # Condition on the same lock, the idle worker parks on it until an item is queued
+        self.condition: Condition = Condition(self.lock)
+        self.worker: Thread = Thread(target=self.__drain, name='leaky-bucket-scheduler', daemon=True)
+        self.worker.start()
+
+    def add(self, fn: Callable, *args, **kwargs) -> bool:
+        """
+        Queue a call of fn(*args, **kwargs), run once its turn to leave the bucket comes, without tracking its result
+
+        :param fn: callable to run
+        :return: True, if the call was queued, False if the queue is full
+        """
+        return self.__enqueue(None, fn, args, kwargs)
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Optional[Future]:
+        """
+        Queue a call of fn(*args, **kwargs), run once its turn to leave the bucket comes
+
+        :param fn: callable to run
+        :return: future of the result of the call, None if the queue is full
+        """
+        future = Future()
+        return future if self.__enqueue(future, fn, args, kwargs) else None
+
+    def get_queue_length(self) -> int:
+        """
+        Get the number of queued items, not released yet
+
+        :return: queued items
+        """
+        with self.lock:
+            return len(self.queue)
+
+    def shutdown(self, wait: bool = True, cancel_pending: bool = False) -> None:
+        """
+        Stop accepting work, the queued items still leave at leak_rate unless they are cancelled
+
+        :param wait: wait for the worker to release every queued item
+        :param cancel_pending: cancel the queued items instead of running them
+        """
+        with self.lock:
+            self.shutting_down = True
+            if cancel_pending:
+                for future, _, _, _ in self.queue:
+                    if future is not None:
+                        future.cancel()
+                self.queue.clear()
+            self.condition.notify()
+        if wait:
+            self.worker.join()
+
+    def __enter__(self) -> 'LeakyBucketScheduler':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.shutdown(wait=True)
+
+    def __enqueue(self, future: Optional[Future], fn: Callable, args: tuple, kwargs: dict) -> bool:
+        """
+        Queue an item if the queue has room for it
+        """
+        with self.lock:
+            if self.shutting_down:
+                raise RuntimeError("Cannot submit work after shutdown")
+            if len(self.queue) >= self.capacity:
+                return False
+
+            if not self.queue:
+                self.__start_period_if_idle(time.monotonic())
+                self.condition.notify()
+            self.queue.append((future, fn, args, kwargs))
+            return True
+
+    def __drain(self) -> None:
+        """
+        Release the due items in batches, once per tick at most, until shutdown
+        """
+        wait_time = 0.0
+        while True:
+            with self.lock:
+                if wait_time > 0:
+                    # Cut short by a submission to an empty queue or by shutdown, at most once per submission
+                    self.condition.wait(wait_time)
+                while not self.queue:
+                    if self.shutting_down:
+                        return
+                    self.condition.wait()
+
+                current_time = time.monotonic()
+                due_count = int((current_time - self.period_start_time) * self.leak_rate) - self.released_count + 1
+                batch = [self.queue.popleft() for _ in range(min(due_count, len(self.queue)))]
+                self.released_count += len(batch)
+                next_due_time = self.period_start_time + self.released_count / self.leak_rate
+
+            for item in batch:
+                if self.executor is None:
+                    self.__run(*item)
+                else:
+                    self.executor.submit(self.__run, *item)
+            wait_time = max(self.tick, next_due_time - time.monotonic())
+
+    def __run(self, future: Optional[Future], fn: Callable, args: tuple, kwargs: dict) -> None:
+        """
+        Run a released call, resolving its future with the result, unless the future was cancelled
+        """
+        if future is None:
+            try:
+                fn(*args, **kwargs)
+            except BaseException as exception:
+                if self.error_handler is None:
+                    traceback.print_exception(exception)
+                else:
+                    self.error_handler(exception)
+            return
+
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as exception:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+
+    def __start_period_if_idle(self, current_time: float) -> None:
+        """
+        Start a new busy period if the last one is over, the next item is then due right away
+        This method is not thread-safe and should be called within a lock
+        """
+        if self.period_start_time + self.released_count / self.leak_rate < current_time:
+            self.period_start_time = current_time
+            self.released_count = 0
+
+
+class AsyncLeakyBucketScheduler:
+    def __init__(self, capacity: int, leak_rate: float, tick: float = 0.001):
+        """
+        Initialize a leaky bucket that queues work and drains it at leak_rate, on the running event loop
+
+        Same schedule as LeakyBucketScheduler: the n-th item of a busy period is due n / leak_rate seconds after
+        the period started, and a drain task wakes up at most once per tick to release the due items. The drain
+        task only runs while items are queued. Released coroutines run as tasks, so the scheduler paces when work
+        starts, not how long it takes.
+
+        :param capacity: maximum number of queued items, submissions beyond it are rejected
+        :param leak_rate: number of items released per second
+        :param tick: shortest time in seconds the drain task sleeps between two batches
+        """
+        if capacity <= 0 or leak_rate <= 0:
+            raise ValueError("Capacity or leak rate should be positive")
+        if tick <= 0:
+            raise ValueError("Tick should be positive")
+
+        self.capacity: int = capacity
+        self.leak_rate: float = leak_rate
+        self.tick: float = tick
+
+        self.queue: deque = deque()  # (future, work, args) of the queued items, in submission order
+        self.period_start_time: float = 0.0  # Start of the current busy period, in event loop time
+        self.released_count: int = 0  # Items released since the start of the busy period
+        self.drain_task: Optional[asyncio.Task] = None
+
+    def submit(self, work: Any, *args) -> Optional[asyncio.Future]:
+        """
+        Queue a coroutine, or a call of work(*args), run once its turn to leave the bucket comes.
+        Must be called from the event loop
+
+        :param work: coroutine, or callable returning a result or a coroutine
+        :return: future of the result of the work, None if the queue is full
+        """
+        if len(self.queue) >= self.capacity:
+            if asyncio.iscoroutine(work):
+                work.close()  # Never run, do not let it warn about not being awaited
+            return None
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if not self.queue:
+            current_time = loop.time()
+            if self.period_start_time + self.released_count / self.leak_rate < current_time:
+                self.period_start_time = current_time
+                self.released_count = 0
+        self.queue.append((future, work, args))
+        if self.drain_task is None or self.drain_task.done():
+            self.drain_task = loop.create_task(self.__drain())
+        return future
+
+    def get_queue_length(self) -> int:
+        """
+        Get the number of queued items, not released yet
+
+        :return: queued items
+        """
+        return len(self.queue)
+
+    async def join(self) -> None:
+        """
+        Wait until every queued item is released
+        """
+        while self.drain_task is not None and not self.drain_task.done():
+            await asyncio.shield(self.drain_task)
+
+    def cancel_pending(self) -> int:
+        """
+        Cancel the queued items
+
+        :return: number of cancelled items
+        """
+        cancelled_count = len(self.queue)
+        for future, work, _ in self.queue:
+            future.cancel()
+            if asyncio.iscoroutine(work):
+                work.close()
+        self.queue.clear()
+        return cancelled_count
+
+    async def __drain(self) -> None:
+        """
+        Release the due items in batches, once per tick at most, until the queue is empty
+        """
+        loop = asyncio.get_running_loop()
+        while self.queue:
+            current_time = loop.time()
+            due_count = int((current_time - self.period_start_time) * self.leak_rate) - self.released_count + 1
+            for _ in range(min(due_count, len(self.queue))):
+                future, work, args = self.queue.popleft()
+                self.released_count += 1
+                self.__release(loop, future, work, args)
+
+            if self.queue:
+                next_due_time = self.period_start_time + self.released_count / self.leak_rate
+                await asyncio.sleep(max(self.tick, next_due_time - loop.time()))
+
+    @staticmethod
+    def __release(loop: asyncio.AbstractEventLoop, future: asyncio.Future, work: Any, args: tuple) -> None:
+        """
+        Start a released item, resolving its future with the result
+        """
+        if future.cancelled():
+            if asyncio.iscoroutine(work):
+                work.close()
+            return
+        try:
+            result = work if asyncio.iscoroutine(work) else work(*args)
+        except BaseException as exception:
+            future.set_exception(exception)
+            return
+        if not asyncio.iscoroutine(result):
+            future.set_result(result)
+            return
+
+        task = loop.create_task(result)
+        task.add_done_callback(lambda done: _resolve(future, done))
+        future.add_done_callback(lambda done: task.cancel() if done.cancelled() else None)
+
+
+def _resolve(future: asyncio.Future, task: asyncio.Task) -> None:
+    """
+    Copy the outcome of a finished task to the future of its item
+    """
+    if future.done():
+        return
+    if task.cancelled():
+        future.cancel()
+    elif task.exception() is not None:
+        future.set_exception(task.exception())
+    else:
+        future.set_result(task.result())
@@ -0,0 +1,219 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Callable, Hashable, Optional
+
+from src.rate_limiting.distributed_rate_limiter import ALGORITHM_LIMITS
+from src.rate_limiting.storage_backend import StorageBackend
+from src.rate_limiting.timing_wheel import TimingWheel
+
+# Algorithms whose quota can be leased, a lease is taken from the same state the DistributedRateLimiter uses
+LEASABLE_ALGORITHMS = ('token_bucket', 'fixed_window_counter')
+EXPIRY_TICK = 0.1  # Resolution in seconds of the timing wheel dropping the leases that ran out
+MAX_EXPIRATIONS = 8  # Leases dropped at most per decision, bounds the work done on the request path
+
+
+class _Lease:
+    __slots__ = ('remaining', 'expiry_time', 'retry_time', 'refilling')
+
+    def __init__(self):
+        self.remaining: int = 0
+        self.expiry_time: float = 0.0
+        self.retry_time: float = 0.0  # No lease is taken before this time, the backend is out of quota until then
+        self.refilling: bool = False
+
+
+class LeasedRateLimiter:
+    def __init__(self, backend: StorageBackend, algorithm: str, lease_size: int, refill_threshold: Optional[int] = None,
+                 lease_ttl: float = 1.0, key_prefix: str = 'rate_limit', clock: Optional[Callable[[], float]] = None,
+                 **limits: float):
+        """
+        Initialize a distributed rate limiter that answers decisions from a local lease of the global quota
+
+        Instead of one round-trip per decision, a node takes up to lease_size tokens or requests from the backend
+        at once and spends them locally. When a lease of a key runs below refill_threshold, the next one is taken
+        in the background, so most decisions never wait for the backend.
+
+        Leased quota is taken out of the global state right away, so the nodes never admit more than the backend
+        grants, but they spend it later than the backend handed it out:
+        - token_bucket: a lease is dropped lease_ttl seconds after it was taken, so a burst can exceed the
+          capacity by about lease_size + refill_threshold tokens per node
+        - fixed_window_counter: a lease is dropped at the end of the window it was taken in, so a window never
+          admits more than max_allowed_requests; up to lease_size unused requests per node are lost instead
+        Smaller leases trade round-trips for a tighter limit.
+
+        When the backend grants less than it was asked for, the key is out of quota: the partial grant is spent
+        locally and no other lease is taken until the backend may cover a request again, after refilling one token
+        for the token bucket or at the end of the window for the fixed window, so an overloaded key is denied
+        without a round-trip per request. Leases that ran out are dropped as they expire, tracked by a TimingWheel,
+        so keys that stop sending requests do not pile up.
+
+        :param backend: storage backend holding the state, e.g. RedisStorageBackend
+        :param algorithm: token_bucket or fixed_window_counter
+        :param lease_size: tokens or requests taken from the backend at once
+        :param refill_threshold: remaining quota of a lease below which the next lease is taken in the background,
+            a quarter of lease_size if omitted
+        :param lease_ttl: seconds after which unused tokens of a token bucket lease are dropped
+        :param key_prefix: prefix of the keys holding the state in the backend
+        :param clock: zero-argument callable returning the current time in seconds, time.monotonic if omitted, the
+            leases are timed with it, the backend keeps its own clock
+        :param limits: limits of the algorithm, named as in the local classes, e.g. capacity and fill_rate
+        """
+        if algorithm not in LEASABLE_ALGORITHMS:
+            raise ValueError(f"Unknown algorithm {algorithm}, expected one of {', '.join(LEASABLE_ALGORITHMS)}")
+        if set(limits) != set(ALGORITHM_LIMITS[algorithm]):
+            raise ValueError(f"{algorithm} takes the limits {', '.join(ALGORITHM_LIMITS[algorithm])}")
+        if any(value <= 0 for value in limits.values()):
+            raise ValueError("Limits must be positive")
+        if lease_size <= 0:
+            raise ValueError("Lease size must be positive")
+        refill_threshold = lease_size // 4 if refill_threshold is None else refill_threshold
+        if not 0 <= refill_threshold <= lease_size:
+            raise ValueError("Refill threshold must be between 0 and the lease size")
+        if lease_ttl <= 0:
+            raise ValueError("Lease TTL must be positive")
+
+        self.backend: StorageBackend = backend
+        self.algorithm: str = algorithm
+        self.lease_size: int = lease_size
+        self.refill_threshold: int = refill_threshold
+        self.lease_ttl: float = lease_ttl
+        self.key_prefix: str = key_prefix
+        self.limits: tuple = tuple(limits[name] for name in ALGORITHM_LIMITS[algorithm])
+        self.leases: dict[Hashable, _Lease] = {}
+        self.clock: Callable[[], float] = time.monotonic if clock is None else clock
+        # Time after which the lease of a key can be dropped
+        self.wheel: TimingWheel = TimingWheel(EXPIRY_TICK, clock=self.clock)
+        self.lock: Lock = Lock()
+        # Thread taking the leases in the background, created with the first refill: a limiter whose leases never
+        # run low holds no thread
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.closed: bool = False  # No background refill is started once closed
+
+    def allow_request(self, key: Hashable, cost: int = 1) -> bool:
+        """
+        Determines if a request of a key is allowed, from the local lease if it covers the cost,
+        with one round-trip otherwise, unless the backend ran out of quota for the key since
+
+        :param key: key identifying the client
+        :param cost: cost of the request, tokens for the token bucket and requests for the fixed window
+        :return: True, if the request is allowed, False otherwise
+        """
+        if cost < 0:
+            raise ValueError("Cost cannot be negative")
+
+        with self.lock:
+            now = self.clock()
+            self.__expire(now)
+            lease = self.leases.get(key)
+            if lease is None:
+                lease = self.leases[key] = _Lease()
+                self.wheel.schedule(key, now)
+            if self.__spend(key, lease, cost, now):
+                return True
+            if now < lease.retry_time:
+                return False
+
+        # The lease cannot cover the request, take the next one right away
+        requested = max(self.lease_size, cost)
+        granted, expiry_time = self.__take_lease(key, requested)
+        with self.lock:
+            now = self.clock()
+            # The lease may have been dropped meanwhile, and another one created
+            lease = self.leases.setdefault(key, lease)
+            self.__merge(key, lease, granted, expiry_time, now)
+            if granted < requested:
+                self.__back_off(key, lease, max(1, cost - lease.remaining), expiry_time, now)
+            return self.__spend(key, lease, cost, now)
+
+    def remaining(self, key: Hashable) -> int:
+        """
+        Returns the quota of the local lease of a key that can still be spent
+
+        :param key: key identifying the client
+        :return: unexpired tokens or requests of the lease
+        """
+        with self.lock:
+            lease = self.leases.get(key)
+            if lease is None or lease.expiry_time <= self.clock():
+                return 0
+            return lease.remaining
+
+    def close(self):
+        """Stops the background refills, waiting for the ones in flight. Leases are then only taken on demand."""
+        with self.lock:
+            self.closed = True
+            executor = self.executor
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def __spend(self, key: Hashable, lease: _Lease, cost: int, now: float) -> bool:
+        if lease.expiry_time <= now:
+            lease.remaining = 0
+        if lease.remaining < cost:
+            return False
+        lease.remaining -= cost
+        if (lease.remaining < self.refill_threshold and not lease.refilling and now >= lease.retry_time
+                and not self.closed):
+            lease.refilling = True
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='lease-refill')
+            self.executor.submit(self.__refill, key, lease)
+        return True
+
+    def __merge(self, key: Hashable, lease: _Lease, granted: int, expiry_time: float, now: float):
+        if lease.expiry_time <= now:
+            lease.remaining = 0
+        lease.remaining += granted
+        lease.expiry_time = max(lease.expiry_time, expiry_time)
+        self.wheel.schedule(key, max(lease.expiry_time, lease.retry_time))
+
+    def __back_off(self, key: Hashable, lease: _Lease, missing: int, expiry_time: float, now: float):
+        """
+        Take no other lease of a key until the backend may grant the missing quota: a token bucket refills it at
+        fill_rate, a fixed window only starts over with the next window, when the lease expires.
+        This method is not thread-safe and should be called within a lock
+        """
+        if self.algorithm == 'token_bucket':
+            lease.retry_time = now + missing / self.limits[1]
+        else:
+            lease.retry_time = expiry_time
+        self.wheel.schedule(key, max(lease.expiry_time, lease.retry_time))
+
+    def __expire(self, now: float):
+        """
+        Drop up to MAX_EXPIRATIONS leases that ran out and hold no backoff, leases still in use are scheduled again.
+        This method is not thread-safe and should be called within a lock
+        """
+        for key in self.wheel.advance(MAX_EXPIRATIONS):
+            lease = self.leases.get(key)
+            if lease is None:
+                continue
+            end_time = max(lease.expiry_time, lease.retry_time)
+            if end_time > now or lease.refilling:
+                self.wheel.schedule(key, max(end_time, now + EXPIRY_TICK))
+            else:
+                del self.leases[key]
+
+    def __refill(self, key: Hashable, lease: _Lease):
+        try:
+            granted, expiry_time = self.__take_lease(key, self.lease_size)
+            with self.lock:
+                now = self.clock()
+                self.__merge(key, lease, granted, expiry_time, now)
+                if granted < self.lease_size:
+                    self.__back_off(key, lease, 1, expiry_time, now)
+        finally:
+            with self.lock:
+                lease.refilling = False
+
+    def __take_lease(self, key: Hashable, amount: int) -> tuple[int, float]:
+        requested_time = self.clock()
+        granted, expires_in_ms = self.backend.evaluate(f"{self.algorithm}_lease", self.__state_key(key),
+                                                       [*self.limits, amount, ''])
+        lease_ttl = self.lease_ttl if int(expires_in_ms) < 0 else int(expires_in_ms) / 1000
+        # Time the lease from before the round-trip, so that it never outlives the backend's window
+        return int(granted), requested_time + lease_ttl
+
+    def __state_key(self, key: Hashable) -> str:
+        return f"{self.key_prefix}:{self.algorithm}:{key}"
@@ -0,0 +1,253 @@
+import itertools
+import time
+from bisect import bisect_left
+from threading import Lock
+from typing import Callable, Iterable, Optional
+
+# Upper bounds of the histogram buckets in nanoseconds, from 100 ns to 100 ms, plus an implicit +Inf bucket
+DEFAULT_BUCKETS_NS = (100, 250, 500, 1_000, 2_500, 5_000, 10_000, 25_000, 50_000, 100_000, 250_000, 500_000,
+                      1_000_000, 10_000_000, 100_000_000)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+OPENMETRICS_CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+NANOSECONDS_PER_SECOND = 1_000_000_000
+
+# (snapshot key, metric family, help text) of the exported histograms
+HISTOGRAM_FAMILIES = (
+    ('lock_wait', 'rate_limiter_lock_wait_seconds',
+     "Time spent waiting for a limiter lock held by another thread, contended acquisitions only."),
+    ('decision_latency', 'rate_limiter_decision_seconds',
+     "Latency of a decision, lock wait included, sampled decisions only."),
+)
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram of durations in nanoseconds.
+    This class is not thread-safe, RateLimiterMetrics updates it within its lock
+    """
+
+    def __init__(self, bounds_ns: tuple[int, ...] = DEFAULT_BUCKETS_NS):
+        """
+        :param bounds_ns: increasing upper bounds of the buckets in nanoseconds
+        """
+        if not bounds_ns or any(lower >= upper for lower, upper in zip(bounds_ns, bounds_ns[1:])):
+            raise ValueError("Bucket bounds must be a non-empty increasing sequence")
+        self.bounds_ns: tuple[int, ...] = tuple(bounds_ns)
+        self.bucket_counts: list[int] = [0] * (len(bounds_ns) + 1)  # The last bucket is +Inf
+        self.sum_ns: int = 0
+
+    def observe(self, duration_ns: int) -> None:
+        self.bucket_counts[bisect_left(self.bounds_ns, duration_ns)] += 1
+        self.sum_ns += duration_ns
+
+    def snapshot(self) -> dict:
+        """
+        Get the cumulative bucket counts, as exported to Prometheus
+
+        :return: dictionary with the (upper bound in seconds, cumulative count) of every bucket,
+            the number of observations and their sum in seconds
+        """
+        cumulative_counts = list(itertools.accumulate(self.bucket_counts))
+        bounds = [bound / NANOSECONDS_PER_SECOND for bound in self.bounds_ns] + [float('inf')]
+        return {
+            'buckets': list(zip(bounds, cumulative_counts)),
+            'count': cumulative_counts[-1],
+            'sum': self.sum_ns / NANOSECONDS_PER_SECOND,
+        }
+
+
+class RateLimiterMetrics:
+    def __init__(self, name: str = 'default', sample_every: int = 64,
+                 buckets_ns: tuple[int, ...] = DEFAULT_BUCKETS_NS):
+        """
+        Initialize the metrics of a rate limiter, passed as the metrics of one or more limiters
+
+        Allowed and denied requests are counted on plain ints, incremented by the limiters within their lock, so
+        counting takes no lock of its own. A metrics object can be shared by many limiters, e.g. every limiter of
+        a KeyedRateLimiter: an increment is a single in-place addition, which no other thread interleaves with
+        under the GIL. Reading a snapshot never takes a limiter lock and does not slow down decisions.
+        Timing every decision would cost more than the decision itself, so only one decision in sample_every
+        is timed for the decision latency histogram, through timed_decision; the limiters count the others
+        inline, a method call would cost more than 5% of a decision. The lock wait histogram records every
+        acquisition that found the limiter lock taken, uncontended acquisitions do not wait and are not timed.
+
+        :param name: value of the limiter label of the exported metrics
+        :param sample_every: one decision in sample_every goes to the decision latency histogram
+        :param buckets_ns: increasing upper bounds of the histogram buckets in nanoseconds
+        """
+        if sample_every <= 0:
+            raise ValueError("sample_every must be positive")
+
+        self.name: str = name
+        self.sample_every: int = sample_every
+        # Untimed decisions left before the next timed one, updated without a lock: a race only shifts the sampling
+        self.sample_countdown: int = sample_every - 1
+
+        # Decisions so far, incremented within the lock of the limiter that made them
+        self.allowed: int = 0
+        self.denied: int = 0
+        self.lock_wait: Histogram = Histogram(buckets_ns)
+        self.decision_latency: Histogram = Histogram(buckets_ns)
+
+        # Lock guarding the histograms, only taken by contended and sampled decisions
+        self.lock: Lock = Lock()
+
+    def wait_for_lock(self, lock: Lock) -> None:
+        """
+        Acquire a limiter lock that is taken by another thread, recording the wait
+        """
+        start_time = time.perf_counter_ns()
+        lock.acquire()
+        wait_time = time.perf_counter_ns() - start_time
+        with self.lock:
+            self.lock_wait.observe(wait_time)
+
+    def timed_decision(self, lock: Lock, decision: Callable[[int], bool], cost: int) -> bool:
+        """
+        Make a decision within a limiter lock and count it, recording its latency, the lock wait included
+
+        :param lock: lock of the limiter
+        :param decision: decision of the limiter, not thread-safe, e.g. its private allow request method
+        :param cost: cost of the request, the argument of the decision
+        :return: the decision
+        """
+        self.sample_countdown = self.sample_every - 1
+        start_time = time.perf_counter_ns()
+        if not lock.acquire(False):
+            self.wait_for_lock(lock)
+        try:
+            allowed = decision(cost)
+            if allowed:
+                self.allowed += 1
+            else:
+                self.denied += 1
+        finally:
+            lock.release()
+        latency = time.perf_counter_ns() - start_time
+
+        with self.lock:
+            self.decision_latency.observe(latency)
+        return allowed
+
+    def snapshot(self) -> dict:
+        """
+        Get the current metrics, without taking any limiter lock
+
+        :return: dictionary with the name, the allowed and denied requests, and the lock wait and decision latency
+            histograms
+        """
+        allowed, denied = self.allowed, self.denied
+        with self.lock:
+            return {
+                'name': self.name,
+                'allowed': allowed,
+                'denied': denied,
+                'lock_wait': self.lock_wait.snapshot(),
+                'decision_latency': self.decision_latency.snapshot(),
+            }
+
+
+def count_decision(metrics: Optional[RateLimiterMetrics], allowed: bool) -> bool:
+    """
+    Count the outcome of a decision made outside timed_decision, e.g. by acquire, if the limiter has metrics.
+    This function is not thread-safe and should be called within the lock of the limiter
+
+    :param metrics: metrics of the limiter, None to skip instrumentation
+    :param allowed: outcome of the decision
+    :return: the outcome, so that acquire can return count_decision(self.metrics, True)
+    """
+    if metrics is not None:
+        if allowed:
+            metrics.allowed += 1
+        else:
+            metrics.denied += 1
+    return allowed
+
+
+def to_prometheus(metrics: Iterable[RateLimiterMetrics]) -> str:
+    """
+    Export metrics in the Prometheus text format, served with PROMETHEUS_CONTENT_TYPE.
+    Metrics with the same name are added up
+
+    :param metrics: metrics of the limiters
+    :return: exposition text
+    """
+    return _export(metrics, openmetrics=False)
+
+
+def to_openmetrics(metrics: Iterable[RateLimiterMetrics]) -> str:
+    """
+    Export metrics in the OpenMetrics text format, served with OPENMETRICS_CONTENT_TYPE.
+    Metrics with the same name are added up
+
+    :param metrics: metrics of the limiters
+    :return: exposition text
+    """
+    return _export(metrics, openmetrics=True)
+
+
+def _export(metrics: Iterable[RateLimiterMetrics], openmetrics: bool) -> str:
+    """
+    Render the snapshots of metrics in either text format, the two only differ in their metadata lines
+    """
+    snapshots = _merge_snapshots(limiter_metrics.snapshot() for limiter_metrics in metrics)
+    lines = []
+
+    family = 'rate_limiter_decisions' if openmetrics else 'rate_limiter_decisions_total'
+    lines.append(f"# HELP {family} Rate limiting decisions, by result.")
+    lines.append(f"# TYPE {family} counter")
+    for snapshot in snapshots:
+        limiter = _escape_label_value(snapshot['name'])
+        for result in ('allowed', 'denied'):
+            lines.append(f'rate_limiter_decisions_total{{limiter="{limiter}",result="{result}"}} {snapshot[result]}')
+
+    for key, family, description in HISTOGRAM_FAMILIES:
+        lines.append(f"# HELP {family} {description}")
+        lines.append(f"# TYPE {family} histogram")
+        if openmetrics:
+            lines.append(f"# UNIT {family} seconds")
+        for snapshot in snapshots:
+            limiter = _escape_label_value(snapshot['name'])
+            histogram = snapshot[key]
+            for bound, count in histogram['buckets']:
+                lines.append(f'{family}_bucket{{limiter="{limiter}",le="{_format_bound(bound)}"}} {count}')
+            lines.append(f'{family}_sum{{limiter="{limiter}"}} {histogram["sum"]!r}')
+            lines.append(f'{family}_count{{limiter="{limiter}"}} {histogram["count"]}')
+
+    if openmetrics:
+        lines.append('# EOF')
+    return '\n'.join(lines) + '\n'
+
+
+def _merge_snapshots(snapshots: Iterable[dict]) -> list[dict]:
+    """
+    Add up the snapshots with the same name, a series cannot appear twice in an exposition
+    """
+    merged = {}
+    for snapshot in snapshots:
+        total = merged.get(snapshot['name'])
+        if total is None:
+            merged[snapshot['name']] = snapshot
+            continue
+        total['allowed'] += snapshot['allowed']
+        total['denied'] += snapshot['denied']
+        for key in ('lock_wait', 'decision_latency'):
+            if [bound for bound, _ in total[key]['buckets']] != [bound for bound, _ in snapshot[key]['buckets']]:
+                raise ValueError(f"Metrics named {snapshot['name']!r} have different histogram buckets")
+            total[key] = {
+                'buckets': [(bound, count + other_count) for (bound, count), (_, other_count)
+                            in zip(total[key]['buckets'], snapshot[key]['buckets'])],
+                'count': total[key]['count'] + snapshot[key]['count'],
+                'sum': total[key]['sum'] + snapshot[key]['sum'],
+            }
+    return list(merged.values())
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_bound(bound: float) -> str:
+    return '+Inf' if bound == float('inf') else repr(bound)
@@ -0,0 +1,93 @@
+from typing import Any, Callable, Hashable, Optional
+
+from src.rate_limiting.keyed_rate_limiter import KeyedRateLimiter
+
+# 2^64 divided by the golden ratio, mixes the hash of a key before it is reduced to a shard (Fibonacci hashing)
+HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+HASH_MASK = (1 << 64) - 1
+
+
+class ShardedKeyedRateLimiter:
+    def __init__(self, limiter_factory: Callable[[], Any], num_shards: int = 64, max_keys: int = 1_000_000,
+                 idle_ttl: Optional[float] = None, max_eviction_steps: int = 8,
+                 clock: Optional[Callable[[], float]] = None, wheel_tick: Optional[float] = None):
+        """
+        Initialize a keyed rate limiter whose keys are spread over lock-striped shards
+
+        Every shard is an independent KeyedRateLimiter with its own lock, so inserting or evicting a key only
+        blocks the keys hashed to the same shard, and unrelated keys never wait on each other.
+        Lookups of known keys take no lock either way: under the GIL, sharding only pays off when keys are
+        created or evicted while the lock is held by work that releases the GIL, e.g. a limiter_factory reading
+        the quota of a tenant from a store, see sharded_keyed_rate_limiter_benchmark. Otherwise the extra hashing
+        makes it slower than a single KeyedRateLimiter.
+
+        :param limiter_factory: zero-argument callable creating the limiter for a new key
+        :param num_shards: number of partitions, each with its own lock
+        :param max_keys: maximum number of keys tracked at the same time, split evenly between the shards
+        :param idle_ttl: seconds after which an unused key is evicted, None to evict only when max_keys is reached
+        :param max_eviction_steps: maximum number of second chances given by a single eviction
+        :param clock: zero-argument callable returning the current time in seconds, shared by the shards,
+            time.monotonic if omitted
+        :param wheel_tick: resolution in seconds of the timing wheels expiring the keys, one per shard, None to
+            expire keys by scanning them in evict_idle
+        """
+        if num_shards <= 0 or max_keys <= 0:
+            raise ValueError("num_shards and max_keys must be positive")
+        if max_keys < num_shards:
+            raise ValueError("max_keys must be at least num_shards")
+
+        self.num_shards: int = num_shards
+        self.max_keys: int = max_keys
+
+        max_keys_per_shard = -(-max_keys // num_shards)  # Ceiling division
+        self.shards: list[KeyedRateLimiter] = [
+            KeyedRateLimiter(limiter_factory, max_keys_per_shard, idle_ttl, max_eviction_steps, clock, wheel_tick)
+            for _ in range(num_shards)
+        ]
+
+    def get_limiter(self, key: Hashable) -> Any:
+        """
+        Get the limiter for a key, creating it if the key is not tracked yet
+
+        :param key: key identifying the client
+        :return: limiter for the key
+        """
+        return self.__shard(key).get_limiter(key)
+
+    def remove(self, key: Hashable) -> bool:
+        """
+        Stop tracking a key
+
+        :param key: key to remove
+        :return: True, if the key was tracked, False otherwise
+        """
+        return self.__shard(key).remove(key)
+
+    def evict_idle(self) -> int:
+        """
+        Evict every key that has not been used for idle_ttl seconds, or whose limiter expired with timing wheels.
+        Shards are swept one after the other, so only one shard is locked at any time.
+
+        :return: number of evicted keys
+        """
+        return sum(shard.evict_idle() for shard in self.shards)
+
+    def clear(self) -> None:
+        """
+        Stop tracking all keys
+        """
+        for shard in self.shards:
+            shard.clear()
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self.shards)
+
+    def __shard(self, key: Hashable) -> KeyedRateLimiter:
+        """
+        Get the shard of a key. The hash of an int is the int itself, so ids sharing a stride with num_shards
+        would crowd into a few shards: the hash is mixed first, and its upper bits pick the shard
+        """
+        return self.shards[(((hash(key) * HASH_MULTIPLIER) & HASH_MASK) >> 32) % self.num_shards]
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.__shard(key)
@@ -0,0 +1,168 @@
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import struct
+import time
+from threading import Lock
+from typing import Any, Optional, Sequence
+
+from src.rate_limiting import backend_algorithms
+from src.rate_limiting.storage_backend import StorageBackend
+
+MAGIC = b'RLSHM001'
+HEADER = struct.Struct('<8sqq')  # Magic, number of stripes, slots per stripe
+DATA_OFFSET = 64  # Records start after the header, on a cache line boundary
+# Record of a key: fingerprint, expiry time, then up to three state fields depending on the algorithm
+RECORD = struct.Struct('<qdddd')
+RECORD_HEAD = struct.Struct('<qd')
+EMPTY_SLOT = 0  # Fingerprint of a slot never used, real fingerprints never take this value
+# Supported algorithms -> number of state fields they keep in a record
+STATE_SIZES = {
+    'token_bucket': 2,
+    'leaky_bucket': 2,
+    'fixed_window_counter': 2,
+    'sliding_window_counter': 3,
+    'gcra': 1,
+    'token_bucket_lease': 2,
+    'fixed_window_counter_lease': 2,
+}
+MAX_PROBES = 32  # Slots probed for a key, bounds the work of a decision on a crowded stripe
+
+
+class SharedMemoryStorageBackend(StorageBackend):
+    def __init__(self, path: str, num_stripes: int = 64, slots_per_stripe: int = 16_384):
+        """
+        Initialize a backend keeping the state of the limiters in a memory-mapped file, shared by every process
+        of a host that opens the same path
+
+        Where every worker of a pre-fork server (gunicorn, uvicorn --workers) would otherwise enforce its own limit,
+        a DistributedRateLimiter or LeasedRateLimiter on this backend enforces one limit per host, without a
+        network store. Decisions run the same functions as InMemoryStorageBackend, from backend_algorithms, against
+        the wall clock, and take no round-trip: the state is read and written in place. A file under /dev/shm lives
+        in memory.
+
+        The file is a fixed size hash table of 40-byte records, split into stripes. A key is hashed to a stripe and
+        probed for within it, and a decision locks its stripe only, with a lock for the threads of the process and
+        an fcntl byte-range lock for the other processes, so decisions on keys of different stripes never wait on
+        each other. Keys are identified by a 64-bit fingerprint of their name, stable across processes; two keys
+        with the same fingerprint share their state. Expired records are reused in place. When none of the slots
+        probed for a new key is free, the record expiring first is overwritten, so that key starts over from a
+        fresh state: size the table for the number of keys alive at the same time.
+        sliding_window_log keeps a variable number of timestamps per key and is not supported.
+
+        :param path: file holding the table, created if missing, e.g. /dev/shm/rate_limits
+        :param num_stripes: number of stripes, each with its own lock
+        :param slots_per_stripe: number of records per stripe
+        """
+        if num_stripes <= 0 or slots_per_stripe <= 0:
+            raise ValueError("num_stripes and slots_per_stripe must be positive")
+
+        super().__init__()
+        self.path: str = path
+        self.num_stripes: int = num_stripes
+        self.slots_per_stripe: int = slots_per_stripe
+        self.max_probes: int = min(MAX_PROBES, slots_per_stripe)
+        size = DATA_OFFSET + num_stripes * slots_per_stripe * RECORD.size
+
+        self.fd: int = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            # Byte 0 of the file guards its creation, byte 1 + i guards stripe i, the ranges are only lock names
+            fcntl.lockf(self.fd, fcntl.LOCK_EX, 1, 0)
+            try:
+                if os.fstat(self.fd).st_size == 0:
+                    os.ftruncate(self.fd, size)  # Zero-filled, every slot is empty
+                    os.pwrite(self.fd, HEADER.pack(MAGIC, num_stripes, slots_per_stripe), 0)
+                elif os.pread(self.fd, HEADER.size, 0) != HEADER.pack(MAGIC, num_stripes, slots_per_stripe):
+                    raise ValueError(f"{path} is not a table of {num_stripes} stripes of {slots_per_stripe} slots")
+            finally:
+                fcntl.lockf(self.fd, fcntl.LOCK_UN, 1, 0)
+            self.memory: mmap.mmap = mmap.mmap(self.fd, size)
+        except BaseException:
+            os.close(self.fd)
+            raise
+
+        # fcntl locks belong to the process, threads of the same process also need a lock of their own
+        self.stripe_locks: list[Lock] = [Lock() for _ in range(num_stripes)]
+
+    def evaluate(self, algorithm: str, key: str, args: Sequence[Any]) -> Any:
+        self._count_round_trip()
+        return self.__run(algorithm, key, args)
+
+    def evaluate_many(self, algorithm: str, calls: Sequence[tuple[str, Sequence[Any]]]) -> list[Any]:
+        self._count_round_trip()
+        return [self.__run(algorithm, key, args) for key, args in calls]
+
+    def close(self) -> None:
+        """
+        Unmap the table, the file and the state it holds stay for the other processes
+        """
+        self.memory.close()
+        os.close(self.fd)
+
+    def unlink(self) -> None:
+        """
+        Delete the file, processes that have it open keep using it until they close it
+        """
+        os.unlink(self.path)
+
+    def __enter__(self) -> 'SharedMemoryStorageBackend':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def __run(self, algorithm: str, key: str, args: Sequence[Any]) -> Any:
+        """
+        Run the decision of an algorithm on the record of a key, within the lock of its stripe
+        """
+        state_size = STATE_SIZES.get(algorithm)
+        if state_size is None:
+            raise ValueError(f"{algorithm} is not supported by the shared memory backend")
+        decide = backend_algorithms.ALGORITHMS[algorithm]
+        first_limit, second_limit, cost = float(args[0]), float(args[1]), int(args[2])
+
+        fingerprint = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little', signed=True)
+        if fingerprint == EMPTY_SLOT:
+            fingerprint = 1
+        unsigned_fingerprint = fingerprint & 0xFFFFFFFFFFFFFFFF
+        stripe = unsigned_fingerprint % self.num_stripes
+        home_slot = unsigned_fingerprint // self.num_stripes % self.slots_per_stripe
+
+        with self.stripe_locks[stripe]:
+            fcntl.lockf(self.fd, fcntl.LOCK_EX, 1, 1 + stripe)
+            try:
+                now = time.time()
+                offset, state = self.__find(fingerprint, stripe, home_slot, now)
+                state = None if state is None else state[:state_size]
+                reply, state, time_to_live = decide(state, now, first_limit, second_limit, cost)
+                expiry_time = now + (math.ceil(time_to_live * 1000) + 1000) / 1000
+                RECORD.pack_into(self.memory, offset, fingerprint, expiry_time, *state, *(0.0,) * (3 - len(state)))
+                return reply
+            finally:
+                fcntl.lockf(self.fd, fcntl.LOCK_UN, 1, 1 + stripe)
+
+    def __find(self, fingerprint: int, stripe: int, home_slot: int, now: float) -> tuple[int, Optional[tuple]]:
+        """
+        Find the record of a fingerprint, or the slot to store it in, and get its state, None if it has none.
+        A slot is free if it is empty or expired; slots never go back to empty, so the search for a fingerprint
+        ends at the first empty slot.
+        This method is not thread-safe and should be called within the lock of the stripe
+        """
+        memory = self.memory
+        stripe_offset = DATA_OFFSET + stripe * self.slots_per_stripe * RECORD.size
+        free_offset, oldest_offset, oldest_expiry_time = -1, -1, math.inf
+        for probe in range(self.max_probes):
+            offset = stripe_offset + (home_slot + probe) % self.slots_per_stripe * RECORD.size
+            slot_fingerprint, expiry_time = RECORD_HEAD.unpack_from(memory, offset)
+            if slot_fingerprint == fingerprint:
+                return offset, RECORD.unpack_from(memory, offset)[2:] if expiry_time > now else None
+            if slot_fingerprint == EMPTY_SLOT:
+                return (offset if free_offset < 0 else free_offset), None
+            if expiry_time <= now and free_offset < 0:
+                free_offset = offset
+            if expiry_time < oldest_expiry_time:
+                oldest_offset, oldest_expiry_time = offset, expiry_time
+        # No free slot left around the home slot, the record expiring first makes room
+        return (oldest_offset if free_offset < 0 else free_offset), None
@@ -1,59 +1,193 @@
+import math
 import time
-from threading import Lock
+from threading import Condition, Lock
+from typing import Callable, Optional
+
+from src.rate_limiting.metrics import RateLimiterMetrics, count_decision
 
 
 class SlidingWindowCounter:
-    def __init__(self, max_allowed_requests: int, window_size: float):
+    def __init__(self, max_allowed_requests: int, window_size: float, clock: Optional[Callable[[], float]] = None,
+                 metrics: Optional[RateLimiterMetrics] = None):
         """
         Initializes Sliding Window Counter
 
         :param max_allowed_requests: number of allowed requests in a window
         :param window_size: size of the window
+        :param clock: zero-argument callable returning the current time in seconds, time.monotonic if omitted,
+            e.g. a VirtualClock to run the limiter in simulated time
+        :param metrics: metrics the decisions are counted and timed in, None to skip instrumentation
         """
         if max_allowed_requests <= 0 or window_size <= 0:
             raise ValueError("Max allowed requests and window size should be positive")
 
+        self.clock: Callable[[], float] = time.monotonic if clock is None else clock
+        self.metrics: Optional[RateLimiterMetrics] = metrics
         self.max_allowed_requests: int = max_allowed_requests
         self.window_size: float = window_size
 
-        self.current_window: int = int(time.monotonic() // window_size)  # Current window identifier
+        self.current_window: int = int(self.clock() // window_size)  # Current window identifier
         self.current_request_count: int = 0  # Request count in the current window
         self.previous_request_count: int = 0  # Request count in the previous window
 
         self.lock: Lock = Lock()
+        self.condition: Condition = Condition(self.lock)  # Threads waiting for the next window park on it
 
-    def allow_request(self) -> bool:
+    def allow_request(self, cost: int = 1) -> bool:
         """
         Determines if a request is allowed in the current window
+        :param cost: weight of the request, the number of requests it counts as in the window
         :return: True, if the request is allowed, False otherwise
         """
-        with self.lock:
-            current_time = time.monotonic()
-            current_window = int(current_time // self.window_size)
+        if cost < 0:
+            raise ValueError("Cannot admit a negative cost")
 
-            if current_window == self.current_window:
-                # Same window, check if the request is allowed
-                if self.current_request_count < self.max_allowed_requests:
-                    self.current_request_count += 1
-                    return True
-                return False
+        metrics = self.metrics
+        if metrics is None:
+            with self.lock:
+                return self.__allow_request(cost)
+        if metrics.sample_countdown <= 0:
+            return metrics.timed_decision(self.lock, self.__allow_request, cost)
+        # Untimed decision counted inline, see RateLimiterMetrics
+        metrics.sample_countdown -= 1
+        lock = self.lock
+        if not lock.acquire(False):
+            metrics.wait_for_lock(lock)
+        try:
+            allowed = self.__allow_request(cost)
+            if allowed:
+                metrics.allowed += 1
             else:
-                # Next window, shift counters
-                time_elapsed_in_current_window = (current_time % self.window_size) / self.window_size
-                previous_window_weight = 1 - time_elapsed_in_current_window
-
-                # Sliding window effect: weighted combination of current and previous window counts
-                allowed_count = (
-                        self.current_request_count * (1 - previous_window_weight) +
-                        self.previous_request_count * previous_window_weight
-                )
-
-                if allowed_count < self.max_allowed_requests:
-                    self.previous_request_count = self.current_request_count
-                    self.current_window = current_window
-                    self.current_request_count = 1  # First request in new window
-                    return True
-                return False
+                metrics.denied += 1
+        finally:
+            lock.release()
+        return allowed
+
+    def acquire(self, cost: int = 1, timeout: Optional[float] = None) -> bool:
+        """
+        Admit a request, waiting for the window to slide if needed
+
+        :param cost: weight of the request, the number of requests it counts as in the window
+        :param timeout: maximum number of seconds to wait, None to wait as long as needed
+        :return: True, if the request is allowed, False if it cannot be allowed before the timeout
+        """
+        if cost < 0:
+            raise ValueError("Cannot admit a negative cost")
+        if cost > self.max_allowed_requests:
+            raise ValueError("Cannot admit a cost above the maximum allowed requests")
+
+        deadline = None if timeout is None else self.clock() + timeout
+        with self.condition:
+            while not self.__allow_request(cost):
+                wait_time = self.__time_until_available(cost)
+                if deadline is not None and deadline - self.clock() < wait_time:
+                    # No point in waiting, the next window will not start in time
+                    return count_decision(self.metrics, False)
+                self.condition.wait(wait_time)
+            return count_decision(self.metrics, True)
+
+    def time_until_available(self, cost: int = 1) -> float:
+        """
+        Get the time until a request would be allowed
+
+        :param cost: weight of the request, the number of requests it counts as in the window
+        :return: seconds to wait, 0 if a request is allowed now, infinity if the cost exceeds the maximum allowed
+            requests
+        """
+        if cost < 0:
+            raise ValueError("Cannot admit a negative cost")
+
+        with self.lock:
+            return self.__time_until_available(cost)
+
+    def expiry_time(self) -> float:
+        """
+        Get the time at which the requests of the current window stop weighing on the next one, from then on the
+        counter holds no state a new one would not, so a KeyedRateLimiter may drop it
+
+        :return: end of the window following the current one, in seconds of the clock
+        """
+        with self.lock:
+            return (self.current_window + 2) * self.window_size
+
+    def __allow_request(self, cost: int) -> bool:
+        """
+        Determines if a request is allowed in the current window
+        This method is not thread-safe and should be called within a lock
+        """
+        current_time = self.clock()
+        self.__shift_windows(current_time)
+
+        # Sliding window effect: the part of the previous window still inside the sliding window counts
+        time_elapsed_in_current_window = (current_time % self.window_size) / self.window_size
+        allowed_count = (self.previous_request_count * (1 - time_elapsed_in_current_window) +
+                         self.current_request_count)
+
+        # A request of cost n is admitted as n single requests in a row would be: the count before the last of
+        # them is under the limit
+        if allowed_count + cost - 1 < self.max_allowed_requests:
+            self.current_request_count += cost
+            return True
+        return False
+
+    def _check(self, amount: int) -> bool:
+        """
+        Check if requests can be admitted now, without admitting them, the first phase of a HierarchicalRateLimiter
+        decision
+        This method is not thread-safe and should be called within a lock
+        """
+        current_time = self.clock()
+        self.__shift_windows(current_time)
+        time_elapsed_in_current_window = (current_time % self.window_size) / self.window_size
+        allowed_count = (self.previous_request_count * (1 - time_elapsed_in_current_window) +
+                         self.current_request_count)
+        # Same rule as a single request: the count before the last of the requests is under the limit
+        return allowed_count + amount - 1 < self.max_allowed_requests
+
+    def _commit(self, amount: int) -> None:
+        """
+        Admit requests that _check accepted, the second phase of a HierarchicalRateLimiter decision
+        This method is not thread-safe and should be called within a lock
+        """
+        self.current_request_count += amount
+
+    def __time_until_available(self, cost: int) -> float:
+        """
+        Compute the time until a request would be allowed, from the weight of the previous window
+        This method is not thread-safe and should be called within a lock
+        """
+        if cost > self.max_allowed_requests:
+            return math.inf
+        current_time = self.clock()
+        self.__shift_windows(current_time)
+        window_start_time = self.current_window * self.window_size
+        # The weighted count must drop below this limit for the request to be admitted
+        limit = self.max_allowed_requests - cost + 1
+
+        if self.current_request_count >= limit:
+            # Wait for the next window, in which this one is the previous window and weighs less and less
+            window_start_time += self.window_size
+            excess_count, previous_request_count = 0, self.current_request_count
+        else:
+            excess_count, previous_request_count = self.current_request_count, self.previous_request_count
+
+        # A request is allowed once previous_request_count * (1 - elapsed) + excess_count drops below the limit
+        if previous_request_count == 0:
+            return max(0.0, window_start_time - current_time)
+        time_elapsed = 1 - (limit - excess_count) / previous_request_count
+        return max(0.0, window_start_time + max(0.0, time_elapsed) * self.window_size - current_time)
+
+    def __shift_windows(self, current_time: float) -> None:
+        """
+        Move the counters to the window of the current time, a window older than the previous one is dropped
+        This method is not thread-safe and should be called within a lock
+        """
+        current_window = int(current_time // self.window_size)
+        if current_window != self.current_window:
+            consecutive = current_window == self.current_window + 1
+            self.previous_request_count = self.current_request_count if consecutive else 0
+            self.current_request_count = 0
+            self.current_window = current_window
 
     def get_window_status(self) -> dict[str, int]:
         """
@@ -62,7 +196,7 @@ class SlidingWindowCounter:
         :return: A dictionary with the current request count, previous window count, and time remaining in the window
         """
         with self.lock:
-            current_time = time.monotonic()
+            current_time = self.clock()
             current_window = int(current_time // self.window_size)
             time_remaining = self.window_size - (current_time % self.window_size)
 
@@ -78,6 +212,7 @@ class SlidingWindowCounter:
         Resets the window to its initial configuration
         """
         with self.lock:
-            self.current_window = int(time.monotonic() // self.window_size)
+            self.current_window = int(self.clock() // self.window_size)
             self.current_request_count = 0
             self.previous_request_count = 0
+            self.condition.notify_all()  # Waiting threads can go ahead
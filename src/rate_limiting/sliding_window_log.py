@@ -1,43 +1,177 @@
+import math
 import time
 from collections import deque
-from threading import Lock
+from threading import Condition, Lock
+from typing import Callable, Optional
+
+from src.rate_limiting.metrics import RateLimiterMetrics, count_decision
 
 
 class SlidingWindowLog:
-    def __init__(self, max_allowed_requests: int, window_size: float):
+    def __init__(self, max_allowed_requests: int, window_size: float, clock: Optional[Callable[[], float]] = None,
+                 metrics: Optional[RateLimiterMetrics] = None):
         """
         Initialize Sliding Window Log
         :param max_allowed_requests: maximum allowed request for a window
         :param window_size: size of the time window
+        :param clock: zero-argument callable returning the current time in seconds, time.monotonic if omitted,
+            e.g. a VirtualClock to run the limiter in simulated time
+        :param metrics: metrics the decisions are counted and timed in, None to skip instrumentation
         """
         if max_allowed_requests <= 0 or window_size <= 0:
             raise ValueError("Max allowed requests and window size should be positive")
 
+        self.clock: Callable[[], float] = time.monotonic if clock is None else clock
+        self.metrics: Optional[RateLimiterMetrics] = metrics
         self.max_allowed_requests: int = max_allowed_requests
         self.window_size: float = window_size
 
-        self.request_timestamps: deque = deque()  # Timestamps of the requests received
-        self.current_request_count: int = 0  # Current count of requests in the window
-        self.last_request_time: float = time.monotonic()  # Timestamp of the last received request
+        # Log of the requests received: their timestamps and, in a parallel deque, their costs, so a request of any
+        # cost is a single entry
+        self.request_timestamps: deque = deque()
+        self.request_costs: deque = deque()
+        self.current_request_count: int = 0  # Current count of requests in the window, the sum of their costs
+        self.last_request_time: float = self.clock()  # Timestamp of the last received request
 
         self.lock: Lock = Lock()
+        self.condition: Condition = Condition(self.lock)  # Threads waiting for old requests to expire park on it
 
-    def allow_request(self) -> bool:
+    def allow_request(self, cost: int = 1) -> bool:
         """
         Determines if a new request is allowed
 
+        :param cost: weight of the request, the number of requests it counts as in the window
         :return: True, if the request is allowed, False otherwise
         """
+        if cost < 0:
+            raise ValueError("Cannot admit a negative cost")
+
+        metrics = self.metrics
+        if metrics is None:
+            with self.lock:
+                return self.__allow_request(self.clock(), cost)
+        if metrics.sample_countdown <= 0:
+            return metrics.timed_decision(self.lock, self.__allow_request_now, cost)
+        # Untimed decision counted inline, see RateLimiterMetrics
+        metrics.sample_countdown -= 1
+        lock = self.lock
+        if not lock.acquire(False):
+            metrics.wait_for_lock(lock)
+        try:
+            allowed = self.__allow_request(self.clock(), cost)
+            if allowed:
+                metrics.allowed += 1
+            else:
+                metrics.denied += 1
+        finally:
+            lock.release()
+        return allowed
+
+    def acquire(self, cost: int = 1, timeout: Optional[float] = None) -> bool:
+        """
+        Admit a new request, waiting for the oldest requests to leave the window if needed
+
+        :param cost: weight of the request, the number of requests it counts as in the window
+        :param timeout: maximum number of seconds to wait, None to wait as long as needed
+        :return: True, if the request is allowed, False if it cannot be allowed before the timeout
+        """
+        if cost < 0:
+            raise ValueError("Cannot admit a negative cost")
+        if cost > self.max_allowed_requests:
+            raise ValueError("Cannot admit a cost above the maximum allowed requests")
+
+        deadline = None if timeout is None else self.clock() + timeout
+        with self.condition:
+            while True:
+                current_time = self.clock()
+                if self.__allow_request(current_time, cost):
+                    return count_decision(self.metrics, True)
+
+                wait_time = self.__time_until_available(current_time, cost)
+                if deadline is not None and deadline - current_time < wait_time:
+                    return count_decision(self.metrics, False)  # No point in waiting, no request will expire in time
+                self.condition.wait(wait_time)
+
+    def time_until_available(self, cost: int = 1) -> float:
+        """
+        Get the time until a request would be allowed
+
+        :param cost: weight of the request, the number of requests it counts as in the window
+        :return: seconds to wait, 0 if a request is allowed now, infinity if the cost exceeds the maximum allowed
+            requests
+        """
+        if cost < 0:
+            raise ValueError("Cannot admit a negative cost")
+
         with self.lock:
-            current_time = time.monotonic()
+            current_time = self.clock()
             self.__remove_old_requests(current_time)
+            return self.__time_until_available(current_time, cost)
 
-            if self.current_request_count < self.max_allowed_requests:
-                self.request_timestamps.append(current_time)
-                self.current_request_count += 1
-                self.last_request_time = current_time
-                return True
-            return False
+    def __allow_request(self, current_time: float, cost: int) -> bool:
+        """
+        Determines if a new request is allowed
+        This method is not thread-safe and should be called within a lock
+
+        :param current_time: the current timestamp
+        :param cost: weight of the request
+        """
+        self.__remove_old_requests(current_time)
+
+        if self.current_request_count + cost <= self.max_allowed_requests:
+            self.request_timestamps.append(current_time)
+            self.request_costs.append(cost)
+            self.current_request_count += cost
+            self.last_request_time = current_time
+            return True
+        return False
+
+    def __allow_request_now(self, cost: int) -> bool:
+        """
+        Determines if a new request is allowed at the current time
+        This method is not thread-safe and should be called within a lock
+        """
+        return self.__allow_request(self.clock(), cost)
+
+    def _check(self, amount: int) -> bool:
+        """
+        Check if requests can be admitted now, without admitting them, the first phase of a HierarchicalRateLimiter
+        decision
+        This method is not thread-safe and should be called within a lock
+        """
+        self.__remove_old_requests(self.clock())
+        return self.current_request_count + amount <= self.max_allowed_requests
+
+    def _commit(self, amount: int) -> None:
+        """
+        Admit requests that _check accepted, the second phase of a HierarchicalRateLimiter decision
+        This method is not thread-safe and should be called within a lock
+        """
+        current_time = self.clock()
+        self.request_timestamps.append(current_time)
+        self.request_costs.append(amount)
+        self.current_request_count += amount
+        self.last_request_time = current_time
+
+    def __time_until_available(self, current_time: float, cost: int) -> float:
+        """
+        Compute the time until a request would be allowed, from the oldest requests in the window
+        This method is not thread-safe and should be called within a lock
+
+        :param current_time: the current timestamp
+        :param cost: weight of the request
+        """
+        if cost > self.max_allowed_requests:
+            return math.inf
+        excess_count = self.current_request_count + cost - self.max_allowed_requests
+        if excess_count <= 0:
+            return 0.0
+        # Requests leave the window window_size after they were received, from the oldest one, until enough of them
+        # have left
+        for timestamp, request_cost in zip(self.request_timestamps, self.request_costs):
+            excess_count -= request_cost
+            if excess_count <= 0:
+                return max(0.0, timestamp + self.window_size - current_time)
 
     def get_stats(self) -> dict:
         """
@@ -46,7 +180,7 @@ class SlidingWindowLog:
         :return: A dictionary containing current stats
         """
         with self.lock:
-            current_time = time.monotonic()
+            current_time = self.clock()
             self.__remove_old_requests(current_time)
 
             return {
@@ -62,8 +196,10 @@ class SlidingWindowLog:
         """
         with self.lock:
             self.request_timestamps.clear()
+            self.request_costs.clear()
             self.current_request_count = 0
-            self.last_request_time = time.monotonic()
+            self.last_request_time = self.clock()
+            self.condition.notify_all()  # Waiting threads can go ahead
 
     def __remove_old_requests(self, current_time):
         """
@@ -74,4 +210,4 @@ class SlidingWindowLog:
         window_start_time = current_time - self.window_size
         while self.request_timestamps and self.request_timestamps[0] <= window_start_time:
             self.request_timestamps.popleft()
-            self.current_request_count -= 1
+            self.current_request_count -= self.request_costs.popleft()
@@ -0,0 +1,154 @@
+import mmap
+import os
+import struct
+import time
+from array import array
+from contextlib import AbstractContextManager, nullcontext
+from typing import Callable, Optional
+
+from src.rate_limiting.token_bucket_store import DELETED_SLOT, EMPTY_SLOT, TokenBucketStore
+
+MAGIC = b'RLSNAP02'
+# Magic, number of slots, buckets, slots in use, default capacity, default fill rate, wall clock time minus store
+# clock time
+HEADER = struct.Struct('<8sqqqqdd')
+HEADER_SIZE = 64  # Columns start after the header, on a cache line boundary
+# Columns of a TokenBucketStore in the order they are written, with their type codes
+COLUMNS = (
+    ('fingerprint_column', 'q'),
+    ('check_column', 'i'),
+    ('tokens_column', 'i'),
+    ('last_fill_time_column', 'd'),
+    ('capacity_column', 'i'),
+    ('fill_rate_column', 'd'),
+)
+
+
+def save_snapshot(store: TokenBucketStore, path: str, chunk_slots: int = 65_536) -> None:
+    """
+    Write the buckets of a store to a file, to warm restart it with load_snapshot after a deploy instead of
+    letting every client start over with a full bucket
+
+    The columns of the store are copied as they are, slot range after slot range, into a memory-mapped file.
+    The lock of the store is held for one range of chunk_slots slots at a time, so decisions go on while the
+    snapshot is taken, waiting at most for one range to be copied. Every bucket is saved in a consistent state,
+    buckets of different ranges as they were at slightly different times. A store resized during the snapshot
+    is copied again from the start, that time in one hold of its lock. The snapshot is written to a temporary file
+    renamed over path once complete, so a crash never leaves a partial snapshot behind.
+
+    :param store: store to save
+    :param path: file to write
+    :param chunk_slots: slots copied per hold of the lock of the store
+    """
+    if chunk_slots <= 0:
+        raise ValueError("chunk_slots must be positive")
+
+    temporary_path = f"{path}.tmp"
+    if not _write_snapshot(store, temporary_path, chunk_slots, store.lock):
+        # Resized meanwhile, the copied slots belong to an older layout: copy again in one hold of the lock, so a
+        # store growing without pause cannot keep the snapshot from completing
+        with store.lock:
+            _write_snapshot(store, temporary_path, chunk_slots, nullcontext())
+    os.replace(temporary_path, path)
+
+
+def load_snapshot(path: str, clock: Optional[Callable[[], float]] = None) -> TokenBucketStore:
+    """
+    Create a store holding the buckets saved by save_snapshot
+
+    Columns are read back in bulk, without visiting every bucket in Python, so a few million buckets restore in a
+    fraction of a second. Rather than rewriting every last fill time, the clock of the new store is rebased on the
+    timeline of the saved one through the wall clock: store.clock is the given clock shifted by the difference
+    of the two clocks, and the buckets refill for the time that passed between the snapshot and the restore.
+
+    :param path: file written by save_snapshot
+    :param clock: clock of the new store before its shift, time.monotonic if omitted
+    :return: store with the saved buckets
+    """
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as memory:
+        if len(memory) < HEADER_SIZE or memory[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a token bucket store snapshot")
+        _, num_slots, size, used_slots, capacity, fill_rate, wall_clock_offset = HEADER.unpack_from(memory, 0)
+        if len(memory) < HEADER_SIZE + num_slots * sum(array(type_code).itemsize for _, type_code in COLUMNS):
+            raise ValueError(f"{path} is truncated, it is shorter than its {num_slots} slots")
+
+        store = TokenBucketStore(capacity, fill_rate, initial_slots=1, clock=clock)
+        offset = HEADER_SIZE
+        with memoryview(memory) as view:
+            for name, type_code in COLUMNS:
+                column = array(type_code)
+                column.frombytes(view[offset:offset + num_slots * column.itemsize])
+                setattr(store, name, column)
+                offset += num_slots * column.itemsize
+    store.num_slots, store.size, store.used_slots = num_slots, size, used_slots
+
+    # The saved clock read saved_time when the wall clock read saved_time + wall_clock_offset, the new clock reads
+    # new_time when it reads new_time + new_offset: the saved clock now reads the new one + new_offset - offset
+    new_clock = store.clock
+    shift = time.time() - new_clock() - wall_clock_offset
+    store.clock = lambda: new_clock() + shift
+    return store
+
+
+def _write_snapshot(store: TokenBucketStore, path: str, chunk_slots: int, lock: AbstractContextManager) -> bool:
+    """
+    Write the columns of the store and the header to a file, see save_snapshot
+
+    :param lock: lock of the store, or a null context if the caller already holds it
+    :return: True, if the file was written, False if the store was resized meanwhile
+    """
+    with lock:
+        columns = [getattr(store, name) for name, _ in COLUMNS]
+    num_slots = len(columns[0])
+    column_offsets = []
+    offset = HEADER_SIZE
+    for column in columns:
+        column_offsets.append(offset)
+        offset += num_slots * column.itemsize
+
+    with open(path, 'wb+') as file:
+        file.truncate(offset)
+        with mmap.mmap(file.fileno(), offset) as memory:
+            slot_counts = _copy_columns(store, columns, column_offsets, memory, chunk_slots, lock)
+            if slot_counts is None:
+                return False
+            empty_slots, deleted_slots = slot_counts
+            used_slots = num_slots - empty_slots
+            size = used_slots - deleted_slots
+            # Timestamps are on the clock of the store, e.g. time.monotonic, which restarts with the host: record
+            # where the clock stood in wall clock time so load_snapshot can rebase them
+            with lock:
+                wall_clock_offset = time.time() - store.clock()
+            HEADER.pack_into(memory, 0, MAGIC, num_slots, size, used_slots, store.capacity, store.fill_rate,
+                             wall_clock_offset)
+            memory.flush()
+    return True
+
+
+def _copy_columns(store: TokenBucketStore, columns: list[array], column_offsets: list[int], memory: mmap.mmap,
+                  chunk_slots: int, lock: AbstractContextManager) -> Optional[tuple[int, int]]:
+    """
+    Copy the columns into the file one slot range at a time, each within the lock, and count the empty
+    and deleted slots of the copy, rather than of the store, which may have changed since. Counting a range at a
+    time keeps the GIL from being held for the whole column at once.
+
+    :return: numbers of empty and deleted slots, None if the store was resized meanwhile
+    """
+    num_slots = len(columns[0])
+    empty_slots = deleted_slots = 0
+    for start in range(0, num_slots, chunk_slots):
+        end = min(start + chunk_slots, num_slots)
+        with lock:
+            if store.fingerprint_column is not columns[0]:
+                return None
+            for column, column_offset in zip(columns, column_offsets):
+                with memoryview(column) as view:
+                    memory[column_offset + start * column.itemsize:column_offset + end * column.itemsize] = \
+                        view[start:end].cast('B')
+
+        fingerprints = array('q')
+        with memoryview(memory) as view:
+            fingerprints.frombytes(view[column_offsets[0] + start * 8:column_offsets[0] + end * 8])
+        empty_slots += fingerprints.count(EMPTY_SLOT)
+        deleted_slots += fingerprints.count(DELETED_SLOT)
+    return empty_slots, deleted_slots
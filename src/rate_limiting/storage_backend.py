@@ -0,0 +1,332 @@
+import math
+import time
+from threading import Lock
+from typing import Any, Sequence
+
+from src.rate_limiting.backend_algorithms import ALGORITHMS
+
+# Keys a script takes after the state key, named after it. In Redis Cluster, give the state key a hash tag, e.g.
+# {user-1}, so that they all land in its slot.
+SCRIPT_KEY_SUFFIXES = {'sliding_window_log': (':cost',)}
+
+# One script per algorithm. Every script runs atomically on the server and takes the state key as KEYS[1] followed
+# by the keys of SCRIPT_KEY_SUFFIXES, the two limits of the algorithm as ARGV[1] and ARGV[2], the cost of the
+# request as ARGV[3] and a unique request id as ARGV[4]. Time comes from the server clock so that replicas with
+# skewed clocks agree. State expires once it is back to its initial value, so idle keys do not accumulate. Calling
+# TIME before writing needs effects replication, the default since Redis 5.
+LUA_SCRIPTS = {
+    'token_bucket': """
+local capacity = tonumber(ARGV[1])
+local fill_rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local server_time = redis.call('TIME')
+local now = tonumber(server_time[1]) + tonumber(server_time[2]) / 1000000
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'last_fill_time')
+local tokens = tonumber(state[1]) or capacity
+local last_fill_time = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - last_fill_time) * fill_rate)
+
+local allowed = 0
+if cost <= tokens then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'last_fill_time', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / fill_rate * 1000) + 1000)
+return allowed
+""",
+    'leaky_bucket': """
+local capacity = tonumber(ARGV[1])
+local leak_rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local server_time = redis.call('TIME')
+local now = tonumber(server_time[1]) + tonumber(server_time[2]) / 1000000
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'last_leak_time')
+local tokens = tonumber(state[1]) or 0
+local last_leak_time = tonumber(state[2]) or now
+tokens = math.max(0, tokens - math.max(0, now - last_leak_time) * leak_rate)
+
+local allowed = 0
+if tokens + cost <= capacity then
+    tokens = tokens + cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'last_leak_time', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(tokens / leak_rate * 1000) + 1000)
+return allowed
+""",
+    'fixed_window_counter': """
+local max_allowed_requests = tonumber(ARGV[1])
+local window_size = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local server_time = redis.call('TIME')
+local now = tonumber(server_time[1]) + tonumber(server_time[2]) / 1000000
+
+local state = redis.call('HMGET', KEYS[1], 'current_request_count', 'window_start_time')
+local count = tonumber(state[1]) or 0
+local window_start_time = tonumber(state[2]) or now
+if now - window_start_time >= window_size then
+    window_start_time = now
+    count = 0
+end
+
+local allowed = 0
+if count + cost <= max_allowed_requests then
+    count = count + cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'current_request_count', count, 'window_start_time', window_start_time)
+redis.call('PEXPIRE', KEYS[1], math.ceil((window_start_time + window_size - now) * 1000) + 1000)
+return allowed
+""",
+    'sliding_window_counter': """
+local max_allowed_requests = tonumber(ARGV[1])
+local window_size = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local server_time = redis.call('TIME')
+local now = tonumber(server_time[1]) + tonumber(server_time[2]) / 1000000
+local current_window = math.floor(now / window_size)
+
+local state = redis.call('HMGET', KEYS[1], 'current_window', 'current_request_count', 'previous_request_count')
+local window = tonumber(state[1]) or current_window
+local current_count = tonumber(state[2]) or 0
+local previous_count = tonumber(state[3]) or 0
+if window == current_window - 1 then
+    previous_count = current_count
+    current_count = 0
+elseif window < current_window - 1 then
+    previous_count = 0
+    current_count = 0
+end
+
+local time_elapsed_in_current_window = (now - current_window * window_size) / window_size
+local weighted_count = previous_count * (1 - time_elapsed_in_current_window) + current_count
+
+local allowed = 0
+-- The rule of SlidingWindowCounter: a request of cost n is admitted as n single requests in a row would be
+if weighted_count + cost - 1 < max_allowed_requests then
+    current_count = current_count + cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'current_window', current_window, 'current_request_count', current_count,
+           'previous_request_count', previous_count)
+redis.call('PEXPIRE', KEYS[1], math.ceil(2 * window_size * 1000) + 1000)
+return allowed
+""",
+    # One member per request, the request id and its cost, and the total cost of the members in KEYS[2]
+    'sliding_window_log': """
+local max_allowed_requests = tonumber(ARGV[1])
+local window_size = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local server_time = redis.call('TIME')
+local now = tonumber(server_time[1]) + tonumber(server_time[2]) / 1000000
+
+local count = tonumber(redis.call('GET', KEYS[2])) or 0
+local expired = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', now - window_size)
+if #expired > 0 then
+    for _, member in ipairs(expired) do
+        count = count - tonumber(string.match(member, ':(%d+)$'))
+    end
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window_size)
+end
+
+local allowed = 0
+if count + cost <= max_allowed_requests then
+    if cost > 0 then
+        redis.call('ZADD', KEYS[1], now, ARGV[4] .. ':' .. cost)
+        count = count + cost
+    end
+    allowed = 1
+end
+local time_to_live = math.ceil(window_size * 1000) + 1000
+redis.call('SET', KEYS[2], count, 'PX', time_to_live)
+redis.call('PEXPIRE', KEYS[1], time_to_live)
+return allowed
+""",
+    # The state is a single integer, the theoretical arrival time in microseconds: the time at which the bucket
+    # would be full again. string.format keeps all its digits, tostring would round it to 14 significant digits
+    'gcra': """
+local capacity = tonumber(ARGV[1])
+local fill_rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local server_time = redis.call('TIME')
+local now = tonumber(server_time[1]) * 1000000 + tonumber(server_time[2])
+
+-- Whole microseconds per token, so a full bucket always admits capacity tokens and TATs stay integers
+local emission_interval = math.max(1, math.floor(1000000 / fill_rate + 0.5))
+local theoretical_arrival_time = math.max(tonumber(redis.call('GET', KEYS[1])) or now, now)
+local new_arrival_time = theoretical_arrival_time + cost * emission_interval
+if new_arrival_time - now > capacity * emission_interval then
+    return 0
+end
+redis.call('SET', KEYS[1], string.format('%d', new_arrival_time),
+           'PX', math.ceil((new_arrival_time - now) / 1000) + 1000)
+return 1
+""",
+    # Lease scripts take up to ARGV[3] tokens or requests at once from the same state as the scripts above,
+    # they return the granted amount and the milliseconds until the lease must be dropped, -1 if it never has to
+    'token_bucket_lease': """
+local capacity = tonumber(ARGV[1])
+local fill_rate = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local server_time = redis.call('TIME')
+local now = tonumber(server_time[1]) + tonumber(server_time[2]) / 1000000
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'last_fill_time')
+local tokens = tonumber(state[1]) or capacity
+local last_fill_time = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - last_fill_time) * fill_rate)
+
+local granted = math.min(requested, math.floor(tokens))
+tokens = tokens - granted
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'last_fill_time', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / fill_rate * 1000) + 1000)
+return {granted, -1}
+""",
+    'fixed_window_counter_lease': """
+local max_allowed_requests = tonumber(ARGV[1])
+local window_size = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local server_time = redis.call('TIME')
+local now = tonumber(server_time[1]) + tonumber(server_time[2]) / 1000000
+
+local state = redis.call('HMGET', KEYS[1], 'current_request_count', 'window_start_time')
+local count = tonumber(state[1]) or 0
+local window_start_time = tonumber(state[2]) or now
+if now - window_start_time >= window_size then
+    window_start_time = now
+    count = 0
+end
+
+local granted = math.max(0, math.min(requested, max_allowed_requests - count))
+count = count + granted
+redis.call('HSET', KEYS[1], 'current_request_count', count, 'window_start_time', window_start_time)
+redis.call('PEXPIRE', KEYS[1], math.ceil((window_start_time + window_size - now) * 1000) + 1000)
+return {granted, math.floor((window_start_time + window_size - now) * 1000)}
+""",
+}
+
+
+class StorageBackend:
+    def __init__(self):
+        """
+        Initialize the storage backend shared by the limiters of every node
+
+        Backends run the decision of an algorithm atomically next to the state, in a single round-trip.
+        """
+        self.round_trips: int = 0  # Number of round-trips to the store, for benchmarking
+        self.lock: Lock = Lock()
+
+    def evaluate(self, algorithm: str, key: str, args: Sequence[Any]) -> Any:
+        """
+        Run the decision of an algorithm for one key
+
+        :param algorithm: name of the algorithm, a key of LUA_SCRIPTS
+        :param key: key holding the state of the limiter
+        :param args: limits of the algorithm, cost of the request and unique request id
+        :return: reply of the script, 1 if the request is allowed and 0 otherwise for the decision scripts
+        """
+        raise NotImplementedError
+
+    def evaluate_many(self, algorithm: str, calls: Sequence[tuple[str, Sequence[Any]]]) -> list[Any]:
+        """
+        Run the decisions of an algorithm for several keys in one round-trip, in order
+
+        :param algorithm: name of the algorithm, a key of LUA_SCRIPTS
+        :param calls: key and args of every decision
+        :return: reply of the script for every decision
+        """
+        raise NotImplementedError
+
+    def _count_round_trip(self) -> None:
+        with self.lock:
+            self.round_trips += 1
+
+
+class RedisStorageBackend(StorageBackend):
+    def __init__(self, client: Any):
+        """
+        Initialize the Redis backend, every decision is one EVALSHA of the algorithm script
+
+        :param client: Redis client, e.g. redis.Redis, or any client of a Redis-compatible server
+        """
+        super().__init__()
+        self.client = client
+        self.scripts: dict = {algorithm: client.register_script(source) for algorithm, source in LUA_SCRIPTS.items()}
+
+    def evaluate(self, algorithm: str, key: str, args: Sequence[Any]) -> Any:
+        self._count_round_trip()
+        return self.scripts[algorithm](keys=self.__keys(algorithm, key), args=args)
+
+    def evaluate_many(self, algorithm: str, calls: Sequence[tuple[str, Sequence[Any]]]) -> list[Any]:
+        # A pipeline without MULTI/EXEC, every script is still atomic on its own
+        pipeline = self.client.pipeline(transaction=False)
+        for key, args in calls:
+            self.scripts[algorithm](keys=self.__keys(algorithm, key), args=args, client=pipeline)
+        self._count_round_trip()
+        return pipeline.execute()
+
+    @staticmethod
+    def __keys(algorithm: str, key: str) -> list[str]:
+        """
+        Get the keys of a script: the state key followed by the keys named after it
+        """
+        return [key] + [key + suffix for suffix in SCRIPT_KEY_SUFFIXES.get(algorithm, ())]
+
+
+class InMemoryStorageBackend(StorageBackend):
+    def __init__(self):
+        """
+        Initialize an in-process stand-in for the Redis backend, for tests and benchmarks
+
+        Every decision runs the Python equivalent of the algorithm script, from backend_algorithms, under a lock,
+        with the same expiry, against the wall clock like the server would.
+        """
+        super().__init__()
+        self.data: dict = {}  # Key -> state of the limiter, see backend_algorithms
+        self.expiry_times: dict = {}  # Key -> wall clock time after which the state is discarded
+
+    def evaluate(self, algorithm: str, key: str, args: Sequence[Any]) -> Any:
+        self._count_round_trip()
+        with self.lock:
+            return self.__run(algorithm, key, args)
+
+    def evaluate_many(self, algorithm: str, calls: Sequence[tuple[str, Sequence[Any]]]) -> list[Any]:
+        self._count_round_trip()
+        results = []
+        for key, args in calls:
+            with self.lock:  # Other clients may interleave between the scripts of a pipeline, as on a server
+                results.append(self.__run(algorithm, key, args))
+        return results
+
+    def purge_expired(self) -> int:
+        """
+        Discard the state of every expired key, expired keys are otherwise only discarded when accessed
+
+        :return: number of discarded keys
+        """
+        with self.lock:
+            now = time.time()
+            expired_keys = [key for key, expiry_time in self.expiry_times.items() if expiry_time <= now]
+            for key in expired_keys:
+                del self.data[key]
+                del self.expiry_times[key]
+            return len(expired_keys)
+
+    def __run(self, algorithm: str, key: str, args: Sequence[Any]) -> Any:
+        """
+        Run the script of an algorithm.
+        This method is not thread-safe and should be called within a lock
+        """
+        now = time.time()
+        if key in self.expiry_times and self.expiry_times[key] <= now:
+            del self.data[key]
+            del self.expiry_times[key]
+
+        first_limit, second_limit, cost = float(args[0]), float(args[1]), int(args[2])
+        decide = ALGORITHMS[algorithm]
+        reply, self.data[key], time_to_live = decide(self.data.get(key), now, first_limit, second_limit, cost)
+        self.expiry_times[key] = now + (math.ceil(time_to_live * 1000) + 1000) / 1000
+        return reply
@@ -0,0 +1,186 @@
+import math
+import time
+from collections import deque
+from typing import Callable, Hashable, Optional
+
+
+class TimingWheel:
+    """
+    Hierarchical timing wheel tracking when keys expire, e.g. the keys of a KeyedRateLimiter.
+    This class is not thread-safe, KeyedRateLimiter uses it within its lock
+    """
+
+    def __init__(self, tick: float = 0.1, wheel_size: int = 256, levels: int = 4,
+                 clock: Optional[Callable[[], float]] = None):
+        """
+        Initialize the timing wheel
+
+        Time is cut in ticks of tick seconds. Level 0 has one slot per tick for the next wheel_size ticks, every
+        level above has one slot per turn of the level below, so 4 levels of 256 slots cover 256 ** 4 ticks.
+        A key is filed in the slot of its expiry tick at the lowest level that reaches it. When the wheel turns,
+        the slot of the current tick fires its keys, and the slots of the upper levels starting at that tick
+        cascade their keys to the levels below. Scheduling a key, and expiring or cascading it, cost O(1) whatever
+        the number of keys, and a key is cascaded at most once per level.
+
+        Moving the expiry of a key later, e.g. a key used again, only records the new expiry, the key stays in its
+        slot and is filed again when that slot fires, so a busy key costs nothing until then. Moving it earlier
+        files it again, its older entry is skipped when its slot fires.
+
+        Keys expire up to one tick late, never early, later if advance runs behind its budget.
+
+        :param tick: resolution of the wheel in seconds
+        :param wheel_size: number of slots per level
+        :param levels: number of levels, expiry times beyond wheel_size ** levels ticks are filed at the top level
+            and cascaded again until they are in reach
+        :param clock: zero-argument callable returning the current time in seconds, time.monotonic if omitted,
+            e.g. a VirtualClock to run the wheel in simulated time
+        """
+        if tick <= 0:
+            raise ValueError("Tick must be positive")
+        if wheel_size < 2 or levels <= 0:
+            raise ValueError("Wheel size must be at least 2 and levels positive")
+
+        self.clock: Callable[[], float] = time.monotonic if clock is None else clock
+        self.tick: float = tick
+        self.wheel_size: int = wheel_size
+        self.levels: int = levels
+        self.spans: list[int] = [wheel_size ** level for level in range(levels + 1)]  # Ticks per slot of a level
+
+        # Slots of every level, each a list of (key, filed tick) entries
+        self.slots: list[list[list]] = [[[] for _ in range(wheel_size)] for _ in range(levels)]
+        self.level_sizes: list[int] = [0] * levels  # Entries filed at every level, stale ones included
+        self.due: deque = deque()  # Entries of fired slots left over by a call with a budget
+        self.current_tick: int = math.floor(self.clock() / tick)  # Last tick whose slot fired
+
+        self.expiry_ticks: dict[Hashable, int] = {}  # Key -> tick at which it expires
+        self.filed_ticks: dict[Hashable, int] = {}  # Key -> tick its live entry is filed for
+
+    def schedule(self, key: Hashable, expiry_time: float) -> None:
+        """
+        Set the time at which a key expires, replacing its previous expiry time
+
+        :param key: key to expire
+        :param expiry_time: time at which the key expires, in seconds of the clock
+        """
+        # The key expires at the first tick that is not before its expiry time, or on the next tick if it is overdue
+        expiry_tick = max(math.ceil(expiry_time / self.tick), self.current_tick + 1)
+        self.expiry_ticks[key] = expiry_tick
+        filed_tick = self.filed_ticks.get(key)
+        if filed_tick is None or expiry_tick < filed_tick:
+            self.__file(key, expiry_tick)
+
+    def cancel(self, key: Hashable) -> bool:
+        """
+        Stop tracking a key, its entry is skipped when its slot fires
+
+        :param key: key to stop tracking
+        :return: True, if the key was tracked, False otherwise
+        """
+        self.filed_ticks.pop(key, None)
+        return self.expiry_ticks.pop(key, None) is not None
+
+    def advance(self, max_expirations: Optional[int] = None) -> list:
+        """
+        Turn the wheel to the current time and collect the keys that expired
+
+        :param max_expirations: stop once this many keys expired, the keys left over expire on the next calls first,
+            so keys sharing a tick do not expire all at once. None to catch up with the current time
+        :return: expired keys, no longer tracked
+        """
+        budget = math.inf if max_expirations is None else max_expirations
+        target_tick = math.floor(self.clock() / self.tick)
+        expired = []
+        self.__fire_due(expired, budget)
+        while self.current_tick < target_tick and len(expired) < budget:
+            next_tick = self.__next_busy_tick(target_tick)
+            self.current_tick = next_tick
+            if next_tick > target_tick:
+                self.current_tick = target_tick
+                break
+
+            # Upper levels first, so keys cascading to the current tick fire right away
+            for level in range(self.levels - 1, 0, -1):
+                if next_tick % self.spans[level] == 0:
+                    self.__cascade(self.__take_slot(level, (next_tick // self.spans[level]) % self.wheel_size))
+            self.due.extend(self.__take_slot(0, next_tick % self.wheel_size))
+            self.__fire_due(expired, budget)
+        return expired
+
+    def expiry_time(self, key: Hashable) -> Optional[float]:
+        """
+        Get the time at which a key expires
+
+        :param key: tracked key
+        :return: expiry time, rounded up to a whole tick, None if the key is not tracked
+        """
+        expiry_tick = self.expiry_ticks.get(key)
+        return None if expiry_tick is None else expiry_tick * self.tick
+
+    def __len__(self) -> int:
+        return len(self.expiry_ticks)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.expiry_ticks
+
+    def __next_busy_tick(self, target_tick: int) -> int:
+        """
+        Get the next tick with a slot that may fire or cascade: with the lower levels empty, the wheel jumps to the
+        next slot of the lowest level holding entries instead of stepping through empty ticks
+        """
+        for level in range(self.levels):
+            if self.level_sizes[level]:
+                span = self.spans[level]
+                return (self.current_tick // span + 1) * span
+        return target_tick + 1  # No entry left, nothing fires until the target tick
+
+    def __file(self, key: Hashable, expiry_tick: int) -> None:
+        """
+        File an entry of a key in the slot of its expiry tick, at the lowest level that reaches it, superseding its
+        older entry
+        """
+        delay = expiry_tick - self.current_tick
+        for level in range(self.levels):
+            if delay < self.spans[level + 1]:
+                break
+        else:
+            # Beyond the reach of the wheel, file it in the furthest slot of the top level, it cascades from there
+            level = self.levels - 1
+            expiry_tick = self.current_tick + self.spans[self.levels] - 1
+        self.slots[level][(expiry_tick // self.spans[level]) % self.wheel_size].append((key, expiry_tick))
+        self.level_sizes[level] += 1
+        self.filed_ticks[key] = expiry_tick
+
+    def __take_slot(self, level: int, index: int) -> list:
+        """
+        Empty a slot and get its entries
+        """
+        entries = self.slots[level][index]
+        if entries:
+            self.slots[level][index] = []
+            self.level_sizes[level] -= len(entries)
+        return entries
+
+    def __cascade(self, entries: list) -> None:
+        """
+        File the entries of an upper level slot again, at the lower levels now in reach of their expiry tick
+        """
+        for key, filed_tick in entries:
+            if self.filed_ticks.get(key) == filed_tick:  # Not cancelled nor filed again for an earlier tick
+                self.__file(key, self.expiry_ticks[key])
+
+    def __fire_due(self, expired: list, budget: float) -> None:
+        """
+        Expire the keys of the due entries until the budget is spent, keys expiring later are filed again
+        """
+        due = self.due
+        while due and len(expired) < budget:
+            key, filed_tick = due.popleft()
+            if self.filed_ticks.get(key) != filed_tick:
+                continue  # Cancelled, or filed again for an earlier tick
+            expiry_tick = self.expiry_ticks[key]
+            if expiry_tick <= self.current_tick:
+                del self.expiry_ticks[key]
+                del self.filed_ticks[key]
+                expired.append(key)
+            else:
+                self.__file(key, expiry_tick)
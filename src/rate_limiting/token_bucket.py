@@ -1,27 +1,39 @@
+import math
 import time
-from threading import Lock
+from threading import Condition, Lock
+from typing import Callable, Optional
+
+from src.rate_limiting.metrics import RateLimiterMetrics, count_decision
 
 
 class TokenBucket:
-    def __init__(self, capacity: int, fill_rate: float):
+    def __init__(self, capacity: int, fill_rate: float, clock: Optional[Callable[[], float]] = None,
+                 metrics: Optional[RateLimiterMetrics] = None):
         """
         Initialize the token bucket
         :param capacity: maximum number of tokens a bucket can hold
         :param fill_rate: number of tokens added per unit of time
+        :param clock: zero-argument callable returning the current time in seconds, time.monotonic if omitted,
+            e.g. a VirtualClock to run the limiter in simulated time
+        :param metrics: metrics the decisions are counted and timed in, None to skip instrumentation
         """
         if capacity <= 0 or fill_rate <= 0:
             raise ValueError("Capacity and fill rate must be a positive number")
 
+        self.clock: Callable[[], float] = time.monotonic if clock is None else clock
+        self.metrics: Optional[RateLimiterMetrics] = metrics
         self.capacity: int = capacity
         self.fill_rate: float = fill_rate
 
         # Current token count
         self.tokens: int = capacity
         # Last time when the bucket was filled
-        self.last_fill_time: float = time.monotonic()
+        self.last_fill_time: float = self.clock()
 
         # Lock for thread safety
         self.lock: Lock = Lock()
+        # Condition on the same lock, threads waiting for tokens park on it
+        self.condition: Condition = Condition(self.lock)
 
     def get_available_tokens(self) -> int:
         """
@@ -37,13 +49,18 @@ class TokenBucket:
         Add tokens to the token bucket
         """
         # Get the current time
-        current_time = time.monotonic()
+        current_time = self.clock()
         time_elapsed = current_time - self.last_fill_time
-        new_tokens = time_elapsed * self.fill_rate
+        fill_rate = self.fill_rate  # Read once, an AIMDController may retune it meanwhile
+        new_tokens = int(time_elapsed * fill_rate)  # Whole tokens only, the fraction of the next one is kept
 
         if new_tokens > 0:
-            self.tokens = min(self.capacity, round(new_tokens + self.tokens))
-            self.last_fill_time = current_time
+            if self.tokens + new_tokens >= self.capacity:
+                self.tokens = self.capacity
+                self.last_fill_time = current_time  # A full bucket does not bank time
+            else:
+                self.tokens += new_tokens
+                self.last_fill_time += new_tokens / fill_rate
 
     def consume(self, tokens: int) -> bool:
         """
@@ -55,9 +72,105 @@ class TokenBucket:
         if tokens < 0:
             raise ValueError("Cannot consume negative tokens")
 
+        metrics = self.metrics
+        if metrics is None:
+            with self.lock:
+                return self.__consume(tokens)
+        if metrics.sample_countdown <= 0:
+            return metrics.timed_decision(self.lock, self.__consume, tokens)
+        # Untimed decision counted inline, see RateLimiterMetrics
+        metrics.sample_countdown -= 1
+        lock = self.lock
+        if not lock.acquire(False):
+            metrics.wait_for_lock(lock)
+        try:
+            allowed = self.__consume(tokens)
+            if allowed:
+                metrics.allowed += 1
+            else:
+                metrics.denied += 1
+        finally:
+            lock.release()
+        return allowed
+
+    def acquire(self, tokens: int = 1, timeout: Optional[float] = None) -> bool:
+        """
+        Consume tokens from the bucket, waiting for the refill if needed
+
+        :param tokens: required tokens to consume
+        :param timeout: maximum number of seconds to wait, None to wait as long as needed
+        :return: True, if tokens were consumed, False if they cannot be available before the timeout
+        """
+        if tokens < 0:
+            raise ValueError("Cannot consume negative tokens")
+        if tokens > self.capacity:
+            raise ValueError("Cannot consume more tokens than the capacity")
+
+        deadline = None if timeout is None else self.clock() + timeout
+        with self.condition:
+            while True:
+                self.add_tokens()  # Refill tokens
+                if tokens <= self.tokens:
+                    self.tokens -= tokens
+                    return count_decision(self.metrics, True)
+
+                wait_time = self.__time_until_available(tokens)
+                if deadline is not None and deadline - self.clock() < wait_time:
+                    # No point in waiting, the tokens will not be there in time
+                    return count_decision(self.metrics, False)
+                self.condition.wait(wait_time)
+
+    def time_until_available(self, tokens: int) -> float:
+        """
+        Get the time until the bucket holds the required tokens
+
+        :param tokens: required tokens to consume
+        :return: seconds to wait, 0 if the tokens are available now, infinity if they exceed the capacity
+        """
+        if tokens < 0:
+            raise ValueError("Cannot consume negative tokens")
+
         with self.lock:
             self.add_tokens()  # Refill tokens
-            if tokens <= self.tokens:
-                self.tokens -= tokens
-                return True
-            return False
+            return self.__time_until_available(tokens)
+
+    def __consume(self, tokens: int) -> bool:
+        """
+        Consume tokens from the bucket if it holds enough of them
+        This method is not thread-safe and should be called within a lock
+        """
+        self.add_tokens()  # Refill tokens
+        if tokens <= self.tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    def _check(self, tokens: int) -> bool:
+        """
+        Check if tokens can be consumed now, without consuming them, the first phase of a
+        HierarchicalRateLimiter decision
+        This method is not thread-safe and should be called within a lock
+        """
+        self.add_tokens()  # Refill tokens
+        return tokens <= self.tokens
+
+    def _commit(self, tokens: int) -> None:
+        """
+        Consume tokens that _check accepted, the second phase of a HierarchicalRateLimiter decision
+        This method is not thread-safe and should be called within a lock
+        """
+        self.tokens -= tokens
+
+    def __time_until_available(self, tokens: int) -> float:
+        """
+        Compute the time until the bucket holds the required tokens, from the fill rate
+        This method is not thread-safe and should be called within a lock
+        """
+        if tokens <= self.tokens:
+            return 0.0
+        if tokens > self.capacity:
+            return math.inf
+
+        missing_tokens = tokens - self.tokens
+        time_since_last_fill = self.clock() - self.last_fill_time
+        return max(0.0, missing_tokens / self.fill_rate - time_since_last_fill)
@@ -0,0 +1,288 @@
+import hashlib
+import time
+from array import array
+from threading import Lock
+from typing import Callable, Hashable, Optional
+
+# Markers of the fingerprint column, real fingerprints never take these values
+EMPTY_SLOT = 0
+DELETED_SLOT = 1
+
+MAX_LOAD_FACTOR = 0.75
+
+
+def key_bytes(key: Hashable) -> bytes:
+    """
+    Encode a key to the bytes it is hashed from, its type and its content
+
+    :param key: str, bytes, or any key whose repr identifies it, e.g. int or a tuple of str and int
+    :return: encoded key
+    """
+    if isinstance(key, bytes):
+        return b'b' + key
+    if isinstance(key, str):
+        return b's' + key.encode('utf-8', 'surrogatepass')
+    return b'r' + repr(key).encode('utf-8', 'surrogatepass')
+
+
+def key_fingerprint(key: Hashable) -> tuple[int, int]:
+    """
+    Get the 96-bit fingerprint of a key, a BLAKE2b digest of its content, the same in every process
+
+    Unlike hash(), which maps -1 and -2 or 1 and 1.0 to the same value, the digest is taken from the type and the
+    bytes of the key, so two distinct keys only share a fingerprint by accident, less than once in 10**14 for
+    10 million keys.
+
+    :param key: str, bytes, or any key whose repr identifies it, e.g. int or a tuple of str and int
+    :return: signed 64-bit and 32-bit parts of the fingerprint
+    """
+    digest = hashlib.blake2b(key_bytes(key), digest_size=12).digest()
+    return int.from_bytes(digest[:8], 'little', signed=True), int.from_bytes(digest[8:], 'little', signed=True)
+
+
+class TokenBucketStore:
+    def __init__(self, capacity: int, fill_rate: float, initial_slots: int = 1024,
+                 clock: Optional[Callable[[], float]] = None):
+        """
+        Initialize a compact store of token buckets, one per key
+
+        Bucket state lives in contiguous typed arrays, one column per field, instead of one TokenBucket object
+        per key. The key -> slot map is an open addressing hash table over two columns holding the 96-bit
+        fingerprint of every key, see key_fingerprint, so no Python object is kept per key: a bucket costs 36 bytes
+        per slot, about 45 to 95 bytes per key depending on the table load. Fingerprints are digests of the content
+        of the keys, the same in every process, so buckets restored from a snapshot are found again.
+        Decisions are the same as TokenBucket.consume.
+
+        :param capacity: default maximum number of tokens a bucket can hold, at most 2**31 - 1
+        :param fill_rate: default number of tokens added per unit of time
+        :param initial_slots: initial size of the table, rounded up to a power of two
+        :param clock: zero-argument callable returning the current time in seconds, time.monotonic if omitted,
+            e.g. a VirtualClock to run the limiter in simulated time
+        """
+        if capacity <= 0 or fill_rate <= 0:
+            raise ValueError("Capacity and fill rate must be a positive number")
+        if initial_slots <= 0:
+            raise ValueError("initial_slots must be positive")
+
+        self.clock: Callable[[], float] = time.monotonic if clock is None else clock
+        self.capacity: int = capacity
+        self.fill_rate: float = fill_rate
+
+        self.size: int = 0  # Number of keys with a bucket
+        self.used_slots: int = 0  # Number of slots holding a bucket or a deleted marker
+        self.__allocate_columns(1 << (initial_slots - 1).bit_length())
+
+        # Lock for thread safety
+        self.lock: Lock = Lock()
+
+    def add_bucket(self, key: Hashable, capacity: Optional[int] = None, fill_rate: Optional[float] = None) -> None:
+        """
+        Add a full bucket for a key, replacing the existing one if any
+
+        :param key: key identifying the client
+        :param capacity: maximum number of tokens of this bucket, defaults to the store capacity
+        :param fill_rate: number of tokens added per unit of time to this bucket, defaults to the store fill rate
+        """
+        capacity = self.capacity if capacity is None else capacity
+        fill_rate = self.fill_rate if fill_rate is None else fill_rate
+        if capacity <= 0 or fill_rate <= 0:
+            raise ValueError("Capacity and fill rate must be a positive number")
+
+        fingerprint, check = self.__fingerprint(key)
+        with self.lock:
+            slot = self.__find(fingerprint, check)
+            if slot < 0:
+                self.__insert(fingerprint, check, capacity, fill_rate)
+            else:
+                self.tokens_column[slot] = capacity
+                self.last_fill_time_column[slot] = self.clock()
+                self.capacity_column[slot] = capacity
+                self.fill_rate_column[slot] = fill_rate
+
+    def get_available_tokens(self, key: Hashable) -> int:
+        """
+        Get the current number of tokens in the bucket of a key
+
+        :param key: key identifying the client
+        :return: tokens, the default capacity if the key has no bucket yet
+        """
+        fingerprint, check = self.__fingerprint(key)
+        with self.lock:
+            slot = self.__find(fingerprint, check)
+            if slot < 0:
+                return self.capacity
+            self.__add_tokens(slot)
+            return self.tokens_column[slot]
+
+    def consume(self, key: Hashable, tokens: int) -> bool:
+        """
+        Consume tokens from the bucket of a key, creating a full bucket if the key has none yet
+
+        :param key: key identifying the client
+        :param tokens: required tokens to consume
+        :return: True, if tokens were consumed, False otherwise
+        """
+        if tokens < 0:
+            raise ValueError("Cannot consume negative tokens")
+
+        fingerprint, check = self.__fingerprint(key)
+        with self.lock:
+            slot = self.__find(fingerprint, check)
+            if slot < 0:
+                slot = self.__insert(fingerprint, check, self.capacity, self.fill_rate)
+            else:
+                self.__add_tokens(slot)  # Refill tokens
+
+            available_tokens = self.tokens_column[slot]
+            if tokens <= available_tokens:
+                self.tokens_column[slot] = available_tokens - tokens
+                return True
+            return False
+
+    def remove(self, key: Hashable) -> bool:
+        """
+        Remove the bucket of a key
+
+        :param key: key identifying the client
+        :return: True, if the key had a bucket, False otherwise
+        """
+        fingerprint, check = self.__fingerprint(key)
+        with self.lock:
+            slot = self.__find(fingerprint, check)
+            if slot < 0:
+                return False
+            self.fingerprint_column[slot] = DELETED_SLOT
+            self.size -= 1
+            return True
+
+    def nbytes(self) -> int:
+        """
+        Get the memory used by the bucket columns
+
+        :return: size of the columns in bytes
+        """
+        return sum(column.itemsize * len(column) for column in (
+            self.fingerprint_column, self.check_column, self.tokens_column, self.last_fill_time_column,
+            self.capacity_column, self.fill_rate_column
+        ))
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, key: Hashable) -> bool:
+        fingerprint, check = self.__fingerprint(key)
+        with self.lock:
+            return self.__find(fingerprint, check) >= 0
+
+    @staticmethod
+    def __fingerprint(key: Hashable) -> tuple[int, int]:
+        """
+        Get the fingerprint of a key, whose 64-bit part is never equal to the empty or deleted markers
+        """
+        fingerprint, check = key_fingerprint(key)
+        # Move the markers to the far end of the 64-bit range
+        return (fingerprint - (1 << 63) if fingerprint in (EMPTY_SLOT, DELETED_SLOT) else fingerprint), check
+
+    def __allocate_columns(self, num_slots: int) -> None:
+        """
+        Replace the columns with empty ones of the given number of slots
+        """
+        self.num_slots: int = num_slots
+        self.fingerprint_column: array = array('q', [EMPTY_SLOT]) * num_slots
+        self.check_column: array = array('i', [0]) * num_slots  # Last 32 bits of the fingerprints
+        self.tokens_column: array = array('i', [0]) * num_slots
+        self.last_fill_time_column: array = array('d', [0.0]) * num_slots
+        self.capacity_column: array = array('i', [0]) * num_slots
+        self.fill_rate_column: array = array('d', [0.0]) * num_slots
+
+    def __find(self, fingerprint: int, check: int) -> int:
+        """
+        Find the slot of a fingerprint, probing in the same order as CPython dictionaries.
+        This method is not thread-safe and should be called within a lock
+
+        :return: the slot, or -1 if the fingerprint is not in the table
+        """
+        fingerprints = self.fingerprint_column
+        mask = self.num_slots - 1
+        perturb = fingerprint & 0xFFFFFFFFFFFFFFFF
+        slot = perturb & mask
+        while True:
+            current = fingerprints[slot]
+            if current == fingerprint and self.check_column[slot] == check:
+                return slot
+            if current == EMPTY_SLOT:
+                return -1
+            perturb >>= 5
+            slot = (slot * 5 + perturb + 1) & mask
+
+    def __insert(self, fingerprint: int, check: int, capacity: int, fill_rate: float) -> int:
+        """
+        Store a full bucket for a fingerprint that is not in the table yet and return its slot.
+        This method is not thread-safe and should be called within a lock
+        """
+        if self.used_slots + 1 > self.num_slots * MAX_LOAD_FACTOR:
+            self.__resize()
+
+        fingerprints = self.fingerprint_column
+        mask = self.num_slots - 1
+        perturb = fingerprint & 0xFFFFFFFFFFFFFFFF
+        slot = perturb & mask
+        while fingerprints[slot] != EMPTY_SLOT and fingerprints[slot] != DELETED_SLOT:
+            perturb >>= 5
+            slot = (slot * 5 + perturb + 1) & mask
+
+        if fingerprints[slot] == EMPTY_SLOT:
+            self.used_slots += 1
+        self.size += 1
+        fingerprints[slot] = fingerprint
+        self.check_column[slot] = check
+        self.tokens_column[slot] = capacity
+        self.last_fill_time_column[slot] = self.clock()
+        self.capacity_column[slot] = capacity
+        self.fill_rate_column[slot] = fill_rate
+        return slot
+
+    def __resize(self) -> None:
+        """
+        Rebuild the table without deleted markers, doubling it if it is more than half full.
+        This method is not thread-safe and should be called within a lock
+        """
+        old_columns = (self.fingerprint_column, self.check_column, self.tokens_column, self.last_fill_time_column,
+                       self.capacity_column, self.fill_rate_column)
+        num_slots = self.num_slots * 2 if self.size * 2 >= self.num_slots else self.num_slots
+        self.__allocate_columns(num_slots)
+        self.used_slots = self.size
+
+        mask = num_slots - 1
+        fingerprints = self.fingerprint_column
+        for old_slot, fingerprint in enumerate(old_columns[0]):
+            if fingerprint == EMPTY_SLOT or fingerprint == DELETED_SLOT:
+                continue
+            perturb = fingerprint & 0xFFFFFFFFFFFFFFFF
+            slot = perturb & mask
+            while fingerprints[slot] != EMPTY_SLOT:
+                perturb >>= 5
+                slot = (slot * 5 + perturb + 1) & mask
+            fingerprints[slot] = fingerprint
+            self.check_column[slot] = old_columns[1][old_slot]
+            self.tokens_column[slot] = old_columns[2][old_slot]
+            self.last_fill_time_column[slot] = old_columns[3][old_slot]
+            self.capacity_column[slot] = old_columns[4][old_slot]
+            self.fill_rate_column[slot] = old_columns[5][old_slot]
+
+    def __add_tokens(self, slot: int) -> None:
+        """
+        Refill the bucket stored in a slot, same arithmetic as TokenBucket.add_tokens.
+        This method is not thread-safe and should be called within a lock
+        """
+        current_time = self.clock()
+        fill_rate = self.fill_rate_column[slot]
+        new_tokens = int((current_time - self.last_fill_time_column[slot]) * fill_rate)
+
+        if new_tokens > 0:
+            if self.tokens_column[slot] + new_tokens >= self.capacity_column[slot]:
+                self.tokens_column[slot] = self.capacity_column[slot]
+                self.last_fill_time_column[slot] = current_time
+            else:
+                self.tokens_column[slot] += new_tokens
+                self.last_fill_time_column[slot] += new_tokens / fill_rate
@@ -0,0 +1,189 @@
+import math
+import random
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+
+class VirtualClock:
+    """
+    Clock of a simulation, passed as the clock of the limiters: time only moves when the simulation moves it.
+    """
+
+    def __init__(self, start_time: float = 0.0):
+        self.current_time: float = start_time
+
+    def __call__(self) -> float:
+        return self.current_time
+
+    def advance(self, seconds: float) -> None:
+        """
+        Move the clock forward
+
+        :param seconds: seconds to move forward, cannot be negative
+        """
+        if seconds < 0:
+            raise ValueError("A clock cannot go backwards")
+        self.current_time += seconds
+
+    def advance_to(self, timestamp: float) -> None:
+        """
+        Move the clock to a timestamp, a timestamp in the past leaves it where it is
+
+        :param timestamp: time to move to
+        """
+        self.current_time = max(self.current_time, timestamp)
+
+
+def poisson_arrivals(rate: float, duration: float, seed: Optional[int] = None) -> Iterator[float]:
+    """
+    Arrival times of a Poisson process, the usual model of many independent clients
+
+    :param rate: mean number of arrivals per second
+    :param duration: seconds of traffic
+    :param seed: seed of the random generator, for reproducible traces
+    :return: arrival times in increasing order, from 0
+    """
+    if rate <= 0 or duration <= 0:
+        raise ValueError("Rate and duration must be positive")
+    return _varying_rate_arrivals(lambda timestamp: rate, rate, duration, random.Random(seed))
+
+
+def bursty_arrivals(rate: float, burst_rate: float, burst_duration: float, burst_interval: float, duration: float,
+                    seed: Optional[int] = None) -> Iterator[float]:
+    """
+    Arrival times of an on-off Poisson process: burst_rate for burst_duration seconds at the start of every
+    burst_interval, rate the rest of the time
+
+    :param rate: mean number of arrivals per second between bursts
+    :param burst_rate: mean number of arrivals per second during a burst
+    :param burst_duration: seconds of a burst
+    :param burst_interval: seconds from the start of a burst to the start of the next one
+    :param duration: seconds of traffic
+    :param seed: seed of the random generator, for reproducible traces
+    :return: arrival times in increasing order, from 0
+    """
+    if rate < 0 or burst_rate <= 0 or duration <= 0:
+        raise ValueError("Rates must not be negative, burst rate and duration must be positive")
+    if not 0 < burst_duration <= burst_interval:
+        raise ValueError("Burst duration must be positive and at most the burst interval")
+
+    def rate_at(timestamp: float) -> float:
+        return burst_rate if timestamp % burst_interval < burst_duration else rate
+
+    return _varying_rate_arrivals(rate_at, max(rate, burst_rate), duration, random.Random(seed))
+
+
+def diurnal_arrivals(mean_rate: float, amplitude: float, duration: float, period: float = 86_400.0,
+                     seed: Optional[int] = None) -> Iterator[float]:
+    """
+    Arrival times of a Poisson process whose rate follows a daily cycle, lowest at the start of the period
+    and highest in the middle: mean_rate * (1 - amplitude * cos(2 * pi * t / period))
+
+    :param mean_rate: mean number of arrivals per second over a period
+    :param amplitude: relative swing of the rate around its mean, between 0 and 1
+    :param duration: seconds of traffic
+    :param period: seconds of a cycle, a day by default
+    :param seed: seed of the random generator, for reproducible traces
+    :return: arrival times in increasing order, from 0
+    """
+    if mean_rate <= 0 or duration <= 0 or period <= 0:
+        raise ValueError("Mean rate, duration and period must be positive")
+    if not 0 <= amplitude <= 1:
+        raise ValueError("Amplitude must be between 0 and 1")
+
+    def rate_at(timestamp: float) -> float:
+        return mean_rate * (1 - amplitude * math.cos(2 * math.pi * timestamp / period))
+
+    return _varying_rate_arrivals(rate_at, mean_rate * (1 + amplitude), duration, random.Random(seed))
+
+
+def recorded_arrivals(timestamps: Iterable[float], time_scale: float = 1.0) -> Iterator[float]:
+    """
+    Arrival times of a recorded trace, e.g. the timestamps of an access log, shifted to start at 0
+
+    :param timestamps: recorded times in seconds, in increasing order
+    :param time_scale: factor applied to the gaps between arrivals, below 1 to replay the trace faster
+    :return: arrival times in increasing order, from 0
+    """
+    if time_scale <= 0:
+        raise ValueError("Time scale must be positive")
+    return _shifted_arrivals(timestamps, time_scale)
+
+
+def default_decision(limiter: Any) -> bool:
+    """Decide one request of cost 1 on any of the limiters of this package."""
+    if hasattr(limiter, 'consume'):
+        return limiter.consume(1)
+    if hasattr(limiter, 'add_tokens'):
+        return limiter.add_tokens(1)
+    return limiter.allow_request()
+
+
+def simulate(limiter_factory: Callable[[VirtualClock], Any], arrivals: Iterable[float],
+             decide: Callable[[Any], bool] = default_decision, interval: Optional[float] = None) -> dict:
+    """
+    Feed a trace of arrivals through a limiter in virtual time: the clock jumps from one arrival to the next,
+    so hours of traffic take as long as the decisions themselves
+
+    :param limiter_factory: callable creating the limiter from the virtual clock,
+        e.g. lambda clock: TokenBucket(capacity=10, fill_rate=1, clock=clock)
+    :param arrivals: arrival times in increasing order, e.g. poisson_arrivals(rate=100, duration=3600)
+    :param decide: decision of one request on the limiter, default_decision if omitted
+    :param interval: if given, also count allowed and denied requests per interval of that many seconds
+    :return: dictionary with the number of requests, allowed and denied ones, the deny rate, the duration
+        of the trace and, with an interval, the list of (interval start, allowed, denied) of every interval
+    """
+    if interval is not None and interval <= 0:
+        raise ValueError("Interval must be positive")
+
+    clock = VirtualClock()
+    limiter = limiter_factory(clock)
+    requests = allowed = 0
+    timeline = []
+    for timestamp in arrivals:
+        clock.advance_to(timestamp)
+        requests += 1
+        is_allowed = decide(limiter)
+        allowed += is_allowed
+
+        if interval is not None:
+            interval_start = math.floor(timestamp / interval) * interval
+            if not timeline or timeline[-1][0] != interval_start:
+                timeline.append([interval_start, 0, 0])
+            timeline[-1][1 if is_allowed else 2] += 1
+
+    result = {
+        'requests': requests,
+        'allowed': allowed,
+        'denied': requests - allowed,
+        'deny_rate': (requests - allowed) / requests if requests else 0.0,
+        'duration': clock.current_time,
+    }
+    if interval is not None:
+        result['timeline'] = [tuple(counts) for counts in timeline]
+    return result
+
+
+def _varying_rate_arrivals(rate_at: Callable[[float], float], max_rate: float, duration: float,
+                           rng: random.Random) -> Iterator[float]:
+    """
+    Arrival times of a Poisson process of varying rate, by thinning: candidates are drawn at max_rate and each one
+    is kept with probability rate_at(t) / max_rate
+    """
+    timestamp = 0.0
+    while True:
+        timestamp += rng.expovariate(max_rate)
+        if timestamp >= duration:
+            return
+        if rng.random() * max_rate < rate_at(timestamp):
+            yield timestamp
+
+
+def _shifted_arrivals(timestamps: Iterable[float], time_scale: float) -> Iterator[float]:
+    """
+    Arrival times of a recorded trace shifted to start at 0, the gaps between them scaled by time_scale
+    """
+    first_timestamp = None
+    for timestamp in timestamps:
+        if first_timestamp is None:
+            first_timestamp = timestamp
+        yield (timestamp - first_timestamp) * time_scale
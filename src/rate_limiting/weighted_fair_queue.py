@@ -0,0 +1,227 @@
+import math
+import time
+from collections import deque
+from threading import Condition, Lock
+from typing import Any, Callable, Hashable, Optional
+
+# Attributes holding the largest cost a limiter can ever admit at once, in the order they are looked up
+CAPACITY_ATTRIBUTES = ('capacity', 'max_allowed_requests')
+
+
+class _TenantQueue:
+    """
+    Queued items of a tenant with its deficit counter
+    """
+    __slots__ = ('tenant', 'items', 'quantum', 'deficit')
+
+    def __init__(self, tenant: Hashable, quantum: float):
+        self.tenant: Hashable = tenant
+        self.items: deque = deque()  # (item, cost) in enqueue order
+        self.quantum: float = quantum  # Cost the tenant may dequeue per round, proportional to its weight
+        self.deficit: float = quantum  # Cost the tenant may still dequeue in the current round
+
+
+class WeightedFairQueue:
+    def __init__(self, limiter: Any, quantum: float = 1.0, max_queue_length: int = 1000,
+                 default_weight: float = 1.0, clock: Optional[Callable[[], float]] = None):
+        """
+        Initialize a queue sharing the capacity of a limiter among tenants, in proportion to their weights
+
+        Items of every tenant wait in a queue of their own, and dequeue hands them out in deficit round robin
+        order: the tenants with queued items take turns, and on its turn a tenant may dequeue items up to its
+        deficit, topped up by quantum * weight every round, so over a round every busy tenant gets a share of the
+        limiter proportional to its weight whatever the cost of its items. The item picked is only dequeued once
+        the limiter admits its cost, so the limiter sets the pace and the queue sets the order. A tenant whose
+        queue empties leaves the rotation and loses the rest of its deficit: idle tenants bank nothing, their share
+        goes to the busy ones. A tenant flooding the queue only lengthens its own queue, which holds at most
+        max_queue_length items: another tenant's item waits for one round at most, the sum of the quanta of the
+        busy tenants, however many items the flooding tenant queued.
+        A dequeue is O(1) as long as quantum * weight is at least the cost of an item, otherwise a tenant takes
+        several rounds to build up the deficit of an expensive item.
+
+        :param limiter: shared limiter the items are admitted by, e.g. TokenBucket or LeakyBucket, or any limiter
+            of this package supporting two-phase decisions, see HierarchicalRateLimiter, with a capacity or
+            max_allowed_requests bounding the cost of an item
+        :param quantum: cost a tenant of weight 1 may dequeue per round
+        :param max_queue_length: maximum number of items queued per tenant, enqueue rejects items beyond it
+        :param default_weight: weight of the tenants without one set by set_weight
+        :param clock: zero-argument callable returning the current time in seconds, time.monotonic if omitted,
+            the clock of the limiter, e.g. a VirtualClock, to run the queue in simulated time
+        """
+        if not hasattr(limiter, '_check') or not hasattr(limiter, '_commit'):
+            raise ValueError("The limiter must support two-phase decisions")
+        capacity_attribute = next((name for name in CAPACITY_ATTRIBUTES if hasattr(limiter, name)), None)
+        if capacity_attribute is None:
+            raise ValueError(f"{type(limiter).__name__} has no capacity to check the costs against")
+        if quantum <= 0 or default_weight <= 0:
+            raise ValueError("Quantum and default weight must be positive")
+        if max_queue_length <= 0:
+            raise ValueError("Max queue length must be positive")
+
+        self.clock: Callable[[], float] = time.monotonic if clock is None else clock
+        self.limiter: Any = limiter
+        # Attribute of the limiter bounding the cost of an item, read on every enqueue as it may be retuned
+        self.capacity_attribute: str = capacity_attribute
+        self.quantum: float = quantum
+        self.max_queue_length: int = max_queue_length
+        self.default_weight: float = default_weight
+        self.weights: dict = {}  # Tenant -> weight set by set_weight
+
+        self.queues: dict = {}  # Tenant -> _TenantQueue, of the tenants with queued items only
+        self.active: deque = deque()  # _TenantQueue of the tenants with queued items, the head has the turn
+        self.length: int = 0  # Items queued for all the tenants
+
+        self.lock: Lock = Lock()
+        # Condition on the same lock, threads waiting in get park on it
+        self.condition: Condition = Condition(self.lock)
+
+    def set_weight(self, tenant: Hashable, weight: float) -> None:
+        """
+        Set the weight of a tenant, applied from its next round
+
+        :param tenant: key identifying the tenant
+        :param weight: share of the tenant relative to the others
+        """
+        if weight <= 0:
+            raise ValueError("Weight must be positive")
+
+        with self.lock:
+            self.weights[tenant] = weight
+            queue = self.queues.get(tenant)
+            if queue is not None:
+                queue.quantum = self.quantum * weight
+
+    def enqueue(self, tenant: Hashable, item: Any, cost: int = 1) -> bool:
+        """
+        Queue an item of a tenant
+
+        :param tenant: key identifying the tenant
+        :param item: item to queue, returned as is by dequeue
+        :param cost: tokens or requests the item takes from the limiter, at most its capacity or
+            max_allowed_requests: an item the limiter can never admit would stall the rotation
+        :return: True, if the item was queued, False if the queue of the tenant is full
+        """
+        if cost < 0:
+            raise ValueError("Cost cannot be negative")
+        if cost > getattr(self.limiter, self.capacity_attribute):
+            raise ValueError(f"Cost cannot exceed the {self.capacity_attribute} of the limiter")
+
+        with self.lock:
+            queue = self.queues.get(tenant)
+            if queue is None:
+                queue = _TenantQueue(tenant, self.quantum * self.weights.get(tenant, self.default_weight))
+                self.queues[tenant] = queue
+                self.active.append(queue)
+            elif len(queue.items) >= self.max_queue_length:
+                return False
+
+            queue.items.append((item, cost))
+            self.length += 1
+            self.condition.notify()
+            return True
+
+    def dequeue(self) -> Optional[tuple[Hashable, Any]]:
+        """
+        Dequeue the next item in fair order, if the limiter admits it now
+
+        :return: (tenant, item), None if no item is queued or the limiter does not admit the next one yet
+        """
+        with self.lock:
+            return self.__dequeue()
+
+    def get(self, timeout: Optional[float] = None) -> Optional[tuple[Hashable, Any]]:
+        """
+        Dequeue the next item in fair order, waiting for an item to be queued or for the limiter to admit it
+
+        :param timeout: maximum number of seconds to wait, None to wait as long as needed
+        :return: (tenant, item), None if no item could be dequeued before the timeout
+        """
+        deadline = None if timeout is None else self.clock() + timeout
+        with self.condition:
+            while True:
+                entry = self.__dequeue()
+                if entry is not None:
+                    return entry
+
+                wait_time = self.__time_until_available()
+                if deadline is not None:
+                    wait_time = min(wait_time, deadline - self.clock())
+                    if wait_time <= 0:
+                        return None
+                self.condition.wait(None if wait_time == math.inf else wait_time)
+
+    def time_until_available(self) -> float:
+        """
+        Get the time until the limiter admits the next item
+
+        :return: seconds to wait, 0 if the next item can be dequeued now, infinity if no item is queued
+        """
+        with self.lock:
+            return self.__time_until_available()
+
+    def get_queue_length(self, tenant: Optional[Hashable] = None) -> int:
+        """
+        Get the number of queued items
+
+        :param tenant: tenant whose items are counted, None to count the items of every tenant
+        :return: queued items
+        """
+        with self.lock:
+            if tenant is None:
+                return self.length
+            queue = self.queues.get(tenant)
+            return 0 if queue is None else len(queue.items)
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __next_queue(self) -> Optional[_TenantQueue]:
+        """
+        Find the queue whose head item is the next to dequeue, ending the turns of the tenants whose deficit does
+        not cover their head item
+        This method is not thread-safe and should be called within a lock
+        """
+        active = self.active
+        if not active:
+            return None
+        queue = active[0]
+        while queue.items[0][1] > queue.deficit:
+            # End of the turn, the deficit is topped up for the next round
+            queue.deficit += queue.quantum
+            active.rotate(-1)
+            queue = active[0]
+        return queue
+
+    def __dequeue(self) -> Optional[tuple[Hashable, Any]]:
+        """
+        Dequeue the next item if the limiter admits its cost
+        This method is not thread-safe and should be called within a lock
+        """
+        queue = self.__next_queue()
+        if queue is None:
+            return None
+        item, cost = queue.items[0]
+        limiter = self.limiter
+        with limiter.lock:
+            if not limiter._check(cost):
+                return None  # The item stays next, its turn is not over
+            limiter._commit(cost)
+
+        queue.items.popleft()
+        queue.deficit -= cost
+        self.length -= 1
+        if not queue.items:
+            # An idle tenant banks nothing, its next item starts a new turn with a fresh quantum
+            self.active.popleft()
+            del self.queues[queue.tenant]
+        return queue.tenant, item
+
+    def __time_until_available(self) -> float:
+        """
+        Get the time until the limiter admits the next item, infinity if no item is queued
+        This method is not thread-safe and should be called within a lock
+        """
+        queue = self.__next_queue()
+        if queue is None:
+            return math.inf
+        return self.limiter.time_until_available(queue.items[0][1])
@@ -0,0 +1,163 @@
+import csv
+import gzip
+import json
+
+import pytest
+
+from src.rate_limiting import access_log_replay
+from src.rate_limiting.access_log_replay import ALGORITHMS, limit_grid, read_access_log, replay_access_log
+from src.rate_limiting.keyed_rate_limiter import KeyedRateLimiter
+from src.rate_limiting.traffic_simulator import VirtualClock, default_decision
+
+
+def write_jsonl(path, records):
+    opener = gzip.open if str(path).endswith('.gz') else open
+    with opener(path, 'wt') as file:
+        for record in records:
+            file.write(json.dumps(record) + '\n')
+
+
+class TestAccessLogReplay:
+
+    def test_read_gzip_jsonl(self, tmp_path):
+        path = tmp_path / 'access.jsonl.gz'
+        write_jsonl(path, [{'ts': 10.5, 'client': 'a'}, {'ts': '2024-01-01T00:00:00Z', 'client': 7}])
+        requests = list(read_access_log(str(path), key_field='client', timestamp_field='ts'))
+        assert requests == [(10.5, 'a'), (1704067200.0, '7')]
+
+    def test_read_csv(self, tmp_path):
+        path = tmp_path / 'access.csv'
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['timestamp', 'key', 'path'])
+            writer.writerow(['1.0', 'a', '/'])
+            writer.writerow(['2.0', 'b', '/login'])
+        assert list(read_access_log(str(path))) == [(1.0, 'a'), (2.0, 'b')]
+
+    def test_invalid_lines(self, tmp_path):
+        path = tmp_path / 'access.jsonl'
+        with open(path, 'w') as file:
+            file.write('{"timestamp": 1, "key": "a"}\n\nnot json\n{"key": "b"}\n{"timestamp": 2, "key": "c"}\n')
+        with pytest.raises(ValueError, match="line 3"):
+            list(read_access_log(str(path)))
+        assert list(read_access_log(str(path), skip_invalid=True)) == [(1.0, 'a'), (2.0, 'c')]
+
+    def test_read_is_lazy(self, tmp_path):
+        path = tmp_path / 'access.jsonl'
+        write_jsonl(path, ({'timestamp': i, 'key': 'a'} for i in range(1000)))
+        requests = read_access_log(str(path))
+        assert next(requests) == (0.0, 'a')
+        requests.close()
+
+    def test_limit_grid(self):
+        assert limit_grid(capacity=[5, 10], fill_rate=[1]) == [{'capacity': 5, 'fill_rate': 1},
+                                                               {'capacity': 10, 'fill_rate': 1}]
+
+    def test_per_key_deny_rates(self):
+        # Key 'a' sends 4 requests per second for 100 seconds, key 'b' one per second
+        requests = sorted([(t / 4, 'a') for t in range(400)] + [(t + 0.1, 'b') for t in range(100)])
+        report = replay_access_log(requests, 'token_bucket', limit_grid(capacity=[2], fill_rate=[1, 2, 4]),
+                                   target_deny_rate=0.05)
+        assert report['requests'] == 500
+        assert report['keys'] == 2
+        assert report['duration'] == pytest.approx(99.75)
+
+        per_key = report['per_key']
+        assert per_key['b']['deny_rates'] == [0.0, 0.0, 0.0]
+        assert per_key['b']['smallest_limits'] == {'capacity': 2, 'fill_rate': 1}
+        assert per_key['a']['deny_rates'][0] == pytest.approx(0.75, abs=0.01)
+        assert per_key['a']['deny_rates'][1] == pytest.approx(0.5, abs=0.01)
+        assert per_key['a']['deny_rates'][2] == 0.0
+        assert per_key['a']['smallest_limits'] == {'capacity': 2, 'fill_rate': 4}
+
+        assert [result['keys_over_target'] for result in report['candidates']] == [1, 1, 0]
+        assert report['recommended'] == {'capacity': 2, 'fill_rate': 4}
+
+    def test_candidates_are_sorted_from_smallest(self):
+        requests = [(float(t), 'a') for t in range(10)]
+        report = replay_access_log(requests, 'sliding_window_log',
+                                   [{'max_allowed_requests': 10, 'window_size': 1},
+                                    {'max_allowed_requests': 1, 'window_size': 2}])
+        assert [result['limits']['max_allowed_requests'] for result in report['candidates']] == [1, 10]
+        assert report['candidates'][0]['denied'] == 5
+        assert report['recommended'] == {'max_allowed_requests': 10, 'window_size': 1}
+
+    def test_no_candidate_meets_the_target(self):
+        requests = [(0.0, 'a')] * 10
+        report = replay_access_log(requests, 'fixed_window_counter',
+                                   [{'max_allowed_requests': 5, 'window_size': 1}], target_deny_rate=0.1)
+        assert report['candidates'][0]['deny_rate'] == 0.5
+        assert report['recommended'] is None
+        assert report['per_key']['a']['smallest_limits'] is None
+
+    @pytest.mark.parametrize('algorithm, limits', [
+        ('token_bucket', {'capacity': 3, 'fill_rate': 1}),
+        ('leaky_bucket', {'capacity': 3, 'leak_rate': 1}),
+        ('fixed_window_counter', {'max_allowed_requests': 3, 'window_size': 2}),
+        ('sliding_window_counter', {'max_allowed_requests': 3, 'window_size': 2}),
+        ('sliding_window_log', {'max_allowed_requests': 3, 'window_size': 2}),
+    ])
+    def test_evicting_idle_keys_does_not_change_decisions(self, algorithm, limits):
+        # Keys come back after idle gaps long enough for their limiter to be evicted
+        requests = []
+        for burst in range(50):
+            for key in range(20):
+                requests += [(burst * 7.3 + key * 0.01 + i * 0.1, key) for i in range(5)]
+        requests.sort()
+
+        # Same log through limiters that are never evicted
+        clock = VirtualClock()
+        limiters = {}
+        expected_denied = 0
+        for timestamp, key in requests:
+            clock.advance_to(timestamp)
+            limiter = limiters.setdefault(key, ALGORITHMS[algorithm][0](**limits, clock=clock))
+            expected_denied += not default_decision(limiter)
+
+        report = replay_access_log(requests, algorithm, [limits])
+        assert report['candidates'][0]['denied'] == expected_denied
+        assert 0 < expected_denied < len(requests)
+
+    def test_idle_keys_expire_as_the_log_goes(self, monkeypatch):
+        registries = []
+
+        def recording_registry(*args, **kwargs):
+            registries.append(KeyedRateLimiter(*args, **kwargs))
+            return registries[-1]
+
+        monkeypatch.setattr(access_log_replay, 'KeyedRateLimiter', recording_registry)
+        # A new key every 0.1s, each idle for good after its request
+        requests = [(i * 0.1, f'client-{i}') for i in range(10_000)]
+        report = replay_access_log(requests, 'token_bucket', [{'capacity': 3, 'fill_rate': 1}])
+        assert 9_990 <= report['keys'] <= 10_000  # Counted by the sketch, a key colliding on every row is missed
+        # Keys are dropped (3 + 1) / 1 seconds after their request, up to a quarter of that late
+        assert len(registries[0]) <= 51
+
+    def test_only_the_heaviest_keys_are_reported(self):
+        # 3 heavy keys sending 5 requests per second among 20000 keys sending one request each
+        requests = sorted([(t / 5, f'heavy-{key}') for t in range(500) for key in range(3)] +
+                          [(t / 200, f'light-{t}') for t in range(20_000)])
+        report = replay_access_log(requests, 'token_bucket', limit_grid(capacity=[2], fill_rate=[1, 5]),
+                                   top_keys=10)
+        assert report['requests'] == 21_500 and 19_900 <= report['keys'] <= 20_003
+        assert len(report['per_key']) == 10
+        assert list(report['per_key'])[:3] == ['heavy-0', 'heavy-1', 'heavy-2']  # Most requests first
+        heavy = report['per_key']['heavy-0']
+        assert heavy['requests'] == 500
+        assert heavy['deny_rates'][0] == pytest.approx(0.8, abs=0.01) and heavy['deny_rates'][1] == 0.0
+        assert heavy['smallest_limits'] == {'capacity': 2, 'fill_rate': 5}
+        # Only the heavy keys are denied, and they were counted from their first request
+        assert report['candidates'][0]['denied'] == sum(round(stats['deny_rates'][0] * stats['requests'])
+                                                        for stats in report['per_key'].values())
+
+    def test_invalid_arguments(self):
+        with pytest.raises(ValueError):
+            replay_access_log([], 'unknown', [{'capacity': 1, 'fill_rate': 1}])
+        with pytest.raises(ValueError):
+            replay_access_log([], 'token_bucket', [])
+        with pytest.raises(ValueError):
+            replay_access_log([], 'token_bucket', [{'capacity': 0, 'fill_rate': 1}])
+        with pytest.raises(ValueError):
+            replay_access_log([], 'token_bucket', [{'capacity': 1, 'fill_rate': 1}], target_deny_rate=1)
+        with pytest.raises(ValueError):
+            replay_access_log([], 'token_bucket', [{'capacity': 1, 'fill_rate': 1}], top_keys=0)
@@ -0,0 +1,93 @@
+import pytest
+
+from src.rate_limiting.adaptive_rate_limiter import AIMDController, simulate_goodput
+from src.rate_limiting.fixed_window_counter import FixedWindowCounter
+from src.rate_limiting.leaky_bucket import LeakyBucket
+from src.rate_limiting.token_bucket import TokenBucket
+from src.rate_limiting.traffic_simulator import VirtualClock, poisson_arrivals
+
+
+class TestAIMDController:
+
+    def test_init_invalid_params(self):
+        bucket = TokenBucket(capacity=10, fill_rate=10)
+        with pytest.raises(ValueError):
+            AIMDController(bucket, latency_target=0, min_rate=1, max_rate=10)
+        with pytest.raises(ValueError):
+            AIMDController(bucket, latency_target=0.1, min_rate=10, max_rate=1)
+        with pytest.raises(ValueError):
+            AIMDController(bucket, latency_target=0.1, min_rate=1, max_rate=10, decrease_factor=1)
+        with pytest.raises(ValueError):
+            AIMDController(object(), latency_target=0.1, min_rate=1, max_rate=10)
+
+    def test_additive_increase_multiplicative_decrease(self):
+        clock = VirtualClock()
+        bucket = TokenBucket(capacity=10, fill_rate=50, clock=clock)
+        controller = AIMDController(bucket, latency_target=0.1, min_rate=10, max_rate=100, increase=5,
+                                    interval=1, clock=clock)
+        for _ in range(3):
+            for _ in range(20):
+                controller.record(0.05)
+            clock.advance(1)
+            controller.record(0.05)  # First call of the next interval adjusts the rate
+        assert bucket.fill_rate == 65
+
+        for _ in range(20):
+            controller.record(0.5)  # Slow
+        clock.advance(1)
+        controller.record(0.05, error=True)
+        assert bucket.fill_rate == 32.5
+
+        clock.advance(10)  # Idle intervals are skipped, a single increase follows them
+        controller.record(0.05)
+        assert bucket.fill_rate == 37.5
+        for _ in range(10):
+            for _ in range(20):
+                controller.record(1, error=True)
+            clock.advance(1)
+        controller.record(1, error=True)
+        assert bucket.fill_rate == 10  # Held at min_rate
+
+    def test_tolerance(self):
+        clock = VirtualClock()
+        bucket = LeakyBucket(capacity=10, leak_rate=20, clock=clock)
+        controller = AIMDController(bucket, latency_target=0.1, min_rate=1, max_rate=100, tolerance=0.1, clock=clock)
+        for i in range(100):
+            controller.record(0.5 if i < 10 else 0.01)  # 10% slow, within tolerance
+        clock.advance(1)
+        controller.record(0.01)
+        assert bucket.leak_rate == 21
+
+    def test_integer_rate(self):
+        clock = VirtualClock()
+        counter = FixedWindowCounter(max_allowed_requests=10, window_size=1, clock=clock)
+        controller = AIMDController(counter, latency_target=0.1, min_rate=1, max_rate=100, increase=0.5,
+                                    clock=clock)
+        assert controller.attribute == 'max_allowed_requests'
+        for expected in (10, 11, 12, 12):  # Round half to even, the controller keeps the fraction
+            controller.record(0.01)
+            clock.advance(1)
+            controller.record(0.01)
+            assert counter.max_allowed_requests == expected and isinstance(counter.max_allowed_requests, int)
+
+    def test_adaptive_limit_improves_goodput(self):
+        def capacity_at(timestamp):
+            return 200 if timestamp < 60 else 60 if timestamp < 120 else 400  # The backend degrades, then scales out
+
+        def run(controller_factory):
+            return simulate_goodput(lambda clock: TokenBucket(capacity=20, fill_rate=150, clock=clock),
+                                    poisson_arrivals(rate=350, duration=180, seed=1), capacity_at, timeout=0.5,
+                                    controller_factory=controller_factory, interval=60)
+
+        static = run(None)
+        adaptive = run(lambda limiter, clock: AIMDController(limiter, latency_target=0.1, min_rate=10, max_rate=1000,
+                                                             increase=10, clock=clock))
+        assert static['requests'] == adaptive['requests']
+        assert static['served'] + static['failed'] == static['admitted']
+        # The static limit overloads the degraded backend, whose queue never drains: every later request times out
+        assert static['timeline'][2][1] == 0
+        assert static['failed'] > static['served']
+        # The controller backs off, then follows the backend as it scales out
+        assert adaptive['failed'] < adaptive['admitted'] * 0.02
+        assert adaptive['served'] > 2.5 * static['served']
+        assert adaptive['timeline'][2][2] > 300
@@ -0,0 +1,152 @@
+import asyncio
+import pytest
+import time
+
+from src.rate_limiting.async_rate_limiter import (
+    AsyncFixedWindowCounter,
+    AsyncRateLimiter,
+    AsyncLeakyBucket,
+    AsyncSlidingWindowCounter,
+    AsyncSlidingWindowLog,
+    AsyncTokenBucket,
+)
+
+
+class TestAsyncRateLimiter:
+
+    def test_base_class_is_abstract(self):
+        with pytest.raises(TypeError):
+            AsyncRateLimiter()
+
+    def test_acquire_without_waiting(self):
+        async def run():
+            bucket = AsyncTokenBucket(capacity=5, fill_rate=1)
+            await bucket.acquire(3)
+            return bucket.tokens
+
+        assert asyncio.run(run()) == 2
+
+    def test_acquire_waits_for_refill(self):
+        async def run():
+            bucket = AsyncTokenBucket(capacity=2, fill_rate=20)
+            await bucket.acquire(2)
+            start_time = time.monotonic()
+            await bucket.acquire(1)
+            return time.monotonic() - start_time
+
+        assert 0.04 <= asyncio.run(run()) <= 0.2
+
+    def test_acquire_waits_for_leak(self):
+        async def run():
+            bucket = AsyncLeakyBucket(capacity=2, leak_rate=20)
+            await bucket.acquire(2)
+            start_time = time.monotonic()
+            await bucket.acquire(1)
+            return time.monotonic() - start_time
+
+        assert 0.04 <= asyncio.run(run()) <= 0.2
+
+    def test_waiters_are_served_in_fifo_order(self):
+        async def run():
+            bucket = AsyncTokenBucket(capacity=1, fill_rate=100)
+            await bucket.acquire(1)
+            served = []
+
+            async def request(i):
+                await bucket.acquire(1)
+                served.append(i)
+
+            await asyncio.gather(*(request(i) for i in range(10)))
+            return served
+
+        assert asyncio.run(run()) == list(range(10))
+
+    def test_large_request_is_not_overtaken(self):
+        async def run():
+            bucket = AsyncTokenBucket(capacity=5, fill_rate=50)
+            await bucket.acquire(5)
+            served = []
+
+            async def request(name, tokens):
+                await bucket.acquire(tokens)
+                served.append(name)
+
+            await asyncio.gather(request('large', 5), request('small', 1))
+            return served
+
+        assert asyncio.run(run()) == ['large', 'small']
+
+    def test_cancelled_waiter_does_not_block_queue(self):
+        async def run():
+            bucket = AsyncTokenBucket(capacity=1, fill_rate=20)
+            await bucket.acquire(1)
+            first = asyncio.ensure_future(bucket.acquire(1))
+            second = asyncio.ensure_future(bucket.acquire(1))
+            await asyncio.sleep(0)
+            first.cancel()
+            await asyncio.wait_for(second, timeout=1)
+            return len(bucket.waiters)
+
+        assert asyncio.run(run()) == 0
+
+    def test_async_context_manager(self):
+        async def run():
+            counter = AsyncFixedWindowCounter(max_allowed_requests=3, window_size=10)
+            for _ in range(3):
+                async with counter:
+                    pass
+            return counter.get_remaining_requests()
+
+        assert asyncio.run(run()) == 0
+
+    def test_acquire_waits_for_next_window(self):
+        async def run():
+            counter = AsyncFixedWindowCounter(max_allowed_requests=2, window_size=0.1)
+            await counter.acquire()
+            await counter.acquire()
+            start_time = time.monotonic()
+            await counter.acquire()
+            return time.monotonic() - start_time
+
+        assert 0.05 <= asyncio.run(run()) <= 0.2
+
+    def test_sliding_window_log_waits_for_oldest_request(self):
+        async def run():
+            log = AsyncSlidingWindowLog(max_allowed_requests=2, window_size=0.1)
+            start_time = time.monotonic()
+            for _ in range(3):
+                await log.acquire()
+            return time.monotonic() - start_time
+
+        assert 0.09 <= asyncio.run(run()) <= 0.2
+
+    def test_sliding_window_counter_acquire(self):
+        async def run():
+            counter = AsyncSlidingWindowCounter(max_allowed_requests=5, window_size=1)
+            await counter.acquire()
+            return counter.current_request_count
+
+        assert asyncio.run(run()) >= 1
+
+    def test_invalid_amounts(self):
+        async def run(limiter, amount):
+            await limiter.acquire(amount)
+
+        with pytest.raises(ValueError):
+            asyncio.run(run(AsyncTokenBucket(capacity=5, fill_rate=1), 6))
+        with pytest.raises(ValueError):
+            asyncio.run(run(AsyncTokenBucket(capacity=5, fill_rate=1), -1))
+        with pytest.raises(ValueError):
+            asyncio.run(run(AsyncLeakyBucket(capacity=5, leak_rate=1), 6))
+        with pytest.raises(ValueError):
+            asyncio.run(run(AsyncSlidingWindowLog(max_allowed_requests=5, window_size=1), 6))
+
+    def test_weighted_window_acquire(self):
+        async def run():
+            log = AsyncSlidingWindowLog(max_allowed_requests=10, window_size=0.1)
+            await log.acquire(6)
+            start_time = time.monotonic()
+            await log.acquire(5)
+            return time.monotonic() - start_time
+
+        assert 0.09 <= asyncio.run(run()) <= 0.2
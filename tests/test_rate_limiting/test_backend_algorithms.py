@@ -0,0 +1,42 @@
+import random
+
+import pytest
+
+from src.rate_limiting import shared_memory_backend, storage_backend
+from src.rate_limiting.backend_algorithms import ALGORITHMS, gcra, sliding_window_counter, token_bucket
+from src.rate_limiting.shared_memory_backend import STATE_SIZES, SharedMemoryStorageBackend
+from src.rate_limiting.storage_backend import InMemoryStorageBackend
+
+
+class TestBackendAlgorithms:
+
+    def test_functions_are_pure(self):
+        state = None
+        replies = []
+        for now in (100.0, 100.0, 100.0, 100.5):
+            reply, state, time_to_live = token_bucket(state, now, 2, 2, 1)
+            replies.append(reply)
+        assert replies == [1, 1, 0, 1]
+        assert state == (0.0, 100.5) and time_to_live == 1.0
+        # The same inputs always give the same outputs, the state is never changed in place
+        assert token_bucket((1.0, 100.0), 100.25, 2, 2, 1) == token_bucket((1.0, 100.0), 100.25, 2, 2, 1)
+        assert gcra(None, 1.0, 2, 2, 1) == (1, (1_500_000,), 0.5)
+        assert sliding_window_counter((9, 3, 0), 10.5, 4, 1, 1) == (1, (10, 1, 3), 2)
+
+    @pytest.mark.parametrize('algorithm', list(STATE_SIZES))
+    def test_shared_and_in_memory_backends_agree(self, tmp_path, monkeypatch, algorithm):
+        current_time = [1000.0]
+        monkeypatch.setattr(storage_backend.time, 'time', lambda: current_time[0])
+        monkeypatch.setattr(shared_memory_backend.time, 'time', lambda: current_time[0])
+        in_memory = InMemoryStorageBackend()
+        rng = random.Random(5)
+        with SharedMemoryStorageBackend(str(tmp_path / 'table'), num_stripes=2, slots_per_stripe=16) as shared:
+            for _ in range(500):
+                current_time[0] += rng.expovariate(4)
+                args = [5, 2, rng.randint(1, 3), '']
+                key = f'key-{rng.randrange(4)}'
+                assert shared.evaluate(algorithm, key, args) == in_memory.evaluate(algorithm, key, args)
+
+    def test_every_script_has_a_function(self):
+        assert set(ALGORITHMS) == set(storage_backend.LUA_SCRIPTS)
+        assert set(STATE_SIZES) <= set(ALGORITHMS)
@@ -0,0 +1,127 @@
+import numpy as np
+import pytest
+import random
+import time
+
+from src.rate_limiting import batch_rate_limiter
+from src.rate_limiting.batch_rate_limiter import (
+    BatchFixedWindowCounter,
+    BatchLeakyBucket,
+    BatchSlidingWindowCounter,
+    BatchSlidingWindowLog,
+    BatchTokenBucket,
+)
+from src.rate_limiting.fixed_window_counter import FixedWindowCounter
+from src.rate_limiting.leaky_bucket import LeakyBucket
+from src.rate_limiting.sliding_window_counter import SlidingWindowCounter
+from src.rate_limiting.sliding_window_log import SlidingWindowLog
+from src.rate_limiting.token_bucket import TokenBucket
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    current_time = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: current_time[0])
+    return current_time
+
+
+def compare_with_sequential(clock, batch_decide, create_limiter, decide, with_costs):
+    """Run random batches through the batch limiter and through one single-key limiter per key."""
+    rng = random.Random(42)
+    limiters = {}
+    for _ in range(200):
+        clock[0] += rng.expovariate(20)
+        keys = [rng.randrange(30) for _ in range(rng.randint(1, 60))]
+        costs = [rng.choice((0, 1, 1, 1, 2, 5)) for _ in keys]
+        mask = batch_decide(keys, costs) if with_costs else batch_decide(keys)
+
+        expected = []
+        for key, cost in zip(keys, costs):
+            if key not in limiters:
+                limiters[key] = create_limiter()
+            expected.append(decide(limiters[key], cost) if with_costs else decide(limiters[key]))
+        assert mask.tolist() == expected
+
+
+class TestBatchRateLimiter:
+
+    def test_init_invalid_params(self):
+        with pytest.raises(ValueError):
+            BatchTokenBucket(capacity=0, fill_rate=1)
+        with pytest.raises(ValueError):
+            BatchLeakyBucket(capacity=10, leak_rate=0)
+        with pytest.raises(ValueError):
+            BatchFixedWindowCounter(max_allowed_requests=0, window_size=1)
+        with pytest.raises(ValueError):
+            BatchSlidingWindowCounter(max_allowed_requests=10, window_size=-1)
+        with pytest.raises(ValueError):
+            BatchSlidingWindowLog(max_allowed_requests=10, window_size=1, initial_slots=0)
+
+    def test_base_class_is_abstract(self):
+        with pytest.raises(TypeError):
+            batch_rate_limiter._BatchRateLimiter(16)
+
+    def test_token_bucket_batch(self):
+        buckets = BatchTokenBucket(capacity=3, fill_rate=0.001)
+        mask = buckets.consume_batch(['a', 'b', 'a', 'a', 'a', 'b'], [1, 3, 1, 1, 1, 1])
+        assert mask.tolist() == [True, True, True, True, False, False]
+        assert len(buckets) == 2
+        assert 'a' in buckets
+
+    def test_later_cheaper_request_fits(self):
+        buckets = BatchTokenBucket(capacity=5, fill_rate=0.001)
+        mask = buckets.consume_batch(['a', 'a', 'a', 'a'], [3, 3, 2, 1])
+        assert mask.tolist() == [True, False, True, False]
+
+    def test_invalid_costs(self):
+        buckets = BatchTokenBucket(capacity=5, fill_rate=1)
+        with pytest.raises(ValueError):
+            buckets.consume_batch(['a'], [-1])
+        with pytest.raises(ValueError):
+            buckets.consume_batch(['a', 'b'], [1])
+        leaky_buckets = BatchLeakyBucket(capacity=5, leak_rate=1)
+        with pytest.raises(ValueError):
+            leaky_buckets.add_tokens_batch(['a'], [-1])
+
+    def test_empty_batch(self):
+        assert len(BatchTokenBucket(capacity=5, fill_rate=1).consume_batch([], [])) == 0
+        assert len(BatchFixedWindowCounter(max_allowed_requests=5, window_size=1).allow_request_batch([])) == 0
+
+    def test_growth(self):
+        counters = BatchFixedWindowCounter(max_allowed_requests=1, window_size=100, initial_slots=2)
+        assert counters.allow_request_batch(list(range(1000))).all()
+        assert not counters.allow_request_batch(list(range(1000))).any()
+        assert len(counters) == 1000
+
+    def test_token_bucket_matches_sequential(self, clock):
+        buckets = BatchTokenBucket(capacity=10, fill_rate=7)
+        compare_with_sequential(clock, buckets.consume_batch, lambda: TokenBucket(capacity=10, fill_rate=7),
+                                lambda limiter, cost: limiter.consume(cost), with_costs=True)
+
+    def test_leaky_bucket_matches_sequential(self, clock):
+        buckets = BatchLeakyBucket(capacity=10, leak_rate=7)
+        compare_with_sequential(clock, buckets.add_tokens_batch, lambda: LeakyBucket(capacity=10, leak_rate=7),
+                                lambda limiter, cost: limiter.add_tokens(cost), with_costs=True)
+
+    def test_fixed_window_counter_matches_sequential(self, clock):
+        counters = BatchFixedWindowCounter(max_allowed_requests=8, window_size=0.5)
+        compare_with_sequential(clock, counters.allow_request_batch,
+                                lambda: FixedWindowCounter(max_allowed_requests=8, window_size=0.5),
+                                lambda limiter: limiter.allow_request(), with_costs=False)
+
+    def test_sliding_window_counter_matches_sequential(self, clock):
+        counters = BatchSlidingWindowCounter(max_allowed_requests=8, window_size=0.5)
+        compare_with_sequential(clock, counters.allow_request_batch,
+                                lambda: SlidingWindowCounter(max_allowed_requests=8, window_size=0.5),
+                                lambda limiter: limiter.allow_request(), with_costs=False)
+
+    def test_sliding_window_log_matches_sequential(self, clock):
+        logs = BatchSlidingWindowLog(max_allowed_requests=8, window_size=0.5)
+        compare_with_sequential(clock, logs.allow_request_batch,
+                                lambda: SlidingWindowLog(max_allowed_requests=8, window_size=0.5),
+                                lambda limiter: limiter.allow_request(), with_costs=False)
+
+    def test_accepts_numpy_arrays(self):
+        buckets = BatchLeakyBucket(capacity=2, leak_rate=0.001)
+        mask = buckets.add_tokens_batch(np.array([7, 7, 7]), np.array([1, 1, 1]))
+        assert mask.tolist() == [True, True, False]
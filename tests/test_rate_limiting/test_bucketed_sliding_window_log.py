@@ -0,0 +1,134 @@
+import math
+import random
+import threading
+import time
+from bisect import bisect_left, bisect_right
+
+import pytest
+
+from src.rate_limiting.bucketed_sliding_window_log import BucketedSlidingWindowLog
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    current_time = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: current_time[0])
+    return current_time
+
+
+class TestBucketedSlidingWindowLog:
+
+    def test_init(self):
+        log = BucketedSlidingWindowLog(max_allowed_requests=10, window_size=1.0, slices=10)
+        assert log.max_allowed_requests == 10
+        assert log.slice_size == 0.1
+        assert len(log.slice_counts) == 11
+        assert log.current_request_count == 0
+
+    def test_init_invalid_params(self):
+        with pytest.raises(ValueError):
+            BucketedSlidingWindowLog(max_allowed_requests=0, window_size=1.0)
+        with pytest.raises(ValueError):
+            BucketedSlidingWindowLog(max_allowed_requests=10, window_size=0)
+        with pytest.raises(ValueError):
+            BucketedSlidingWindowLog(max_allowed_requests=10, window_size=1.0, slices=0)
+
+    def test_allow_request_exceeds_limit(self, clock):
+        log = BucketedSlidingWindowLog(max_allowed_requests=3, window_size=1.0, slices=4)
+        assert [log.allow_request() for _ in range(4)] == [True, True, True, False]
+        assert log.current_request_count == 3
+
+    def test_slice_is_kept_until_it_fully_leaves_the_window(self, clock):
+        log = BucketedSlidingWindowLog(max_allowed_requests=2, window_size=1.0, slices=4)
+        clock[0] = 1000.1  # Inside the slice [1000.0, 1000.25)
+        assert log.allow_request() is True
+        assert log.allow_request() is True
+        clock[0] = 1001.1  # The requests are window_size old, but their slice is not out of the window yet
+        assert log.allow_request() is False
+        assert log.time_until_available() == pytest.approx(0.15)
+        clock[0] = 1001.25
+        assert log.allow_request() is True
+
+    def test_memory_does_not_grow_with_the_limit(self, clock):
+        log = BucketedSlidingWindowLog(max_allowed_requests=100_000, window_size=60, slices=60)
+        for _ in range(100_000):
+            log.allow_request()
+            clock[0] += 0.0005
+        assert len(log.slice_counts) == 61
+        assert log.current_request_count == 100_000
+
+    def test_long_idle_period_clears_the_window(self, clock):
+        log = BucketedSlidingWindowLog(max_allowed_requests=2, window_size=1.0, slices=10)
+        log.allow_request()
+        log.allow_request()
+        clock[0] += 1000
+        assert log.allow_request() is True
+        assert log.current_request_count == 1
+        assert sum(log.slice_counts) == 1
+
+    def test_error_stays_within_documented_bound(self, clock):
+        window_size, slices, max_allowed_requests = 1.0, 8, 20
+        log = BucketedSlidingWindowLog(max_allowed_requests, window_size, slices)
+        rng = random.Random(7)
+        admitted = []
+        for _ in range(20_000):
+            clock[0] += rng.expovariate(40)
+            now = clock[0]
+            if log.allow_request():
+                admitted.append(now)
+                # Never more than the limit within any window_size seconds
+                assert len(admitted) - bisect_right(admitted, now - window_size) <= max_allowed_requests
+            else:
+                # Denied only if the exact log would have denied it with a window one slice longer
+                recent = len(admitted) - bisect_left(admitted, now - window_size - window_size / slices)
+                assert recent >= max_allowed_requests
+
+    def test_acquire_waits_for_oldest_slice(self):
+        log = BucketedSlidingWindowLog(max_allowed_requests=2, window_size=0.1, slices=5)
+        assert log.acquire() is True
+        assert log.acquire() is True
+        start_time = time.monotonic()
+        assert log.acquire() is True
+        assert 0.05 <= time.monotonic() - start_time < 0.3
+
+    def test_acquire_timeout(self):
+        log = BucketedSlidingWindowLog(max_allowed_requests=1, window_size=10, slices=5)
+        log.acquire()
+        assert log.acquire(timeout=0.05) is False
+
+    def test_reset(self):
+        log = BucketedSlidingWindowLog(max_allowed_requests=1, window_size=10)
+        assert log.allow_request() is True
+        log.reset()
+        assert log.get_stats()['current_request_count'] == 0
+        assert log.allow_request() is True
+
+    def test_concurrent_access(self):
+        log = BucketedSlidingWindowLog(max_allowed_requests=100, window_size=10)
+        allowed = []
+
+        def worker():
+            allowed.extend(log.allow_request() for _ in range(50))
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert sum(allowed) == 100
+
+
+    def test_weighted_requests(self, clock):
+        log = BucketedSlidingWindowLog(max_allowed_requests=100, window_size=1.0, slices=4)
+        assert log.allow_request(60) is True
+        clock[0] += 0.25
+        assert log.allow_request(30) is True
+        assert log.allow_request(11) is False
+        # A slice leaves the window once its end is window_size old
+        assert log.time_until_available(11) == pytest.approx(1.0)  # The first slice has to leave
+        assert log.time_until_available(71) == pytest.approx(1.25)  # Both slices have to leave
+        assert log.time_until_available(101) == math.inf
+        clock[0] += 1.0
+        assert log.allow_request(70) is True
+        with pytest.raises(ValueError):
+            log.allow_request(-1)
@@ -0,0 +1,208 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.rate_limiting.concurrency_limiter import AsyncConcurrencyLimiter, ConcurrencyLimiter, VegasLimit
+from src.rate_limiting.keyed_rate_limiter import KeyedRateLimiter
+from src.rate_limiting.metrics import RateLimiterMetrics
+from src.rate_limiting.traffic_simulator import VirtualClock
+
+
+class TestConcurrencyLimiter:
+
+    def test_init_invalid_params(self):
+        with pytest.raises(ValueError):
+            ConcurrencyLimiter(0)
+        with pytest.raises(ValueError):
+            VegasLimit(min_limit=10, max_limit=5)
+        with pytest.raises(ValueError):
+            VegasLimit(alpha=6, beta=3)
+        limiter = ConcurrencyLimiter(2)
+        with pytest.raises(ValueError):
+            limiter.acquire(3)  # Could never be admitted
+        with pytest.raises(ValueError):
+            limiter.release()  # Nothing in flight
+
+    def test_allow_request_and_release(self):
+        limiter = ConcurrencyLimiter(3)
+        assert limiter.allow_request(2)
+        assert limiter.allow_request()
+        assert not limiter.allow_request()
+        assert limiter.get_available_permits() == 0
+        limiter.release(2)
+        assert limiter.get_available_permits() == 2
+        assert not limiter.allow_request(3)
+        assert limiter.allow_request(2)
+
+    def test_permit_context_manager(self):
+        limiter = ConcurrencyLimiter(1)
+        with limiter.permit():
+            assert limiter.in_flight == 1
+            with pytest.raises(TimeoutError):
+                with limiter.permit(timeout=0):
+                    pass
+        assert limiter.in_flight == 0
+
+        with pytest.raises(RuntimeError):
+            with limiter.permit():
+                raise RuntimeError
+        assert limiter.in_flight == 0  # Released when the block raises
+
+    def test_acquire_waits_for_release(self):
+        limiter = ConcurrencyLimiter(1)
+        limiter.acquire()
+        threading.Timer(0.05, limiter.release).start()
+        start_time = time.monotonic()
+        assert limiter.acquire(timeout=1)
+        assert 0.04 <= time.monotonic() - start_time <= 0.5
+        assert not limiter.acquire(timeout=0.05)
+
+    def test_request_beyond_an_adapted_limit_fails_fast(self):
+        limiter = ConcurrencyLimiter(4, limit_algorithm=VegasLimit(max_limit=8, alpha=0.5, beta=1))
+        for _ in range(4):
+            limiter.acquire()
+        results = []
+        waiter = threading.Thread(target=lambda: results.append(limiter.acquire(4)))
+        waiter.start()
+        for latency in (0.01, 1, 1, 1):  # The latency grows, the limit drops to 3 below the cost of the waiter
+            limiter.release(latency=latency)
+        waiter.join(timeout=1)
+        assert results == [False] and limiter.limit == 3
+        assert not limiter.acquire(4)  # Instead of waiting forever
+        assert limiter.acquire(3, timeout=0)
+
+    def test_concurrency_is_capped(self):
+        limiter = ConcurrencyLimiter(3)
+        in_flight = []
+        peak = [0]
+        lock = threading.Lock()
+
+        def call():
+            with limiter.permit():
+                with lock:
+                    in_flight.append(1)
+                    peak[0] = max(peak[0], len(in_flight))
+                time.sleep(0.005)
+                with lock:
+                    in_flight.pop()
+
+        threads = [threading.Thread(target=call) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert peak[0] == 3 and limiter.in_flight == 0
+
+    def test_metrics(self):
+        metrics = RateLimiterMetrics(sample_every=1)
+        limiter = ConcurrencyLimiter(1, metrics=metrics)
+        assert limiter.allow_request()
+        assert not limiter.allow_request()
+        assert not limiter.acquire(timeout=0)
+        assert metrics.snapshot()['allowed'] == 1 and metrics.snapshot()['denied'] == 2
+
+    def test_per_tenant_cap(self):
+        clock = VirtualClock()
+        registry = KeyedRateLimiter(lambda: ConcurrencyLimiter(2, clock=clock), clock=clock, wheel_tick=1)
+        assert registry.get_limiter('a').allow_request(2)
+        assert not registry.get_limiter('a').allow_request()
+        assert registry.get_limiter('b').allow_request()  # Other tenants have their own permits
+
+        clock.advance(10)
+        registry.get_limiter('c')
+        clock.advance(10)
+        registry.evict_idle()
+        # Only the tenants without permits out are dropped
+        assert 'a' in registry and 'b' in registry and 'c' not in registry
+        registry.get_limiter('a').release(2)
+        registry.get_limiter('b').release()
+        clock.advance(10)
+        registry.evict_idle()
+        assert len(registry) == 0
+
+    def test_async_permit(self):
+        async def run():
+            limiter = AsyncConcurrencyLimiter(2)
+            served = []
+
+            async def call(i):
+                async with limiter.permit():
+                    served.append(i)
+                    await asyncio.sleep(0.01)
+
+            await asyncio.gather(*(call(i) for i in range(10)))
+            return served, limiter.in_flight
+
+        assert asyncio.run(run()) == (list(range(10)), 0)  # FIFO order
+
+    def test_async_timeout_releases_nothing(self):
+        async def run():
+            limiter = AsyncConcurrencyLimiter(1)
+            await limiter.acquire_async()
+            assert not await limiter.acquire_async(timeout=0.02)
+            with pytest.raises(TimeoutError):
+                async with limiter.permit(timeout=0):
+                    pass
+            waiter = asyncio.ensure_future(limiter.acquire_async())
+            await asyncio.sleep(0.01)
+            limiter.release()
+            assert await waiter
+            return limiter.in_flight, len(limiter.waiters)
+
+        assert asyncio.run(run()) == (1, 0)
+
+    def test_async_waiters_are_not_overtaken(self):
+        async def run():
+            limiter = AsyncConcurrencyLimiter(2)
+            await limiter.acquire_async(2)
+            waiter = asyncio.ensure_future(limiter.acquire_async(2))
+            await asyncio.sleep(0.01)
+            limiter.release()
+            assert not limiter.allow_request()  # The freed permit is kept for the waiter
+            limiter.release()
+            await waiter
+            return limiter.in_flight
+
+        assert asyncio.run(run()) == 2
+
+    def test_async_request_beyond_an_adapted_limit_fails_fast(self):
+        async def run():
+            limiter = AsyncConcurrencyLimiter(4, limit_algorithm=VegasLimit(max_limit=8, alpha=0.5, beta=1))
+            await limiter.acquire_async(4)
+            beyond_reach = asyncio.ensure_future(limiter.acquire_async(4))
+            behind = asyncio.ensure_future(limiter.acquire_async(1))
+            await asyncio.sleep(0.01)
+            for latency in (0.01, 1, 1, 1):
+                limiter.release(latency=latency)
+            # The waiter beyond reach does not hold up the queue
+            assert await beyond_reach is False and await behind is True
+            limiter.release()
+            assert not await limiter.acquire_async(4)
+            return limiter.limit, limiter.in_flight
+
+        assert asyncio.run(run()) == (3, 0)
+
+    def test_vegas_limit_finds_the_backend_capacity(self):
+        # A backend serving 10 calls at once in 10 ms, the others queue: the latency grows with the calls in flight
+        clock = VirtualClock()
+        limiter = ConcurrencyLimiter(1, limit_algorithm=VegasLimit(max_limit=100, alpha=2, beta=4), clock=clock)
+        for _ in range(500):
+            in_flight = limiter.limit
+            for _ in range(in_flight):
+                assert limiter.allow_request()
+            latency = 0.01 * max(1.0, in_flight / 10)
+            clock.advance(latency)
+            for _ in range(in_flight):
+                limiter.release(latency=latency)
+        assert 10 <= limiter.limit <= 16
+
+        for _ in range(500):  # The backend halves its capacity
+            in_flight = limiter.limit
+            for _ in range(in_flight):
+                limiter.allow_request()
+            latency = 0.02 * max(1.0, in_flight / 5)
+            for _ in range(in_flight):
+                limiter.release(latency=latency)
+        assert 5 <= limiter.limit <= 8
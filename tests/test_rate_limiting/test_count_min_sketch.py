@@ -0,0 +1,132 @@
+import random
+from collections import Counter
+
+import pytest
+
+from src.rate_limiting.count_min_sketch import CountMinSketch, CountMinSketchLimiter
+from src.rate_limiting.traffic_simulator import VirtualClock
+
+
+class TestCountMinSketch:
+
+    def test_init_invalid_params(self):
+        with pytest.raises(ValueError):
+            CountMinSketch(width=0, depth=4)
+        with pytest.raises(ValueError):
+            CountMinSketch.from_error_bounds(epsilon=0, delta=0.01)
+        with pytest.raises(ValueError):
+            CountMinSketch.from_error_bounds(epsilon=0.01, delta=1)
+        with pytest.raises(ValueError):
+            CountMinSketch(width=10, depth=2).add('a', -1)
+        with pytest.raises(ValueError):
+            CountMinSketch(width=10, depth=2, salt=bytes(65))
+
+    def test_dimensions_from_error_bounds(self):
+        sketch = CountMinSketch.from_error_bounds(epsilon=0.01, delta=0.01)
+        assert (sketch.width, sketch.depth) == (272, 5)
+        assert sketch.nbytes() == 272 * 5 * 8
+
+    def test_exact_without_collisions(self):
+        sketch = CountMinSketch(width=1000, depth=4)
+        assert sketch.add('a') == 1
+        assert sketch.add('a', 4) == 5
+        assert sketch.estimate('a') == 5
+        assert sketch.estimate('unknown') == 0
+        assert sketch.total == 5
+        sketch.clear()
+        assert sketch.estimate('a') == 0 and sketch.total == 0
+
+    def test_cells_depend_on_the_salt(self):
+        keys = range(100)
+        sketch = CountMinSketch(width=1000, depth=4)
+        assert sketch.salt != CountMinSketch(width=1000, depth=4).salt
+        same_salt = CountMinSketch(width=1000, depth=4, salt=sketch.salt)
+        other_salt = CountMinSketch(width=1000, depth=4, salt=b'other')
+        assert [same_salt._cells(key) for key in keys] == [sketch._cells(key) for key in keys]
+        # Another salt places every key elsewhere
+        assert sum(other_salt._cells(key) == sketch._cells(key) for key in keys) == 0
+
+    def test_estimates_within_error_bounds(self):
+        rng = random.Random(3)
+        sketch = CountMinSketch.from_error_bounds(epsilon=0.01, delta=0.01)
+        counts = Counter(rng.randrange(5000) for _ in range(50_000))
+        counts.update({'heavy': 2000})
+        for key, count in counts.items():
+            sketch.add(key, count)
+        errors = [sketch.estimate(key) - count for key, count in counts.items()]
+        assert min(errors) >= 0  # Never underestimates
+        assert sum(error > 0.01 * sketch.total for error in errors) <= 0.01 * len(errors)
+        assert sketch.estimate('heavy') - 2000 <= 0.01 * sketch.total
+
+
+class TestCountMinSketchLimiter:
+
+    def test_init_invalid_params(self):
+        with pytest.raises(ValueError):
+            CountMinSketchLimiter(max_allowed_requests=0, window_size=1)
+        with pytest.raises(ValueError):
+            CountMinSketchLimiter(max_allowed_requests=5, window_size=1, top_k=-1)
+        with pytest.raises(ValueError):
+            CountMinSketchLimiter(max_allowed_requests=5, window_size=1, epsilon=2)
+        with pytest.raises(ValueError):
+            CountMinSketchLimiter(max_allowed_requests=5, window_size=1).allow_request('a', cost=-1)
+
+    def test_keys_are_limited_independently(self):
+        clock = VirtualClock()
+        limiter = CountMinSketchLimiter(max_allowed_requests=3, window_size=10, clock=clock)
+        assert [limiter.allow_request('a') for _ in range(4)] == [True, True, True, False]
+        assert limiter.allow_request('b') is True
+        assert limiter.allow_request('b', cost=2) is True
+        assert limiter.allow_request('b') is False
+
+    def test_previous_window_is_weighted(self):
+        clock = VirtualClock()
+        limiter = CountMinSketchLimiter(max_allowed_requests=10, window_size=10, count_denied=False, clock=clock)
+        for _ in range(10):
+            assert limiter.allow_request('a') is True
+        clock.advance_to(15)  # Half of the previous window is still in the sliding window
+        assert limiter.estimate('a') == 5
+        assert [limiter.allow_request('a') for _ in range(6)] == [True] * 5 + [False]
+        clock.advance_to(30)  # Two windows later, nothing is left
+        assert limiter.estimate('a') == 0
+
+    def test_count_denied(self):
+        clock = VirtualClock()
+        counting = CountMinSketchLimiter(max_allowed_requests=5, window_size=10, clock=clock)
+        lenient = CountMinSketchLimiter(max_allowed_requests=5, window_size=10, count_denied=False, clock=clock)
+        for _ in range(20):
+            counting.allow_request('flood')
+            lenient.allow_request('flood')
+        assert counting.estimate('flood') == 20
+        assert lenient.estimate('flood') == 5
+        clock.advance_to(15)
+        assert counting.allow_request('flood') is False  # Still weighed down by the flood
+        assert lenient.allow_request('flood') is True
+
+    def test_heavy_hitters(self):
+        clock = VirtualClock()
+        limiter = CountMinSketchLimiter(max_allowed_requests=100, window_size=10, top_k=3, clock=clock)
+        rng = random.Random(5)
+        for i in range(20_000):
+            limiter.allow_request(f'10.0.{i % 256}.{i // 256 % 256}')  # Many light keys
+            if i % 10 == 0:
+                limiter.allow_request('attacker-1')
+            if i % 20 == 0:
+                limiter.allow_request('attacker-2')
+            if i % 40 == 0:
+                limiter.allow_request(rng.choice(['attacker-3', 'attacker-3', 'light']))
+        heavy_hitters = limiter.get_heavy_hitters()
+        assert [key for key, _ in heavy_hitters] == ['attacker-1', 'attacker-2', 'attacker-3']
+        assert heavy_hitters[0][1] >= 2000
+
+        clock.advance_to(15)
+        assert limiter.get_heavy_hitters()[0] == ('attacker-1', pytest.approx(heavy_hitters[0][1] / 2))
+        assert CountMinSketchLimiter(max_allowed_requests=5, window_size=1, top_k=0).get_heavy_hitters() == []
+
+    def test_memory_is_fixed(self):
+        limiter = CountMinSketchLimiter(max_allowed_requests=5, window_size=1, epsilon=0.001, delta=0.01)
+        nbytes = limiter.nbytes()
+        assert nbytes == 2 * 2719 * 5 * 8
+        for i in range(50_000):
+            limiter.allow_request(i)
+        assert limiter.nbytes() == nbytes
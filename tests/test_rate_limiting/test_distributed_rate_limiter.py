@@ -0,0 +1,77 @@
+import pytest
+import threading
+
+from src.rate_limiting.distributed_rate_limiter import DistributedRateLimiter
+from src.rate_limiting.storage_backend import InMemoryStorageBackend
+
+
+class TestDistributedRateLimiter:
+
+    def test_init_invalid_params(self):
+        backend = InMemoryStorageBackend()
+        with pytest.raises(ValueError):
+            DistributedRateLimiter(backend, 'unknown', capacity=5, fill_rate=1)
+        with pytest.raises(ValueError):
+            DistributedRateLimiter(backend, 'token_bucket', capacity=5)
+        with pytest.raises(ValueError):
+            DistributedRateLimiter(backend, 'token_bucket', capacity=5, leak_rate=1)
+        with pytest.raises(ValueError):
+            DistributedRateLimiter(backend, 'fixed_window_counter', max_allowed_requests=0, window_size=1)
+
+    @pytest.mark.parametrize("algorithm,limits", [
+        ('token_bucket', {'capacity': 5, 'fill_rate': 0.01}),
+        ('leaky_bucket', {'capacity': 5, 'leak_rate': 0.01}),
+        ('fixed_window_counter', {'max_allowed_requests': 5, 'window_size': 100}),
+        ('sliding_window_counter', {'max_allowed_requests': 5, 'window_size': 100}),
+        ('sliding_window_log', {'max_allowed_requests': 5, 'window_size': 100}),
+    ])
+    def test_limit_is_shared_between_nodes(self, algorithm, limits):
+        backend = InMemoryStorageBackend()
+        node_a = DistributedRateLimiter(backend, algorithm, **limits)
+        node_b = DistributedRateLimiter(backend, algorithm, **limits)
+        results = [node.allow_request('client') for node in (node_a, node_b) * 4]
+        assert results == [True] * 5 + [False] * 3
+        assert node_a.allow_request('other-client') is True
+
+    def test_cost(self):
+        limiter = DistributedRateLimiter(InMemoryStorageBackend(), 'sliding_window_log',
+                                         max_allowed_requests=5, window_size=100)
+        assert limiter.allow_request('client', cost=3) is True
+        assert limiter.allow_request('client', cost=3) is False
+        assert limiter.allow_request('client', cost=2) is True
+        with pytest.raises(ValueError):
+            limiter.allow_request('client', cost=-1)
+
+    def test_allow_batch(self):
+        backend = InMemoryStorageBackend()
+        limiter = DistributedRateLimiter(backend, 'token_bucket', capacity=3, fill_rate=0.01)
+        assert limiter.allow_batch(['a', 'b', 'a', 'a', 'a'], [1, 1, 1, 1, 1]) == [True, True, True, True, False]
+        assert limiter.allow_batch(['b', 'b'], [2, 1]) == [True, False]
+        assert limiter.allow_batch([]) == []
+        assert backend.round_trips == 2
+        with pytest.raises(ValueError):
+            limiter.allow_batch(['a'], [1, 2])
+
+    def test_key_prefix_separates_limiters(self):
+        backend = InMemoryStorageBackend()
+        per_user = DistributedRateLimiter(backend, 'fixed_window_counter', key_prefix='user',
+                                          max_allowed_requests=1, window_size=100)
+        per_ip = DistributedRateLimiter(backend, 'fixed_window_counter', key_prefix='ip',
+                                        max_allowed_requests=1, window_size=100)
+        assert per_user.allow_request('x') is True
+        assert per_ip.allow_request('x') is True
+
+    def test_concurrent_nodes(self):
+        backend = InMemoryStorageBackend()
+        allowed = []
+
+        def node():
+            limiter = DistributedRateLimiter(backend, 'fixed_window_counter', max_allowed_requests=100, window_size=100)
+            allowed.extend(limiter.allow_request('client') for _ in range(50))
+
+        threads = [threading.Thread(target=node) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert sum(allowed) == 100
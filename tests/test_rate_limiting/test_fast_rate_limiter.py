@@ -0,0 +1,112 @@
+import random
+
+import pytest
+
+from src.rate_limiting import fast_rate_limiter
+from src.rate_limiting.fast_rate_limiter import (FastFixedWindowCounter, FastLeakyBucket, FastSlidingWindowCounter,
+                                                 FastSlidingWindowLog, FastTokenBucket)
+from src.rate_limiting.fixed_window_counter import FixedWindowCounter
+from src.rate_limiting.sliding_window_counter import SlidingWindowCounter
+from src.rate_limiting.sliding_window_log import SlidingWindowLog
+from src.rate_limiting.traffic_simulator import VirtualClock
+
+MILLISECOND = 1_000_000
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    current_time = [1000 * fast_rate_limiter.NANOSECONDS_PER_SECOND]
+    monkeypatch.setattr(fast_rate_limiter, 'monotonic_ns', lambda: current_time[0])
+    return current_time
+
+
+class TestFastRateLimiter:
+
+    @pytest.mark.parametrize("limiter_class", [FastTokenBucket, FastLeakyBucket, FastFixedWindowCounter,
+                                               FastSlidingWindowCounter, FastSlidingWindowLog])
+    def test_init_invalid_params(self, limiter_class):
+        with pytest.raises(ValueError):
+            limiter_class(0, 1)
+        with pytest.raises(ValueError):
+            limiter_class(1, 0)
+
+    @pytest.mark.parametrize("limiter_class", [FastTokenBucket, FastLeakyBucket, FastFixedWindowCounter,
+                                               FastSlidingWindowCounter, FastSlidingWindowLog])
+    def test_slots(self, limiter_class):
+        assert not hasattr(limiter_class(1, 1), '__dict__')
+
+    def test_token_bucket(self, clock):
+        bucket = FastTokenBucket(capacity=3, fill_rate=10)
+        assert [bucket.consume(1) for _ in range(4)] == [True, True, True, False]
+        clock[0] += 150 * MILLISECOND
+        assert bucket.get_available_tokens() == 1
+        clock[0] += 50 * MILLISECOND  # The half token carried over completes the second one
+        assert bucket.consume(2) is True
+        with pytest.raises(ValueError):
+            bucket.consume(-1)
+
+    def test_token_bucket_does_not_overfill(self, clock):
+        bucket = FastTokenBucket(capacity=3, fill_rate=10)
+        bucket.consume(1)
+        clock[0] += 10_000 * MILLISECOND
+        assert bucket.get_available_tokens() == 3
+        assert bucket.consume(3) is True
+        assert bucket.consume(1) is False
+
+    def test_leaky_bucket(self, clock):
+        bucket = FastLeakyBucket(capacity=2, leak_rate=10)
+        assert bucket.add_tokens(2) is True
+        assert bucket.add_tokens(1) is False
+        clock[0] += 150 * MILLISECOND
+        assert bucket.get_available_tokens() == 1
+        clock[0] += 50 * MILLISECOND
+        assert bucket.add_tokens(2) is True
+        clock[0] += 10_000 * MILLISECOND
+        assert bucket.get_available_tokens() == 0
+        with pytest.raises(ValueError):
+            bucket.add_tokens(-1)
+
+    def test_fixed_window_counter(self, clock):
+        counter = FastFixedWindowCounter(max_allowed_requests=2, window_size=1)
+        assert [counter.allow_request() for _ in range(3)] == [True, True, False]
+        assert counter.get_remaining_requests() == 0
+        clock[0] += 1000 * MILLISECOND
+        assert counter.allow_request() is True
+        assert counter.get_remaining_requests() == 1
+
+    def test_sliding_window_counter(self, clock):
+        counter = FastSlidingWindowCounter(max_allowed_requests=4, window_size=1)
+        assert [counter.allow_request() for _ in range(5)] == [True] * 4 + [False]
+        clock[0] += 1250 * MILLISECOND  # 75% of the previous window still counts: 3 < 4
+        assert counter.allow_request() is True
+        assert counter.previous_request_count == 4
+
+    def test_sliding_window_log(self, clock):
+        log = FastSlidingWindowLog(max_allowed_requests=3, window_size=1)
+        for _ in range(3):
+            assert log.allow_request() is True
+            clock[0] += 400 * MILLISECOND
+        # The first request left the window, the ring wraps around to its slot
+        assert log.allow_request() is True
+        assert log.allow_request() is False
+        clock[0] += 1000 * MILLISECOND
+        assert [log.allow_request() for _ in range(4)] == [True, True, True, False]
+        assert log.current_request_count == 3
+        assert len(log.request_timestamps) == 3
+
+    @pytest.mark.parametrize("fast_class, regular_class", [(FastFixedWindowCounter, FixedWindowCounter),
+                                                           (FastSlidingWindowCounter, SlidingWindowCounter),
+                                                           (FastSlidingWindowLog, SlidingWindowLog)])
+    def test_weighted_requests_match_the_regular_limiter(self, clock, fast_class, regular_class):
+        virtual_clock = VirtualClock(clock[0] / fast_rate_limiter.NANOSECONDS_PER_SECOND)
+        fast = fast_class(max_allowed_requests=5, window_size=1)
+        regular = regular_class(max_allowed_requests=5, window_size=1, clock=virtual_clock)
+        rng = random.Random(3)
+        for _ in range(2000):
+            step = rng.randint(0, 20) / 128  # Exact in binary, both clocks agree on every window boundary
+            clock[0] += round(step * fast_rate_limiter.NANOSECONDS_PER_SECOND)
+            virtual_clock.advance(step)
+            cost = rng.randint(0, 3)
+            assert fast.allow_request(cost) == regular.allow_request(cost)
+        with pytest.raises(ValueError):
+            fast.allow_request(-1)
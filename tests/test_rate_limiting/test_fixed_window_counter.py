@@ -1,7 +1,10 @@
+import math
+
 import pytest
 import time
 
 from src.rate_limiting.fixed_window_counter import FixedWindowCounter
+from src.rate_limiting.traffic_simulator import VirtualClock
 
 
 class TestFixedWindowCounter:
@@ -67,3 +70,66 @@ class TestFixedWindowCounter:
 
         with pytest.raises(ValueError):
             FixedWindowCounter(max_allowed_requests=5, window_size=-10)
+
+    def test_time_until_available(self):
+        assert self.fixed_window_counter.time_until_available() == 0
+        for _ in range(5):
+            self.fixed_window_counter.allow_request()
+        assert 9 < self.fixed_window_counter.time_until_available() <= 10
+
+    def test_request_allowed_after_waiting(self):
+        counter = FixedWindowCounter(max_allowed_requests=2, window_size=0.1)
+        counter.allow_request()
+        counter.allow_request()
+        time.sleep(counter.time_until_available())
+        assert counter.allow_request() is True
+
+    def test_acquire_waits_for_next_window(self):
+        counter = FixedWindowCounter(max_allowed_requests=2, window_size=0.2)
+        assert counter.acquire() is True
+        assert counter.acquire() is True
+        start_time = time.monotonic()
+        assert counter.acquire() is True
+        assert 0.1 <= time.monotonic() - start_time <= 0.4
+
+    def test_acquire_timeout(self):
+        for _ in range(5):
+            assert self.fixed_window_counter.acquire(timeout=0) is True
+        assert self.fixed_window_counter.acquire(timeout=1) is False
+
+    def test_reset_wakes_waiting_threads(self):
+        import threading
+        for _ in range(5):
+            self.fixed_window_counter.allow_request()
+        results = []
+        thread = threading.Thread(target=lambda: results.append(self.fixed_window_counter.acquire(timeout=20)))
+        thread.start()
+        time.sleep(0.05)
+        self.fixed_window_counter.reset_window()
+        thread.join(timeout=2)
+        assert results == [True]
+
+    def test_weighted_requests(self):
+        clock = VirtualClock()
+        counter = FixedWindowCounter(max_allowed_requests=100, window_size=1, clock=clock)
+        assert counter.allow_request(50) is True
+        assert counter.allow_request(40) is True
+        assert counter.allow_request(11) is False  # Would exceed the window, and is not counted
+        assert counter.allow_request(10) is True
+        assert counter.time_until_available(1) == pytest.approx(1)
+        assert counter.time_until_available(101) == math.inf
+        clock.advance(1)
+        assert counter.allow_request(100) is True
+        assert counter.allow_request(0) is True
+        with pytest.raises(ValueError):
+            counter.allow_request(-1)
+        with pytest.raises(ValueError):
+            counter.acquire(101)
+
+    def test_weighted_acquire_waits_for_next_window(self):
+        counter = FixedWindowCounter(max_allowed_requests=10, window_size=0.1)
+        assert counter.acquire(8) is True
+        start_time = time.monotonic()
+        assert counter.acquire(5, timeout=1) is True
+        assert time.monotonic() - start_time >= 0.05
+        assert counter.acquire(10, timeout=0.01) is False
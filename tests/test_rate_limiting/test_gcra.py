@@ -0,0 +1,218 @@
+import math
+import threading
+import time
+from fractions import Fraction
+
+import pytest
+
+from src.rate_limiting.distributed_rate_limiter import DistributedRateLimiter
+from src.rate_limiting.gcra import GCRA, GCRAStore
+from src.rate_limiting.hierarchical_rate_limiter import HierarchicalRateLimiter
+from src.rate_limiting.metrics import RateLimiterMetrics
+from src.rate_limiting.storage_backend import InMemoryStorageBackend
+from src.rate_limiting.traffic_simulator import VirtualClock, poisson_arrivals
+
+
+class TestGCRA:
+
+    def test_init_invalid_params(self):
+        with pytest.raises(ValueError):
+            GCRA(capacity=0, fill_rate=1)
+        with pytest.raises(ValueError):
+            GCRA(capacity=5, fill_rate=-1)
+        with pytest.raises(ValueError):
+            GCRA(capacity=5, fill_rate=1).consume(-1)
+
+    def test_burst_up_to_capacity(self):
+        clock = VirtualClock()
+        limiter = GCRA(capacity=5, fill_rate=1, clock=clock)
+        assert limiter.get_available_tokens() == 5
+        assert [limiter.consume(1) for _ in range(6)] == [True] * 5 + [False]
+        assert limiter.get_available_tokens() == 0
+        assert limiter.consume(6) is False
+
+    @pytest.mark.parametrize('fill_rate', [7, 0.7, 11, 13, 3, 1e6 / 7])
+    def test_full_bucket_admits_capacity_at_any_rate(self, fill_rate):
+        # 1 / fill_rate is not a whole number of nanoseconds, rounding must not eat into the burst
+        clock = VirtualClock(1234.5678)
+        limiter = GCRA(capacity=10, fill_rate=fill_rate, clock=clock)
+        store = GCRAStore(capacity=10, fill_rate=fill_rate, clock=clock)
+        assert [limiter.consume(1) for _ in range(11)] == [True] * 10 + [False]
+        assert [store.consume('key', 1) for _ in range(11)] == [True] * 10 + [False]
+        assert GCRA(capacity=10, fill_rate=fill_rate, clock=clock).consume(10) is True
+        clock.advance(100 / fill_rate)
+        assert limiter.get_available_tokens() == 10
+        assert [limiter.consume(2) for _ in range(6)] == [True] * 5 + [False]
+
+    def test_partial_tokens_are_kept(self):
+        clock = VirtualClock()
+        limiter = GCRA(capacity=2, fill_rate=2, clock=clock)
+        assert limiter.consume(2) is True
+        clock.advance(0.25)  # Half a token
+        assert limiter.consume(1) is False
+        clock.advance(0.25)  # The other half, the first one was not rounded away
+        assert limiter.consume(1) is True
+        assert limiter.consume(1) is False
+
+    def test_idle_bucket_does_not_exceed_capacity(self):
+        clock = VirtualClock()
+        limiter = GCRA(capacity=3, fill_rate=1, clock=clock)
+        clock.advance(100)
+        assert limiter.get_available_tokens() == 3
+        assert [limiter.consume(1) for _ in range(4)] == [True] * 3 + [False]
+
+    def test_same_decisions_as_exact_token_bucket(self):
+        clock = VirtualClock()
+        limiter = GCRA(capacity=10, fill_rate=8, clock=clock)
+        # Token bucket with exact fractional tokens, the arrivals are whole milliseconds so nothing is rounded
+        tokens, last_time = Fraction(10), Fraction(0)
+        decisions = 0
+        for index, timestamp in enumerate(poisson_arrivals(rate=12, duration=300, seed=7)):
+            current_time = Fraction(round(timestamp * 1000), 1000)
+            clock.advance_to(float(current_time))
+            tokens = min(Fraction(10), tokens + (current_time - last_time) * 8)
+            last_time = current_time
+            cost = index % 3 + 1
+            allowed = cost <= tokens
+            if allowed:
+                tokens -= cost
+            assert limiter.consume(cost) == allowed
+            decisions += 1
+        assert decisions > 3000
+
+    def test_consume_with_retry_after(self):
+        clock = VirtualClock()
+        limiter = GCRA(capacity=2, fill_rate=4, clock=clock)
+        assert limiter.consume_with_retry_after(2) == (True, 0.0)
+        allowed, retry_after = limiter.consume_with_retry_after(1)
+        assert allowed is False
+        assert retry_after == pytest.approx(0.25)
+        clock.advance(retry_after)
+        assert limiter.consume_with_retry_after(1) == (True, 0.0)
+        assert limiter.consume_with_retry_after(3) == (False, math.inf)
+
+    def test_time_until_available(self):
+        clock = VirtualClock()
+        limiter = GCRA(capacity=4, fill_rate=2, clock=clock)
+        assert limiter.time_until_available(4) == 0
+        limiter.consume(4)
+        assert limiter.time_until_available(1) == pytest.approx(0.5)
+        assert limiter.time_until_available(3) == pytest.approx(1.5)
+        assert limiter.time_until_available(5) == math.inf
+
+    def test_acquire_waits_for_tokens(self):
+        limiter = GCRA(capacity=1, fill_rate=20)
+        assert limiter.consume(1) is True
+        start_time = time.monotonic()
+        assert limiter.acquire(1, timeout=1) is True
+        assert time.monotonic() - start_time >= 0.04
+        assert limiter.acquire(1, timeout=0.01) is False
+        with pytest.raises(ValueError):
+            limiter.acquire(2)
+
+    def test_thread_safety(self):
+        limiter = GCRA(capacity=100, fill_rate=0.001)
+        results = []
+
+        def worker():
+            results.extend(limiter.consume(1) for _ in range(50))
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results.count(True) == 100
+
+    def test_metrics(self):
+        metrics = RateLimiterMetrics(sample_every=2)
+        limiter = GCRA(capacity=3, fill_rate=1, clock=VirtualClock(), metrics=metrics)
+        for _ in range(5):
+            limiter.consume(1)
+        assert (metrics.allowed, metrics.denied) == (3, 2)
+        assert metrics.snapshot()['decision_latency']['count'] == 2
+
+    def test_hierarchical_limits(self):
+        clock = VirtualClock()
+        user = GCRA(capacity=2, fill_rate=1, clock=clock)
+        organization = GCRA(capacity=3, fill_rate=1, clock=clock)
+        first_user = HierarchicalRateLimiter([user, organization])
+        second_user = HierarchicalRateLimiter([GCRA(capacity=2, fill_rate=1, clock=clock), organization])
+        assert [first_user.allow_request() for _ in range(3)] == [True, True, False]
+        assert [second_user.allow_request() for _ in range(2)] == [True, False]
+        assert second_user.denying_limiter() is organization
+        # The denied requests charged nothing
+        clock.advance(1)
+        assert user.get_available_tokens() == 1
+        assert organization.get_available_tokens() == 1
+
+
+class TestGCRAStore:
+
+    def test_init_invalid_params(self):
+        with pytest.raises(ValueError):
+            GCRAStore(capacity=5, fill_rate=0)
+        with pytest.raises(ValueError):
+            GCRAStore(capacity=5, fill_rate=1).consume('key', -1)
+
+    def test_keys_are_independent(self):
+        store = GCRAStore(capacity=2, fill_rate=1, clock=VirtualClock())
+        assert [store.consume('a', 1) for _ in range(3)] == [True, True, False]
+        assert store.consume('b', 2) is True
+        assert store.get_available_tokens('a') == 0
+        assert store.get_available_tokens('unknown') == 2
+        assert 'unknown' not in store
+
+    def test_one_integer_per_key(self):
+        store = GCRAStore(capacity=5, fill_rate=1, clock=VirtualClock(10.5))
+        for key in range(100):
+            store.consume(key, 1)
+        assert len(store) == 100
+        assert all(type(value) is int for value in store.theoretical_arrival_times.values())
+
+    def test_same_decisions_as_single_limiter(self):
+        clock = VirtualClock()
+        store = GCRAStore(capacity=4, fill_rate=3, clock=clock)
+        limiters = {key: GCRA(capacity=4, fill_rate=3, clock=clock) for key in 'abc'}
+        for index, timestamp in enumerate(poisson_arrivals(rate=10, duration=60, seed=3)):
+            clock.advance_to(timestamp)
+            key = 'abc'[index % 3]
+            assert store.consume_with_retry_after(key, 1) == limiters[key].consume_with_retry_after(1)
+
+    def test_retry_after(self):
+        clock = VirtualClock()
+        store = GCRAStore(capacity=1, fill_rate=2, clock=clock)
+        assert store.consume_with_retry_after('key', 1) == (True, 0.0)
+        allowed, retry_after = store.consume_with_retry_after('key', 1)
+        assert allowed is False
+        assert retry_after == pytest.approx(0.5)
+        assert store.consume_with_retry_after('key', 2) == (False, math.inf)
+
+    def test_purge_idle(self):
+        clock = VirtualClock()
+        store = GCRAStore(capacity=2, fill_rate=1, clock=clock)
+        store.consume('short', 1)
+        store.consume('long', 2)
+        clock.advance(1.5)
+        assert store.purge_idle() == 1
+        assert 'short' not in store and 'long' in store
+        assert store.get_available_tokens('long') == 1
+        clock.advance(0.5)
+        assert store.purge_idle() == 1
+        assert len(store) == 0
+
+
+class TestDistributedGCRA:
+
+    def test_limit_is_shared_between_nodes(self):
+        backend = InMemoryStorageBackend()
+        node_a = DistributedRateLimiter(backend, 'gcra', capacity=5, fill_rate=0.01)
+        node_b = DistributedRateLimiter(backend, 'gcra', capacity=5, fill_rate=0.01)
+        results = [node.allow_request('client') for node in (node_a, node_b) * 4]
+        assert results == [True] * 5 + [False] * 3
+        assert node_a.allow_request('other-client') is True
+        assert isinstance(backend.data['rate_limit:gcra:client'][0], int)
+
+    def test_invalid_limits(self):
+        with pytest.raises(ValueError):
+            DistributedRateLimiter(InMemoryStorageBackend(), 'gcra', capacity=5, leak_rate=1)
@@ -0,0 +1,101 @@
+import random
+import threading
+
+import pytest
+
+from src.rate_limiting.bucketed_sliding_window_log import BucketedSlidingWindowLog
+from src.rate_limiting.fast_rate_limiter import FastTokenBucket
+from src.rate_limiting.fixed_window_counter import FixedWindowCounter
+from src.rate_limiting.hierarchical_rate_limiter import HierarchicalRateLimiter
+from src.rate_limiting.leaky_bucket import LeakyBucket
+from src.rate_limiting.sliding_window_counter import SlidingWindowCounter
+from src.rate_limiting.sliding_window_log import SlidingWindowLog
+from src.rate_limiting.token_bucket import TokenBucket
+from src.rate_limiting.traffic_simulator import VirtualClock, default_decision, poisson_arrivals
+
+LIMITERS = {
+    'token_bucket': lambda clock: TokenBucket(5, 2, clock=clock),
+    'leaky_bucket': lambda clock: LeakyBucket(5, 2, clock=clock),
+    'fixed_window_counter': lambda clock: FixedWindowCounter(5, 1, clock=clock),
+    'sliding_window_counter': lambda clock: SlidingWindowCounter(5, 1, clock=clock),
+    'sliding_window_log': lambda clock: SlidingWindowLog(5, 1, clock=clock),
+    'bucketed_sliding_window_log': lambda clock: BucketedSlidingWindowLog(5, 1, slices=10, clock=clock),
+}
+
+
+class TestHierarchicalRateLimiter:
+
+    @pytest.mark.parametrize('algorithm', list(LIMITERS))
+    def test_same_decisions_as_the_limiter_alone(self, algorithm):
+        clock = VirtualClock()
+        alone = LIMITERS[algorithm](clock)
+        composite = HierarchicalRateLimiter([LIMITERS[algorithm](clock)])
+        for timestamp in poisson_arrivals(rate=10, duration=100, seed=3):
+            clock.advance_to(timestamp)
+            assert composite.allow_request() == default_decision(alone)
+
+    def test_denial_leaves_the_other_limiters_untouched(self):
+        clock = VirtualClock()
+        user = TokenBucket(5, 1, clock=clock)
+        organization = SlidingWindowLog(3, 60, clock=clock)
+        composite = HierarchicalRateLimiter([user, organization])
+        assert [composite.allow_request() for _ in range(4)] == [True, True, True, False]
+        assert user.get_available_tokens() == 2  # The denied request was not charged
+        assert organization.get_stats()['current_request_count'] == 3
+        assert composite.denying_limiter() is organization
+        clock.advance(60)
+        assert composite.denying_limiter() is None
+        assert user.get_available_tokens() == 5
+
+    def test_amount(self):
+        clock = VirtualClock()
+        bucket = TokenBucket(10, 1, clock=clock)
+        window = FixedWindowCounter(4, 1, clock=clock)
+        composite = HierarchicalRateLimiter([bucket, window])
+        assert composite.allow_request(3) is True
+        assert composite.allow_request(2) is False  # 5 requests in the window
+        assert composite.allow_request(1) is True
+        assert bucket.get_available_tokens() == 6
+        assert composite.denying_limiter(7) is bucket
+
+    def test_shared_limiters_under_threads(self):
+        global_limiter = FixedWindowCounter(1000, 3600)
+        organizations = [TokenBucket(300, 0.001) for _ in range(3)]
+        users = [SlidingWindowLog(50, 3600) for _ in range(30)]
+        # Users list their limits in different orders, the lock order must not depend on it
+        composites = [HierarchicalRateLimiter([users[i], organizations[i % 3], global_limiter][::1 - 2 * (i % 2)])
+                      for i in range(30)]
+        allowed = [0] * 30
+
+        def worker(index):
+            rng = random.Random(index)
+            for _ in range(2000):
+                user = rng.randrange(30)
+                if composites[user].allow_request():
+                    allowed[user] += 1
+
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=30)
+            assert not thread.is_alive()
+
+        assert sum(allowed) == global_limiter.current_request_count
+        assert sum(allowed) <= 1000
+        for user in range(30):
+            assert allowed[user] == users[user].get_stats()['current_request_count'] <= 50
+        for organization in range(3):
+            organization_allowed = sum(allowed[user] for user in range(organization, 30, 3))
+            assert organization_allowed + organizations[organization].get_available_tokens() == 300
+
+    def test_invalid_arguments(self):
+        bucket = TokenBucket(1, 1)
+        with pytest.raises(ValueError):
+            HierarchicalRateLimiter([])
+        with pytest.raises(ValueError):
+            HierarchicalRateLimiter([bucket, bucket])
+        with pytest.raises(ValueError):
+            HierarchicalRateLimiter([FastTokenBucket(1, 1)])
+        with pytest.raises(ValueError):
+            HierarchicalRateLimiter([bucket]).allow_request(-1)
@@ -0,0 +1,168 @@
+import pytest
+import threading
+import time
+
+from src.rate_limiting.fixed_window_counter import FixedWindowCounter
+from src.rate_limiting.keyed_rate_limiter import KeyedRateLimiter
+from src.rate_limiting.sliding_window_counter import SlidingWindowCounter
+from src.rate_limiting.token_bucket import TokenBucket
+from src.rate_limiting.traffic_simulator import VirtualClock
+
+
+class TestKeyedRateLimiter:
+
+    def test_init_invalid_params(self):
+        with pytest.raises(ValueError):
+            KeyedRateLimiter(lambda: TokenBucket(capacity=5, fill_rate=1), max_keys=0)
+        with pytest.raises(ValueError):
+            KeyedRateLimiter(lambda: TokenBucket(capacity=5, fill_rate=1), idle_ttl=0)
+        with pytest.raises(ValueError):
+            KeyedRateLimiter(lambda: TokenBucket(capacity=5, fill_rate=1), max_eviction_steps=0)
+        with pytest.raises(ValueError):
+            KeyedRateLimiter(lambda: TokenBucket(capacity=5, fill_rate=1), idle_ttl=1, wheel_tick=0)
+
+    def test_timing_wheel_needs_an_expiry(self):
+        created = []
+        registry = KeyedRateLimiter(lambda: created.append(1) or TokenBucket(capacity=5, fill_rate=1), wheel_tick=0.1)
+        assert created == []  # The factory is only called for keys
+        with pytest.raises(ValueError):
+            registry.get_limiter('client-1')  # No expiry to track
+        assert len(registry) == 0
+
+    def test_lazy_creation(self):
+        registry = KeyedRateLimiter(lambda: TokenBucket(capacity=5, fill_rate=1))
+        assert len(registry) == 0
+        limiter = registry.get_limiter('client-1')
+        assert isinstance(limiter, TokenBucket)
+        assert 'client-1' in registry
+        assert registry.get_limiter('client-1') is limiter
+
+    def test_keys_are_limited_independently(self):
+        registry = KeyedRateLimiter(lambda: FixedWindowCounter(max_allowed_requests=2, window_size=10))
+        assert registry.get_limiter('a').allow_request() is True
+        assert registry.get_limiter('a').allow_request() is True
+        assert registry.get_limiter('a').allow_request() is False
+        assert registry.get_limiter('b').allow_request() is True
+
+    def test_max_keys_is_enforced(self):
+        registry = KeyedRateLimiter(lambda: TokenBucket(capacity=5, fill_rate=1), max_keys=100)
+        for i in range(1000):
+            registry.get_limiter(i)
+        assert len(registry) == 100
+
+    def test_recently_used_keys_get_second_chance(self):
+        registry = KeyedRateLimiter(lambda: TokenBucket(capacity=5, fill_rate=1), max_keys=3)
+        for key in ('a', 'b', 'c'):
+            registry.get_limiter(key)
+        time.sleep(0.01)
+        registry.get_limiter('a')  # 'a' is the oldest key, but it was used again
+        registry.get_limiter('d')
+        assert 'a' in registry
+        assert 'b' not in registry
+        assert len(registry) == 3
+
+    def test_idle_keys_are_evicted_on_insert(self):
+        registry = KeyedRateLimiter(lambda: TokenBucket(capacity=5, fill_rate=1), idle_ttl=0.05)
+        registry.get_limiter('a')
+        registry.get_limiter('b')
+        time.sleep(0.06)
+        registry.get_limiter('c')
+        assert 'a' not in registry
+        assert 'b' not in registry
+        assert 'c' in registry
+
+    def test_evict_idle(self):
+        registry = KeyedRateLimiter(lambda: TokenBucket(capacity=5, fill_rate=1), idle_ttl=0.05)
+        registry.get_limiter('a')
+        registry.get_limiter('b')
+        time.sleep(0.06)
+        registry.get_limiter('b')
+        assert registry.evict_idle() == 1
+        assert 'a' not in registry
+        assert 'b' in registry
+
+    def test_wheel_evicts_idle_keys(self):
+        clock = VirtualClock()
+        registry = KeyedRateLimiter(lambda: TokenBucket(capacity=5, fill_rate=1, clock=clock), idle_ttl=10,
+                                    clock=clock, wheel_tick=1)
+        registry.get_limiter('a')
+        registry.get_limiter('b')
+        clock.advance(6)
+        registry.get_limiter('b')  # Used again, 'b' now expires at 16
+        clock.advance(4)
+        assert registry.evict_idle() == 1
+        assert 'a' not in registry and 'b' in registry
+        clock.advance(6)
+        assert registry.evict_idle() == 1
+        assert len(registry) == 0 and len(registry.wheel) == 0
+
+    def test_wheel_evicts_expired_windows(self):
+        clock = VirtualClock()
+        registry = KeyedRateLimiter(lambda: FixedWindowCounter(max_allowed_requests=2, window_size=10, clock=clock),
+                                    clock=clock, wheel_tick=1)
+        registry.get_limiter('a').allow_request()
+        clock.advance(5)
+        registry.get_limiter('b').allow_request()
+        clock.advance(5)
+        assert registry.evict_idle() == 1  # The window of 'a' ended, its counter holds nothing worth keeping
+        assert 'a' not in registry and 'b' in registry
+
+        clock.advance(8)
+        registry.get_limiter('b').allow_request()  # Starts a new window, ending at 28
+        clock.advance(2)
+        assert registry.evict_idle() == 0
+        clock.advance(8)
+        assert registry.evict_idle() == 1
+
+        sliding = KeyedRateLimiter(lambda: SlidingWindowCounter(max_allowed_requests=2, window_size=10, clock=clock),
+                                   clock=clock, wheel_tick=1)
+        sliding.get_limiter('a').allow_request()
+        clock.advance(10)
+        assert sliding.evict_idle() == 0  # Still weighs on the next window
+        clock.advance(10)
+        assert sliding.evict_idle() == 1
+
+    def test_wheel_expiry_on_insert_is_bounded(self):
+        clock = VirtualClock()
+        registry = KeyedRateLimiter(lambda: TokenBucket(capacity=5, fill_rate=1, clock=clock), idle_ttl=1,
+                                    max_eviction_steps=8, clock=clock, wheel_tick=0.1)
+        for i in range(100):
+            registry.get_limiter(i)
+        clock.advance(2)
+        registry.get_limiter('new')
+        assert len(registry) == 101 - 8
+        registry.remove(50)
+        assert 50 not in registry.wheel
+        registry.clear()
+        assert len(registry.wheel) == 0
+
+    def test_evict_idle_without_ttl(self):
+        registry = KeyedRateLimiter(lambda: TokenBucket(capacity=5, fill_rate=1))
+        registry.get_limiter('a')
+        assert registry.evict_idle() == 0
+        assert 'a' in registry
+
+    def test_remove_and_clear(self):
+        registry = KeyedRateLimiter(lambda: TokenBucket(capacity=5, fill_rate=1))
+        registry.get_limiter('a')
+        registry.get_limiter('b')
+        assert registry.remove('a') is True
+        assert registry.remove('a') is False
+        registry.clear()
+        assert len(registry) == 0
+
+    def test_concurrent_creation_returns_same_limiter(self):
+        registry = KeyedRateLimiter(lambda: TokenBucket(capacity=5, fill_rate=1))
+        limiters = []
+
+        def lookup():
+            for _ in range(100):
+                limiters.append(registry.get_limiter('shared'))
+
+        threads = [threading.Thread(target=lookup) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(registry) == 1
+        assert all(limiter is limiters[0] for limiter in limiters)
@@ -2,6 +2,7 @@ import pytest
 import time
 
 from src.rate_limiting.leaky_bucket import LeakyBucket
+from src.rate_limiting.traffic_simulator import VirtualClock
 
 
 class TestLeakyBucket:
@@ -85,3 +86,57 @@ class TestLeakyBucket:
         lb.add_tokens(lb.capacity)  # Fill the bucket
         time.sleep(sleep_time)
         assert expected_min <= lb.get_available_tokens() <= expected_max
+
+    def test_time_until_available(self):
+        lb = LeakyBucket(capacity=10, leak_rate=10)
+        assert lb.time_until_available(10) == 0
+        lb.add_tokens(10)
+        assert 0.4 <= lb.time_until_available(5) <= 0.5
+        assert lb.time_until_available(11) == float('inf')
+        with pytest.raises(ValueError):
+            lb.time_until_available(-1)
+
+    def test_tokens_fit_after_waiting(self):
+        lb = LeakyBucket(capacity=10, leak_rate=20)
+        lb.add_tokens(10)
+        time.sleep(lb.time_until_available(3))
+        assert lb.add_tokens(3) is True
+
+    def test_acquire_waits_for_leak(self):
+        lb = LeakyBucket(capacity=10, leak_rate=20)
+        assert lb.acquire(10) is True
+        start_time = time.monotonic()
+        assert lb.acquire(4) is True
+        assert 0.15 <= time.monotonic() - start_time <= 0.4
+
+    def test_acquire_timeout(self):
+        lb = LeakyBucket(capacity=10, leak_rate=1)
+        assert lb.acquire(10, timeout=0) is True
+        start_time = time.monotonic()
+        assert lb.acquire(5, timeout=1) is False
+        assert time.monotonic() - start_time < 0.1
+
+    def test_acquire_invalid(self):
+        lb = LeakyBucket(capacity=10, leak_rate=1)
+        with pytest.raises(ValueError):
+            lb.acquire(-1)
+        with pytest.raises(ValueError):
+            lb.acquire(11)
+
+    def test_frequent_requests_see_fractional_leaks(self):
+        clock = VirtualClock()
+        lb = LeakyBucket(capacity=5, leak_rate=1, clock=clock)
+        assert lb.add_tokens(5) is True
+        allowed = 0
+        for _ in range(12):
+            clock.advance(0.25)  # Each call sees a quarter of a token leak, which must not be rounded away
+            allowed += lb.add_tokens(1)
+        assert allowed == 3  # 3 seconds leaked 3 whole tokens
+
+    def test_empty_bucket_does_not_bank_time(self):
+        clock = VirtualClock()
+        lb = LeakyBucket(capacity=2, leak_rate=1, clock=clock)
+        clock.advance(10)
+        assert lb.add_tokens(2) is True
+        clock.advance(0.5)
+        assert lb.add_tokens(1) is False
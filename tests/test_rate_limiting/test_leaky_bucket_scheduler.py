@@ -0,0 +1,151 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+import pytest
+
+from src.rate_limiting.leaky_bucket_scheduler import AsyncLeakyBucketScheduler, LeakyBucketScheduler
+
+
+class TestLeakyBucketScheduler:
+
+    def test_init_invalid_params(self):
+        with pytest.raises(ValueError):
+            LeakyBucketScheduler(capacity=0, leak_rate=1)
+        with pytest.raises(ValueError):
+            LeakyBucketScheduler(capacity=5, leak_rate=0)
+        with pytest.raises(ValueError):
+            LeakyBucketScheduler(capacity=5, leak_rate=1, tick=0)
+
+    def test_items_leave_at_leak_rate(self):
+        release_times = []
+        with LeakyBucketScheduler(capacity=100, leak_rate=50) as scheduler:
+            start_time = time.monotonic()
+            futures = [scheduler.submit(lambda i=i: release_times.append(time.monotonic()) or i) for i in range(6)]
+            assert [future.result(timeout=2) for future in futures] == list(range(6))
+        assert release_times[0] - start_time < 0.015  # An idle bucket releases the first item right away
+        assert 0.095 <= release_times[-1] - start_time <= 0.2
+        gaps = [later - earlier for earlier, later in zip(release_times, release_times[1:])]
+        assert min(gaps) >= 0.015
+
+    def test_full_queue_rejects_items(self):
+        started, unblock = threading.Event(), threading.Event()
+        scheduler = LeakyBucketScheduler(capacity=2, leak_rate=1000)
+        scheduler.add(lambda: (started.set(), unblock.wait(2)))
+        assert started.wait(2)  # The worker is busy, nothing leaves the queue
+        assert scheduler.add(len, 'a') is True
+        assert scheduler.submit(len, 'ab') is not None
+        assert scheduler.add(len, 'abc') is False
+        assert scheduler.submit(len, 'abc') is None
+        assert scheduler.get_queue_length() == 2
+        unblock.set()
+        scheduler.shutdown()
+        assert scheduler.get_queue_length() == 0
+
+    def test_idle_scheduler_does_not_bank_time(self):
+        release_times = []
+        with LeakyBucketScheduler(capacity=100, leak_rate=20) as scheduler:
+            time.sleep(0.2)
+            start_time = time.monotonic()
+            for _ in range(3):
+                scheduler.add(lambda: release_times.append(time.monotonic()))
+        assert release_times[1] - start_time >= 0.045
+        assert release_times[2] - start_time >= 0.095
+
+    def test_sustains_high_rate(self):
+        released = []
+        with LeakyBucketScheduler(capacity=100_000, leak_rate=100_000) as scheduler:
+            start_time = time.monotonic()
+            for i in range(20_000):
+                scheduler.add(released.append, i)
+        elapsed = time.monotonic() - start_time
+        assert released == list(range(20_000))
+        assert 0.19 <= elapsed <= 0.6
+
+    def test_exceptions(self):
+        errors = []
+        with LeakyBucketScheduler(capacity=10, leak_rate=1000, error_handler=errors.append) as scheduler:
+            future = scheduler.submit(lambda: 1 / 0)
+            scheduler.add(lambda: [][0])
+            with pytest.raises(ZeroDivisionError):
+                future.result(timeout=2)
+        assert len(errors) == 1 and isinstance(errors[0], IndexError)
+
+    def test_executor(self):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            with LeakyBucketScheduler(capacity=10, leak_rate=1000, executor=executor) as scheduler:
+                future = scheduler.submit(threading.current_thread)
+                assert future.result(timeout=2) is not scheduler.worker
+
+    def test_shutdown_cancels_pending_items(self):
+        scheduler = LeakyBucketScheduler(capacity=10, leak_rate=2)
+        first = scheduler.submit(lambda: 'first')
+        assert first.result(timeout=2) == 'first'
+        pending = [scheduler.submit(lambda: 'late') for _ in range(3)]
+        start_time = time.monotonic()
+        scheduler.shutdown(cancel_pending=True)
+        assert time.monotonic() - start_time < 0.3
+        for future in pending:
+            with pytest.raises(CancelledError):
+                future.result(timeout=0)
+        with pytest.raises(RuntimeError):
+            scheduler.add(len, 'a')
+
+
+class TestAsyncLeakyBucketScheduler:
+
+    def test_init_invalid_params(self):
+        with pytest.raises(ValueError):
+            AsyncLeakyBucketScheduler(capacity=5, leak_rate=-1)
+
+    def test_coroutines_start_at_leak_rate(self):
+        async def run():
+            scheduler = AsyncLeakyBucketScheduler(capacity=10, leak_rate=50)
+            loop = asyncio.get_running_loop()
+            start_time = loop.time()
+
+            async def work(i):
+                return i, loop.time() - start_time
+
+            futures = [scheduler.submit(work(i)) for i in range(3)] + [scheduler.submit(work, 3)]
+            futures.append(scheduler.submit(lambda: 'sync'))
+            return await asyncio.gather(*futures)
+
+        results = asyncio.run(run())
+        assert [result[0] for result in results[:4]] == [0, 1, 2, 3]
+        assert results[0][1] < 0.015
+        assert 0.055 <= results[3][1] <= 0.15
+        assert results[4] == 'sync'
+
+    def test_full_queue_rejects_items(self):
+        async def run():
+            scheduler = AsyncLeakyBucketScheduler(capacity=2, leak_rate=10)
+
+            async def work():
+                return 'done'
+
+            futures = [scheduler.submit(work()) for _ in range(3)]
+            assert futures[2] is None
+            assert scheduler.get_queue_length() == 2
+            await scheduler.join()
+            return await asyncio.gather(*futures[:2])
+
+        assert asyncio.run(run()) == ['done', 'done']
+
+    def test_cancel_pending_and_exceptions(self):
+        async def run():
+            scheduler = AsyncLeakyBucketScheduler(capacity=10, leak_rate=5)
+
+            async def fail():
+                raise KeyError('key')
+
+            failing = scheduler.submit(fail())
+            pending = [scheduler.submit(asyncio.sleep, 0) for _ in range(3)]
+            with pytest.raises(KeyError):
+                await failing
+            assert scheduler.cancel_pending() == 3
+            assert all(future.cancelled() for future in pending)
+            await scheduler.join()
+
+        asyncio.run(run())
@@ -0,0 +1,162 @@
+import threading
+import time
+
+import pytest
+
+from src.rate_limiting.distributed_rate_limiter import DistributedRateLimiter
+from src.rate_limiting.leased_rate_limiter import LeasedRateLimiter
+from src.rate_limiting.storage_backend import InMemoryStorageBackend
+from src.rate_limiting.traffic_simulator import VirtualClock
+
+
+def wait_for_refills(limiter):
+    if limiter.executor is not None:
+        limiter.executor.submit(lambda: None).result()
+
+
+class TestLeasedRateLimiter:
+
+    def test_init_invalid_params(self):
+        backend = InMemoryStorageBackend()
+        with pytest.raises(ValueError):
+            LeasedRateLimiter(backend, 'sliding_window_log', 10, max_allowed_requests=5, window_size=1)
+        with pytest.raises(ValueError):
+            LeasedRateLimiter(backend, 'token_bucket', 10, capacity=5)
+        with pytest.raises(ValueError):
+            LeasedRateLimiter(backend, 'token_bucket', 0, capacity=5, fill_rate=1)
+        with pytest.raises(ValueError):
+            LeasedRateLimiter(backend, 'token_bucket', 10, refill_threshold=11, capacity=5, fill_rate=1)
+        with pytest.raises(ValueError):
+            LeasedRateLimiter(backend, 'token_bucket', 10, lease_ttl=0, capacity=5, fill_rate=1)
+
+    def test_round_trips_drop_by_lease_size(self):
+        backend = InMemoryStorageBackend()
+        limiter = LeasedRateLimiter(backend, 'token_bucket', 100, capacity=10_000, fill_rate=0.01)
+        assert all(limiter.allow_request('client') for _ in range(1000))
+        wait_for_refills(limiter)
+        assert backend.round_trips <= 11
+        limiter.close()
+
+    @pytest.mark.parametrize("algorithm,limits", [
+        ('token_bucket', {'capacity': 50, 'fill_rate': 0.01}),
+        ('fixed_window_counter', {'max_allowed_requests': 50, 'window_size': 100}),
+    ])
+    def test_nodes_never_admit_more_than_the_global_limit(self, algorithm, limits):
+        backend = InMemoryStorageBackend()
+        nodes = [LeasedRateLimiter(backend, algorithm, 8, **limits) for _ in range(3)]
+        allowed = sum(node.allow_request('client') for _ in range(40) for node in nodes)
+        for node in nodes:
+            wait_for_refills(node)
+        allowed += sum(node.allow_request('client') for _ in range(40) for node in nodes)
+        assert allowed == 50
+        for node in nodes:
+            node.close()
+
+    def test_lease_shares_state_with_distributed_limiter(self):
+        backend = InMemoryStorageBackend()
+        limiter = LeasedRateLimiter(backend, 'fixed_window_counter', 4, refill_threshold=0,
+                                    max_allowed_requests=5, window_size=100)
+        remote = DistributedRateLimiter(backend, 'fixed_window_counter', max_allowed_requests=5, window_size=100)
+        assert limiter.allow_request('client') is True
+        assert limiter.remaining('client') == 3
+        assert remote.allow_request('client') is True
+        assert remote.allow_request('client') is False
+        limiter.close()
+
+    def test_token_bucket_lease_expires(self):
+        backend = InMemoryStorageBackend()
+        limiter = LeasedRateLimiter(backend, 'token_bucket', 5, refill_threshold=0, lease_ttl=0.05,
+                                    capacity=5, fill_rate=0.01)
+        assert limiter.allow_request('client') is True
+        assert limiter.remaining('client') == 4
+        time.sleep(0.06)
+        assert limiter.remaining('client') == 0
+        assert limiter.allow_request('client') is False  # The unused tokens were dropped, not returned
+        limiter.close()
+
+    def test_leases_are_timed_with_the_clock(self):
+        clock = VirtualClock(1000.0)
+        limiter = LeasedRateLimiter(InMemoryStorageBackend(), 'token_bucket', 5, refill_threshold=0, lease_ttl=5,
+                                    clock=clock, capacity=5, fill_rate=0.01)
+        assert limiter.allow_request('client') is True
+        clock.advance(4)
+        assert limiter.remaining('client') == 4
+        clock.advance(2)
+        assert limiter.remaining('client') == 0
+        clock.advance(1)
+        limiter.allow_request('other-client')
+        assert 'client' not in limiter.leases  # Dropped by the timing wheel, on the same clock
+        assert limiter.executor is None  # No lease ran low, no refill thread
+        limiter.close()
+
+    def test_refills_stop_once_closed(self):
+        limiter = LeasedRateLimiter(InMemoryStorageBackend(), 'token_bucket', 4, capacity=100, fill_rate=0.01)
+        limiter.close()
+        assert all(limiter.allow_request('client') for _ in range(20))  # Leases are still taken on demand
+        assert limiter.executor is None
+
+    def test_fixed_window_lease_expires_with_the_window(self):
+        backend = InMemoryStorageBackend()
+        limiter = LeasedRateLimiter(backend, 'fixed_window_counter', 3, refill_threshold=0,
+                                    max_allowed_requests=3, window_size=0.05)
+        assert [limiter.allow_request('client') for _ in range(4)] == [True, True, True, False]
+        time.sleep(0.06)
+        assert limiter.allow_request('client') is True
+        limiter.close()
+
+    def test_cost_larger_than_lease(self):
+        backend = InMemoryStorageBackend()
+        limiter = LeasedRateLimiter(backend, 'token_bucket', 2, capacity=10, fill_rate=0.01)
+        assert limiter.allow_request('client', cost=7) is True
+        assert limiter.allow_request('client', cost=7) is False
+        with pytest.raises(ValueError):
+            limiter.allow_request('client', cost=-1)
+        limiter.close()
+
+    def test_concurrent_requests(self):
+        backend = InMemoryStorageBackend()
+        limiter = LeasedRateLimiter(backend, 'fixed_window_counter', 10, max_allowed_requests=200, window_size=100)
+        allowed = []
+
+        def worker():
+            allowed.extend(limiter.allow_request('client') for _ in range(50))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        limiter.close()
+        assert sum(allowed) == 200
+
+    def test_overloaded_key_backs_off(self):
+        backend = InMemoryStorageBackend()
+        limiter = LeasedRateLimiter(backend, 'token_bucket', 2, capacity=5, fill_rate=0.01)
+        assert sum(limiter.allow_request('client') for _ in range(100)) == 5
+        wait_for_refills(limiter)
+        # The partial grant is spent locally, then denials take no round-trip until a token could be refilled
+        assert backend.round_trips == 3
+        limiter.close()
+
+    def test_window_backoff_ends_with_the_window(self):
+        backend = InMemoryStorageBackend()
+        limiter = LeasedRateLimiter(backend, 'fixed_window_counter', 4, refill_threshold=0,
+                                    max_allowed_requests=3, window_size=0.05)
+        assert sum(limiter.allow_request('client') for _ in range(50)) == 3
+        assert backend.round_trips == 1
+        time.sleep(0.06)
+        assert limiter.allow_request('client') is True
+        limiter.close()
+
+    def test_expired_leases_are_dropped(self):
+        backend = InMemoryStorageBackend()
+        limiter = LeasedRateLimiter(backend, 'token_bucket', 5, refill_threshold=0, lease_ttl=0.05,
+                                    capacity=100, fill_rate=100)
+        for i in range(20):
+            assert limiter.allow_request(f'client-{i}') is True
+        assert len(limiter.leases) == 20
+        time.sleep(0.25)
+        for _ in range(3):
+            limiter.allow_request('active-client')
+        assert list(limiter.leases) == ['active-client']
+        limiter.close()
@@ -0,0 +1,180 @@
+import threading
+import time
+
+import pytest
+
+from src.rate_limiting.async_rate_limiter import AsyncTokenBucket
+from src.rate_limiting.bucketed_sliding_window_log import BucketedSlidingWindowLog
+from src.rate_limiting.fixed_window_counter import FixedWindowCounter
+from src.rate_limiting.gcra import GCRA
+from src.rate_limiting.keyed_rate_limiter import KeyedRateLimiter
+from src.rate_limiting.leaky_bucket import LeakyBucket
+from src.rate_limiting.metrics import Histogram, RateLimiterMetrics, to_openmetrics, to_prometheus
+from src.rate_limiting.sliding_window_counter import SlidingWindowCounter
+from src.rate_limiting.sliding_window_log import SlidingWindowLog
+from src.rate_limiting.token_bucket import TokenBucket
+from src.rate_limiting.traffic_simulator import VirtualClock, default_decision
+
+LIMITERS = {
+    'token_bucket': lambda clock, metrics: TokenBucket(3, 1, clock=clock, metrics=metrics),
+    'leaky_bucket': lambda clock, metrics: LeakyBucket(3, 1, clock=clock, metrics=metrics),
+    'fixed_window_counter': lambda clock, metrics: FixedWindowCounter(3, 10, clock=clock, metrics=metrics),
+    'sliding_window_counter': lambda clock, metrics: SlidingWindowCounter(3, 10, clock=clock, metrics=metrics),
+    'sliding_window_log': lambda clock, metrics: SlidingWindowLog(3, 10, clock=clock, metrics=metrics),
+    'bucketed_sliding_window_log': lambda clock, metrics: BucketedSlidingWindowLog(3, 10, clock=clock,
+                                                                                   metrics=metrics),
+    'gcra': lambda clock, metrics: GCRA(3, 1, clock=clock, metrics=metrics),
+}
+
+
+class TestMetrics:
+
+    @pytest.mark.parametrize('algorithm', list(LIMITERS))
+    def test_decisions_are_counted(self, algorithm):
+        metrics = RateLimiterMetrics(sample_every=4)
+        limiter = LIMITERS[algorithm](VirtualClock(), metrics)
+        decisions = [default_decision(limiter) for _ in range(10)]
+        assert decisions == [True] * 3 + [False] * 7
+        assert metrics.allowed == 3
+        assert metrics.denied == 7
+        # One decision in four is timed
+        assert metrics.snapshot()['decision_latency']['count'] == 2
+
+    def test_timed_decision(self):
+        metrics = RateLimiterMetrics(sample_every=2)
+        lock = threading.Lock()
+        held = []
+
+        def decision(cost):
+            held.append(lock.locked())
+            return cost % 3 != 0
+
+        assert [metrics.timed_decision(lock, decision, cost) for cost in range(6)] == [False, True, True] * 2
+        assert held == [True] * 6
+        assert not lock.locked()
+        assert (metrics.allowed, metrics.denied) == (4, 2)
+        assert metrics.snapshot()['decision_latency']['count'] == 6
+
+    @pytest.mark.parametrize('algorithm', list(LIMITERS))
+    def test_acquire_is_counted(self, algorithm):
+        metrics = RateLimiterMetrics()
+        limiter = LIMITERS[algorithm](VirtualClock(), metrics)
+        assert all(limiter.acquire(1, timeout=0) for _ in range(3))
+        assert not limiter.acquire(1, timeout=0)
+        assert (metrics.allowed, metrics.denied) == (3, 1)
+        assert isinstance(metrics.allowed, int)
+
+    def test_every_decision_timed(self):
+        metrics = RateLimiterMetrics(sample_every=1)
+        limiter = FixedWindowCounter(100, 10, metrics=metrics)
+        for _ in range(50):
+            limiter.allow_request()
+        latency = metrics.snapshot()['decision_latency']
+        assert latency['count'] == 50
+        assert latency['buckets'][-1] == (float('inf'), 50)
+        assert latency['sum'] > 0
+
+    def test_lock_wait_is_recorded_on_contention(self):
+        metrics = RateLimiterMetrics()
+        limiter = TokenBucket(10, 1, metrics=metrics)
+        with limiter.lock:
+            thread = threading.Thread(target=limiter.consume, args=(1,))
+            thread.start()
+            time.sleep(0.05)
+            # A snapshot does not need the limiter lock
+            assert metrics.snapshot()['lock_wait']['count'] == 0
+        thread.join()
+
+        lock_wait = metrics.snapshot()['lock_wait']
+        assert lock_wait['count'] == 1
+        assert lock_wait['sum'] >= 0.04
+        assert metrics.allowed == 1
+
+    def test_uncontended_decisions_do_not_wait(self):
+        metrics = RateLimiterMetrics(sample_every=1)
+        limiter = SlidingWindowLog(10, 1, metrics=metrics)
+        for _ in range(20):
+            limiter.allow_request()
+        assert metrics.snapshot()['lock_wait']['count'] == 0
+
+    def test_shared_metrics_count_every_decision(self):
+        metrics = RateLimiterMetrics(sample_every=8)
+        registry = KeyedRateLimiter(lambda: FixedWindowCounter(500, 60, metrics=metrics))
+
+        def worker(thread_index):
+            for i in range(5000):
+                registry.get_limiter((thread_index + i) % 16).allow_request()
+
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert metrics.allowed == 16 * 500
+        assert metrics.allowed + metrics.denied == 8 * 5000
+
+    def test_async_limiter_metrics(self):
+        import asyncio
+        metrics = RateLimiterMetrics()
+        bucket = AsyncTokenBucket(capacity=2, fill_rate=1000, metrics=metrics)
+
+        async def acquire_three():
+            for _ in range(3):
+                await bucket.acquire()
+
+        asyncio.run(acquire_three())
+        assert metrics.allowed == 3
+
+    def test_histogram(self):
+        histogram = Histogram((10, 100))
+        for duration in (5, 10, 50, 1000):
+            histogram.observe(duration)
+        snapshot = histogram.snapshot()
+        assert snapshot['buckets'] == [(1e-08, 2), (1e-07, 3), (float('inf'), 4)]
+        assert snapshot['count'] == 4
+        assert snapshot['sum'] == pytest.approx(1065e-9)
+        with pytest.raises(ValueError):
+            Histogram((100, 10))
+        with pytest.raises(ValueError):
+            RateLimiterMetrics(sample_every=0)
+
+    def test_prometheus_export(self):
+        metrics = RateLimiterMetrics('login "form"', sample_every=1, buckets_ns=(1_000_000_000,))
+        limiter = FixedWindowCounter(1, 10, metrics=metrics)
+        limiter.allow_request()
+        limiter.allow_request()
+
+        text = to_prometheus([metrics])
+        lines = text.splitlines()
+        assert '# TYPE rate_limiter_decisions_total counter' in lines
+        assert 'rate_limiter_decisions_total{limiter="login \\"form\\"",result="allowed"} 1' in lines
+        assert 'rate_limiter_decisions_total{limiter="login \\"form\\"",result="denied"} 1' in lines
+        assert '# TYPE rate_limiter_decision_seconds histogram' in lines
+        assert 'rate_limiter_decision_seconds_bucket{limiter="login \\"form\\"",le="1.0"} 2' in lines
+        assert 'rate_limiter_decision_seconds_bucket{limiter="login \\"form\\"",le="+Inf"} 2' in lines
+        assert 'rate_limiter_decision_seconds_count{limiter="login \\"form\\""} 2' in lines
+        assert 'rate_limiter_lock_wait_seconds_count{limiter="login \\"form\\""} 0' in lines
+        assert '# EOF' not in lines
+        assert text.endswith('\n')
+
+    def test_openmetrics_export(self):
+        metrics = RateLimiterMetrics('api')
+        TokenBucket(1, 1, metrics=metrics).consume(1)
+        lines = to_openmetrics([metrics]).splitlines()
+        assert '# TYPE rate_limiter_decisions counter' in lines
+        assert 'rate_limiter_decisions_total{limiter="api",result="allowed"} 1' in lines
+        assert '# UNIT rate_limiter_lock_wait_seconds seconds' in lines
+        assert lines[-1] == '# EOF'
+
+    def test_metrics_with_the_same_name_are_added_up(self):
+        first, second = RateLimiterMetrics('api'), RateLimiterMetrics('api')
+        TokenBucket(1, 1, metrics=first).consume(1)
+        bucket = TokenBucket(1, 1, metrics=second)
+        bucket.consume(1)
+        bucket.consume(1)
+        lines = to_prometheus([first, second, RateLimiterMetrics('other')]).splitlines()
+        assert 'rate_limiter_decisions_total{limiter="api",result="allowed"} 2' in lines
+        assert 'rate_limiter_decisions_total{limiter="api",result="denied"} 1' in lines
+        assert 'rate_limiter_decisions_total{limiter="other",result="allowed"} 0' in lines
+        with pytest.raises(ValueError):
+            to_prometheus([first, RateLimiterMetrics('api', buckets_ns=(1, 2))])
@@ -0,0 +1,84 @@
+import pytest
+import threading
+import time
+
+from src.rate_limiting.sharded_keyed_rate_limiter import ShardedKeyedRateLimiter
+from src.rate_limiting.sliding_window_log import SlidingWindowLog
+from src.rate_limiting.token_bucket import TokenBucket
+
+
+class TestShardedKeyedRateLimiter:
+
+    def test_init_invalid_params(self):
+        with pytest.raises(ValueError):
+            ShardedKeyedRateLimiter(lambda: TokenBucket(capacity=5, fill_rate=1), num_shards=0)
+        with pytest.raises(ValueError):
+            ShardedKeyedRateLimiter(lambda: TokenBucket(capacity=5, fill_rate=1), max_keys=0)
+        with pytest.raises(ValueError):
+            ShardedKeyedRateLimiter(lambda: TokenBucket(capacity=5, fill_rate=1), num_shards=8, max_keys=4)
+
+    def test_get_limiter(self):
+        sharded = ShardedKeyedRateLimiter(lambda: TokenBucket(capacity=5, fill_rate=1), num_shards=4)
+        limiter = sharded.get_limiter('client-1')
+        assert isinstance(limiter, TokenBucket)
+        assert sharded.get_limiter('client-1') is limiter
+        assert 'client-1' in sharded
+        assert 'client-2' not in sharded
+
+    def test_keys_are_spread_over_shards(self):
+        sharded = ShardedKeyedRateLimiter(lambda: TokenBucket(capacity=5, fill_rate=1), num_shards=4)
+        for i in range(100):
+            sharded.get_limiter(i)
+        assert len(sharded) == 100
+        assert all(len(shard) > 0 for shard in sharded.shards)
+
+    def test_strided_keys_are_spread_over_shards(self):
+        sharded = ShardedKeyedRateLimiter(lambda: TokenBucket(capacity=5, fill_rate=1), num_shards=64)
+        for i in range(0, 64 * 640, 64):  # hash(key) % num_shards would put them all in the first shard
+            sharded.get_limiter(i)
+        assert max(len(shard) for shard in sharded.shards) <= 30
+
+    def test_max_keys_is_enforced(self):
+        sharded = ShardedKeyedRateLimiter(lambda: TokenBucket(capacity=5, fill_rate=1), num_shards=4, max_keys=100)
+        for i in range(1000):
+            sharded.get_limiter(i)
+        assert len(sharded) <= 100
+
+    def test_remove_evict_idle_and_clear(self):
+        sharded = ShardedKeyedRateLimiter(lambda: TokenBucket(capacity=5, fill_rate=1), num_shards=4, idle_ttl=0.05)
+        for i in range(10):
+            sharded.get_limiter(i)
+        assert sharded.remove(0) is True
+        assert sharded.remove(0) is False
+        time.sleep(0.06)
+        sharded.get_limiter(1)
+        assert sharded.evict_idle() == 8
+        assert len(sharded) == 1
+        sharded.clear()
+        assert len(sharded) == 0
+
+    def test_timing_wheels(self):
+        sharded = ShardedKeyedRateLimiter(lambda: TokenBucket(capacity=5, fill_rate=1), num_shards=4, idle_ttl=0.05,
+                                          wheel_tick=0.01)
+        assert all(shard.wheel is not None for shard in sharded.shards)
+        for i in range(10):
+            sharded.get_limiter(i)
+        time.sleep(0.08)
+        assert sharded.evict_idle() == 10
+
+    def test_thread_safety(self):
+        sharded = ShardedKeyedRateLimiter(lambda: SlidingWindowLog(max_allowed_requests=100, window_size=10),
+                                          num_shards=8)
+
+        def make_requests():
+            for i in range(200):
+                sharded.get_limiter(i % 20).allow_request()
+
+        threads = [threading.Thread(target=make_requests) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(sharded) == 20
+        # 8 threads x 200 requests over 20 keys, exactly 80 requests per key
+        assert all(sharded.get_limiter(key).current_request_count == 80 for key in range(20))
@@ -0,0 +1,99 @@
+import multiprocessing
+
+import pytest
+
+from src.rate_limiting import shared_memory_backend
+from src.rate_limiting.distributed_rate_limiter import DistributedRateLimiter
+from src.rate_limiting.leased_rate_limiter import LeasedRateLimiter
+from src.rate_limiting.shared_memory_backend import SharedMemoryStorageBackend
+
+
+def take_tokens(path: str, num_requests: int, results) -> None:
+    """Worker process: decide requests against the table another process created."""
+    with SharedMemoryStorageBackend(path, num_stripes=4, slots_per_stripe=64) as backend:
+        limiter = DistributedRateLimiter(backend, 'token_bucket', capacity=100, fill_rate=0.001)
+        results.put(sum(limiter.allow_request('host-wide') for _ in range(num_requests)))
+
+
+class TestSharedMemoryStorageBackend:
+
+    def test_init_invalid_params(self, tmp_path):
+        with pytest.raises(ValueError):
+            SharedMemoryStorageBackend(str(tmp_path / 'table'), num_stripes=0)
+        SharedMemoryStorageBackend(str(tmp_path / 'table'), num_stripes=2, slots_per_stripe=8).close()
+        with pytest.raises(ValueError):
+            SharedMemoryStorageBackend(str(tmp_path / 'table'), num_stripes=4, slots_per_stripe=8)
+
+    def test_decisions_match_in_memory_backend(self, tmp_path):
+        with SharedMemoryStorageBackend(str(tmp_path / 'table'), num_stripes=2, slots_per_stripe=8) as backend:
+            assert [backend.evaluate('token_bucket', 'key', [3, 1, 1, '']) for _ in range(4)] == [1, 1, 1, 0]
+            assert backend.evaluate_many('fixed_window_counter', [('a', [1, 10, 1, ''])] * 2) == [1, 0]
+            assert backend.evaluate('leaky_bucket', 'b', [2, 1, 3, '']) == 0
+            assert backend.evaluate('token_bucket_lease', 'c', [10, 0.01, 4, '']) == [4, -1]
+            assert backend.evaluate('token_bucket_lease', 'c', [10, 0.01, 8, '']) == [6, -1]
+            assert backend.round_trips == 8  # One per decision, evaluate_many counts once
+            with pytest.raises(ValueError):
+                backend.evaluate('sliding_window_log', 'd', [2, 1, 1, 'id'])
+
+    @pytest.mark.parametrize('fill_rate', [7, 0.7, 11, 13])
+    def test_gcra_admits_capacity_at_any_rate(self, tmp_path, monkeypatch, fill_rate):
+        monkeypatch.setattr(shared_memory_backend.time, 'time', lambda: 1000.0)
+        with SharedMemoryStorageBackend(str(tmp_path / 'table'), num_stripes=1, slots_per_stripe=4) as backend:
+            assert [backend.evaluate('gcra', 'key', [10, fill_rate, 1, '']) for _ in range(11)] == [1] * 10 + [0]
+
+    def test_windows_and_gcra(self, tmp_path, monkeypatch):
+        current_time = [1000.0]
+        monkeypatch.setattr(shared_memory_backend.time, 'time', lambda: current_time[0])
+        with SharedMemoryStorageBackend(str(tmp_path / 'table'), num_stripes=2, slots_per_stripe=8) as backend:
+            decisions = [backend.evaluate('sliding_window_counter', 'sliding', [4, 1, 1, '']) for _ in range(5)]
+            assert decisions == [1] * 4 + [0]
+            assert [backend.evaluate('gcra', 'gcra', [2, 2, 1, '']) for _ in range(3)] == [1, 1, 0]
+            assert backend.evaluate('fixed_window_counter_lease', 'lease', [5, 2, 3, '']) == [3, 2000]
+            current_time[0] += 0.5
+            assert backend.evaluate('gcra', 'gcra', [2, 2, 1, '']) == 1
+            assert backend.evaluate('fixed_window_counter_lease', 'lease', [5, 2, 3, '']) == [2, 1500]
+            current_time[0] += 1.0  # Half of the previous window is still inside the sliding window
+            decisions = [backend.evaluate('sliding_window_counter', 'sliding', [4, 1, 1, '']) for _ in range(3)]
+            assert decisions == [1, 1, 0]
+
+    def test_state_is_shared_through_the_file(self, tmp_path):
+        path = str(tmp_path / 'table')
+        first = SharedMemoryStorageBackend(path, num_stripes=2, slots_per_stripe=8)
+        second = SharedMemoryStorageBackend(path, num_stripes=2, slots_per_stripe=8)
+        assert first.evaluate('fixed_window_counter', 'key', [2, 10, 1, '']) == 1
+        assert second.evaluate('fixed_window_counter', 'key', [2, 10, 1, '']) == 1
+        assert first.evaluate('fixed_window_counter', 'key', [2, 10, 1, '']) == 0
+        first.close()
+        second.close()
+        second.unlink()
+
+    def test_full_stripe_reuses_record_expiring_first(self, tmp_path, monkeypatch):
+        current_time = [1000.0]
+        monkeypatch.setattr(shared_memory_backend.time, 'time', lambda: current_time[0])
+        with SharedMemoryStorageBackend(str(tmp_path / 'table'), num_stripes=1, slots_per_stripe=2) as backend:
+            assert backend.evaluate('fixed_window_counter', 'long', [1, 60, 1, '']) == 1
+            assert backend.evaluate('fixed_window_counter', 'short', [1, 5, 1, '']) == 1
+            assert backend.evaluate('fixed_window_counter', 'new', [1, 60, 1, '']) == 1  # Overwrites 'short'
+            assert backend.evaluate('fixed_window_counter', 'long', [1, 60, 1, '']) == 0
+            assert backend.evaluate('fixed_window_counter', 'short', [1, 5, 1, '']) == 1  # Overwrites 'new'
+            current_time[0] += 100  # Every record expired, their slots are free again
+            assert backend.evaluate('fixed_window_counter', 'long', [1, 60, 1, '']) == 1
+
+    def test_leased_rate_limiter(self, tmp_path):
+        with SharedMemoryStorageBackend(str(tmp_path / 'table'), num_stripes=2, slots_per_stripe=8) as backend:
+            limiter = LeasedRateLimiter(backend, 'fixed_window_counter', lease_size=5, max_allowed_requests=12,
+                                        window_size=10)
+            assert sum(limiter.allow_request('key') for _ in range(20)) == 12
+
+    def test_processes_enforce_one_limit(self, tmp_path):
+        path = str(tmp_path / 'table')
+        SharedMemoryStorageBackend(path, num_stripes=4, slots_per_stripe=64).close()
+        context = multiprocessing.get_context('spawn')  # Fresh interpreters, with their own hash seeds
+        results = context.Queue()
+        workers = [context.Process(target=take_tokens, args=(path, 60, results)) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        allowed = sum(results.get(timeout=30) for _ in workers)
+        for worker in workers:
+            worker.join(timeout=30)
+        assert allowed == 100
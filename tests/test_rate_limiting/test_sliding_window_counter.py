@@ -1,7 +1,10 @@
+import math
+
 import pytest
 import time
 
 from src.rate_limiting.sliding_window_counter import SlidingWindowCounter
+from src.rate_limiting.traffic_simulator import VirtualClock
 
 
 class TestSlidingWindowCounter:
@@ -35,21 +38,45 @@ class TestSlidingWindowCounter:
         assert swc.current_request_count == 2
 
     def test_allow_request_new_window(self):
-        swc = SlidingWindowCounter(max_allowed_requests=2, window_size=0.1)
+        clock = VirtualClock()
+        swc = SlidingWindowCounter(max_allowed_requests=2, window_size=0.1, clock=clock)
         assert swc.allow_request() is True
         assert swc.allow_request() is True
-        time.sleep(0.11)  # Wait for new window
+        clock.advance(0.11)  # Wait for new window
         assert swc.allow_request() is True
         assert swc.current_request_count == 1
         assert swc.previous_request_count == 2
 
     def test_allow_request_sliding_window_effect(self):
-        swc = SlidingWindowCounter(max_allowed_requests=3, window_size=0.1)
+        clock = VirtualClock()
+        swc = SlidingWindowCounter(max_allowed_requests=3, window_size=0.1, clock=clock)
         assert swc.allow_request() is True
         assert swc.allow_request() is True
         assert swc.allow_request() is True
-        time.sleep(0.05)  # Wait for half window
+        clock.advance(0.05)  # Wait for half window
         assert swc.allow_request() is False  # Should be denied due to sliding window effect
+        clock.advance(0.1)  # Half of the previous window still counts: 1.5 and 2.5 < 3
+        assert swc.allow_request() is True
+        assert swc.allow_request() is True
+        assert swc.allow_request() is False
+
+    def test_counters_keep_shifting_under_sustained_load(self):
+        clock = VirtualClock()
+        swc = SlidingWindowCounter(max_allowed_requests=5, window_size=1, clock=clock)
+        allowed = 0
+        for _ in range(10_000):
+            clock.advance(0.01)
+            allowed += swc.allow_request()
+        assert 450 <= allowed <= 550
+
+    def test_skipped_window_is_dropped(self):
+        clock = VirtualClock()
+        swc = SlidingWindowCounter(max_allowed_requests=2, window_size=1, clock=clock)
+        swc.allow_request()
+        swc.allow_request()
+        clock.advance(2.1)
+        assert swc.allow_request() is True
+        assert swc.previous_request_count == 0
 
     def test_get_window_status(self):
         swc = SlidingWindowCounter(max_allowed_requests=10, window_size=1.0)
@@ -82,3 +109,68 @@ class TestSlidingWindowCounter:
         for thread in threads:
             thread.join()
         assert swc.current_request_count + swc.previous_request_count <= 1000
+
+    def test_time_until_available(self):
+        swc = SlidingWindowCounter(max_allowed_requests=2, window_size=1.0)
+        assert swc.time_until_available() == 0
+        swc.allow_request()
+        swc.allow_request()
+        if swc.allow_request() is False:
+            assert 0 < swc.time_until_available() <= 1.0
+
+    def test_time_until_available_follows_previous_window_weight(self):
+        clock = VirtualClock()
+        swc = SlidingWindowCounter(max_allowed_requests=4, window_size=1, clock=clock)
+        for _ in range(4):
+            swc.allow_request()
+        clock.advance(0.5)
+        # Next window at 1.0, then 4 * (1 - elapsed) < 4 as soon as it starts
+        assert swc.time_until_available() == pytest.approx(0.5)
+        clock.advance(0.6)
+        swc.allow_request()  # Weighted count 4 * 0.9 = 3.6 -> allowed, 3.6 + 1 afterwards
+        # 4 * (1 - elapsed) + 1 < 4 once elapsed > 0.25
+        assert swc.time_until_available() == pytest.approx(0.15)
+
+    def test_acquire(self):
+        swc = SlidingWindowCounter(max_allowed_requests=2, window_size=10)
+        assert swc.acquire(timeout=0) is True
+
+    def test_acquire_timeout(self):
+        swc = SlidingWindowCounter(max_allowed_requests=2, window_size=100)
+        swc.acquire()
+        swc.acquire()
+        start_time = time.monotonic()
+        if swc.current_request_count == 2:
+            assert swc.acquire(timeout=0.5) is False
+            assert time.monotonic() - start_time < 0.1
+
+    def test_weighted_request_same_as_single_requests(self):
+        # A request of cost n is admitted exactly when n single requests in a row would all be
+        def limiter_after(history):
+            clock = VirtualClock()
+            swc = SlidingWindowCounter(max_allowed_requests=20, window_size=1, clock=clock)
+            for time_step, cost in history:
+                clock.advance(time_step)
+                swc.allow_request(cost)
+            return swc
+
+        history = []
+        for step in range(60):
+            history.append((0.13, step % 7 + 1))
+            for cost in range(1, 21):
+                weighted, single = limiter_after(history), limiter_after(history)
+                assert weighted.allow_request(cost) == all(single.allow_request() for _ in range(cost))
+
+    def test_weighted_time_until_available(self):
+        clock = VirtualClock()
+        swc = SlidingWindowCounter(max_allowed_requests=10, window_size=1, clock=clock)
+        assert swc.allow_request(10) is True
+        clock.advance(1)  # The previous window weighs 10 requests, and less and less
+        assert swc.time_until_available(5) == pytest.approx(0.4)  # Once it weighs less than 10 - 4
+        assert swc.time_until_available(8) == pytest.approx(0.7)
+        clock.advance(0.5)
+        assert swc.allow_request(6) is False
+        assert swc.allow_request(5) is True
+        assert swc.time_until_available(11) == math.inf
+        with pytest.raises(ValueError):
+            swc.allow_request(-1)
@@ -1,7 +1,10 @@
+import math
+
 import pytest
 import time
 
 from src.rate_limiting.sliding_window_log import SlidingWindowLog
+from src.rate_limiting.traffic_simulator import VirtualClock
 
 
 class TestSlidingWindowLog:
@@ -81,3 +84,64 @@ class TestSlidingWindowLog:
         for thread in threads:
             thread.join()
         assert swc.current_request_count == 1000
+
+    def test_time_until_available(self):
+        swc = SlidingWindowLog(max_allowed_requests=2, window_size=0.1)
+        assert swc.time_until_available() == 0
+        swc.allow_request()
+        swc.allow_request()
+        assert 0 < swc.time_until_available() <= 0.1
+        time.sleep(swc.time_until_available())
+        assert swc.allow_request() is True
+
+    def test_acquire_waits_for_oldest_request(self):
+        swc = SlidingWindowLog(max_allowed_requests=2, window_size=0.2)
+        assert swc.acquire() is True
+        assert swc.acquire() is True
+        start_time = time.monotonic()
+        assert swc.acquire() is True
+        assert 0.1 <= time.monotonic() - start_time <= 0.4
+
+    def test_acquire_timeout(self):
+        swc = SlidingWindowLog(max_allowed_requests=2, window_size=10)
+        swc.acquire()
+        swc.acquire()
+        assert swc.acquire(timeout=1) is False
+
+    def test_weighted_request_is_one_log_entry(self):
+        clock = VirtualClock()
+        log = SlidingWindowLog(max_allowed_requests=100, window_size=1, clock=clock)
+        assert log.allow_request(50) is True
+        clock.advance(0.25)
+        assert log.allow_request(30) is True
+        clock.advance(0.25)
+        assert log.allow_request(21) is False
+        assert log.allow_request(20) is True
+        assert len(log.request_timestamps) == 3
+        assert log.current_request_count == 100
+        clock.advance(0.5)  # The request of cost 50 leaves the window
+        assert log.allow_request(50) is True
+        assert log.allow_request(1) is False
+
+    def test_weighted_time_until_available(self):
+        clock = VirtualClock()
+        log = SlidingWindowLog(max_allowed_requests=10, window_size=1, clock=clock)
+        for cost in (4, 3, 3):
+            log.allow_request(cost)
+            clock.advance(0.1)
+        assert log.time_until_available(1) == pytest.approx(0.7)  # The first request frees 4
+        assert log.time_until_available(5) == pytest.approx(0.8)  # Both first requests have to leave
+        assert log.time_until_available(10) == pytest.approx(0.9)
+        assert log.time_until_available(11) == math.inf
+        with pytest.raises(ValueError):
+            log.allow_request(-1)
+        with pytest.raises(ValueError):
+            log.acquire(11)
+
+    def test_weighted_acquire(self):
+        log = SlidingWindowLog(max_allowed_requests=10, window_size=0.1)
+        assert log.acquire(7) is True
+        start_time = time.monotonic()
+        assert log.acquire(6, timeout=1) is True
+        assert time.monotonic() - start_time >= 0.05
+        assert log.acquire(10, timeout=0.01) is False
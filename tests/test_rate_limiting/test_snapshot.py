@@ -0,0 +1,94 @@
+import threading
+
+import pytest
+
+from src.rate_limiting import snapshot
+from src.rate_limiting.snapshot import load_snapshot, save_snapshot
+from src.rate_limiting.token_bucket_store import DELETED_SLOT, EMPTY_SLOT, TokenBucketStore
+from src.rate_limiting.traffic_simulator import VirtualClock
+
+
+class TestSnapshot:
+
+    def test_restore_keeps_buckets(self, tmp_path):
+        path = str(tmp_path / 'buckets')
+        store = TokenBucketStore(capacity=10, fill_rate=0.001, initial_slots=8)
+        for i in range(100):
+            store.consume(f'client-{i}', i % 10)
+        store.add_bucket('premium', capacity=50, fill_rate=0.01)
+        store.remove('client-0')
+        save_snapshot(store, path, chunk_slots=16)
+
+        restored = load_snapshot(path)
+        assert len(restored) == len(store) == 100
+        assert 'client-0' not in restored
+        assert restored.get_available_tokens('client-7') == 3
+        assert restored.get_available_tokens('premium') == 50
+        assert restored.consume('premium', 45) is True
+        assert restored.consume('client-9', 2) is False  # Still drained, no burst after the restart
+        assert restored.consume('new-client', 10) is True
+        assert (restored.capacity, restored.fill_rate) == (10, 0.001)
+
+    def test_restore_rebases_time(self, tmp_path, monkeypatch):
+        wall_time = [1_000_000.0]
+        monkeypatch.setattr(snapshot.time, 'time', lambda: wall_time[0])
+        path = str(tmp_path / 'buckets')
+        clock = VirtualClock(500)  # Time since the old host booted
+        store = TokenBucketStore(capacity=10, fill_rate=1, clock=clock)
+        store.consume('client', 10)
+        save_snapshot(store, path)
+
+        wall_time[0] += 4  # The deploy took 4 seconds, and the clock of the new host starts over
+        new_clock = VirtualClock(20)
+        restored = load_snapshot(path, clock=new_clock)
+        assert restored.get_available_tokens('client') == 4
+        wall_time[0] += 2
+        new_clock.advance(2)  # The shifted clock follows the new one
+        assert restored.get_available_tokens('client') == 6
+
+        save_snapshot(restored, path)  # A restored store snapshots again
+        wall_time[0] += 3
+        assert load_snapshot(path, clock=VirtualClock(7)).get_available_tokens('client') == 9
+
+    def test_snapshot_while_store_is_used(self, tmp_path):
+        path = str(tmp_path / 'buckets')
+        store = TokenBucketStore(capacity=10, fill_rate=0.001, initial_slots=64)
+        for key in range(40):
+            store.consume(key, 1)
+        stop = threading.Event()
+
+        def insert_keys():
+            for key in range(1000, 200_000):  # Grows the store, resizing it under the snapshot
+                if stop.is_set():
+                    break
+                store.consume(key, 1)
+
+        thread = threading.Thread(target=insert_keys)
+        thread.start()
+        try:
+            for _ in range(5):
+                save_snapshot(store, path, chunk_slots=8)
+        finally:
+            stop.set()
+            thread.join()
+
+        restored = load_snapshot(path)
+        assert all(restored.get_available_tokens(key) == 9 for key in range(40))
+        fingerprints = restored.fingerprint_column
+        assert len(restored) == len(fingerprints) - fingerprints.count(EMPTY_SLOT) - fingerprints.count(DELETED_SLOT)
+        assert len(restored) >= 40
+
+    def test_invalid_file(self, tmp_path):
+        path = tmp_path / 'not_a_snapshot'
+        path.write_bytes(b'x' * 100)
+        with pytest.raises(ValueError):
+            load_snapshot(str(path))
+
+        store = TokenBucketStore(capacity=1, fill_rate=1)
+        store.consume('client', 1)
+        save_snapshot(store, str(path))
+        path.write_bytes(path.read_bytes()[:-8])
+        with pytest.raises(ValueError):
+            load_snapshot(str(path))
+        with pytest.raises(ValueError):
+            save_snapshot(TokenBucketStore(capacity=1, fill_rate=1), str(path), chunk_slots=0)
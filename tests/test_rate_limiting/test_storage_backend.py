@@ -0,0 +1,222 @@
+import time
+
+import pytest
+
+from src.rate_limiting import storage_backend
+from src.rate_limiting.backend_algorithms import ALGORITHMS, gcra
+from src.rate_limiting.sliding_window_counter import SlidingWindowCounter
+from src.rate_limiting.storage_backend import LUA_SCRIPTS, InMemoryStorageBackend, RedisStorageBackend
+from src.rate_limiting.traffic_simulator import VirtualClock
+
+
+class FakeScript:
+    """Stands in for a registered script: runs the in-memory equivalent, or queues on a pipeline."""
+
+    def __init__(self, client, algorithm):
+        self.client = client
+        self.algorithm = algorithm
+
+    def __call__(self, keys, args, client=None):
+        self.client.keys.append(keys)
+        if client is not None:
+            client.queued.append((self.algorithm, keys[0], args))
+            return client
+        self.client.calls += 1
+        return self.client.server.evaluate(self.algorithm, keys[0], args)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.queued = []
+
+    def execute(self):
+        self.client.calls += 1
+        return [self.client.server.evaluate(*call) for call in self.queued]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.server = InMemoryStorageBackend()
+        self.calls = 0
+        self.keys = []  # Keys of every script call
+
+    def register_script(self, source):
+        algorithm = next(name for name, script in LUA_SCRIPTS.items() if script == source)
+        return FakeScript(self, algorithm)
+
+    def pipeline(self, transaction=True):
+        assert transaction is False
+        return FakePipeline(self)
+
+
+class TestStorageBackend:
+
+    def test_scripts_for_every_algorithm(self):
+        assert set(LUA_SCRIPTS) == {'token_bucket', 'leaky_bucket', 'fixed_window_counter',
+                                    'sliding_window_counter', 'sliding_window_log', 'gcra',
+                                    'token_bucket_lease', 'fixed_window_counter_lease'}
+
+    def test_gcra_script_matches_the_python_algorithm(self):
+        lupa = pytest.importorskip('lupa')
+        for fill_rate in (7, 0.7, 3, 1_000_000 / 7):
+            lua = lupa.LuaRuntime()
+            store, current_time = {}, [1_000_000]  # Microseconds
+
+            def call(command, *args):
+                if command == 'TIME':
+                    return lua.table(str(current_time[0] // 1_000_000), str(current_time[0] % 1_000_000))
+                if command == 'GET':
+                    return store.get(args[0], False)
+                store[args[0]] = args[1]  # SET
+                return True
+
+            lua.globals().redis = lua.table_from({'call': call})
+            script = lua.eval('function(KEYS, ARGV) ' + LUA_SCRIPTS['gcra'] + ' end')
+            state = None
+            for step in range(200):
+                current_time[0] += (step * 7919) % 400_000
+                reply, state, _ = gcra(state, current_time[0] / 1_000_000, 5, fill_rate, 1 + step % 3)
+                assert script(lua.table('key'), lua.table(5, fill_rate, 1 + step % 3)) == reply
+                if reply:
+                    assert int(store['key']) == state[0]
+
+    @pytest.mark.parametrize('algorithm', ['sliding_window_counter', 'sliding_window_log'])
+    def test_window_scripts_match_the_python_algorithms(self, algorithm):
+        lupa = pytest.importorskip('lupa')
+        lua = lupa.LuaRuntime()
+        store, current_time = {}, [1_000_000_000]  # Microseconds
+
+        def call(command, key=None, *args):
+            if command == 'TIME':
+                return lua.table(str(current_time[0] // 1_000_000), str(current_time[0] % 1_000_000))
+            if command == 'GET':
+                return store.get(key, False)
+            if command == 'SET':
+                store[key] = args[0]
+            elif command == 'HMGET':
+                return lua.table(*(store.get(key, {}).get(field, False) for field in args))
+            elif command == 'HSET':
+                store.setdefault(key, {}).update(zip(args[::2], args[1::2]))
+            elif command == 'ZRANGEBYSCORE':
+                return lua.table(*(member for member, score in store.get(key, {}).items() if score <= args[1]))
+            elif command == 'ZREMRANGEBYSCORE':
+                store[key] = {member: score for member, score in store[key].items() if score > args[1]}
+            elif command == 'ZADD':
+                store.setdefault(key, {})[args[1]] = args[0]
+            return True  # PEXPIRE
+
+        lua.globals().redis = lua.table_from({'call': call})
+        script = lua.eval('function(KEYS, ARGV) ' + LUA_SCRIPTS[algorithm] + ' end')
+        state = None
+        for step in range(300):
+            current_time[0] += (step * 7919) % 300_000
+            cost = step % 4
+            now = current_time[0] // 1_000_000 + current_time[0] % 1_000_000 / 1_000_000
+            reply, state, _ = ALGORITHMS[algorithm](state, now, 5, 1, cost)
+            assert script(lua.table('key', 'key:cost'), lua.table(5, 1, cost, f'request-{step}')) == reply
+        if algorithm == 'sliding_window_log':
+            assert len(store['key']) == len(state[1])  # One member per request, whatever its cost
+
+    def test_sliding_window_counter_backends_use_the_local_rule(self):
+        clock = VirtualClock(1000.0)
+        counter = SlidingWindowCounter(max_allowed_requests=5, window_size=1, clock=clock)
+        state = None
+        for step in range(300):
+            clock.advance((step * 7919) % 300_000 / 1_000_000)
+            cost = 1 + step % 3
+            reply, state, _ = ALGORITHMS['sliding_window_counter'](state, clock(), 5, 1, cost)
+            assert counter.allow_request(cost) == reply
+
+    def test_in_memory_token_bucket(self):
+        backend = InMemoryStorageBackend()
+        assert [backend.evaluate('token_bucket', 'key', [3, 1, 1, '']) for _ in range(4)] == [1, 1, 1, 0]
+        assert backend.round_trips == 4
+
+    def test_in_memory_evaluate_many(self):
+        backend = InMemoryStorageBackend()
+        calls = [('key', [2, 10, 1, str(i)]) for i in range(3)]
+        assert backend.evaluate_many('sliding_window_log', calls) == [1, 1, 0]
+        assert backend.round_trips == 1
+
+    def test_in_memory_state_expires(self, monkeypatch):
+        current_time = [1000.0]
+        monkeypatch.setattr(storage_backend.time, 'time', lambda: current_time[0])
+        backend = InMemoryStorageBackend()
+        backend.evaluate('fixed_window_counter', 'key', [5, 1, 1, ''])
+        backend.evaluate('token_bucket', 'full', [5, 1, 0, ''])
+        assert 'key' in backend.data
+        current_time[0] += 1.5
+        assert backend.purge_expired() == 1  # The untouched bucket is full, its state expired right away
+        current_time[0] += 1
+        assert backend.purge_expired() == 1
+        assert backend.data == {}
+
+    def test_in_memory_sliding_window_counter_weights_previous_window(self, monkeypatch):
+        current_time = [1000.0]
+        monkeypatch.setattr(storage_backend.time, 'time', lambda: current_time[0])
+        backend = InMemoryStorageBackend()
+        assert [backend.evaluate('sliding_window_counter', 'key', [4, 1, 1, '']) for _ in range(5)] == [1] * 4 + [0]
+        current_time[0] += 1.5  # Half of the previous window is still inside the sliding window
+        assert [backend.evaluate('sliding_window_counter', 'key', [4, 1, 1, '']) for _ in range(3)] == [1, 1, 0]
+
+    def test_in_memory_gcra_keeps_one_integer(self, monkeypatch):
+        current_time = [1000.0]
+        monkeypatch.setattr(storage_backend.time, 'time', lambda: current_time[0])
+        backend = InMemoryStorageBackend()
+        assert [backend.evaluate('gcra', 'key', [2, 2, 1, '']) for _ in range(3)] == [1, 1, 0]
+        assert backend.data['key'] == (1_001_000_000,)  # Microseconds at which the bucket is full again
+        current_time[0] += 0.25  # Half a token
+        assert backend.evaluate('gcra', 'key', [2, 2, 1, '']) == 0
+        current_time[0] += 0.25
+        assert backend.evaluate('gcra', 'key', [2, 2, 1, '']) == 1
+        current_time[0] += 3
+        assert backend.purge_expired() == 1
+
+    def test_in_memory_gcra_admits_capacity_at_any_rate(self, monkeypatch):
+        monkeypatch.setattr(storage_backend.time, 'time', lambda: 1000.0)
+        backend = InMemoryStorageBackend()
+        for fill_rate in (7, 0.7, 11, 13):
+            key = f'key-{fill_rate}'
+            assert [backend.evaluate('gcra', key, [10, fill_rate, 1, '']) for _ in range(11)] == [1] * 10 + [0]
+
+    def test_redis_backend_uses_one_round_trip_per_decision(self):
+        client = FakeRedis()
+        backend = RedisStorageBackend(client)
+        assert backend.evaluate('leaky_bucket', 'key', [2, 1, 1, '']) == 1
+        assert backend.evaluate('leaky_bucket', 'key', [2, 1, 2, '']) == 0
+        assert client.calls == 2
+        assert backend.round_trips == 2
+        backend.evaluate('sliding_window_log', 'log', [2, 1, 1, 'id'])
+        assert client.keys[-1] == ['log', 'log:cost']  # The total cost of the log is kept next to it
+
+    def test_redis_backend_pipelines_batches(self):
+        client = FakeRedis()
+        backend = RedisStorageBackend(client)
+        calls = [(f'key-{i % 2}', [2, 10, 1, '']) for i in range(6)]
+        assert backend.evaluate_many('fixed_window_counter', calls) == [1, 1, 1, 1, 0, 0]
+        assert client.calls == 1
+        assert backend.round_trips == 1
+
+    def test_token_bucket_lease_grants_what_is_left(self):
+        backend = InMemoryStorageBackend()
+        assert backend.evaluate('token_bucket_lease', 'key', [10, 0.01, 4, '']) == [4, -1]
+        assert backend.evaluate('token_bucket_lease', 'key', [10, 0.01, 8, '']) == [6, -1]
+        assert backend.evaluate('token_bucket', 'key', [10, 0.01, 1, '']) == 0
+
+    def test_fixed_window_counter_lease_expires_with_the_window(self, monkeypatch):
+        current_time = [1000.0]
+        monkeypatch.setattr(storage_backend.time, 'time', lambda: current_time[0])
+        backend = InMemoryStorageBackend()
+        assert backend.evaluate('fixed_window_counter_lease', 'key', [5, 2, 3, '']) == [3, 2000]
+        current_time[0] += 0.5
+        assert backend.evaluate('fixed_window_counter_lease', 'key', [5, 2, 3, '']) == [2, 1500]
+        current_time[0] += 1.5
+        assert backend.evaluate('fixed_window_counter_lease', 'key', [5, 2, 3, '']) == [3, 2000]
+
+    def test_leaky_bucket_leaks(self):
+        backend = InMemoryStorageBackend()
+        assert backend.evaluate('leaky_bucket', 'key', [2, 20, 2, '']) == 1
+        assert backend.evaluate('leaky_bucket', 'key', [2, 20, 1, '']) == 0
+        time.sleep(0.1)
+        assert backend.evaluate('leaky_bucket', 'key', [2, 20, 1, '']) == 1
@@ -0,0 +1,108 @@
+import math
+import random
+
+import pytest
+
+from src.rate_limiting.timing_wheel import TimingWheel
+from src.rate_limiting.traffic_simulator import VirtualClock
+
+
+class TestTimingWheel:
+
+    def test_init_invalid_params(self):
+        with pytest.raises(ValueError):
+            TimingWheel(tick=0)
+        with pytest.raises(ValueError):
+            TimingWheel(wheel_size=1)
+        with pytest.raises(ValueError):
+            TimingWheel(levels=0)
+
+    def test_keys_expire_at_their_tick(self):
+        clock = VirtualClock()
+        wheel = TimingWheel(tick=1, wheel_size=4, levels=2, clock=clock)
+        wheel.schedule('a', 2.5)
+        wheel.schedule('b', 3)
+        wheel.schedule('c', 10)  # Filed at level 1, cascades to level 0
+        assert len(wheel) == 3 and 'a' in wheel
+        assert wheel.expiry_time('a') == 3
+
+        clock.advance(2.9)
+        assert wheel.advance() == []
+        clock.advance(0.1)
+        assert sorted(wheel.advance()) == ['a', 'b']
+        clock.advance_to(9.99)
+        assert wheel.advance() == []
+        clock.advance_to(10)
+        assert wheel.advance() == ['c']
+        assert len(wheel) == 0 and wheel.expiry_time('a') is None
+
+    def test_overdue_keys_expire_on_next_tick(self):
+        clock = VirtualClock(100)
+        wheel = TimingWheel(tick=1, clock=clock)
+        wheel.schedule('a', 50)
+        assert wheel.advance() == []
+        clock.advance(1)
+        assert wheel.advance() == ['a']
+
+    def test_reschedule_and_cancel(self):
+        clock = VirtualClock()
+        wheel = TimingWheel(tick=1, wheel_size=4, levels=2, clock=clock)
+        wheel.schedule('later', 2)
+        wheel.schedule('later', 7)
+        wheel.schedule('earlier', 7)
+        wheel.schedule('earlier', 3)
+        wheel.schedule('cancelled', 2)
+        assert wheel.cancel('cancelled') is True
+        assert wheel.cancel('unknown') is False
+
+        clock.advance_to(3)
+        assert wheel.advance() == ['earlier']
+        clock.advance_to(7)
+        assert wheel.advance() == ['later']
+        assert len(wheel) == 0
+
+    def test_expiry_beyond_reach_of_wheel(self):
+        clock = VirtualClock()
+        wheel = TimingWheel(tick=1, wheel_size=2, levels=2, clock=clock)  # Reaches 4 ticks ahead
+        wheel.schedule('far', 25)
+        clock.advance_to(24)
+        assert wheel.advance() == []
+        clock.advance_to(25)
+        assert wheel.advance() == ['far']
+
+    def test_max_expirations_bounds_work(self):
+        clock = VirtualClock()
+        wheel = TimingWheel(tick=1, clock=clock)
+        for key in range(100):
+            wheel.schedule(key, 1 + key // 10)  # 10 keys expire every tick
+        clock.advance_to(20)
+        assert wheel.advance(max_expirations=25) == list(range(25))
+        assert len(wheel) == 75
+        wheel.schedule(30, 100)  # Left over, but used again meanwhile
+        assert wheel.advance(max_expirations=10) == list(range(25, 30)) + list(range(31, 36))
+        assert len(wheel.advance()) == 64
+        assert len(wheel) == 1
+
+    def test_matches_reference_model(self):
+        rng = random.Random(7)
+        clock = VirtualClock()
+        wheel = TimingWheel(tick=0.5, wheel_size=4, levels=3, clock=clock)
+        expiry_ticks = {}
+        for _ in range(5000):
+            key = rng.randrange(50)
+            action = rng.random()
+            if action < 0.5:
+                expiry_time = clock() + rng.uniform(-5, 100)
+                wheel.schedule(key, expiry_time)
+                expiry_ticks[key] = max(math.ceil(expiry_time / 0.5), wheel.current_tick + 1)
+            elif action < 0.6:
+                wheel.cancel(key)
+                expiry_ticks.pop(key, None)
+            else:
+                clock.advance(rng.uniform(0, 10))
+                for expired_key in wheel.advance(rng.choice([1, 5])):
+                    assert expiry_ticks.pop(expired_key) <= wheel.current_tick
+                for expired_key in wheel.advance():
+                    assert expiry_ticks.pop(expired_key) <= wheel.current_tick
+                assert all(expiry_tick > wheel.current_tick for expiry_tick in expiry_ticks.values())
+            assert set(wheel.expiry_ticks) == set(expiry_ticks)
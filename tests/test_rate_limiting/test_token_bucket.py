@@ -3,6 +3,7 @@ import time
 import threading
 
 from src.rate_limiting.token_bucket import TokenBucket
+from src.rate_limiting.traffic_simulator import VirtualClock
 
 
 class TestTokenBucket:
@@ -88,3 +89,72 @@ class TestTokenBucket:
         for _ in range(10):
             assert self.default_bucket.consume(1) is True
         assert self.default_bucket.consume(1) is False
+
+    def test_time_until_available(self):
+        tb = TokenBucket(capacity=10, fill_rate=10)
+        assert tb.time_until_available(5) == 0
+        assert tb.consume(10) is True
+        assert 0.4 <= tb.time_until_available(5) <= 0.5
+        assert tb.time_until_available(11) == float('inf')
+        with pytest.raises(ValueError):
+            tb.time_until_available(-1)
+
+    def test_tokens_available_after_waiting(self):
+        tb = TokenBucket(capacity=10, fill_rate=20)
+        assert tb.consume(10) is True
+        time.sleep(tb.time_until_available(3))
+        assert tb.consume(3) is True
+
+    def test_acquire_waits_for_refill(self):
+        tb = TokenBucket(capacity=10, fill_rate=20)
+        assert tb.acquire(10) is True
+        start_time = time.monotonic()
+        assert tb.acquire(4) is True
+        assert 0.15 <= time.monotonic() - start_time <= 0.4
+
+    def test_acquire_timeout(self):
+        tb = TokenBucket(capacity=10, fill_rate=1)
+        assert tb.acquire(10, timeout=0) is True
+        start_time = time.monotonic()
+        assert tb.acquire(5, timeout=1) is False
+        assert time.monotonic() - start_time < 0.1  # Gives up without waiting for a refill that comes too late
+        assert tb.acquire(1, timeout=1.5) is True
+
+    def test_acquire_invalid(self):
+        with pytest.raises(ValueError):
+            self.default_bucket.acquire(-1)
+        with pytest.raises(ValueError):
+            self.default_bucket.acquire(11)
+
+    def test_concurrent_acquire(self):
+        tb = TokenBucket(capacity=5, fill_rate=50)
+        results = []
+
+        def acquire():
+            results.append(tb.acquire(5, timeout=2))
+
+        threads = [threading.Thread(target=acquire) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results == [True] * 4
+
+    def test_frequent_requests_earn_fractional_tokens(self):
+        clock = VirtualClock()
+        tb = TokenBucket(capacity=5, fill_rate=1, clock=clock)
+        assert tb.consume(5) is True
+        allowed = 0
+        for _ in range(12):
+            clock.advance(0.25)  # Each call sees a quarter of a token, which must not be rounded away
+            allowed += tb.consume(1)
+        assert allowed == 3  # 3 seconds earned 3 whole tokens
+
+    def test_full_bucket_does_not_bank_time(self):
+        clock = VirtualClock()
+        tb = TokenBucket(capacity=2, fill_rate=1, clock=clock)
+        clock.advance(10)
+        assert tb.get_available_tokens() == 2
+        assert tb.consume(2) is True
+        clock.advance(0.5)
+        assert tb.consume(1) is False
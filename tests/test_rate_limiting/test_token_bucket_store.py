@@ -0,0 +1,124 @@
+import pytest
+import random
+import threading
+import time
+
+from src.rate_limiting.token_bucket import TokenBucket
+from src.rate_limiting.token_bucket_store import TokenBucketStore, key_fingerprint
+
+
+class TestTokenBucketStore:
+
+    def test_init_invalid_params(self):
+        with pytest.raises(ValueError):
+            TokenBucketStore(capacity=0, fill_rate=1)
+        with pytest.raises(ValueError):
+            TokenBucketStore(capacity=10, fill_rate=-1)
+        with pytest.raises(ValueError):
+            TokenBucketStore(capacity=10, fill_rate=1, initial_slots=0)
+
+    def test_consume_creates_full_bucket(self):
+        store = TokenBucketStore(capacity=10, fill_rate=1)
+        assert 'client' not in store
+        assert store.consume('client', 4) is True
+        assert 'client' in store
+        assert len(store) == 1
+        assert store.get_available_tokens('client') == 6
+
+    def test_consume_failure(self):
+        store = TokenBucketStore(capacity=10, fill_rate=1)
+        assert store.consume('client', 11) is False
+        assert store.get_available_tokens('client') == 10
+
+    def test_consume_invalid(self):
+        store = TokenBucketStore(capacity=10, fill_rate=1)
+        with pytest.raises(ValueError):
+            store.consume('client', -1)
+
+    def test_get_available_tokens_unknown_key(self):
+        store = TokenBucketStore(capacity=10, fill_rate=1)
+        assert store.get_available_tokens('client') == 10
+        assert len(store) == 0
+
+    def test_add_bucket_with_own_limits(self):
+        store = TokenBucketStore(capacity=10, fill_rate=1)
+        store.add_bucket('premium', capacity=100, fill_rate=10)
+        assert store.consume('premium', 100) is True
+        assert store.consume('basic', 100) is False
+        with pytest.raises(ValueError):
+            store.add_bucket('broken', capacity=0)
+
+    def test_refill(self):
+        store = TokenBucketStore(capacity=10, fill_rate=10)
+        assert store.consume('client', 10) is True
+        time.sleep(0.5)
+        assert 4 <= store.get_available_tokens('client') <= 6
+
+    def test_remove_and_reuse(self):
+        store = TokenBucketStore(capacity=10, fill_rate=1)
+        store.consume('a', 10)
+        assert store.remove('a') is True
+        assert store.remove('a') is False
+        assert 'a' not in store
+        assert store.get_available_tokens('a') == 10
+
+    def test_growth_keeps_state(self):
+        store = TokenBucketStore(capacity=10, fill_rate=0.001, initial_slots=4)
+        for i in range(5000):
+            store.consume(f'client-{i}', i % 10)
+        for i in range(0, 5000, 50):
+            store.remove(f'client-{i}')
+        assert len(store) == 4900
+        for i in range(5000):
+            expected = 10 if i % 50 == 0 else 10 - i % 10
+            assert store.get_available_tokens(f'client-{i}') == expected
+
+    def test_same_decisions_as_token_bucket(self, monkeypatch):
+        current_time = [1000.0]
+        monkeypatch.setattr(time, 'monotonic', lambda: current_time[0])
+        store = TokenBucketStore(capacity=20, fill_rate=3.7)
+        buckets = {}
+
+        rng = random.Random(7)
+        for _ in range(20000):
+            current_time[0] += rng.expovariate(200)
+            key = rng.randrange(50)
+            tokens = rng.randint(0, 4)
+            # The store creates a bucket on the first request of a key, so do the same with the buckets
+            bucket = buckets.setdefault(key, TokenBucket(capacity=20, fill_rate=3.7))
+            assert store.consume(key, tokens) is bucket.consume(tokens)
+
+    def test_memory_per_key(self):
+        store = TokenBucketStore(capacity=10, fill_rate=1)
+        for i in range(100_000):
+            store.consume(i, 1)
+        assert store.nbytes() / len(store) < 100
+
+    def test_thread_safety(self):
+        store = TokenBucketStore(capacity=100, fill_rate=0.001)
+
+        def consume():
+            for i in range(1000):
+                store.consume(i % 10, 1)
+
+        threads = [threading.Thread(target=consume) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # 4 threads x 100 tokens per key, every bucket is exactly empty
+        assert all(store.get_available_tokens(key) == 0 for key in range(10))
+
+    def test_keys_with_the_same_hash(self):
+        assert hash(-1) == hash(-2) and hash(1) == hash(1.0) == hash(True)
+        store = TokenBucketStore(capacity=10, fill_rate=0.001)
+        assert store.consume(-1, 10) is True
+        assert store.consume(-2, 1) is True
+        assert store.consume(1, 3) is True
+        assert store.consume('1', 2) is True
+        assert len(store) == 4
+        assert [store.get_available_tokens(key) for key in (-1, -2, 1, 1.0, '1', b'1')] == [0, 9, 7, 10, 8, 10]
+
+    def test_key_fingerprint(self):
+        assert key_fingerprint('client') == key_fingerprint('client') != key_fingerprint(b'client')
+        assert key_fingerprint(b'client') == (4209321114454386938, 1551433494)  # Same in every process
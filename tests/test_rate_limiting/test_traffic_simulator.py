@@ -0,0 +1,92 @@
+import time
+
+import pytest
+
+from src.rate_limiting.fixed_window_counter import FixedWindowCounter
+from src.rate_limiting.keyed_rate_limiter import KeyedRateLimiter
+from src.rate_limiting.leaky_bucket import LeakyBucket
+from src.rate_limiting.sliding_window_counter import SlidingWindowCounter
+from src.rate_limiting.sliding_window_log import SlidingWindowLog
+from src.rate_limiting.token_bucket import TokenBucket
+from src.rate_limiting.traffic_simulator import (VirtualClock, bursty_arrivals, diurnal_arrivals, poisson_arrivals,
+                                                 recorded_arrivals, simulate)
+
+
+class TestTrafficSimulator:
+
+    def test_virtual_clock(self):
+        clock = VirtualClock(10.0)
+        assert clock() == 10.0
+        clock.advance(2.5)
+        clock.advance_to(5.0)  # In the past, ignored
+        assert clock() == 12.5
+        with pytest.raises(ValueError):
+            clock.advance(-1)
+
+    def test_limiters_follow_the_injected_clock(self):
+        clock = VirtualClock()
+        bucket = TokenBucket(capacity=2, fill_rate=1, clock=clock)
+        log = SlidingWindowLog(max_allowed_requests=1, window_size=10, clock=clock)
+        assert bucket.consume(2) is True
+        assert log.allow_request() is True
+        assert log.time_until_available() == 10
+        clock.advance(10)
+        assert bucket.get_available_tokens() == 2
+        assert log.allow_request() is True
+
+    def test_keyed_rate_limiter_evicts_idle_keys_in_virtual_time(self):
+        clock = VirtualClock()
+        registry = KeyedRateLimiter(lambda: FixedWindowCounter(1, 1, clock=clock), idle_ttl=60, clock=clock)
+        registry.get_limiter('a')
+        clock.advance(61)
+        assert registry.evict_idle() == 1
+
+    def test_poisson_arrivals(self):
+        arrivals = list(poisson_arrivals(rate=100, duration=100, seed=1))
+        assert arrivals == sorted(arrivals)
+        assert 9_500 < len(arrivals) < 10_500
+        assert arrivals == list(poisson_arrivals(rate=100, duration=100, seed=1))
+
+    def test_bursty_arrivals(self):
+        arrivals = list(bursty_arrivals(rate=10, burst_rate=1000, burst_duration=1, burst_interval=10, duration=100,
+                                        seed=1))
+        in_bursts = sum(1 for timestamp in arrivals if timestamp % 10 < 1)
+        assert 9_500 < in_bursts < 10_500
+        assert 700 < len(arrivals) - in_bursts < 1_100
+        with pytest.raises(ValueError):
+            bursty_arrivals(rate=10, burst_rate=100, burst_duration=2, burst_interval=1, duration=10)
+
+    def test_diurnal_arrivals_peak_in_the_middle_of_the_period(self):
+        arrivals = list(diurnal_arrivals(mean_rate=10, amplitude=0.9, duration=1000, period=1000, seed=1))
+        night = sum(1 for timestamp in arrivals if timestamp < 100 or timestamp >= 900)
+        midday = sum(1 for timestamp in arrivals if 450 <= timestamp < 650)
+        assert midday > 5 * night
+        assert 9_000 < len(arrivals) < 11_000
+
+    def test_recorded_arrivals(self):
+        assert list(recorded_arrivals([100.0, 101.0, 103.0], time_scale=0.5)) == [0.0, 0.5, 1.5]
+        with pytest.raises(ValueError):
+            recorded_arrivals([100.0], time_scale=0)  # Raised on the call, not on the first arrival
+
+    def test_simulate_hour_of_traffic_in_virtual_time(self):
+        start_time = time.monotonic()
+        result = simulate(lambda clock: TokenBucket(capacity=10, fill_rate=5, clock=clock),
+                          poisson_arrivals(rate=10, duration=3600, seed=3), interval=60)
+        assert time.monotonic() - start_time < 5
+        assert result['duration'] > 3599
+        assert result['allowed'] + result['denied'] == result['requests']
+        # Requests come in at twice the fill rate, about half of them are denied
+        assert 0.4 < result['deny_rate'] < 0.6
+        assert len(result['timeline']) == 60
+        assert sum(allowed for _, allowed, _ in result['timeline']) == result['allowed']
+
+    @pytest.mark.parametrize("factory", [
+        lambda clock: TokenBucket(capacity=5, fill_rate=5, clock=clock),
+        lambda clock: LeakyBucket(capacity=5, leak_rate=5, clock=clock),
+        lambda clock: FixedWindowCounter(max_allowed_requests=5, window_size=1, clock=clock),
+        lambda clock: SlidingWindowCounter(max_allowed_requests=5, window_size=1, clock=clock),
+        lambda clock: SlidingWindowLog(max_allowed_requests=5, window_size=1, clock=clock),
+    ])
+    def test_every_algorithm_holds_its_rate(self, factory):
+        result = simulate(factory, poisson_arrivals(rate=50, duration=1000, seed=5))
+        assert 4 * 1000 <= result['allowed'] <= 6 * 1000
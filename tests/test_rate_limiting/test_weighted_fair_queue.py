@@ -0,0 +1,134 @@
+import threading
+from collections import Counter
+
+import pytest
+
+from src.rate_limiting.fixed_window_counter import FixedWindowCounter
+from src.rate_limiting.leaky_bucket import LeakyBucket
+from src.rate_limiting.token_bucket import TokenBucket
+from src.rate_limiting.traffic_simulator import VirtualClock
+from src.rate_limiting.weighted_fair_queue import WeightedFairQueue
+
+
+def drain(queue: WeightedFairQueue, count: int) -> list:
+    """Dequeue up to count items from a queue whose limiter admits them all."""
+    return [entry for entry in (queue.dequeue() for _ in range(count)) if entry is not None]
+
+
+class TestWeightedFairQueue:
+
+    def test_init_invalid_params(self):
+        bucket = TokenBucket(capacity=10, fill_rate=10)
+        with pytest.raises(ValueError):
+            WeightedFairQueue(object())
+        with pytest.raises(ValueError):
+            WeightedFairQueue(bucket, quantum=0)
+        with pytest.raises(ValueError):
+            WeightedFairQueue(bucket, max_queue_length=0)
+        queue = WeightedFairQueue(bucket)
+        with pytest.raises(ValueError):
+            queue.enqueue('a', 'item', cost=11)  # Never admitted
+        with pytest.raises(ValueError):
+            queue.set_weight('a', 0)
+
+    def test_cost_above_max_allowed_requests_is_rejected(self):
+        clock = VirtualClock()
+        queue = WeightedFairQueue(FixedWindowCounter(max_allowed_requests=5, window_size=1, clock=clock), clock=clock)
+        with pytest.raises(ValueError):
+            queue.enqueue('a', 'item', cost=10)  # Would stall the rotation once 'a' has the deficit for it
+        for i in range(20):
+            queue.enqueue('b', i)
+        served = []
+        for _ in range(4):
+            served += drain(queue, 20)
+            clock.advance(1)
+        assert len(served) == 20
+
+    def test_round_robin_between_tenants(self):
+        queue = WeightedFairQueue(TokenBucket(capacity=100, fill_rate=1))
+        for i in range(3):
+            queue.enqueue('a', f'a{i}')
+        queue.enqueue('b', 'b0')
+        assert drain(queue, 5) == [('a', 'a0'), ('b', 'b0'), ('a', 'a1'), ('a', 'a2')]
+        assert len(queue) == 0 and queue.dequeue() is None
+
+    def test_shares_follow_weights(self):
+        queue = WeightedFairQueue(TokenBucket(capacity=1000, fill_rate=1), quantum=2)
+        queue.set_weight('gold', 3)
+        for i in range(300):
+            for tenant in ('gold', 'silver', 'bronze'):
+                queue.enqueue(tenant, i)
+        queue.set_weight('bronze', 0.5)  # Applied to a tenant with queued items
+        served = Counter(tenant for tenant, _ in drain(queue, 450))
+        assert served == {'gold': 300, 'silver': 100, 'bronze': 50}  # 6:2:1 per round
+        # Once gold is done, its share goes to the others, still in proportion to their weights
+        served = Counter(tenant for tenant, _ in drain(queue, 180))
+        assert served == {'silver': 120, 'bronze': 60}
+
+    def test_shares_follow_costs(self):
+        queue = WeightedFairQueue(LeakyBucket(capacity=1000, leak_rate=1), quantum=4)
+        for i in range(100):
+            queue.enqueue('heavy', i, cost=4)
+            queue.enqueue('light', i, cost=1)
+        served = Counter(tenant for tenant, _ in drain(queue, 50))
+        assert served == {'heavy': 10, 'light': 40}  # The same tokens for both
+
+    def test_idle_tenants_share_goes_to_busy_ones(self):
+        queue = WeightedFairQueue(TokenBucket(capacity=1000, fill_rate=1))
+        queue.set_weight('idle', 10)
+        queue.enqueue('idle', 'i0')
+        for i in range(20):
+            queue.enqueue('busy', i)
+        assert drain(queue, 21)[:2] == [('idle', 'i0'), ('busy', 0)]
+        assert queue.get_queue_length('busy') == 0
+        # Coming back, the idle tenant did not bank the deficit of the rounds it missed
+        for i in range(20):
+            queue.enqueue('busy', i)
+            queue.enqueue('idle', i)
+        assert Counter(tenant for tenant, _ in drain(queue, 11)) == {'idle': 10, 'busy': 1}
+
+    def test_full_tenant_queue_rejects_only_its_items(self):
+        queue = WeightedFairQueue(TokenBucket(capacity=10, fill_rate=1), max_queue_length=2)
+        assert queue.enqueue('a', 1) and queue.enqueue('a', 2)
+        assert not queue.enqueue('a', 3)
+        assert queue.enqueue('b', 1)
+        assert queue.get_queue_length() == 3 and queue.get_queue_length('a') == 2
+
+    def test_limiter_sets_the_pace(self):
+        clock = VirtualClock()
+        queue = WeightedFairQueue(TokenBucket(capacity=2, fill_rate=10, clock=clock), clock=clock)
+        for i in range(4):
+            queue.enqueue('a', i)
+        assert len(drain(queue, 4)) == 2
+        assert queue.time_until_available() == pytest.approx(0.1)
+        clock.advance(0.1)
+        assert queue.dequeue() == ('a', 2)
+
+    def test_get_waits_for_enqueue(self):
+        queue = WeightedFairQueue(TokenBucket(capacity=10, fill_rate=100))
+        assert queue.get(timeout=0.01) is None
+        threading.Timer(0.02, queue.enqueue, ('a', 'item')).start()
+        assert queue.get(timeout=1) == ('a', 'item')
+
+    def test_latency_stays_flat_while_a_tenant_floods(self):
+        # 100 items per second shared by a tenant flooding 5000 items at once and 4 tenants sending 10 per second
+        clock = VirtualClock()
+        bucket = TokenBucket(capacity=5, fill_rate=100, clock=clock)
+        queue = WeightedFairQueue(bucket, max_queue_length=10_000, clock=clock)
+        for i in range(5000):
+            queue.enqueue('flood', clock())
+        latencies = []
+        for step in range(2000):  # 20 seconds, 10 ms per step
+            if step % 10 == 0:
+                for tenant in range(4):
+                    queue.enqueue(tenant, clock())
+            while (entry := queue.dequeue()) is not None:
+                tenant, enqueue_time = entry
+                if tenant != 'flood':
+                    latencies.append(clock() - enqueue_time)
+            clock.advance(0.01)
+        assert len(latencies) == 800
+        # A round of 5 tenants takes 50 ms, at most one round of waiting from the first second to the last
+        assert max(latencies) <= 0.05
+        # The flooding tenant still gets the capacity the others leave, 5 tokens of burst and 1999 of refill
+        assert queue.get_queue_length('flood') == 5000 - (5 + 1999 - 800)
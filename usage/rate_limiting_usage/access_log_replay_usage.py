@@ -0,0 +1,55 @@
+import gzip
+import json
+import os
+import random
+import tempfile
+
+from src.rate_limiting.access_log_replay import limit_grid, read_access_log, replay_access_log
+from src.rate_limiting.traffic_simulator import bursty_arrivals, poisson_arrivals
+
+
+def write_access_log(path: str):
+    """Write 20 minutes of traffic: 100 regular clients and one scraper sending bursts every 5 minutes."""
+    rng = random.Random(1)
+    requests = [(timestamp, f"client-{client}")
+                for client in range(100) for timestamp in poisson_arrivals(rate=rng.uniform(0.1, 0.5), duration=1200)]
+    requests += [(timestamp, 'scraper') for timestamp in
+                 bursty_arrivals(rate=1, burst_rate=50, burst_duration=10, burst_interval=300, duration=1200, seed=1)]
+    requests.sort()
+    with gzip.open(path, 'wt') as file:
+        for timestamp, key in requests:
+            file.write(json.dumps({'timestamp': 1_700_000_000 + timestamp, 'api_key': key, 'path': '/items'}) + '\n')
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'access.jsonl.gz')
+        write_access_log(path)
+
+        print("Scenario 1: Token bucket limits keeping 5% of the requests or less denied")
+        requests = read_access_log(path, key_field='api_key')
+        report = replay_access_log(requests, 'token_bucket', limit_grid(capacity=[5, 20], fill_rate=[1, 2, 5]),
+                                   target_deny_rate=0.05)
+        print(f"{report['requests']:,} requests from {report['keys']} keys over {report['duration']:.0f}s")
+        for result in report['candidates']:
+            print(f"{result['limits']}: deny rate {result['deny_rate']:.2%}, "
+                  f"{result['keys_over_target']} keys over the target")
+        print("Recommended:", report['recommended'])
+
+        print("\nScenario 2: Keys denied more than the target with the recommended limits")
+        index = [result['limits'] for result in report['candidates']].index(report['recommended'])
+        for key, stats in report['per_key'].items():
+            if stats['deny_rates'][index] > 0.05:
+                print(f"{key}: {stats['requests']} requests, {stats['deny_rates'][index]:.2%} denied, "
+                      f"smallest limits {stats['smallest_limits']}")
+
+        print("\nScenario 3: Sliding window log over the same log")
+        requests = read_access_log(path, key_field='api_key')
+        report = replay_access_log(requests, 'sliding_window_log',
+                                   limit_grid(max_allowed_requests=[30, 60, 120], window_size=[60]),
+                                   target_deny_rate=0.05)
+        print("Recommended:", report['recommended'])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.rate_limiting.adaptive_rate_limiter import AIMDController, simulate_goodput
+from src.rate_limiting.token_bucket import TokenBucket
+from src.rate_limiting.traffic_simulator import poisson_arrivals
+
+
+def backend_capacity(timestamp: float) -> float:
+    """Requests per second the backend serves: it degrades after a minute, then scales out a minute later."""
+    return 200 if timestamp < 60 else 60 if timestamp < 120 else 400
+
+
+def main():
+    print("Scenario 1: Goodput of a static and an adaptive limit, 350 requests per second for 3 minutes")
+    for name, controller_factory in (
+            ('static 150/s', None),
+            ('adaptive', lambda limiter, clock: AIMDController(limiter, latency_target=0.1, min_rate=10,
+                                                               max_rate=1000, increase=10, clock=clock))):
+        result = simulate_goodput(lambda clock: TokenBucket(capacity=20, fill_rate=150, clock=clock),
+                                  poisson_arrivals(rate=350, duration=180, seed=1), backend_capacity, timeout=0.5,
+                                  controller_factory=controller_factory, interval=30)
+        print(f"{name}: served={result['served']} failed={result['failed']} goodput={result['goodput']:.0f}/s")
+        for interval_start, goodput, rate in result['timeline']:
+            print(f"  t={interval_start:>4.0f}s goodput={goodput:>5.0f}/s rate={rate:.0f}/s")
+
+    print("\nScenario 2: Retuning a live limiter from the latency of the calls it admits")
+    bucket = TokenBucket(capacity=5, fill_rate=50)
+    controller = AIMDController(bucket, latency_target=0.02, min_rate=25, max_rate=200, increase=20, interval=0.2)
+
+    def call_backend(request_id: int) -> None:
+        if not bucket.acquire(timeout=1):
+            return
+        start_time = time.monotonic()
+        time.sleep(0.005 if request_id < 200 else 0.05)  # The backend slows down halfway through
+        controller.record(time.monotonic() - start_time)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        for batch in range(8):
+            list(executor.map(call_backend, range(batch * 50, (batch + 1) * 50)))
+            print(f"after {(batch + 1) * 50} calls: fill rate={bucket.fill_rate:.0f}/s")
+
+
+if __name__ == "__main__":
+    main()
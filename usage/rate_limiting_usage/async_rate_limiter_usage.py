@@ -0,0 +1,39 @@
+import asyncio
+import time
+
+from src.rate_limiting.async_rate_limiter import AsyncLeakyBucket, AsyncSlidingWindowLog, AsyncTokenBucket
+
+
+async def call_api(limiter, request_id: int, start_time: float):
+    """Wait for the rate limiter, then pretend to call the API."""
+    async with limiter:
+        print(f"Request {request_id}: Sent at {time.monotonic() - start_time:.2f}s")
+
+
+async def main():
+    print("Scenario 1: Requests wait for tokens instead of being denied")
+    # Allow bursts of 5 requests, refilled at 5 requests per second
+    bucket = AsyncTokenBucket(capacity=5, fill_rate=5)
+    start_time = time.monotonic()
+    await asyncio.gather(*(call_api(bucket, i + 1, start_time) for i in range(10)))
+
+    print("\nScenario 2: Multiple token acquisition")
+    bucket = AsyncTokenBucket(capacity=10, fill_rate=5)
+    start_time = time.monotonic()
+    for tokens in (10, 5, 5):
+        await bucket.acquire(tokens)
+        print(f"Acquired {tokens} tokens at {time.monotonic() - start_time:.2f}s")
+
+    print("\nScenario 3: Smoothing a burst with a leaky bucket")
+    bucket = AsyncLeakyBucket(capacity=2, leak_rate=4)
+    start_time = time.monotonic()
+    await asyncio.gather(*(call_api(bucket, i + 1, start_time) for i in range(6)))
+
+    print("\nScenario 4: Waiting for the sliding window")
+    log = AsyncSlidingWindowLog(max_allowed_requests=3, window_size=1.0)
+    start_time = time.monotonic()
+    await asyncio.gather(*(call_api(log, i + 1, start_time) for i in range(7)))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,27 @@
+import numpy as np
+
+from src.rate_limiting.batch_rate_limiter import BatchSlidingWindowCounter, BatchTokenBucket
+
+
+def main():
+    print("Scenario 1: A batch of requests decided at once")
+    # Every client gets its own bucket of 3 tokens, the batch is decided in order, as one consume per request
+    buckets = BatchTokenBucket(capacity=3, fill_rate=1)
+    keys = ["client-a", "client-b", "client-a", "client-a", "client-a", "client-b"]
+    admitted = buckets.consume_batch(keys, [1] * len(keys))
+    for key, allowed in zip(keys, admitted):
+        print(f"{key}: {'Allowed' if allowed else 'Denied'}")
+
+    print("\nScenario 2: Weighted requests")
+    admitted = buckets.consume_batch(["client-c", "client-c", "client-c"], [2, 2, 1])
+    print(f"costs 2, 2, 1: {admitted.tolist()}")
+
+    print("\nScenario 3: A million requests of 10000 clients")
+    counters = BatchSlidingWindowCounter(max_allowed_requests=50, window_size=60)
+    keys = np.random.default_rng(3).integers(10_000, size=1_000_000).tolist()
+    admitted = counters.allow_request_batch(keys)
+    print(f"Allowed: {admitted.sum()}, Denied: {len(keys) - admitted.sum()}, tracked clients: {len(counters)}")
+
+
+if __name__ == '__main__':
+    main()
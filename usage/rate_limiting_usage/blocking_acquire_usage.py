@@ -0,0 +1,45 @@
+import threading
+import time
+
+from src.rate_limiting.fixed_window_counter import FixedWindowCounter
+from src.rate_limiting.sliding_window_log import SlidingWindowLog
+from src.rate_limiting.token_bucket import TokenBucket
+
+
+def main():
+    print("Scenario 1: Waiting for the limiter instead of retrying")
+    # 5 requests per second after a burst of 2, acquire sleeps exactly as long as the next token takes
+    bucket = TokenBucket(capacity=2, fill_rate=5)
+    start_time = time.monotonic()
+    for i in range(6):
+        bucket.acquire(1)
+        print(f"request {i} admitted at {time.monotonic() - start_time:.2f}s")
+
+    print("\nScenario 2: Giving up after a timeout")
+    counter = FixedWindowCounter(max_allowed_requests=1, window_size=10)
+    counter.acquire()
+    start_time = time.monotonic()
+    admitted = counter.acquire(timeout=0.5)
+    # Unless the next window starts within the timeout, acquire returns at once rather than waiting in vain
+    print(f"admitted: {admitted}, after {time.monotonic() - start_time:.2f}s")
+
+    print("\nScenario 3: Worker threads sharing a limiter")
+    log = SlidingWindowLog(max_allowed_requests=4, window_size=0.5)
+    admitted = []
+    start_time = time.monotonic()
+
+    def worker() -> None:
+        for _ in range(3):
+            if log.acquire(timeout=2):
+                admitted.append(round(time.monotonic() - start_time, 1))
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(f"Admission times of 12 requests, 4 per window: {sorted(admitted)}")
+
+
+if __name__ == '__main__':
+    main()
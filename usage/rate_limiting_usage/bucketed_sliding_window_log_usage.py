@@ -0,0 +1,33 @@
+import sys
+import time
+
+from src.rate_limiting.bucketed_sliding_window_log import BucketedSlidingWindowLog
+from src.rate_limiting.sliding_window_log import SlidingWindowLog
+
+
+def main():
+    print("Scenario 1: Basic rate limiting")
+    # Allow 5 requests per second, counted in slices of 100 ms
+    log = BucketedSlidingWindowLog(max_allowed_requests=5, window_size=1.0, slices=10)
+    for i in range(8):
+        print(f"Request {i + 1}: {'Allowed' if log.allow_request() else 'Denied'}")
+    print("Current stats:", log.get_stats())
+
+    print("\nScenario 2: Waiting for the oldest slice to leave the window")
+    print(f"Next request allowed in {log.time_until_available():.2f}s")
+    start_time = time.monotonic()
+    log.acquire()
+    print(f"Acquired after {time.monotonic() - start_time:.2f}s")
+
+    print("\nScenario 3: Memory of a heavy tenant, 100k requests per minute")
+    exact = SlidingWindowLog(max_allowed_requests=100_000, window_size=60)
+    bucketed = BucketedSlidingWindowLog(max_allowed_requests=100_000, window_size=60, slices=60)
+    for _ in range(100_000):
+        exact.allow_request()
+        bucketed.allow_request()
+    exact_bytes = sys.getsizeof(exact.request_timestamps) + 100_000 * sys.getsizeof(0.0)
+    print(f"Exact log: ~{exact_bytes:,} bytes, bucketed log: {bucketed.slice_counts.buffer_info()[1] * 8:,} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.rate_limiting.concurrency_limiter import AsyncConcurrencyLimiter, ConcurrencyLimiter, VegasLimit
+from src.rate_limiting.keyed_rate_limiter import KeyedRateLimiter
+
+
+def main():
+    print("Scenario 1: At most 3 calls in flight, from 10 threads")
+    limiter = ConcurrencyLimiter(3)
+    peak = [0]
+    lock = threading.Lock()
+
+    def call_backend(request_id: int) -> None:
+        with limiter.permit():
+            with lock:
+                peak[0] = max(peak[0], limiter.in_flight)
+            time.sleep(0.01)
+
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        list(executor.map(call_backend, range(30)))
+    print(f"30 calls made, at most {peak[0]} in flight")
+
+    print("\nScenario 2: Shedding load instead of queueing it")
+    limiter = ConcurrencyLimiter(2)
+    for request_id in range(4):
+        if limiter.allow_request():
+            print(f"request {request_id}: admitted, {limiter.in_flight} in flight")
+        else:
+            print(f"request {request_id}: rejected, 503")
+    limiter.release()
+    limiter.release()
+
+    print("\nScenario 3: Per-tenant concurrency caps")
+    tenants = KeyedRateLimiter(lambda: ConcurrencyLimiter(2), wheel_tick=1.0)
+    for tenant in ('tenant-a', 'tenant-a', 'tenant-a', 'tenant-b'):
+        print(f"{tenant}: {'admitted' if tenants.get_limiter(tenant).allow_request() else 'rejected'}")
+
+    print("\nScenario 4: async with, coroutines served in arrival order")
+
+    async def run() -> None:
+        async_limiter = AsyncConcurrencyLimiter(2)
+
+        async def call(request_id: int) -> None:
+            async with async_limiter.permit():
+                print(f"request {request_id} running, {async_limiter.in_flight} in flight")
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(call(request_id) for request_id in range(5)))
+
+    asyncio.run(run())
+
+    print("\nScenario 5: Adaptive limit, a backend serving 8 calls at once in 20 ms, sharing itself among more")
+    limiter = ConcurrencyLimiter(1, limit_algorithm=VegasLimit(max_limit=100))
+    backend_calls = [0]
+
+    def call_adaptive_backend(request_id: int) -> None:
+        with limiter.permit():
+            with lock:
+                backend_calls[0] += 1
+                latency = 0.02 * max(1.0, backend_calls[0] / 8)
+            time.sleep(latency)
+            with lock:
+                backend_calls[0] -= 1
+
+    with ThreadPoolExecutor(max_workers=32) as executor:
+        for batch in range(5):
+            list(executor.map(call_adaptive_backend, range(200)))
+            print(f"after {(batch + 1) * 200} calls: limit={limiter.limit}")
+
+
+if __name__ == "__main__":
+    main()
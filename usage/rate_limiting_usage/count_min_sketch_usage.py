@@ -0,0 +1,33 @@
+import random
+
+from src.rate_limiting.count_min_sketch import CountMinSketchLimiter
+from src.rate_limiting.traffic_simulator import VirtualClock
+
+
+def main():
+    print("Scenario 1: Per-client limits without per-client state")
+    # Every source IP gets 5 requests per 10 second window
+    limiter = CountMinSketchLimiter(max_allowed_requests=5, window_size=10)
+    for client in ("10.0.0.1", "10.0.0.2"):
+        decisions = [limiter.allow_request(client) for _ in range(8 if client == "10.0.0.1" else 3)]
+        print(f"{client}: Allowed: {decisions.count(True)}, Denied: {decisions.count(False)}")
+
+    print("\nScenario 2: A flood from half a million sources in fixed memory")
+    clock = VirtualClock()
+    limiter = CountMinSketchLimiter(max_allowed_requests=50, window_size=60, top_k=5, clock=clock)
+    rng = random.Random(42)
+    botnet = [f"203.0.113.{i}" for i in range(5)]
+    denied = 0
+    for i in range(500_000):
+        clock.advance(0.0001)
+        source = rng.choice(botnet) if i % 100 == 0 else f"198.{i % 256}.{i // 256 % 256}.{i // 65536}"
+        denied += not limiter.allow_request(source)
+    print(f"Denied requests: {denied}, memory: {limiter.nbytes() / 1e6:.1f} MB whatever the number of sources")
+
+    print("\nScenario 3: Heavy hitters to block upstream")
+    for source, estimate in limiter.get_heavy_hitters():
+        print(f"{source}: ~{estimate:.0f} requests in the last minute")
+
+
+if __name__ == '__main__':
+    main()
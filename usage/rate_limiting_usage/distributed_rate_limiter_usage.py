@@ -0,0 +1,35 @@
+from src.rate_limiting.distributed_rate_limiter import DistributedRateLimiter
+from src.rate_limiting.storage_backend import InMemoryStorageBackend
+
+
+def main():
+    # The in-memory backend runs the same decisions as the Redis scripts, in process. With a Redis server, use
+    # RedisStorageBackend(redis.Redis()) instead, and every node sharing it enforces the same limits
+    backend = InMemoryStorageBackend()
+
+    print("Scenario 1: One global limit shared by the replicas of a service")
+    replicas = [DistributedRateLimiter(backend, 'token_bucket', capacity=10, fill_rate=1) for _ in range(3)]
+    allowed = [sum(replica.allow_request("client-a") for _ in range(5)) for replica in replicas]
+    print(f"Allowed per replica: {allowed}, in total: {sum(allowed)} of 15")
+
+    print("\nScenario 2: Every algorithm on the same backend")
+    limits = {
+        'leaky_bucket': {'capacity': 5, 'leak_rate': 1},
+        'fixed_window_counter': {'max_allowed_requests': 5, 'window_size': 60},
+        'sliding_window_counter': {'max_allowed_requests': 5, 'window_size': 60},
+        'sliding_window_log': {'max_allowed_requests': 5, 'window_size': 60},
+        'gcra': {'capacity': 5, 'fill_rate': 1},
+    }
+    for algorithm, algorithm_limits in limits.items():
+        limiter = DistributedRateLimiter(backend, algorithm, key_prefix=algorithm, **algorithm_limits)
+        print(f"{algorithm}: {sum(limiter.allow_request('client-b') for _ in range(8))} of 8 allowed")
+
+    print("\nScenario 3: A batch of decisions in one round-trip")
+    limiter = DistributedRateLimiter(backend, 'fixed_window_counter', key_prefix='batch', max_allowed_requests=3,
+                                     window_size=60)
+    round_trips = backend.round_trips
+    print(f"Decisions: {limiter.allow_batch(['client-c'] * 5)}, round-trips: {backend.round_trips - round_trips}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+import threading
+import time
+
+from src.rate_limiting.fast_rate_limiter import FastSlidingWindowLog, FastTokenBucket
+from src.rate_limiting.token_bucket import TokenBucket
+
+
+def decisions_per_second(consume, num_decisions: int = 200_000) -> float:
+    """Throughput of a decision called in a loop."""
+    start_time = time.perf_counter()
+    for _ in range(num_decisions):
+        consume(1)
+    return num_decisions / (time.perf_counter() - start_time)
+
+
+def main():
+    print("Scenario 1: Same decisions as the regular limiters")
+    bucket = FastTokenBucket(capacity=5, fill_rate=1)
+    allowed = sum(bucket.consume(1) for _ in range(8))
+    print(f"Allowed: {allowed}, Denied: {8 - allowed}, tokens left: {bucket.get_available_tokens()}")
+    log = FastSlidingWindowLog(max_allowed_requests=10, window_size=1)
+    print(f"Weighted requests of cost 4: {[log.allow_request(4) for _ in range(3)]}")
+
+    print("\nScenario 2: One limiter per worker thread")
+    # The fast limiters hold no lock, so each thread gets its own, with its share of the limit
+    local = threading.local()
+
+    def worker() -> None:
+        if not hasattr(local, 'bucket'):
+            local.bucket = FastTokenBucket(capacity=5, fill_rate=1)
+        allowed = sum(local.bucket.consume(1) for _ in range(8))
+        print(f"{threading.current_thread().name}: Allowed: {allowed}, Denied: {8 - allowed}")
+
+    threads = [threading.Thread(target=worker, name=f"worker-{i}") for i in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print("\nScenario 3: Decisions per second")
+    print(f"TokenBucket: {decisions_per_second(TokenBucket(capacity=10**9, fill_rate=1).consume):,.0f}")
+    print(f"FastTokenBucket: {decisions_per_second(FastTokenBucket(capacity=10**9, fill_rate=1).consume):,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+import time
+
+from src.rate_limiting.distributed_rate_limiter import DistributedRateLimiter
+from src.rate_limiting.gcra import GCRA, GCRAStore
+from src.rate_limiting.storage_backend import InMemoryStorageBackend
+
+
+def main():
+    print("Scenario 1: Burst, then a steady rate with Retry-After")
+    # Bursts of up to 5 requests, refilled at 2 requests per second
+    limiter = GCRA(capacity=5, fill_rate=2)
+    for i in range(8):
+        allowed, retry_after = limiter.consume_with_retry_after(1)
+        status = "Allowed" if allowed else f"Denied, Retry-After: {retry_after:.3f}s"
+        print(f"Request {i + 1}: {status}")
+    time.sleep(0.5)
+    print(f"After 0.5s: {limiter.get_available_tokens()} token available")
+
+    print("\nScenario 2: Waiting for tokens")
+    start_time = time.monotonic()
+    limiter.acquire(2, timeout=2)
+    print(f"Acquired 2 tokens after {time.monotonic() - start_time:.2f}s")
+
+    print("\nScenario 3: One integer per client")
+    store = GCRAStore(capacity=5, fill_rate=1)
+    for i in range(100_000):
+        store.consume(f"client-{i}", 1)
+    print(f"Tracked clients: {len(store)}, "
+          f"state of a client: {store.theoretical_arrival_times['client-0']} (theoretical arrival time in ns)")
+
+    print("\nScenario 4: Limit shared between nodes")
+    backend = InMemoryStorageBackend()
+    nodes = [DistributedRateLimiter(backend, 'gcra', capacity=3, fill_rate=1) for _ in range(2)]
+    results = [nodes[i % 2].allow_request("client") for i in range(5)]
+    print(f"Decisions across two nodes: {results}")
+
+
+if __name__ == '__main__':
+    main()
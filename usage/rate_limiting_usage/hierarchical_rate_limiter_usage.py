@@ -0,0 +1,31 @@
+from src.rate_limiting.fixed_window_counter import FixedWindowCounter
+from src.rate_limiting.hierarchical_rate_limiter import HierarchicalRateLimiter
+from src.rate_limiting.sliding_window_log import SlidingWindowLog
+from src.rate_limiting.token_bucket import TokenBucket
+
+
+def main():
+    # Every user of an organization has 5 requests, the organization 8 per minute, the whole service 100 per minute
+    global_limiter = FixedWindowCounter(max_allowed_requests=100, window_size=60)
+    organization = SlidingWindowLog(max_allowed_requests=8, window_size=60)
+    alice = HierarchicalRateLimiter([TokenBucket(capacity=5, fill_rate=0.1), organization, global_limiter])
+    bob = HierarchicalRateLimiter([TokenBucket(capacity=5, fill_rate=0.1), organization, global_limiter])
+
+    print("Scenario 1: Alice uses her own quota")
+    for i in range(6):
+        print(f"Alice request {i + 1}: {'Allowed' if alice.allow_request() else 'Denied'}")
+
+    print("\nScenario 2: Bob runs into the organization quota, his own quota is not charged for denied requests")
+    for i in range(5):
+        allowed = bob.allow_request()
+        reason = '' if allowed else f" by {type(bob.denying_limiter()).__name__}"
+        print(f"Bob request {i + 1}: {'Allowed' if allowed else 'Denied'}{reason}")
+    print("Bob tokens left:", bob.limiters[0].get_available_tokens())
+    print("Global requests counted:", global_limiter.current_request_count)
+
+    print("\nScenario 3: A batch of 3 requests is admitted at once, or not at all")
+    print("Alice batch:", 'Allowed' if alice.allow_request(3) else 'Denied')
+
+
+if __name__ == "__main__":
+    main()
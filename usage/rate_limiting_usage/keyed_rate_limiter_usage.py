@@ -0,0 +1,44 @@
+import time
+
+from src.rate_limiting.keyed_rate_limiter import KeyedRateLimiter
+from src.rate_limiting.token_bucket import TokenBucket
+
+
+def simulate_client_calls(registry: KeyedRateLimiter, client: str, num_calls: int):
+    """Simulate API calls from a single client and print the results."""
+    allowed = 0
+    denied = 0
+    for _ in range(num_calls):
+        if registry.get_limiter(client).consume(1):
+            allowed += 1
+        else:
+            denied += 1
+    print(f"{client}: Allowed: {allowed}, Denied: {denied}")
+
+
+def main():
+    print("Scenario 1: Independent limits per client")
+    # Every client gets its own bucket of 5 requests, refilled at 1 request per second
+    registry = KeyedRateLimiter(lambda: TokenBucket(capacity=5, fill_rate=1))
+    simulate_client_calls(registry, "client-a", 8)
+    simulate_client_calls(registry, "client-b", 3)
+    print(f"Tracked clients: {len(registry)}")
+
+    print("\nScenario 2: Bounded number of tracked clients")
+    registry = KeyedRateLimiter(lambda: TokenBucket(capacity=5, fill_rate=1), max_keys=1000)
+    for i in range(100_000):
+        registry.get_limiter(f"10.0.{i // 256 % 256}.{i % 256}-{i}").consume(1)
+    print(f"Seen 100000 clients, tracked clients: {len(registry)}")
+
+    print("\nScenario 3: Idle clients are evicted")
+    registry = KeyedRateLimiter(lambda: TokenBucket(capacity=5, fill_rate=1), idle_ttl=1)
+    for i in range(10):
+        registry.get_limiter(f"client-{i}").consume(1)
+    print(f"Tracked clients: {len(registry)}")
+    time.sleep(1.1)
+    registry.get_limiter("client-0").consume(1)
+    print(f"Evicted {registry.evict_idle()} idle clients, tracked clients: {len(registry)}")
+
+
+if __name__ == '__main__':
+    main()
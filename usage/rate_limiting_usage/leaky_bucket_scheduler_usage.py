@@ -0,0 +1,44 @@
+import asyncio
+import time
+
+from src.rate_limiting.leaky_bucket_scheduler import AsyncLeakyBucketScheduler, LeakyBucketScheduler
+
+
+def call_downstream(request_id: int, start_time: float) -> str:
+    """Stand-in for a call to a service that cannot absorb bursts."""
+    return f"request {request_id} sent at {time.monotonic() - start_time:.2f}s"
+
+
+def main():
+    print("Scenario 1: A burst smoothed to 5 calls per second")
+    with LeakyBucketScheduler(capacity=8, leak_rate=5) as scheduler:
+        start_time = time.monotonic()
+        futures = [scheduler.submit(call_downstream, i + 1, start_time) for i in range(10)]
+        for i, future in enumerate(futures):
+            print(future.result() if future is not None else f"request {i + 1} rejected, the queue is full")
+
+    print("\nScenario 2: Pacing 100,000 calls per second")
+    sent = []
+    with LeakyBucketScheduler(capacity=200_000, leak_rate=100_000) as scheduler:
+        start_time = time.monotonic()
+        for i in range(200_000):
+            scheduler.add(sent.append, i)
+    print(f"Sent {len(sent)} calls in {time.monotonic() - start_time:.2f}s")
+
+    print("\nScenario 3: Coroutines on the event loop")
+
+    async def fetch(page: int, start_time: float) -> str:
+        await asyncio.sleep(0.01)
+        return f"page {page} fetched at {time.monotonic() - start_time:.2f}s"
+
+    async def crawl():
+        scheduler = AsyncLeakyBucketScheduler(capacity=100, leak_rate=4)
+        start_time = time.monotonic()
+        for page in await asyncio.gather(*(scheduler.submit(fetch(i + 1, start_time)) for i in range(6))):
+            print(page)
+
+    asyncio.run(crawl())
+
+
+if __name__ == '__main__':
+    main()
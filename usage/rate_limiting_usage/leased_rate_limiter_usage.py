@@ -0,0 +1,30 @@
+from src.rate_limiting.leased_rate_limiter import LeasedRateLimiter
+from src.rate_limiting.storage_backend import InMemoryStorageBackend
+
+
+def main():
+    print("Scenario 1: Decisions answered from a local lease")
+    # Each node takes 20 requests of the global quota at once, instead of one round-trip per request
+    backend = InMemoryStorageBackend()
+    limiter = LeasedRateLimiter(backend, 'fixed_window_counter', lease_size=20, max_allowed_requests=100,
+                                window_size=60)
+    allowed = sum(limiter.allow_request("client-a") for _ in range(50))
+    limiter.close()
+    print(f"Allowed: {allowed} of 50, round-trips: {backend.round_trips}")
+
+    print("\nScenario 2: Nodes sharing a global quota")
+    backend = InMemoryStorageBackend()
+    nodes = [LeasedRateLimiter(backend, 'fixed_window_counter', lease_size=20, max_allowed_requests=100,
+                               window_size=60) for _ in range(3)]
+    allowed = [sum(node.allow_request("client-b") for _ in range(50)) for node in nodes]
+    for node in nodes:
+        node.close()
+    print(f"Allowed per node: {allowed}, in total: {sum(allowed)} of a quota of 100")
+    # Close waits for the refills in flight: quota leased by a node and not spent in the window is lost, never
+    # admitted twice
+    print(f"Leased and unspent per node: {[node.remaining('client-b') for node in nodes]}")
+    print(f"Round-trips: {backend.round_trips}, instead of 150 without leases")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+import threading
+
+from src.rate_limiting.keyed_rate_limiter import KeyedRateLimiter
+from src.rate_limiting.metrics import RateLimiterMetrics, to_openmetrics, to_prometheus
+from src.rate_limiting.sliding_window_log import SlidingWindowLog
+from src.rate_limiting.token_bucket import TokenBucket
+
+
+def main():
+    print("Scenario 1: Counting the decisions of a limiter")
+    metrics = RateLimiterMetrics('search', sample_every=4)
+    bucket = TokenBucket(capacity=5, fill_rate=1, metrics=metrics)
+    for i in range(8):
+        print(f"Request {i + 1}: {'Allowed' if bucket.consume(1) else 'Denied'}")
+    snapshot = metrics.snapshot()
+    print(f"Allowed: {snapshot['allowed']}, denied: {snapshot['denied']}, "
+          f"timed decisions: {snapshot['decision_latency']['count']}")
+
+    print("\nScenario 2: One metrics object shared by the limiters of every key, under contention")
+    login_metrics = RateLimiterMetrics('login')
+    registry = KeyedRateLimiter(lambda: SlidingWindowLog(max_allowed_requests=100, window_size=60,
+                                                         metrics=login_metrics))
+
+    def worker():
+        for i in range(2000):
+            registry.get_limiter(f"user-{i % 4}").allow_request()
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    snapshot = login_metrics.snapshot()
+    print(f"Allowed: {snapshot['allowed']}, denied: {snapshot['denied']}, "
+          f"contended lock acquisitions: {snapshot['lock_wait']['count']}")
+
+    print("\nScenario 3: Prometheus exposition, as served on a /metrics endpoint")
+    print(to_prometheus([metrics, login_metrics]).split('# HELP rate_limiter_lock_wait_seconds')[0])
+
+    print("Scenario 4: The end of the OpenMetrics exposition")
+    print('\n'.join(to_openmetrics([metrics]).splitlines()[-4:]))
+
+
+if __name__ == "__main__":
+    main()
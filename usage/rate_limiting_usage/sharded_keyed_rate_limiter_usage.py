@@ -0,0 +1,42 @@
+import threading
+import time
+
+from src.rate_limiting.keyed_rate_limiter import KeyedRateLimiter
+from src.rate_limiting.sharded_keyed_rate_limiter import ShardedKeyedRateLimiter
+from src.rate_limiting.token_bucket import TokenBucket
+
+
+def tenant_bucket() -> TokenBucket:
+    """Bucket of a new tenant, whose quota is read from a store first, the lookup releasing the GIL."""
+    time.sleep(0.001)
+    return TokenBucket(capacity=5, fill_rate=1)
+
+
+def onboard_tenants(registry, num_threads: int, tenants_per_thread: int) -> float:
+    """Seconds taken by threads creating the limiters of new tenants at the same time."""
+    def worker(thread_id: int) -> None:
+        for i in range(tenants_per_thread):
+            registry.get_limiter(f"tenant-{thread_id}-{i}").consume(1)
+
+    threads = [threading.Thread(target=worker, args=(thread_id,)) for thread_id in range(num_threads)]
+    start_time = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start_time
+
+
+def main():
+    print("Scenario 1: Same decisions as a keyed rate limiter")
+    registry = ShardedKeyedRateLimiter(lambda: TokenBucket(capacity=5, fill_rate=1), num_shards=16)
+    allowed = sum(registry.get_limiter("client-a").consume(1) for _ in range(8))
+    print(f"client-a: Allowed: {allowed}, Denied: {8 - allowed}, tracked clients: {len(registry)}")
+
+    print("\nScenario 2: Tenants created by 8 threads, with a slow limiter factory")
+    print(f"single lock: {onboard_tenants(KeyedRateLimiter(tenant_bucket), 8, 50):.2f}s")
+    print(f"64 shards: {onboard_tenants(ShardedKeyedRateLimiter(tenant_bucket, num_shards=64), 8, 50):.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+import multiprocessing
+import os
+import tempfile
+
+from src.rate_limiting.distributed_rate_limiter import DistributedRateLimiter
+from src.rate_limiting.shared_memory_backend import SharedMemoryStorageBackend
+from src.rate_limiting.token_bucket import TokenBucket
+
+
+def serve_with_own_bucket(worker_id: int, results) -> None:
+    """A worker process limiting requests on its own, as every worker of a pre-fork server would."""
+    bucket = TokenBucket(capacity=20, fill_rate=0.1)
+    results.put((worker_id, sum(bucket.consume(1) for _ in range(50))))
+
+
+def serve_with_shared_table(worker_id: int, path: str, results) -> None:
+    """A worker process limiting requests through the table every worker of the host maps."""
+    with SharedMemoryStorageBackend(path) as backend:
+        limiter = DistributedRateLimiter(backend, 'token_bucket', capacity=20, fill_rate=0.1)
+        results.put((worker_id, sum(limiter.allow_request('client-a') for _ in range(50))))
+
+
+def run_workers(target, *args) -> None:
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    workers = [context.Process(target=target, args=(worker_id, *args, results)) for worker_id in range(4)]
+    for worker in workers:
+        worker.start()
+    allowed = dict(results.get() for _ in workers)
+    for worker in workers:
+        worker.join()
+    print(f"Allowed per worker: {[allowed[worker_id] for worker_id in range(4)]}, host total: {sum(allowed.values())}")
+
+
+def main():
+    print("Scenario 1: Four workers, one bucket of 20 requests each")
+    run_workers(serve_with_own_bucket)
+
+    print("\nScenario 2: Four workers sharing one bucket of 20 requests through shared memory")
+    with tempfile.TemporaryDirectory(dir='/dev/shm' if os.path.isdir('/dev/shm') else None) as directory:
+        run_workers(serve_with_shared_table, os.path.join(directory, 'rate_limits'))
+
+    print("\nScenario 3: The table outlives the workers")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'rate_limits')
+        with SharedMemoryStorageBackend(path) as backend:
+            limiter = DistributedRateLimiter(backend, 'fixed_window_counter', max_allowed_requests=3, window_size=60)
+            print(f"First worker: {[limiter.allow_request('client-b') for _ in range(2)]}")
+        with SharedMemoryStorageBackend(path) as backend:
+            limiter = DistributedRateLimiter(backend, 'fixed_window_counter', max_allowed_requests=3, window_size=60)
+            print(f"Restarted worker: {[limiter.allow_request('client-b') for _ in range(2)]}")
+
+
+if __name__ == '__main__':
+    main()
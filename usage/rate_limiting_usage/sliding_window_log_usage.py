@@ -46,6 +46,14 @@ def main():
     print("After reset:", counter.get_stats())
     simulate_requests(counter, 5)
 
+    print("\nScenario 4: Weighted requests")
+    # A bulk export costs as much as 50 regular calls, and is still a single entry of the log
+    counter = SlidingWindowLog(max_allowed_requests=100, window_size=1.0)
+    for name, cost in [("export", 50), ("call", 1), ("export", 50), ("call", 1)]:
+        status = "Allowed" if counter.allow_request(cost) else "Denied"
+        print(f"{name} (cost {cost}): {status}, log entries: {len(counter.request_timestamps)}")
+    print(f"Next export in {counter.time_until_available(50):.2f}s")
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,39 @@
+import os
+import tempfile
+import time
+
+from src.rate_limiting.snapshot import load_snapshot, save_snapshot
+from src.rate_limiting.token_bucket_store import TokenBucketStore
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'buckets.snapshot')
+
+        print("Scenario 1: An abusive client drains its bucket before a deploy")
+        # Keys are fingerprinted by their content, the restarted process finds their buckets again
+        store = TokenBucketStore(capacity=5, fill_rate=1)
+        allowed = sum(store.consume("abusive-client", 1) for _ in range(20))
+        print(f"Allowed: {allowed}, tokens left: {store.get_available_tokens('abusive-client')}")
+        save_snapshot(store, path)
+
+        print("\nScenario 2: The new process restores the buckets instead of starting them full")
+        time.sleep(1)  # The deploy
+        store = load_snapshot(path)
+        allowed = sum(store.consume("abusive-client", 1) for _ in range(20))
+        print(f"Allowed after restart: {allowed}, refilled during the deploy only")
+
+        print("\nScenario 3: A million clients")
+        store = TokenBucketStore(capacity=5, fill_rate=1, initial_slots=2_000_000)
+        for i in range(1_000_000):
+            store.consume(i, 1)
+        start_time = time.perf_counter()
+        save_snapshot(store, path)
+        save_time = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        store = load_snapshot(path)
+        print(f"Saved in {save_time:.2f}s, restored {len(store)} clients in {time.perf_counter() - start_time:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+from src.rate_limiting.fixed_window_counter import FixedWindowCounter
+from src.rate_limiting.keyed_rate_limiter import KeyedRateLimiter
+from src.rate_limiting.timing_wheel import TimingWheel
+from src.rate_limiting.token_bucket import TokenBucket
+from src.rate_limiting.traffic_simulator import VirtualClock
+
+
+def main():
+    print("Scenario 1: Sessions expiring on a timing wheel")
+    clock = VirtualClock()
+    wheel = TimingWheel(tick=1, clock=clock)
+    for session, ttl in (("alice", 30), ("bob", 5), ("carol", 90_000)):
+        wheel.schedule(session, clock() + ttl)
+    for seconds in (5, 25, 90_000):
+        clock.advance_to(seconds)
+        print(f"t={seconds}s expired: {wheel.advance()}, still tracked: {len(wheel)}")
+
+    print("\nScenario 2: Window counters dropped once their window ends")
+    clock = VirtualClock()
+    registry = KeyedRateLimiter(lambda: FixedWindowCounter(max_allowed_requests=10, window_size=60, clock=clock),
+                                clock=clock, wheel_tick=1)
+    for i in range(50_000):
+        clock.advance(0.001)
+        registry.get_limiter(f"client-{i}").allow_request()
+    print(f"Tracked clients: {len(registry)}")
+    clock.advance(30)
+    print(f"30s later, expired {registry.evict_idle()} clients, tracked clients: {len(registry)}")
+    clock.advance(60)
+    print(f"90s later, expired {registry.evict_idle()} clients, tracked clients: {len(registry)}")
+
+    print("\nScenario 3: Idle clients expired a few at a time on the insert path")
+    clock = VirtualClock()
+    registry = KeyedRateLimiter(lambda: TokenBucket(capacity=5, fill_rate=1, clock=clock), idle_ttl=10,
+                                max_eviction_steps=8, clock=clock, wheel_tick=0.1)
+    for i in range(1_000):
+        registry.get_limiter(f"old-{i}").consume(1)
+    clock.advance(11)
+    for i in range(50):
+        registry.get_limiter(f"new-{i}").consume(1)
+    print(f"After 50 new clients, tracked clients: {len(registry)}, at most 8 expired per insertion")
+
+
+if __name__ == '__main__':
+    main()
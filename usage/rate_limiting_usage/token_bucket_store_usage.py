@@ -0,0 +1,35 @@
+from src.rate_limiting.token_bucket_store import TokenBucketStore
+
+
+def simulate_client_calls(store: TokenBucketStore, client: str, num_calls: int):
+    """Simulate API calls from a single client and print the results."""
+    allowed = 0
+    denied = 0
+    for _ in range(num_calls):
+        if store.consume(client, 1):
+            allowed += 1
+        else:
+            denied += 1
+    print(f"{client}: Allowed: {allowed}, Denied: {denied}")
+
+
+def main():
+    print("Scenario 1: One bucket per client")
+    # Every client gets its own bucket of 5 tokens, refilled at 1 token per second
+    store = TokenBucketStore(capacity=5, fill_rate=1)
+    simulate_client_calls(store, "client-a", 8)
+    simulate_client_calls(store, "client-b", 3)
+
+    print("\nScenario 2: Clients with their own limits")
+    store.add_bucket("premium-client", capacity=20, fill_rate=10)
+    simulate_client_calls(store, "premium-client", 25)
+
+    print("\nScenario 3: Memory used by a million clients")
+    store = TokenBucketStore(capacity=5, fill_rate=1)
+    for i in range(1_000_000):
+        store.consume(i, 1)
+    print(f"Tracked clients: {len(store)}, bytes per client: {store.nbytes() / len(store):.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+from src.rate_limiting.fixed_window_counter import FixedWindowCounter
+from src.rate_limiting.leaky_bucket import LeakyBucket
+from src.rate_limiting.sliding_window_counter import SlidingWindowCounter
+from src.rate_limiting.sliding_window_log import SlidingWindowLog
+from src.rate_limiting.token_bucket import TokenBucket
+from src.rate_limiting.traffic_simulator import bursty_arrivals, poisson_arrivals, simulate
+
+# Every limiter allows about 10 requests per second
+LIMITERS = {
+    'token_bucket': lambda clock: TokenBucket(capacity=10, fill_rate=10, clock=clock),
+    'leaky_bucket': lambda clock: LeakyBucket(capacity=10, leak_rate=10, clock=clock),
+    'fixed_window_counter': lambda clock: FixedWindowCounter(max_allowed_requests=10, window_size=1, clock=clock),
+    'sliding_window_counter': lambda clock: SlidingWindowCounter(max_allowed_requests=10, window_size=1, clock=clock),
+    'sliding_window_log': lambda clock: SlidingWindowLog(max_allowed_requests=10, window_size=1, clock=clock),
+}
+
+
+def main():
+    print("Scenario 1: An hour of steady traffic at 8 requests per second, in virtual time")
+    for name, factory in LIMITERS.items():
+        result = simulate(factory, poisson_arrivals(rate=8, duration=3600, seed=1))
+        print(f"{name:<24} requests={result['requests']:>6} deny rate={result['deny_rate']:.2%}")
+
+    print("\nScenario 2: The same hour with a 5 second burst at 100 requests per second every minute")
+    for name, factory in LIMITERS.items():
+        arrivals = bursty_arrivals(rate=8, burst_rate=100, burst_duration=5, burst_interval=60, duration=3600, seed=1)
+        result = simulate(factory, arrivals)
+        print(f"{name:<24} requests={result['requests']:>6} deny rate={result['deny_rate']:.2%}")
+
+    print("\nScenario 3: Allowed and denied requests of the token bucket around the first burst")
+    arrivals = bursty_arrivals(rate=8, burst_rate=100, burst_duration=5, burst_interval=60, duration=10, seed=1)
+    result = simulate(LIMITERS['token_bucket'], arrivals, interval=1)
+    for interval_start, allowed, denied in result['timeline']:
+        print(f"t={interval_start:>4.0f}s allowed={allowed:>3} denied={denied:>3}")
+
+
+if __name__ == "__main__":
+    main()
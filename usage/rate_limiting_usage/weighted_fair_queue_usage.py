@@ -0,0 +1,64 @@
+import threading
+from collections import Counter
+
+from src.rate_limiting.token_bucket import TokenBucket
+from src.rate_limiting.traffic_simulator import VirtualClock
+from src.rate_limiting.weighted_fair_queue import WeightedFairQueue
+
+
+def worst_latency(fair: bool) -> float:
+    """
+    Worst latency of 4 well-behaved tenants sending 10 items per second each, while another one floods 5000 items
+    at once, on a limiter admitting 100 items per second, in simulated time
+    """
+    clock = VirtualClock()
+    queue = WeightedFairQueue(TokenBucket(capacity=5, fill_rate=100, clock=clock), max_queue_length=10_000,
+                              clock=clock)
+    for _ in range(5000):
+        queue.enqueue('flood' if fair else 'everyone', ('flood', clock()))
+    latencies = []
+    for step in range(6000):  # 60 seconds, 10 ms per step
+        if step % 10 == 0:
+            for tenant in range(4):
+                queue.enqueue(tenant if fair else 'everyone', (tenant, clock()))
+        while (entry := queue.dequeue()) is not None:
+            tenant, enqueue_time = entry[1]
+            if tenant != 'flood':
+                latencies.append(clock() - enqueue_time)
+        clock.advance(0.01)
+    return max(latencies)
+
+
+def main():
+    print("Scenario 1: Shares in proportion to the weights")
+    queue = WeightedFairQueue(TokenBucket(capacity=1000, fill_rate=10))
+    queue.set_weight('gold', 3)
+    queue.set_weight('bronze', 0.5)
+    for i in range(100):
+        for tenant in ('gold', 'silver', 'bronze'):
+            queue.enqueue(tenant, i)
+    served = Counter(queue.dequeue()[0] for _ in range(90))
+    print(f"90 items dequeued: {dict(served)}")
+
+    print("\nScenario 2: A worker thread draining the queue at the pace of the limiter")
+    queue = WeightedFairQueue(TokenBucket(capacity=2, fill_rate=20))
+    for i in range(3):
+        queue.enqueue('tenant-a', f'a{i}')
+        queue.enqueue('tenant-b', f'b{i}')
+    done = threading.Event()
+
+    def worker() -> None:
+        while (entry := queue.get(timeout=0.5)) is not None:
+            print(f"processing {entry[1]} of {entry[0]}")
+        done.set()
+
+    threading.Thread(target=worker).start()
+    done.wait()
+
+    print("\nScenario 3: Worst latency of the well-behaved tenants while one floods")
+    print(f"one shared FIFO queue: {worst_latency(fair=False):.2f}s")
+    print(f"weighted fair queue: {worst_latency(fair=True):.2f}s")
+
+
+if __name__ == "__main__":
+    main()